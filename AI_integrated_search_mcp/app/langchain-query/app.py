@@ -11,10 +11,10 @@ import os
 import json
 import time
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
-import boto3
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_restful import Api, Resource
@@ -43,6 +43,8 @@ DATA_DIR = Path("/app/data")
 INPUT_DB_PATH = DATA_DIR / "inpit.db"
 BIGQUERY_DB_PATH = DATA_DIR / "google_patents_gcp.db"
 DATABASE_API_URL = os.environ.get("DATABASE_API_URL", "http://sqlite-db:5000")
+# Seconds to wait before retrying a failed client initialization
+SERVICE_INIT_RETRY_SECONDS = float(os.environ.get("SERVICE_INIT_RETRY_SECONDS", "30"))
 
 app = Flask(__name__)
 CORS(app)
@@ -94,32 +96,50 @@ class LangChainQueryProcessor:
     def __init__(self, llm):
         """Initialize LangChain Query Processor"""
         self.llm = llm
-        self.db_connections = {}
+        # db_name -> (file version, (reflected SQLDatabase, query chain, query tool))
+        self._databases: Dict[str, Tuple[Optional[Tuple[int, int]], Tuple[SQLDatabase, Any, Any]]] = {}
+        self._lock = threading.Lock()
         logger.info("Initialized LangChain Query Processor")
     
-    def get_db_connection(self, db_name: str) -> SQLDatabase:
-        """Get SQLDatabase instance for a database"""
-        if db_name in self.db_connections:
-            return self.db_connections[db_name]
-        
+    @staticmethod
+    def _file_version(db_path: str) -> Optional[Tuple[int, int]]:
+        """(inode, mtime) of a database file; changes when the file is replaced or rewritten"""
+        try:
+            stat = os.stat(db_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+    
+    def _get_database(self, db_name: str) -> Tuple[SQLDatabase, Any, Any]:
+        """SQLDatabase, query chain and query tool of a database, rebuilt when its file changes"""
         db_path = str(INPUT_DB_PATH if db_name == "input" else BIGQUERY_DB_PATH)
-        logger.info(f"Creating SQLDatabase connection for: {db_path}")
+        version = self._file_version(db_path)
+        cached = self._databases.get(db_name)
+        if cached and cached[0] == version:
+            return cached[1]
         
-        db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
-        
-        self.db_connections[db_name] = db
-        return db
+        with self._lock:
+            cached = self._databases.get(db_name)
+            if cached and cached[0] == version:
+                return cached[1]
+            
+            logger.info(f"{'Reloading' if cached else 'Creating'} SQLDatabase connection for: {db_path}")
+            db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
+            entry = (db, create_sql_query_chain(self.llm, db), QuerySQLDataBaseTool(db=db))
+            self._databases[db_name] = (version, entry)
+            return entry
+    
+    def get_db_connection(self, db_name: str) -> SQLDatabase:
+        """Get SQLDatabase instance for a database (reflected again after the file changes)"""
+        return self._get_database(db_name)[0]
     
     def process_nl_query(self, user_query: str, db_name: str) -> Dict[str, Any]:
         """Process natural language query using LangChain's DatabaseChain"""
         logger.info(f"Processing natural language query with LangChain: {user_query}")
         
         try:
-            # Get SQLDatabase connection
-            db = self.get_db_connection(db_name)
-            
-            # Create query generation chain
-            query_chain = create_sql_query_chain(self.llm, db)
+            # SQLDatabase, query generation chain and query tool, built once per database file version
+            db, query_chain, query_tool = self._get_database(db_name)
             
             # Generate SQL query
             start_time = time.time()
@@ -129,8 +149,6 @@ class LangChainQueryProcessor:
             logger.info(f"Generated SQL query: {sql_query}")
             
             # Execute the query
-            query_tool = QuerySQLDataBaseTool(db=db)
-            
             execute_start_time = time.time()
             query_result = query_tool.invoke({"query": sql_query})
             execution_time = time.time() - execute_start_time
@@ -271,7 +289,61 @@ class LangChainQueryProcessor:
         return formatted_output
 
 
+class ServiceContainer:
+    """
+    Process-wide LLM client and query processor shared by all requests
+
+    Flask-RESTful creates a new Resource instance for every request, so the Bedrock
+    client and the processor's reflected SQLDatabase instances built in a Resource's
+    __init__ never outlived one request. The container builds them once, on first
+    use or in warm_up(), and is passed to the resources via resource_class_kwargs.
+    A failed initialization is retried after SERVICE_INIT_RETRY_SECONDS.
+    """
+    
+    def __init__(self):
+        self.init_error: Optional[str] = None
+        self._lc_processor: Optional[LangChainQueryProcessor] = None
+        self._failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def lc_processor(self) -> Optional[LangChainQueryProcessor]:
+        """The shared processor, or None if the LLM client could not be initialized"""
+        if self._lc_processor is not None:
+            return self._lc_processor
+        with self._lock:
+            retry_due = self._failed_at is None or time.monotonic() - self._failed_at >= SERVICE_INIT_RETRY_SECONDS
+            if self._lc_processor is None and retry_due:
+                try:
+                    bedrock_llm = BedrockLLM()
+                    self._lc_processor = LangChainQueryProcessor(bedrock_llm.llm)
+                    self.init_error = None
+                except Exception as e:
+                    self._failed_at = time.monotonic()
+                    self.init_error = str(e)
+                    logger.error(f"Error initializing LangChain query services: {str(e)}")
+        return self._lc_processor
+    
+    def warm_up(self, db_names: Tuple[str, ...] = ("input", "bigquery")):
+        """Create the LLM client and reflect the databases before the first request"""
+        lc_processor = self.lc_processor
+        if not lc_processor:
+            return
+        for db_name in db_names:
+            try:
+                lc_processor.get_db_connection(db_name)
+            except Exception as e:
+                logger.warning(f"Could not reflect database {db_name} yet: {str(e)}")
+
+
+# Shared by all requests of this process
+SERVICES = ServiceContainer()
+
+
 class Health(Resource):
+    def __init__(self, services: ServiceContainer):
+        self.services = services
+    
     def get(self):
         """Health check endpoint"""
         logger.debug("Health check requested")
@@ -288,15 +360,8 @@ class Health(Resource):
         return health_status
     
     def _check_bedrock_api(self) -> bool:
-        """Check if Bedrock API is available"""
-        try:
-            # Initialize Bedrock client
-            session = boto3.Session()
-            region = session.region_name or os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
-            boto3.client('bedrock-runtime', region_name=region)
-            return True
-        except:
-            return False
+        """Check if the shared Bedrock LLM client is available"""
+        return self.services.lc_processor is not None
 
 
 class OpenAPISpec(Resource):
@@ -362,23 +427,16 @@ class OpenAPISpec(Resource):
 
 
 class LangChainQuery(Resource):
-    def __init__(self):
-        self.bedrock_llm = None
-        self.lc_processor = None
-        
-        # Initialize clients
-        try:
-            self.bedrock_llm = BedrockLLM()
-            self.lc_processor = LangChainQueryProcessor(self.bedrock_llm.llm)
-        except Exception as e:
-            logger.error(f"Error initializing LangChainQuery resource: {str(e)}")
+    def __init__(self, services: ServiceContainer):
+        self.services = services
     
     def post(self, db_name):
         """Process natural language query using LangChain"""
         logger.debug(f"LangChain Query requested for database: {db_name}")
         
-        if not self.lc_processor:
-            return {"error": "LangChain Query processor not initialized"}, 500
+        lc_processor = self.services.lc_processor
+        if not lc_processor:
+            return {"error": f"LangChain Query processor not initialized: {self.services.init_error}"}, 500
         
         if db_name not in ["input", "bigquery"]:
             return {"error": "Invalid database name"}, 400
@@ -391,7 +449,7 @@ class LangChainQuery(Resource):
         logger.info(f"Processing LangChain query on {db_name} database: {user_query}")
         
         try:
-            result = self.lc_processor.process_nl_query(user_query, db_name)
+            result = lc_processor.process_nl_query(user_query, db_name)
             return result
             
         except Exception as e:
@@ -432,8 +490,8 @@ def docs():
     """
 
 # Register API resources
-api.add_resource(Health, '/health')
-api.add_resource(LangChainQuery, '/query/<string:db_name>')
+api.add_resource(Health, '/health', resource_class_kwargs={"services": SERVICES})
+api.add_resource(LangChainQuery, '/query/<string:db_name>', resource_class_kwargs={"services": SERVICES})
 api.add_resource(OpenAPISpec, '/openapi')
 
 def main():
@@ -444,6 +502,9 @@ def main():
     aws_region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
     logger.info(f"Using AWS region: {aws_region}")
     
+    # Create the LLM client and reflect the databases before serving the first request
+    SERVICES.warm_up()
+    
     # Run the Flask app
     app.run(host='0.0.0.0', port=5000, debug=os.environ.get("LOG_LEVEL", "INFO").upper() == "DEBUG")
 
@@ -12,15 +12,19 @@ import json
 import time
 import re
 import sys
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
 import boto3
 import requests
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from flask_restful import Api, Resource
 from dotenv import load_dotenv
 
+from bedrock_batching import BatchedEmbedder, BatchedReranker
+from schema_context import SchemaContext
+
 # Configure logging
 logging.basicConfig(
     level=os.environ.get("LOG_LEVEL", "INFO"),
@@ -33,6 +37,12 @@ load_dotenv()
 
 # Constants
 DATABASE_API_URL = os.environ.get("DATABASE_API_URL", "http://sqlite-db:5000")
+# Seconds a database schema fetched from the database API is reused
+NL_SCHEMA_CACHE_TTL = float(os.environ.get("NL_SCHEMA_CACHE_TTL", "300"))
+# Seconds to wait before retrying a failed client initialization
+SERVICE_INIT_RETRY_SECONDS = float(os.environ.get("SERVICE_INIT_RETRY_SECONDS", "30"))
+# Cheaper rewrites requested from the LLM when the database rejects a query as too expensive
+NL_SQL_MAX_REWRITES = int(os.environ.get("NL_SQL_MAX_REWRITES", "1"))
 
 app = Flask(__name__)
 CORS(app)
@@ -77,6 +87,10 @@ class BedrockClient:
         logger.info(f"Using embedding model: {self.embedding_model_id}")
         logger.info(f"Using rerank model: {self.rerank_model_id}")
 
+        # Cached, concurrent embedding requests and batched reranking with a local fallback
+        self.embedder = BatchedEmbedder(self._invoke_embedding, self.embedding_model_id)
+        self.reranker = BatchedReranker(self._invoke_rerank)
+
     def get_completion(self, prompt: str) -> str:
         """Get completion from Bedrock LLM"""
         logger.debug(f"Getting completion for prompt: {prompt[:100]}...")
@@ -127,76 +141,93 @@ class BedrockClient:
             logger.error(f"Error getting completion: {str(e)}")
             return f"Error: {str(e)}"
 
-    def get_embeddings(self, text: str) -> List[float]:
-        """Get embeddings from Bedrock embedding model"""
-        logger.debug(f"Getting embeddings for text: {text[:100]}...")
-
-        try:
-            # Prepare request body
-            body = {
-                "inputText": text
-            }
-
-            # Convert request body to JSON
-            body_json = json.dumps(body)
-
-            # Send request to Bedrock
-            response = self.bedrock.invoke_model(
-                modelId=self.embedding_model_id,
-                body=body_json
-            )
-
-            # Parse response
-            response_body = json.loads(response.get('body').read())
+    def stream_completion(self, prompt: str) -> Iterator[str]:
+        """Stream a completion from Bedrock LLM, yielding text deltas as they arrive"""
+        logger.debug(f"Streaming completion for prompt: {prompt[:100]}...")
+
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 4096,
+            "temperature": 0,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
 
-            # Extract and return embeddings
-            if "embedding" in response_body:
-                embeddings = response_body["embedding"]
-                logger.debug(f"Got embeddings of dimension {len(embeddings)}")
-                return embeddings
-            else:
-                logger.error(f"Unexpected response format: {response_body}")
-                return []
+        response = self.cross_region_bedrock.invoke_model_with_response_stream(
+            modelId=self.llm_model_id,
+            body=json.dumps(body)
+        )
+
+        for event in response.get('body'):
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            if payload.get("type") == "content_block_delta":
+                text = payload.get("delta", {}).get("text")
+                if text:
+                    yield text
+
+    def _invoke_embedding(self, text: str) -> List[float]:
+        """Embed one text with the Bedrock embedding model (raises on errors)"""
+        response = self.bedrock.invoke_model(
+            modelId=self.embedding_model_id,
+            body=json.dumps({"inputText": text})
+        )
+        response_body = json.loads(response.get('body').read())
+        if "embedding" not in response_body:
+            raise ValueError(f"Unexpected response format: {response_body}")
+        return response_body["embedding"]
 
-        except Exception as e:
-            logger.error(f"Error getting embeddings: {str(e)}")
-            return []
+    def get_embeddings(self, text: str) -> List[float]:
+        """Get embeddings from Bedrock embedding model (cached by text)"""
+        logger.debug(f"Getting embeddings for text: {text[:100]}...")
+        return self.embedder.embed([text])[0]
+
+    def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for several texts; cached texts are not sent again, the rest concurrently"""
+        logger.debug(f"Getting embeddings for {len(texts)} texts")
+        return self.embedder.embed(texts)
+
+    def _invoke_rerank(self, query: str, passages: List[str]) -> List[float]:
+        """Score one batch of passages with the Bedrock rerank model (raises on errors)"""
+        body = {
+            "query": query,
+            "passages": [{"id": str(i), "text": passage} for i, passage in enumerate(passages)]
+        }
+        response = self.bedrock.invoke_model(
+            modelId=self.rerank_model_id,
+            body=json.dumps(body)
+        )
+        response_body = json.loads(response.get('body').read())
+        if "results" not in response_body:
+            raise ValueError(f"Unexpected response format: {response_body}")
+
+        # Passages the model did not return rank below all returned ones
+        scores = [float("-inf")] * len(passages)
+        ranked = response_body["results"]
+        for rank, item in enumerate(ranked):
+            index = int(item.get("id", item.get("index", rank)))
+            score = item.get("relevance_score", item.get("relevanceScore", item.get("score")))
+            # Without scores, fall back to the rank order of the batch
+            scores[index] = float(score) if score is not None else 1.0 - rank / len(ranked)
+        return scores
 
     def rerank_results(self, query: str, results: List[Dict[str, Any]], k: int = 10) -> List[Dict[str, Any]]:
-        """Rerank results using Bedrock rerank model"""
+        """Rerank results using Bedrock rerank model (batched; scored locally if the model fails or is slow)"""
         logger.debug(f"Reranking {len(results)} results for query: {query}")
 
         if not results:
             return []
 
         try:
-            # Prepare request body
-            body = {
-                "query": query,
-                "passages": [{"id": str(i), "text": json.dumps(result)} for i, result in enumerate(results)]
-            }
-
-            # Convert request body to JSON
-            body_json = json.dumps(body)
-
-            # Send request to Bedrock
-            response = self.bedrock.invoke_model(
-                modelId=self.rerank_model_id,
-                body=body_json
-            )
-
-            # Parse response
-            response_body = json.loads(response.get('body').read())
-
-            # Extract and return ranked results
-            if "results" in response_body:
-                ranked_indices = [int(item["id"]) for item in response_body["results"][:k]]
-                ranked_results = [results[i] for i in ranked_indices]
-                logger.debug(f"Reranked results, top result: {ranked_results[0] if ranked_results else None}")
-                return ranked_results
-            else:
-                logger.error(f"Unexpected response format: {response_body}")
-                return results[:k]  # Return top k if reranking failed
+            ranked_results = self.reranker.rerank(query, results, k)
+            logger.debug(f"Reranked results, top result: {ranked_results[0] if ranked_results else None}")
+            return ranked_results
 
         except Exception as e:
             logger.error(f"Error reranking results: {str(e)}")
@@ -205,9 +236,15 @@ class BedrockClient:
 class DatabaseClient:
     """Client for SQLite Database API"""
 
-    def __init__(self, api_url):
+    def __init__(self, api_url, schema_cache_ttl: float = NL_SCHEMA_CACHE_TTL):
         """Initialize Database API client"""
         self.api_url = api_url
+        # Keep-alive connections to the database API, reused across requests
+        self.session = requests.Session()
+        self.schema_cache_ttl = schema_cache_ttl
+        # db_name -> (fetched at, schema, snapshot_id)
+        self._schemas: Dict[str, Tuple[float, Dict[str, List[Dict[str, Any]]], Optional[str]]] = {}
+        self._schema_lock = threading.Lock()
         logger.info(f"Initialized Database API client with URL: {api_url}")
 
     def get_databases(self) -> List[Dict[str, Any]]:
@@ -215,7 +252,7 @@ class DatabaseClient:
         logger.debug("Getting list of databases")
 
         try:
-            response = requests.get(f"{self.api_url}/databases")
+            response = self.session.get(f"{self.api_url}/databases")
             response.raise_for_status()
             data = response.json()
 
@@ -228,28 +265,48 @@ class DatabaseClient:
             return []
 
     def get_schema(self, db_name: str) -> Dict[str, List[Dict[str, Any]]]:
-        """Get schema of a database"""
+        """Get schema of a database (cached for schema_cache_ttl seconds)"""
+        with self._schema_lock:
+            cached = self._schemas.get(db_name)
+        if cached and time.monotonic() - cached[0] < self.schema_cache_ttl:
+            return cached[1]
+
         logger.debug(f"Getting schema for database: {db_name}")
 
         try:
-            response = requests.get(f"{self.api_url}/schema/{db_name}")
+            response = self.session.get(f"{self.api_url}/schema/{db_name}")
             response.raise_for_status()
             data = response.json()
 
             schema = data.get("schema", {})
             logger.debug(f"Got schema with {len(schema)} tables for database {db_name}")
+            if schema:
+                with self._schema_lock:
+                    self._schemas[db_name] = (time.monotonic(), schema, data.get("snapshot_id"))
             return schema
 
         except requests.RequestException as e:
             logger.error(f"Error getting schema for database {db_name}: {str(e)}")
             return {}
 
+    def get_schema_version(self, db_name: str) -> Optional[str]:
+        """Snapshot id reported with the last fetched schema (None if unknown)"""
+        with self._schema_lock:
+            cached = self._schemas.get(db_name)
+        return cached[2] if cached else None
+
     def execute_query(self, db_name: str, query: str) -> Dict[str, Any]:
-        """Execute SQL query on a database"""
+        """
+        Execute SQL query on a database
+
+        Errors are returned as a dict with "error"; structured errors of the database
+        API (e.g. the query governor's 422 with error_type, reason and hint) are
+        passed through with their fields and the HTTP status.
+        """
         logger.info(f"Executing query on database {db_name}: {query}")
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/execute/{db_name}",
                 json={"query": query},
                 timeout=30  # Increased timeout for potentially long-running queries
@@ -267,9 +324,9 @@ class DatabaseClient:
             if hasattr(e, 'response') and e.response is not None:
                 try:
                     error_data = e.response.json()
-                    if 'error' in error_data:
-                        error_msg = error_data['error']
-                except:
+                    if isinstance(error_data, dict) and 'error' in error_data:
+                        return {**error_data, "query": query, "status_code": e.response.status_code}
+                except ValueError:
                     pass
 
             return {"error": error_msg, "query": query}
@@ -281,29 +338,26 @@ class NLQueryProcessor:
         """Initialize NL Query Processor"""
         self.bedrock_client = bedrock_client
         self.db_client = db_client
+        # Query-aware, token-budgeted schema descriptions for the SQL prompt
+        self.schema_context = SchemaContext(db_client)
         logger.info("Initialized Natural Language Query Processor")
 
-    def generate_sql(self, user_query: str, db_name: str) -> str:
-        """Generate SQL query from natural language query"""
+    def generate_sql(self, user_query: str, db_name: str, feedback: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate SQL query from natural language query
+
+        Args:
+            feedback: Optional query_too_expensive error of a previous attempt
+                (with its "sql"), asking for a cheaper rewrite
+        """
         logger.info(f"Generating SQL for query: {user_query}")
 
-        # Get database schema
-        schema = self.db_client.get_schema(db_name)
-        if not schema:
+        # Schema description with the columns most relevant to the question
+        schema_desc = self.schema_context.build(db_name, user_query)
+        if not schema_desc:
             logger.error(f"Could not get schema for database {db_name}")
             return ""
-
-        # Create schema description for prompt
-        schema_desc = "Database Schema:\n"
-        for table, columns in schema.items():
-            schema_desc += f"Table: {table}\n"
-            schema_desc += "Columns:\n"
-            for col in columns:
-                col_name = col['name']
-                col_type = col['type']
-                is_pk = "PRIMARY KEY" if col['pk'] == 1 else ""
-                schema_desc += f"  - {col_name} ({col_type}) {is_pk}\n"
-            schema_desc += "\n"
+        logger.debug(f"Schema context: {len(schema_desc)} chars")
 
         # Create prompt for SQL generation
         prompt = f"""As an expert SQL developer, your task is to convert a natural language question into a valid SQLite query.
@@ -311,7 +365,7 @@ class NLQueryProcessor:
 {schema_desc}
 
 User question: {user_query}
-
+{self._format_cost_feedback(feedback)}
 Generate ONLY a valid SQL query that answers this question. Do not include any explanations or comments. The query should be executable in SQLite.
 
 SQL Query:"""
@@ -325,6 +379,20 @@ SQL Query:"""
 
         return sql_query
 
+    @staticmethod
+    def _format_cost_feedback(feedback: Optional[Dict[str, Any]]) -> str:
+        """Format a query governor rejection as an extra prompt section"""
+        if not feedback:
+            return ""
+        return f"""
+A previous query for this question was rejected by the database as too expensive:
+{feedback.get("sql", "")}
+
+Reason: {feedback.get("error", "")}
+Hint: {feedback.get("hint", "")}
+Write a cheaper query that still answers the question.
+"""
+
     def _clean_sql(self, sql: str) -> str:
         """Clean up generated SQL query"""
         # Remove markdown code block formatting if present
@@ -340,17 +408,8 @@ SQL Query:"""
 
         return sql
 
-    def process_nl_query(self, user_query: str, db_name: str) -> Dict[str, Any]:
-        """Process natural language query and return results"""
-        logger.info(f"Processing natural language query: {user_query}")
-
-        # Generate SQL query
-        sql_query = self.generate_sql(user_query, db_name)
-        if not sql_query:
-            logger.error("Failed to generate SQL query")
-            return {"error": "Failed to generate SQL query", "query": user_query}
-
-        # Execute SQL query
+    def _execute_generated_sql(self, sql_query: str, db_name: str) -> Dict[str, Any]:
+        """Execute a generated SQL query; returns the query result or an error dict"""
         query_result = self.db_client.execute_query(db_name, sql_query)
         if "error" in query_result:
             logger.error(f"Error executing query: {query_result['error']}")
@@ -364,9 +423,46 @@ SQL Query:"""
                 "query": sql_query,
                 "result": query_result
             }
+        self.schema_context.record_usage(db_name, sql_query)
+        return query_result
+
+    def _execute_with_rewrites(self, user_query: str, sql_query: str, db_name: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Execute generated SQL; when the database rejects it as too expensive, feed the
+        rejection back to the LLM for a cheaper rewrite (up to NL_SQL_MAX_REWRITES times)
+
+        Returns:
+            (the SQL that was executed last, its result or error dict)
+        """
+        query_result = self._execute_generated_sql(sql_query, db_name)
+        for _ in range(NL_SQL_MAX_REWRITES):
+            if query_result.get("error_type") != "query_too_expensive":
+                break
+            logger.info(f"Query rejected as too expensive ({query_result.get('reason')}), requesting rewrite")
+            rewritten_sql = self.generate_sql(user_query, db_name, feedback={**query_result, "sql": sql_query})
+            if not rewritten_sql or rewritten_sql == sql_query:
+                break
+            sql_query = rewritten_sql
+            query_result = self._execute_generated_sql(sql_query, db_name)
+        return sql_query, query_result
+
+    def process_nl_query(self, user_query: str, db_name: str, explain: bool = True) -> Dict[str, Any]:
+        """Process natural language query and return results (explain=False skips the explanation call)"""
+        logger.info(f"Processing natural language query: {user_query}")
+
+        # Generate SQL query
+        sql_query = self.generate_sql(user_query, db_name)
+        if not sql_query:
+            logger.error("Failed to generate SQL query")
+            return {"error": "Failed to generate SQL query", "query": user_query}
+
+        # Execute SQL query (rewritten if the database rejects it as too expensive)
+        sql_query, query_result = self._execute_with_rewrites(user_query, sql_query, db_name)
+        if "error" in query_result:
+            return query_result
 
         # Generate explanation
-        explanation = self._generate_explanation(user_query, sql_query, query_result)
+        explanation = self._generate_explanation(user_query, sql_query, query_result) if explain else ""
         logger.info(f"Generated explanation of length {len(explanation)} chars")
 
         # Return results
@@ -384,10 +480,61 @@ SQL Query:"""
         logger.debug(f"Result structure: {list(result.keys())}")
         return result
 
-    def _generate_explanation(self, user_query: str, sql_query: str, query_result: Dict[str, Any]) -> str:
-        """Generate explanation of query results"""
-        logger.debug("Generating explanation for query results")
+    def stream_nl_query(self, user_query: str, db_name: str, explain: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process a natural language query step by step, yielding (event, data) pairs
 
+        Events in order: "sql" once the SQL is generated (again, with "rewritten": true,
+        if the database rejected it as too expensive and it was rewritten), "results" as soon as the
+        database answers, then "explanation" text deltas streamed from the LLM
+        (skipped when explain is False) and finally "done" with the step timings.
+        An "error" event ends the stream early.
+        """
+        logger.info(f"Streaming natural language query: {user_query}")
+        started = time.monotonic()
+        timings = {}
+
+        sql_query = self.generate_sql(user_query, db_name)
+        timings["sql_generation_ms"] = round((time.monotonic() - started) * 1000, 2)
+        if not sql_query:
+            yield "error", {"error": "Failed to generate SQL query", "query": user_query}
+            return
+        yield "sql", {"user_query": user_query, "sql_query": sql_query}
+
+        executed_sql, query_result = self._execute_with_rewrites(user_query, sql_query, db_name)
+        timings["first_row_ms"] = round((time.monotonic() - started) * 1000, 2)
+        if executed_sql != sql_query:
+            sql_query = executed_sql
+            yield "sql", {"user_query": user_query, "sql_query": sql_query, "rewritten": True}
+        if "error" in query_result:
+            yield "error", query_result
+            return
+        yield "results", {
+            "results": query_result.get("rows", []),
+            "columns": query_result.get("columns", []),
+            "row_count": query_result.get("row_count", 0),
+            "truncated": query_result.get("truncated", False),
+            "execution_time_ms": query_result.get("execution_time_ms", 0)
+        }
+
+        if explain:
+            explanation_started = time.monotonic()
+            try:
+                for text in self.bedrock_client.stream_completion(
+                        self._explanation_prompt(user_query, sql_query, query_result)):
+                    yield "explanation", {"text": text}
+            except Exception as e:
+                logger.error(f"Error streaming explanation: {str(e)}")
+                yield "error", {"error": f"Error generating explanation: {str(e)}", "query": sql_query}
+                return
+            timings["explanation_ms"] = round((time.monotonic() - explanation_started) * 1000, 2)
+
+        timings["total_ms"] = round((time.monotonic() - started) * 1000, 2)
+        logger.info(f"Streamed query processed: {timings}")
+        yield "done", {"timings": timings}
+
+    def _explanation_prompt(self, user_query: str, sql_query: str, query_result: Dict[str, Any]) -> str:
+        """Prompt asking the LLM to explain query results"""
         # Limit rows to include in prompt for explanation
         max_rows = 10
         rows = query_result.get("rows", [])[:max_rows]
@@ -407,14 +554,70 @@ Query returned {row_count} rows. Here are up to {max_rows} rows of the results:
 Please provide a brief explanation of these results, focusing on answering the user's question directly. Include key insights from the data.
 
 Explanation:"""
+        return prompt
+
+    def _generate_explanation(self, user_query: str, sql_query: str, query_result: Dict[str, Any]) -> str:
+        """Generate explanation of query results"""
+        logger.debug("Generating explanation for query results")
 
         # Generate explanation
-        explanation = self.bedrock_client.get_completion(prompt)
+        explanation = self.bedrock_client.get_completion(self._explanation_prompt(user_query, sql_query, query_result))
         logger.debug(f"Generated explanation: {explanation[:100]}...")
 
         return explanation.strip()
 
+class ServiceContainer:
+    """
+    Process-wide clients and processors shared by all requests
+
+    Flask-RESTful creates a new Resource instance for every request, so clients
+    built in a Resource's __init__ (boto3 client, HTTP connections, cached schemas)
+    were thrown away after one request. The container builds them once, on first
+    use or in warm_up(), and is passed to the resources via resource_class_kwargs.
+    A failed initialization is retried after SERVICE_INIT_RETRY_SECONDS.
+    """
+
+    def __init__(self, database_api_url: str = DATABASE_API_URL):
+        self.database_api_url = database_api_url
+        self.init_error: Optional[str] = None
+        self._nl_processor: Optional[NLQueryProcessor] = None
+        self._failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def nl_processor(self) -> Optional[NLQueryProcessor]:
+        """The shared processor, or None if the clients could not be initialized"""
+        if self._nl_processor is not None:
+            return self._nl_processor
+        with self._lock:
+            retry_due = self._failed_at is None or time.monotonic() - self._failed_at >= SERVICE_INIT_RETRY_SECONDS
+            if self._nl_processor is None and retry_due:
+                try:
+                    bedrock_client = BedrockClient()
+                    db_client = DatabaseClient(self.database_api_url)
+                    self._nl_processor = NLQueryProcessor(bedrock_client, db_client)
+                    self.init_error = None
+                except Exception as e:
+                    self._failed_at = time.monotonic()
+                    self.init_error = str(e)
+                    logger.error(f"Error initializing NL query services: {str(e)}")
+        return self._nl_processor
+
+    def warm_up(self, db_names: Tuple[str, ...] = ("input", "bigquery")):
+        """Create the clients and prefetch the database schemas and their profiles before the first request"""
+        nl_processor = self.nl_processor
+        if nl_processor:
+            for db_name in db_names:
+                nl_processor.schema_context.build(db_name, "")
+
+
+# Shared by all requests of this process
+SERVICES = ServiceContainer()
+
 class Health(Resource):
+    def __init__(self, services: ServiceContainer):
+        self.services = services
+
     def get(self):
         """Health check endpoint"""
         logger.debug("Health check requested")
@@ -433,21 +636,14 @@ class Health(Resource):
     def _check_database_api(self) -> bool:
         """Check if Database API is healthy"""
         try:
-            response = requests.get(f"{DATABASE_API_URL}/health", timeout=5)
+            response = requests.get(f"{self.services.database_api_url}/health", timeout=5)
             return response.status_code == 200
         except:
             return False
 
     def _check_bedrock_api(self) -> bool:
-        """Check if Bedrock API is available"""
-        try:
-            # Initialize Bedrock client
-            session = boto3.Session()
-            region = session.region_name or os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
-            boto3.client('bedrock-runtime', region_name=region)
-            return True
-        except:
-            return False
+        """Check if the shared Bedrock client is available"""
+        return self.services.nl_processor is not None
 
 class OpenAPISpec(Resource):
     def get(self):
@@ -491,7 +687,8 @@ class OpenAPISpec(Resource):
                                     "schema": {
                                         "type": "object",
                                         "properties": {
-                                            "query": {"type": "string"}
+                                            "query": {"type": "string"},
+                                            "explain": {"type": "boolean", "default": True}
                                         },
                                         "required": ["query"]
                                     }
@@ -504,32 +701,81 @@ class OpenAPISpec(Resource):
                             }
                         }
                     }
+                },
+                "/query/{db_name}/stream": {
+                    "post": {
+                        "summary": "Process natural language query, streaming the results as server-sent events",
+                        "description": "Events: sql, results, explanation (text deltas, omitted when explain is false), done (timings) or error",
+                        "parameters": [
+                            {
+                                "name": "db_name",
+                                "in": "path",
+                                "required": True,
+                                "schema": {"type": "string", "enum": ["input", "bigquery", "inpit"]}
+                            }
+                        ],
+                        "requestBody": {
+                            "required": True,
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "query": {"type": "string"},
+                                            "explain": {"type": "boolean", "default": True}
+                                        },
+                                        "required": ["query"]
+                                    }
+                                }
+                            }
+                        },
+                        "responses": {
+                            "200": {
+                                "description": "Event stream",
+                                "content": {"text/event-stream": {}}
+                            }
+                        }
+                    }
                 }
             }
         }
 
         return spec
 
-class NLQuery(Resource):
-    def __init__(self):
-        self.bedrock_client = None
-        self.db_client = None
-        self.nl_processor = None
+_TRUE_VALUES = ("true", "1", "yes", "on")
+_FALSE_VALUES = ("false", "0", "no", "off")
 
-        # Initialize clients
-        try:
-            self.bedrock_client = BedrockClient()
-            self.db_client = DatabaseClient(DATABASE_API_URL)
-            self.nl_processor = NLQueryProcessor(self.bedrock_client, self.db_client)
-        except Exception as e:
-            logger.error(f"Error initializing NLQuery resource: {str(e)}")
+def parse_flag(value: Any, default: bool) -> bool:
+    """
+    Parse a boolean request field: JSON booleans, 0/1, or "true"/"false"/"yes"/"no"/"on"/"off"
+
+    Raises:
+        ValueError: the value is not a recognized boolean
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        if value.strip().lower() in _TRUE_VALUES:
+            return True
+        if value.strip().lower() in _FALSE_VALUES:
+            return False
+    raise ValueError(f"Invalid boolean value: {value!r}")
+
+class NLQuery(Resource):
+    def __init__(self, services: ServiceContainer):
+        self.services = services
 
     def post(self, db_name):
         """Process natural language query"""
         logger.debug(f"NL Query requested for database: {db_name}")
 
-        if not self.nl_processor:
-            return {"error": "NL Query processor not initialized"}, 500
+        nl_processor = self.services.nl_processor
+        if not nl_processor:
+            return {"error": f"NL Query processor not initialized: {self.services.init_error}"}, 500
 
         if db_name not in ["input", "bigquery", "inpit"]:
             return {"error": "Invalid database name"}, 400
@@ -543,10 +789,14 @@ class NLQuery(Resource):
             return {"error": "Missing query parameter"}, 400
 
         user_query = data["query"]
+        try:
+            explain = parse_flag(data.get("explain"), True)
+        except ValueError as e:
+            return {"error": f"'explain': {e}"}, 400
         logger.info(f"Processing NL query on {db_name} database: {user_query}")
 
         try:
-            result = self.nl_processor.process_nl_query(user_query, db_name)
+            result = nl_processor.process_nl_query(user_query, db_name, explain=explain)
             
             # Ensure we always have consistent result structure
             if "explanation" in result and (not result.get("results") or not result.get("columns")):
@@ -570,6 +820,54 @@ class NLQuery(Resource):
             logger.error(f"Error processing NL query: {str(e)}")
             return {"error": f"Error processing query: {str(e)}", "query": user_query}, 500
 
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class NLQueryStream(Resource):
+    def __init__(self, services: ServiceContainer):
+        self.services = services
+
+    def post(self, db_name):
+        """Process natural language query, streaming SQL, rows and explanation as server-sent events"""
+        logger.debug(f"Streaming NL Query requested for database: {db_name}")
+
+        nl_processor = self.services.nl_processor
+        if not nl_processor:
+            return {"error": f"NL Query processor not initialized: {self.services.init_error}"}, 500
+
+        if db_name not in ["input", "bigquery", "inpit"]:
+            return {"error": "Invalid database name"}, 400
+
+        # Map "inpit" to "input" for backward compatibility
+        if db_name == "inpit":
+            db_name = "input"
+
+        data = request.get_json()
+        if not data or "query" not in data:
+            return {"error": "Missing query parameter"}, 400
+
+        user_query = data["query"]
+        try:
+            explain = parse_flag(data.get("explain"), True)
+        except ValueError as e:
+            return {"error": f"'explain': {e}"}, 400
+        logger.info(f"Streaming NL query on {db_name} database: {user_query}")
+
+        def generate():
+            try:
+                for event, payload in nl_processor.stream_nl_query(user_query, db_name, explain=explain):
+                    yield format_sse(event, payload)
+            except Exception as e:
+                logger.error(f"Error streaming NL query: {str(e)}")
+                yield format_sse("error", {"error": f"Error processing query: {str(e)}", "query": user_query})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
 # Static files for OpenAPI UI
 @app.route('/docs')
 def docs():
@@ -603,8 +901,9 @@ def docs():
     """
 
 # Register API resources
-api.add_resource(Health, '/health')
-api.add_resource(NLQuery, '/query/<string:db_name>')
+api.add_resource(Health, '/health', resource_class_kwargs={"services": SERVICES})
+api.add_resource(NLQuery, '/query/<string:db_name>', resource_class_kwargs={"services": SERVICES})
+api.add_resource(NLQueryStream, '/query/<string:db_name>/stream', resource_class_kwargs={"services": SERVICES})
 api.add_resource(OpenAPISpec, '/openapi')
 
 def main():
@@ -615,6 +914,9 @@ def main():
     aws_region = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION')
     logger.info(f"Using AWS region: {aws_region}")
 
+    # Create the shared clients before serving the first request
+    SERVICES.warm_up()
+
     # Run the Flask app
     app.run(host='0.0.0.0', port=5000, debug=os.environ.get("LOG_LEVEL", "INFO").upper() == "DEBUG")
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Batching, caching and local fallback scoring for Bedrock rerank and embedding calls.
+
+BatchedReranker splits the passages of a rerank request into batches bounded by
+passage count and total characters, sends the batches concurrently and merges the
+per-passage relevance scores. When a batch fails or the batches do not finish
+within the timeout, all passages are scored locally instead (BM25 over words and
+CJK character bigrams, or NumPy cosine similarity of hashed term vectors), so
+scores in one ranking always come from the same scorer.
+
+BatchedEmbedder embeds texts concurrently and keeps the vectors in an LRU cache
+keyed by a hash of the model id and the text.
+"""
+
+import os
+import re
+import math
+import json
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from schema_context import terms
+
+logger = logging.getLogger(__name__)
+
+# Maximum passages per rerank request
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "50"))
+# Maximum total passage characters per rerank request
+RERANK_BATCH_MAX_CHARS = int(os.environ.get("RERANK_BATCH_MAX_CHARS", "40000"))
+# Passages are cut to this many characters
+RERANK_PASSAGE_MAX_CHARS = int(os.environ.get("RERANK_PASSAGE_MAX_CHARS", "2000"))
+# Concurrent rerank / embedding requests
+BEDROCK_BATCH_WORKERS = int(os.environ.get("BEDROCK_BATCH_WORKERS", "4"))
+# Seconds to wait for all rerank batches before falling back to local scoring
+RERANK_TIMEOUT_SECONDS = float(os.environ.get("RERANK_TIMEOUT_SECONDS", "10"))
+# Local scorer used as fallback: "bm25" or "cosine"
+RERANK_FALLBACK_SCORER = os.environ.get("RERANK_FALLBACK_SCORER", "bm25")
+# Embeddings kept in the cache
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000"))
+
+# Dimension of the hashed term vectors used by the cosine scorer
+HASHED_VECTOR_DIM = 4096
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[^\x00-\x7f\s_]+")
+
+
+def serialize_result(result: Any, max_chars: int = RERANK_PASSAGE_MAX_CHARS) -> str:
+    """Passage text for a result row"""
+    text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+    return text[:max_chars]
+
+
+def make_batches(passages: Sequence[str], batch_size: int = RERANK_BATCH_SIZE,
+                 max_chars: int = RERANK_BATCH_MAX_CHARS) -> List[List[int]]:
+    """Split passage indexes into batches of at most batch_size passages and max_chars characters"""
+    batches, current, current_chars = [], [], 0
+    for i, passage in enumerate(passages):
+        if current and (len(current) >= batch_size or current_chars + len(passage) > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += len(passage)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def bm25_scores(query: str, passages: Sequence[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of each passage for the query"""
+    query_terms = terms(query)
+    docs = [Counter(_term_list(p)) for p in passages]
+    if not docs or not query_terms:
+        return [0.0] * len(docs)
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+    doc_freq = Counter(t for d in docs for t in query_terms if t in d)
+
+    scores = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for t in query_terms:
+            tf = d.get(t, 0)
+            if tf:
+                idf = math.log(1 + (len(docs) - doc_freq[t] + 0.5) / (doc_freq[t] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+def cosine_scores(query: str, passages: Sequence[str], dim: int = HASHED_VECTOR_DIM) -> List[float]:
+    """Cosine similarity of hashed term-frequency vectors of the query and each passage"""
+    if not passages:
+        return []
+    matrix = np.zeros((len(passages) + 1, dim), dtype=np.float32)
+    for row, text in enumerate([query, *passages]):
+        for t in _term_list(text):
+            matrix[row, int(hashlib.md5(t.encode("utf-8")).hexdigest()[:8], 16) % dim] += 1.0
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    matrix /= norms[:, None]
+    return (matrix[1:] @ matrix[0]).tolist()
+
+
+LOCAL_SCORERS: Dict[str, Callable[[str, Sequence[str]], List[float]]] = {
+    "bm25": bm25_scores,
+    "cosine": cosine_scores,
+}
+
+
+def _term_list(text: str) -> List[str]:
+    """Terms of a text as terms() splits them, keeping repetitions for term frequencies"""
+    result = []
+    for word in _WORD_PATTERN.findall(str(text).lower()):
+        if word.isascii():
+            if len(word) > 1:
+                result.append(word)
+        elif len(word) == 1:
+            result.append(word)
+        else:
+            result.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return result
+
+
+class BatchedReranker:
+    """Concurrent, size-bounded rerank requests with a local fallback scorer"""
+
+    def __init__(self, rerank_batch: Callable[[str, List[str]], List[float]],
+                 batch_size: int = RERANK_BATCH_SIZE, max_chars: int = RERANK_BATCH_MAX_CHARS,
+                 max_workers: int = BEDROCK_BATCH_WORKERS, timeout: float = RERANK_TIMEOUT_SECONDS,
+                 fallback: str = RERANK_FALLBACK_SCORER):
+        """
+        Args:
+            rerank_batch: Scores one batch remotely; returns one score per passage
+            batch_size: Maximum passages per batch
+            max_chars: Maximum total passage characters per batch
+            max_workers: Batches sent concurrently
+            timeout: Seconds to wait for all batches before scoring locally
+            fallback: Local scorer, "bm25" or "cosine"
+        """
+        if fallback not in LOCAL_SCORERS:
+            raise ValueError(f"Unknown fallback scorer: {fallback}")
+        self.rerank_batch = rerank_batch
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.fallback = fallback
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rerank")
+
+    def scores(self, query: str, passages: List[str]) -> Tuple[List[float], str]:
+        """Relevance score of each passage and the scorer that produced them ("remote" or the fallback)"""
+        if not passages:
+            return [], "remote"
+
+        batches = make_batches(passages, self.batch_size, self.max_chars)
+        futures = {self._executor.submit(self.rerank_batch, query, [passages[i] for i in batch]): batch
+                   for batch in batches}
+        done, pending = wait(futures, timeout=self.timeout)
+
+        scores: List[Optional[float]] = [None] * len(passages)
+        failed = len(pending)
+        for future in done:
+            try:
+                batch_scores = future.result()
+            except Exception as e:
+                logger.warning(f"Rerank batch failed: {str(e)}")
+                failed += 1
+                continue
+            for i, score in zip(futures[future], batch_scores):
+                scores[i] = score
+
+        if failed or any(score is None for score in scores):
+            for future in pending:
+                future.cancel()
+            logger.warning(f"{failed} of {len(batches)} rerank batches failed or timed out, "
+                           f"scoring {len(passages)} passages with {self.fallback}")
+            return LOCAL_SCORERS[self.fallback](query, passages), self.fallback
+        return scores, "remote"
+
+    def rerank(self, query: str, results: List[Any], k: int = 10) -> List[Any]:
+        """Top k results by relevance to the query"""
+        passages = [serialize_result(result) for result in results]
+        scores, _ = self.scores(query, passages)
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)
+        return [results[i] for i in order[:k]]
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embeddings keyed by a hash of model id and text"""
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class BatchedEmbedder:
+    """Concurrent embedding requests for the texts missing from the cache"""
+
+    def __init__(self, embed_one: Callable[[str], List[float]], model_id: str,
+                 cache: Optional[EmbeddingCache] = None, max_workers: int = BEDROCK_BATCH_WORKERS):
+        """
+        Args:
+            embed_one: Embeds one text remotely
+            model_id: Embedding model, part of the cache key
+            cache: Shared cache (default: a new EmbeddingCache)
+            max_workers: Texts embedded concurrently
+        """
+        self.embed_one = embed_one
+        self.model_id = model_id
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed")
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings of the texts in order; a text that could not be embedded gets []"""
+        keys = [EmbeddingCache.key(self.model_id, text) for text in texts]
+        embeddings: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in embeddings or key in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                embeddings[key] = cached
+            else:
+                missing[key] = text
+
+        if missing:
+            futures = {self._executor.submit(self.embed_one, text): key for key, text in missing.items()}
+            for future, key in futures.items():
+                try:
+                    embedding = future.result()
+                except Exception as e:
+                    logger.error(f"Error getting embeddings: {str(e)}")
+                    embedding = []
+                if embedding:
+                    self.cache.put(key, embedding)
+                embeddings[key] = embedding
+        return [embeddings[key] for key in keys]
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Query-aware schema context for SQL generation prompts.
+
+Listing every table and column of a database in the prompt makes prompts for the
+wide INPIT table (dozens of Japanese columns) large, slow and costly. SchemaContext
+builds a compact schema description for one question instead:
+
+  1. columns are ranked by relevance to the question: keyword overlap of the
+     question with the column name and its sample values (Japanese text is
+     compared as character bigrams, a few English terms are mapped to the
+     Japanese column vocabulary), plus a boost for columns used by earlier
+     successful queries (record_usage);
+  2. relevant columns are listed with their type and sample values, most relevant
+     first until the token budget is spent; the names of the other columns are
+     listed after them as far as the budget allows.
+
+Table profiles (columns and sample values) are cached per database version, i.e.
+the snapshot_id reported by the database API's /schema endpoint.
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Approximate token budget of the schema description in the prompt
+NL_SCHEMA_TOKEN_BUDGET = int(os.environ.get("NL_SCHEMA_TOKEN_BUDGET", "1500"))
+# Rows read per table to collect sample values
+NL_SCHEMA_SAMPLE_ROWS = int(os.environ.get("NL_SCHEMA_SAMPLE_ROWS", "50"))
+# Sample values shown per relevant column
+NL_SCHEMA_SAMPLE_VALUES = int(os.environ.get("NL_SCHEMA_SAMPLE_VALUES", "3"))
+
+# Sample values longer than this are cut (and abstracts or claims are skipped)
+MAX_SAMPLE_VALUE_LENGTH = 40
+# Columns with at least this score are listed with type and sample values
+RELEVANT_SCORE = 1.0
+
+# Question terms and the column vocabulary they usually refer to
+# (English words match whole words, Japanese keys match anywhere in the question)
+TERM_ALIASES = {
+    "年": ["日", "year"],
+    "企業": ["出願人", "権利者", "assignee"],
+    "会社": ["出願人", "権利者", "assignee"],
+    "技術": ["ipc", "fi", "名称"],
+    "分類": ["ipc", "fi", "分類"],
+    "applicant": ["出願人", "assignee", "applicant"],
+    "assignee": ["出願人", "権利者", "assignee"],
+    "company": ["出願人", "権利者", "assignee"],
+    "companies": ["出願人", "権利者", "assignee"],
+    "inventor": ["発明者", "inventor"],
+    "inventors": ["発明者", "inventor"],
+    "title": ["名称", "title"],
+    "abstract": ["要約", "abstract"],
+    "claim": ["請求", "claims"],
+    "claims": ["請求", "claims"],
+    "date": ["日", "date"],
+    "year": ["日", "date", "year"],
+    "years": ["日", "date", "year"],
+    "filed": ["出願", "filing"],
+    "filing": ["出願", "filing"],
+    "application": ["出願", "application"],
+    "applications": ["出願", "application"],
+    "publication": ["公開", "publication"],
+    "published": ["公開", "publication"],
+    "granted": ["登録", "grant"],
+    "registration": ["登録", "grant"],
+    "country": ["国", "country"],
+    "classification": ["ipc", "fi", "cpc", "分類"],
+    "number": ["番号", "number"],
+    "status": ["状態", "ステータス", "status"],
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[^\x00-\x7f\s_]+")
+_CJK_PATTERN = re.compile(r"[^\x00-\x7f]")
+_IDENTIFIER_PATTERN = re.compile(r'"([^"]+)"|`([^`]+)`|\[([^\]]+)\]|(\w+)', re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about one token per CJK character, four other characters per token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def terms(text: str) -> Set[str]:
+    """Lower-case ASCII words and CJK character bigrams (single characters for short runs)"""
+    result = set()
+    for word in _WORD_PATTERN.findall(str(text).lower()):
+        if word.isascii():
+            if len(word) > 1:
+                result.add(word)
+        elif len(word) == 1:
+            result.add(word)
+        else:
+            result.update(word[i:i + 2] for i in range(len(word) - 1))
+    return result
+
+
+def question_terms(question: str) -> Set[str]:
+    """terms() of the question, extended with TERM_ALIASES"""
+    result = terms(question)
+    lowered = question.lower()
+    for key, aliases in TERM_ALIASES.items():
+        if (key in result) if key.isascii() else (key in lowered):
+            for alias in aliases:
+                result |= terms(alias)
+    return result
+
+
+class TableProfile:
+    """Columns of one table with their terms and sample values"""
+
+    def __init__(self, name: str, columns: List[Dict[str, Any]], rows: List[Dict[str, Any]]):
+        self.name = name
+        self.columns = columns
+        self.name_terms = {col["name"]: terms(col["name"].replace("_", " ")) for col in columns}
+        self.samples: Dict[str, List[str]] = {}
+        self.sample_terms: Dict[str, Set[str]] = {}
+        for col in columns:
+            values = []
+            for row in rows:
+                value = row.get(col["name"])
+                if value is None or value == "" or isinstance(value, (bytes, bytearray)):
+                    continue
+                value = str(value)
+                if len(value) > MAX_SAMPLE_VALUE_LENGTH * 3:
+                    # Free text (abstracts, claims): samples would only cost tokens
+                    values = []
+                    break
+                if value not in values:
+                    values.append(value)
+            self.samples[col["name"]] = values
+            self.sample_terms[col["name"]] = set().union(*(terms(v) for v in values)) if values else set()
+
+
+class SchemaContext:
+    """Builds token-budgeted schema descriptions ranked by relevance to a question"""
+
+    def __init__(self, db_client, token_budget: int = NL_SCHEMA_TOKEN_BUDGET,
+                 sample_rows: int = NL_SCHEMA_SAMPLE_ROWS):
+        self.db_client = db_client
+        self.token_budget = token_budget
+        self.sample_rows = sample_rows
+        # db_name -> (version, table profiles)
+        self._profiles: Dict[str, Tuple[Any, Dict[str, TableProfile]]] = {}
+        # db_name -> column name -> number of successful queries using it
+        self._usage: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def _table_profiles(self, db_name: str) -> Dict[str, TableProfile]:
+        """Table profiles for the current version of a database"""
+        schema = self.db_client.get_schema(db_name)
+        if not schema:
+            return {}
+        version = self.db_client.get_schema_version(db_name)
+        if version is None:
+            version = tuple((table, tuple(col["name"] for col in cols)) for table, cols in sorted(schema.items()))
+
+        with self._lock:
+            cached = self._profiles.get(db_name)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        logger.info(f"Profiling schema of database {db_name} (version {str(version)[:40]})")
+        profiles = {}
+        for table, columns in schema.items():
+            rows = []
+            if self.sample_rows > 0:
+                result = self.db_client.execute_query(db_name, f'SELECT * FROM "{table}" LIMIT {self.sample_rows}')
+                rows = result.get("rows", [])
+                if "error" in result:
+                    logger.warning(f"Could not sample table {table}: {result['error']}")
+            profiles[table] = TableProfile(table, columns, rows)
+
+        with self._lock:
+            self._profiles[db_name] = (version, profiles)
+        return profiles
+
+    def record_usage(self, db_name: str, sql_query: str):
+        """Count the columns referenced by a successfully executed query"""
+        with self._lock:
+            cached = self._profiles.get(db_name)
+        if not cached:
+            return
+        known = {col["name"] for profile in cached[1].values() for col in profile.columns}
+        used = set()
+        for match in _IDENTIFIER_PATTERN.finditer(sql_query):
+            name = next(group for group in match.groups() if group)
+            if name in known:
+                used.add(name)
+        if used:
+            with self._lock:
+                self._usage.setdefault(db_name, Counter()).update(used)
+
+    def score(self, db_name: str, profile: TableProfile, column: str, q_terms: Set[str]) -> float:
+        """Relevance of a column to the question terms"""
+        score = 3.0 * len(q_terms & profile.name_terms[column])
+        score += 1.0 * len(q_terms & profile.sample_terms[column])
+        usage = self._usage.get(db_name, {}).get(column, 0)
+        if usage:
+            score += math.log1p(usage)
+        return score
+
+    def build(self, db_name: str, question: str) -> str:
+        """Compact schema description for the question, or "" if the schema is unavailable"""
+        profiles = self._table_profiles(db_name)
+        if not profiles:
+            return ""
+
+        q_terms = question_terms(question)
+        ranked = []
+        for profile in profiles.values():
+            for col in profile.columns:
+                score = self.score(db_name, profile, col["name"], q_terms)
+                if col.get("pk") == 1:
+                    score += RELEVANT_SCORE
+                ranked.append((score, profile.name, col))
+        # Stable sort: equally relevant columns keep the table's column order
+        ranked.sort(key=lambda item: -item[0])
+
+        budget = self.token_budget - sum(estimate_tokens(f"Table: {name}\n\n") for name in profiles)
+        shown: Dict[str, Dict[str, str]] = {name: {} for name in profiles}
+        others: Dict[str, List[str]] = {name: [] for name in profiles}
+        for score, table, col in ranked:
+            if score < RELEVANT_SCORE:
+                others[table].append(col["name"])
+                continue
+            line = f"  - {col['name']} ({col['type']})"
+            if col.get("pk") == 1:
+                line += " PRIMARY KEY"
+            samples = profiles[table].samples[col["name"]][:NL_SCHEMA_SAMPLE_VALUES]
+            if samples:
+                line += " e.g. " + ", ".join(repr(v[:MAX_SAMPLE_VALUE_LENGTH]) for v in samples)
+            cost = estimate_tokens(line) + 1
+            if cost <= budget:
+                shown[table][col["name"]] = line
+                budget -= cost
+            else:
+                others[table].append(col["name"])
+
+        schema_desc = "Database Schema:\n"
+        for table, profile in profiles.items():
+            schema_desc += f"Table: {table}\n"
+            # Keep the table's column order so related columns stay together
+            schema_desc += "".join(shown[table][col["name"]] + "\n"
+                                   for col in profile.columns if col["name"] in shown[table])
+            listed = []
+            other_names = set(others[table])
+            for name in (col["name"] for col in profile.columns if col["name"] in other_names):
+                cost = estimate_tokens(name + ", ")
+                if cost > budget:
+                    break
+                listed.append(name)
+                budget -= cost
+            if listed:
+                schema_desc += f"  - Other columns: {', '.join(listed)}\n"
+            if len(listed) < len(others[table]):
+                schema_desc += f"  - ({len(others[table]) - len(listed)} more columns not shown)\n"
+            schema_desc += "\n"
+        return schema_desc
@@ -9,9 +9,6 @@ import io
 from datetime import datetime
 import os
 import tempfile
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
 import pandas as pd
 import json
 import sqlite3
@@ -19,9 +16,8 @@ import re
 from typing import List, Dict, Optional, Any
 import logging
 import base64
-from io import BytesIO
-import seaborn as sns
 from japanesetoeng import japanese_to_english
+from chart_renderer import render_chart_base64
 import requests
 
 # Configure logging
@@ -97,6 +93,9 @@ class PatentTrendResponse(BaseModel):
     chart_image: str
     assessment: str
 
+# Applicants kept per year in classification trends
+TOP_APPLICANTS_PER_YEAR = 5
+
 # Models for classification-based endpoints
 class ClassificationTrendRequest(BaseModel):
     classification_code: str
@@ -131,77 +130,48 @@ def analyze_patent_trends(applicant_name: str, start_year: Optional[int] = None,
     params = [applicant_name]
     
     if start_year:
-        where_clauses.append("substr(filing_date, 1, 4) >= ?")
-        params.append(str(start_year))
+        where_clauses.append("filing_year >= ?")
+        params.append(int(start_year))
     
     if end_year:
-        where_clauses.append("substr(filing_date, 1, 4) <= ?")
-        params.append(str(end_year))
+        where_clauses.append("filing_year <= ?")
+        params.append(int(end_year))
     
     where_clause = " AND ".join(where_clauses)
     
     query = f"""
         SELECT 
-            substr(filing_date, 1, 4) as year,
-            substr(ipc_code, 1, 1) as class_code,
+            filing_year as year,
+            ipc_section as class_code,
             COUNT(*) as application_count
         FROM 
             publications
         WHERE 
             {where_clause}
         GROUP BY 
-            substr(filing_date, 1, 4), 
-            substr(ipc_code, 1, 1)
+            filing_year, 
+            ipc_section
         ORDER BY 
-            substr(filing_date, 1, 4), 
-            substr(ipc_code, 1, 1)
+            filing_year, 
+            ipc_section
     """
     
     try:
-        # For the database API, we need to replace the placeholders (?) with actual values
-        # since the API doesn't support parameterized queries directly
-        query_with_params = query
-        
-        # Replace placeholders with literal values
-        actual_query = f"""
-        SELECT 
-            substr(filing_date, 1, 4) as year,
-            substr(ipc_code, 1, 1) as class_code,
-            COUNT(*) as application_count
-        FROM 
-            publications
-        WHERE 
-            assignee_original LIKE '%{applicant_name}%'
-        """
-        
-        # Add year filters if provided
-        if start_year:
-            actual_query += f" AND substr(filing_date, 1, 4) >= '{start_year}'"
-        
-        if end_year:
-            actual_query += f" AND substr(filing_date, 1, 4) <= '{end_year}'"
-            
-        actual_query += """
-        GROUP BY 
-            substr(filing_date, 1, 4), 
-            substr(ipc_code, 1, 1)
-        ORDER BY 
-            substr(filing_date, 1, 4), 
-            substr(ipc_code, 1, 1)
-        """
-        
-        logger.info(f"Sending query to database API: {actual_query}")
+        logger.info(f"Sending query to database API: {query} with params {params}")
         
-        # Send query to database API
+        # Send query to database API (values are bound server-side, so every call
+        # with the same filters reuses the same statement)
         response = requests.post(
             f"{db_url}/execute/bigquery",
-            json={"query": actual_query}
+            json={"query": query, "params": params}
         )
         
         if response.status_code != 200:
             raise Exception(f"Database API returned error: {response.status_code}, {response.text}")
         
         result = response.json()
+        if result.get("truncated"):
+            raise Exception(f"Result truncated at {result.get('row_count')} rows; narrow the year range")
         
         # Process results into the desired format
         yearly_classification_counts = {}
@@ -230,48 +200,60 @@ def analyze_classification_trends(classification_code: str, start_year: Optional
     """Query SQLite database for patent application data by applicant and year for a specific classification"""
     db_url = get_db_connection()
     
-    # Build the SQL query
-    where_clauses = [f"substr(ipc_code, 1, 1) = '{classification_code}'"]
+    # Build the SQL query with parameters for the database API
+    where_clauses = ["ipc_section = ?"]
+    params = [classification_code]
     
     if start_year:
-        where_clauses.append(f"substr(filing_date, 1, 4) >= '{start_year}'")
+        where_clauses.append("filing_year >= ?")
+        params.append(int(start_year))
     
     if end_year:
-        where_clauses.append(f"substr(filing_date, 1, 4) <= '{end_year}'")
+        where_clauses.append("filing_year <= ?")
+        params.append(int(end_year))
     
     where_clause = " AND ".join(where_clauses)
     
-    # Query to get top applicants per year for the specified classification
+    # Top applicants per year, ranked in SQL so the result stays small for broad sections
     actual_query = f"""
-    SELECT 
-        substr(filing_date, 1, 4) as year,
-        assignee_original as applicant_name,
-        COUNT(*) as application_count
-    FROM 
-        publications
-    WHERE 
-        {where_clause}
-    GROUP BY 
-        substr(filing_date, 1, 4), 
-        assignee_original
+    SELECT year, applicant_name, application_count
+    FROM (
+        SELECT 
+            filing_year as year,
+            assignee_original as applicant_name,
+            COUNT(*) as application_count,
+            ROW_NUMBER() OVER (
+                PARTITION BY filing_year ORDER BY COUNT(*) DESC, assignee_original
+            ) as applicant_rank
+        FROM 
+            publications
+        WHERE 
+            {where_clause}
+        GROUP BY 
+            filing_year, 
+            assignee_original
+    )
+    WHERE applicant_rank <= {TOP_APPLICANTS_PER_YEAR}
     ORDER BY 
-        substr(filing_date, 1, 4), 
-        COUNT(*) DESC
+        year, 
+        application_count DESC
     """
     
     try:
-        logger.info(f"Sending classification query to database API: {actual_query}")
+        logger.info(f"Sending classification query to database API: {actual_query} with params {params}")
         
         # Send query to database API
         response = requests.post(
             f"{db_url}/execute/bigquery",
-            json={"query": actual_query}
+            json={"query": actual_query, "params": params}
         )
         
         if response.status_code != 200:
             raise Exception(f"Database API returned error: {response.status_code}, {response.text}")
         
         result = response.json()
+        if result.get("truncated"):
+            raise Exception(f"Result truncated at {result.get('row_count')} rows; narrow the year range")
         
         # Process results into the desired format
         yearly_applicant_counts = {}
@@ -282,12 +264,7 @@ def analyze_classification_trends(classification_code: str, start_year: Optional
             applicant = row.get("applicant_name", "Unknown")
             application_count = row.get("application_count", 0)
             
-            if year not in yearly_applicant_counts:
-                yearly_applicant_counts[year] = {}
-            
-            # Only keep top 5 applicants per year to prevent cluttering the chart
-            if len(yearly_applicant_counts[year]) < 5:
-                yearly_applicant_counts[year][applicant] = application_count
+            yearly_applicant_counts.setdefault(year, {})[applicant] = application_count
         
         return yearly_applicant_counts
     
@@ -295,139 +272,67 @@ def analyze_classification_trends(classification_code: str, start_year: Optional
         logger.error(f"Error querying classification data: {e}")
         raise Exception(f"Error retrieving classification trend data: {e}")
 
+def _stacked_yearly_chart(title: str, legend_title: str, cmap: str, figsize: List[int],
+                          yearly_counts: Dict[str, Dict[str, int]]) -> str:
+    """Render a stacked bar chart of {year: {series_name: count}} with per-year totals"""
+    years = sorted(yearly_counts)
+    names = sorted({name for counts in yearly_counts.values() for name in counts})
+    
+    spec = {
+        "type": "bar",
+        "stacked": True,
+        "title": title,
+        "title_fontsize": 16,
+        "xlabel": "Year",
+        "ylabel": "Number of Patent Applications",
+        "label_fontsize": 14,
+        "figsize": figsize,
+        "cmap": cmap,
+        "style": "seaborn-v0_8-whitegrid",
+        "xtick_rotation": 45,
+        "grid": {"axis": "y", "linestyle": "--", "alpha": 0.7},
+        "total_labels": {"format": "Total: {:.0f}", "offset": 5, "fontweight": "bold"},
+        "legend": {"title": legend_title, "title_fontsize": 12, "bbox_to_anchor": [1.05, 1], "loc": "upper left"},
+        "empty_message": "No data available for the specified criteria"
+    }
+    data = {
+        "labels": years,
+        "series": [
+            {"name": name, "values": [yearly_counts[year].get(name, 0) for year in years]}
+            for name in names
+        ]
+    }
+    return render_chart_base64(spec, data)
+
 def generate_trend_chart(applicant_name: str, yearly_classification_counts: Dict[str, Dict[str, int]]):
     """Generate a bar chart visualization of the patent classification trends"""
-    plt.figure(figsize=(12, 8))
+    # Convert applicant name for the title
+    safe_applicant = japanese_to_english.convert(applicant_name)
     
-    # Convert the nested dict into a pandas DataFrame for easier plotting
-    data = []
-    for year, class_counts in yearly_classification_counts.items():
-        for class_name, count in class_counts.items():
-            data.append({"Year": year, "Class": class_name, "Count": count})
-    
-    df = pd.DataFrame(data)
-    
-    # Check if we have data to plot
-    if df.empty:
-        plt.text(0.5, 0.5, "No data available for the specified criteria", 
-                 horizontalalignment='center', verticalalignment='center')
-    else:
-        # Set seaborn style
-        sns.set(style="whitegrid")
-        
-        # Convert applicant name for the title
-        safe_applicant = japanese_to_english.convert(applicant_name)
-        
-        # Create pivot table for plotting
-        pivot_df = df.pivot_table(
-            index="Year", 
-            columns="Class", 
-            values="Count",
-            aggfunc="sum",
-            fill_value=0
-        )
-        
-        # Plot stacked bar chart
-        ax = pivot_df.plot(kind="bar", stacked=True, figsize=(12, 8), cmap="tab10")
-        
-        # Customize the plot
-        plt.title(f"Patent Classifications by Year for {safe_applicant}", fontsize=16)
-        plt.xlabel("Year", fontsize=14)
-        plt.ylabel("Number of Patent Applications", fontsize=14)
-        plt.xticks(rotation=45)
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        # Add annotations for total counts on top of each bar
-        for i, year in enumerate(pivot_df.index):
-            total = pivot_df.loc[year].sum()
-            ax.text(i, total + 5, f'Total: {int(total)}', ha='center', fontweight='bold')
-        
-        # Add legend with a title
-        handles, labels = ax.get_legend_handles_labels()
-        ax.legend(handles, labels, title="IPC Classes", title_fontsize=12, 
-                 bbox_to_anchor=(1.05, 1), loc='upper left')
-        
-        plt.tight_layout()
-    
-    # Save to bytes buffer
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=100)
-    buf.seek(0)
-    
-    # Convert to base64 for embedding in JSON
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
-    return img_str
+    return _stacked_yearly_chart(
+        f"Patent Classifications by Year for {safe_applicant}", "IPC Classes", "tab10", [12, 8],
+        yearly_classification_counts
+    )
 
 def generate_classification_chart(classification_code: str, yearly_applicant_counts: Dict[str, Dict[str, int]]):
     """Generate a bar chart visualization of the top applicants by year for a classification"""
-    plt.figure(figsize=(14, 9))
-    
-    # Convert the nested dict into a pandas DataFrame for easier plotting
-    data = []
+    # Convert and truncate long applicant names, merging counts that map to the same label
+    yearly_counts = {}
     for year, applicant_counts in yearly_applicant_counts.items():
+        year_counts = yearly_counts.setdefault(str(year), {})
         for applicant, count in applicant_counts.items():
             applicant_safe = japanese_to_english.convert(applicant)
-            # Truncate long applicant names
             if len(applicant_safe) > 20:
                 applicant_safe = applicant_safe[:18] + "..."
-            data.append({"Year": year, "Applicant": applicant_safe, "Count": count})
-    
-    df = pd.DataFrame(data)
-    
-    # Check if we have data to plot
-    if df.empty:
-        plt.text(0.5, 0.5, "No data available for the specified criteria", 
-                 horizontalalignment='center', verticalalignment='center')
-    else:
-        # Set seaborn style
-        sns.set(style="whitegrid")
-        
-        # Get class description
-        class_description = get_ipc_class_description(classification_code)
-        
-        # Create pivot table for plotting
-        pivot_df = df.pivot_table(
-            index="Year", 
-            columns="Applicant", 
-            values="Count",
-            aggfunc="sum",
-            fill_value=0
-        )
-        
-        # Plot stacked bar chart
-        ax = pivot_df.plot(kind="bar", stacked=True, figsize=(14, 9), cmap="tab20")
-        
-        # Customize the plot
-        plt.title(f"Top Applicants by Year for IPC Class {classification_code} ({class_description})", fontsize=16)
-        plt.xlabel("Year", fontsize=14)
-        plt.ylabel("Number of Patent Applications", fontsize=14)
-        plt.xticks(rotation=45)
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        # Add annotations for total counts on top of each bar
-        for i, year in enumerate(pivot_df.index):
-            total = pivot_df.loc[year].sum()
-            ax.text(i, total + 5, f'Total: {int(total)}', ha='center', fontweight='bold')
-        
-        # Add legend with a title
-        handles, labels = ax.get_legend_handles_labels()
-        ax.legend(handles, labels, title="Top Applicants", title_fontsize=12, 
-                 bbox_to_anchor=(1.05, 1), loc='upper left')
-        
-        plt.tight_layout()
-    
-    # Save to bytes buffer
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=100)
-    buf.seek(0)
+            year_counts[applicant_safe] = year_counts.get(applicant_safe, 0) + count
     
-    # Convert to base64 for embedding in JSON
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
+    # Get class description
+    class_description = get_ipc_class_description(classification_code)
     
-    return img_str
+    return _stacked_yearly_chart(
+        f"Top Applicants by Year for IPC Class {classification_code} ({class_description})",
+        "Top Applicants", "tab20", [14, 9], yearly_counts
+    )
 
 def generate_assessment(applicant_name: str, yearly_classification_counts: Dict[str, Dict[str, int]]):
     """Generate an assessment based on the patent trend data"""
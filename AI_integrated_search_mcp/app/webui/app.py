@@ -10,7 +10,12 @@ import logging
 import os
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
 from flask import Flask, render_template, jsonify, request, redirect, url_for, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -29,16 +34,61 @@ load_dotenv()
 DATABASE_API_URL = os.environ.get("DATABASE_API_URL", "http://sqlite-db:5000")
 NL_QUERY_API_URL = os.environ.get("NL_QUERY_API_URL", "http://nl-query-service:5000")
 LANGCHAIN_QUERY_API_URL = os.environ.get("LANGCHAIN_QUERY_API_URL", "http://langchain-query-service:5000")
+# Timeout in seconds for metadata requests (databases, schema, sample queries)
+WEBUI_HTTP_TIMEOUT = float(os.environ.get("WEBUI_HTTP_TIMEOUT", "10"))
+# Keep-alive connections per back-end service
+WEBUI_HTTP_POOL_SIZE = int(os.environ.get("WEBUI_HTTP_POOL_SIZE", "20"))
+# Seconds databases, schemas and sample queries are reused
+WEBUI_METADATA_CACHE_TTL = float(os.environ.get("WEBUI_METADATA_CACHE_TTL", "60"))
 
 app = Flask(__name__)
 CORS(app)
 
+
+def create_http_session(pool_size: int = WEBUI_HTTP_POOL_SIZE) -> requests.Session:
+    """HTTP session with a keep-alive connection pool per back-end host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by all service clients; page views reuse its connections
+HTTP_SESSION = create_http_session()
+# Runs the independent back-end calls of a page view concurrently
+FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="webui-fanout")
+
+
+class TTLCache:
+    """Values cached for a fixed number of seconds"""
+
+    def __init__(self, ttl: float = WEBUI_METADATA_CACHE_TTL):
+        self.ttl = ttl
+        self._values: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """Cached value of key, computed on a miss or after the TTL; empty values (errors) are not kept"""
+        with self._lock:
+            cached = self._values.get(key)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        value = compute()
+        if value:
+            with self._lock:
+                self._values[key] = (time.monotonic(), value)
+        return value
+
+
 class DatabaseClient:
     """Client for SQLite Database API"""
     
-    def __init__(self, api_url):
+    def __init__(self, api_url, session: requests.Session = HTTP_SESSION):
         """Initialize Database API client"""
         self.api_url = api_url
+        self.session = session
+        self.cache = TTLCache()
         logger.info(f"Initialized Database API client with URL: {api_url}")
     
     def get_health(self):
@@ -46,7 +96,7 @@ class DatabaseClient:
         logger.debug("Getting database API health")
         
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
+            response = self.session.get(f"{self.api_url}/health", timeout=5)
             response.raise_for_status()
             data = response.json()
             return True, data
@@ -55,11 +105,15 @@ class DatabaseClient:
             return False, {"error": str(e)}
     
     def get_databases(self):
+        """Get list of available databases (cached for WEBUI_METADATA_CACHE_TTL seconds)"""
+        return self.cache.get_or_compute("databases", lambda: self._fetch_databases())
+
+    def _fetch_databases(self):
         """Get list of available databases"""
         logger.debug("Getting list of databases")
         
         try:
-            response = requests.get(f"{self.api_url}/databases")
+            response = self.session.get(f"{self.api_url}/databases", timeout=WEBUI_HTTP_TIMEOUT)
             response.raise_for_status()
             data = response.json()
             
@@ -72,11 +126,15 @@ class DatabaseClient:
             return []
     
     def get_schema(self, db_name):
+        """Get schema of a database (cached for WEBUI_METADATA_CACHE_TTL seconds)"""
+        return self.cache.get_or_compute(("schema", db_name), lambda: self._fetch_schema(db_name))
+
+    def _fetch_schema(self, db_name):
         """Get schema of a database"""
         logger.debug(f"Getting schema for database: {db_name}")
         
         try:
-            response = requests.get(f"{self.api_url}/schema/{db_name}")
+            response = self.session.get(f"{self.api_url}/schema/{db_name}", timeout=WEBUI_HTTP_TIMEOUT)
             response.raise_for_status()
             data = response.json()
             
@@ -93,7 +151,7 @@ class DatabaseClient:
         logger.info(f"Executing query on database {db_name}: {query}")
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/execute/{db_name}",
                 json={"query": query},
                 timeout=30  # Increased timeout for potentially long-running queries
@@ -119,11 +177,15 @@ class DatabaseClient:
             return {"error": error_msg, "query": query}
     
     def get_sample_queries(self, db_name):
+        """Get sample queries for a database (cached for WEBUI_METADATA_CACHE_TTL seconds)"""
+        return self.cache.get_or_compute(("sample_queries", db_name), lambda: self._fetch_sample_queries(db_name))
+
+    def _fetch_sample_queries(self, db_name):
         """Get sample queries for a database"""
         logger.debug(f"Getting sample queries for database: {db_name}")
         
         try:
-            response = requests.get(f"{self.api_url}/sample_queries/{db_name}")
+            response = self.session.get(f"{self.api_url}/sample_queries/{db_name}", timeout=WEBUI_HTTP_TIMEOUT)
             response.raise_for_status()
             data = response.json()
             
@@ -138,9 +200,10 @@ class DatabaseClient:
 class NLQueryClient:
     """Client for NL Query API"""
     
-    def __init__(self, api_url):
+    def __init__(self, api_url, session: requests.Session = HTTP_SESSION):
         """Initialize NL Query API client"""
         self.api_url = api_url
+        self.session = session
         logger.info(f"Initialized NL Query API client with URL: {api_url}")
     
     def get_health(self):
@@ -148,7 +211,7 @@ class NLQueryClient:
         logger.debug("Getting NL Query API health")
         
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
+            response = self.session.get(f"{self.api_url}/health", timeout=5)
             response.raise_for_status()
             data = response.json()
             return True, data
@@ -161,7 +224,7 @@ class NLQueryClient:
         logger.info(f"Processing natural language query on database {db_name}: {query}")
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/query/{db_name}",
                 json={"query": query},
                 timeout=60,  # Increased timeout for NL processing
@@ -191,9 +254,10 @@ class NLQueryClient:
 class LangChainQueryClient:
     """Client for LangChain Query API"""
     
-    def __init__(self, api_url):
+    def __init__(self, api_url, session: requests.Session = HTTP_SESSION):
         """Initialize LangChain Query API client"""
         self.api_url = api_url
+        self.session = session
         logger.info(f"Initialized LangChain Query API client with URL: {api_url}")
     
     def get_health(self):
@@ -201,7 +265,7 @@ class LangChainQueryClient:
         logger.debug("Getting LangChain Query API health")
         
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
+            response = self.session.get(f"{self.api_url}/health", timeout=5)
             response.raise_for_status()
             data = response.json()
             return True, data
@@ -214,7 +278,7 @@ class LangChainQueryClient:
         logger.info(f"Processing LangChain query on database {db_name}: {query}")
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/query/{db_name}",
                 json={"query": query},
                 timeout=60  # Increased timeout for LangChain processing
@@ -249,12 +313,14 @@ def index():
     """Render index page"""
     logger.debug("Rendering index page")
     
-    # Get list of databases
-    databases = db_client.get_databases()
+    # Get list of databases and check health of services concurrently
+    databases_future = FANOUT_EXECUTOR.submit(db_client.get_databases)
+    db_health_future = FANOUT_EXECUTOR.submit(db_client.get_health)
+    nl_health_future = FANOUT_EXECUTOR.submit(nl_client.get_health)
     
-    # Check health of services
-    db_health, _ = db_client.get_health()
-    nl_health, _ = nl_client.get_health()
+    databases = databases_future.result()
+    db_health, _ = db_health_future.result()
+    nl_health, _ = nl_health_future.result()
     
     return render_template(
         'index.html',
@@ -268,11 +334,12 @@ def database_view(db_name):
     """Render database view page"""
     logger.debug(f"Rendering database view page for database: {db_name}")
     
-    # Get database schema
-    schema = db_client.get_schema(db_name)
+    # Get database schema and sample queries concurrently
+    schema_future = FANOUT_EXECUTOR.submit(db_client.get_schema, db_name)
+    sample_queries_future = FANOUT_EXECUTOR.submit(db_client.get_sample_queries, db_name)
     
-    # Get sample queries
-    sample_queries = db_client.get_sample_queries(db_name)
+    schema = schema_future.result()
+    sample_queries = sample_queries_future.result()
     
     return render_template(
         'database.html',
@@ -364,10 +431,9 @@ def health():
     """Health check endpoint"""
     logger.debug("Health check requested")
     
-    # Check health of services
-    db_health, db_data = db_client.get_health()
-    nl_health, nl_data = nl_client.get_health()
-    langchain_health, langchain_data = langchain_client.get_health()
+    # Check health of services concurrently
+    futures = [FANOUT_EXECUTOR.submit(client.get_health) for client in (db_client, nl_client, langchain_client)]
+    (db_health, db_data), (nl_health, nl_data), (langchain_health, langchain_data) = [f.result() for f in futures]
     
     health_status = {
         "status": "healthy" if db_health and nl_health and langchain_health else "degraded",
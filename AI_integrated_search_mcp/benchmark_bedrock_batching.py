@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Latency/throughput benchmark of the nl-query Bedrock batching layer against a fake
+Bedrock endpoint (no AWS calls).
+
+The fake endpoint answers rerank requests after a fixed overhead plus a cost per
+passage character, and embedding requests after a fixed overhead. Compared:
+
+  rerank      one unbounded request (the previous behaviour) vs. size-bounded
+              batches sent concurrently (BatchedReranker)
+  fallback    BatchedReranker with a slow endpoint: local BM25 / cosine scoring
+              after the timeout
+  embeddings  one request per text vs. BatchedEmbedder (concurrent, cached) over
+              texts that repeat
+
+Usage:
+    python benchmark_bedrock_batching.py
+    python benchmark_bedrock_batching.py --passages 400 --overhead-ms 80 --repeat 5
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import logging
+import argparse
+import statistics
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "nl-query"))
+
+from bedrock_batching import BatchedEmbedder, BatchedReranker, serialize_result, LOCAL_SCORERS
+
+WORDS = ["電池", "制御", "装置", "画像", "処理", "通信", "半導体", "車両", "センサ", "battery", "sensor", "vehicle"]
+
+
+class FakeBedrock:
+    """Fake rerank / embedding endpoint with configurable latency"""
+
+    def __init__(self, overhead_ms: float, per_kchar_ms: float):
+        self.overhead = overhead_ms / 1000
+        self.per_char = per_kchar_ms / 1000 / 1000
+        self.requests = 0
+
+    def rerank(self, query: str, passages: List[str]) -> List[float]:
+        self.requests += 1
+        time.sleep(self.overhead + self.per_char * sum(len(p) for p in passages))
+        # Relevance: shared query words, like a real model would roughly agree with
+        return [sum(passage.count(word) for word in query.split()) / (1 + len(passage) / 1000)
+                for passage in passages]
+
+    def embed(self, text: str) -> List[float]:
+        self.requests += 1
+        time.sleep(self.overhead)
+        rng = random.Random(text)
+        return [rng.random() for _ in range(16)]
+
+
+def time_runs(func: Callable[[], None], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: List[float], items: int):
+    median = statistics.median(timings)
+    print(f"{name:<34}{min(timings):>10.1f}{median:>12.1f}{items / (median / 1000):>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rerank batching and embedding caching")
+    parser.add_argument("--passages", type=int, default=200, help="Results to rerank (default: 200)")
+    parser.add_argument("--texts", type=int, default=200, help="Texts to embed, half of them repeats (default: 200)")
+    parser.add_argument("--overhead-ms", type=float, default=50, help="Fake request overhead (default: 50)")
+    parser.add_argument("--per-kchar-ms", type=float, default=2, help="Fake rerank cost per 1000 chars (default: 2)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Passages per rerank batch (default: 50)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests (default: 4)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per variant (default: 5)")
+    args = parser.parse_args()
+    # The fallback runs log a warning per request
+    logging.basicConfig(level=logging.ERROR)
+
+    rng = random.Random(42)
+    results = [{"publication_number": f"JP{i:010d}A",
+                "title": "".join(rng.choice(WORDS) for _ in range(4)),
+                "abstract": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200)))}
+               for i in range(args.passages)]
+    query = "電池 制御"
+    fake = FakeBedrock(args.overhead_ms, args.per_kchar_ms)
+
+    print(f"{'variant':<34}{'min ms':>10}{'median ms':>12}{'items/s':>14}")
+    print("-" * 70)
+
+    def unbatched():
+        passages = [json.dumps(r) for r in results]
+        scores = fake.rerank(query, passages)
+        sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:10]
+    report(f"rerank unbatched ({args.passages})", time_runs(unbatched, args.repeat), args.passages)
+
+    reranker = BatchedReranker(fake.rerank, batch_size=args.batch_size, max_workers=args.workers)
+    report(f"rerank batched x{args.workers}", time_runs(lambda: reranker.rerank(query, results), args.repeat),
+           args.passages)
+
+    slow = FakeBedrock(args.overhead_ms * 20, args.per_kchar_ms)
+    for scorer in LOCAL_SCORERS:
+        fallback = BatchedReranker(slow.rerank, batch_size=args.batch_size, max_workers=args.workers,
+                                   timeout=args.overhead_ms / 1000 * 2, fallback=scorer)
+        report(f"rerank slow endpoint -> {scorer}", time_runs(lambda: fallback.rerank(query, results), args.repeat),
+               args.passages)
+
+    # Agreement of the local scorers with the fake model's top 10
+    passages = [serialize_result(r) for r in results]
+    remote = fake.rerank(query, passages)
+    top_remote = set(sorted(range(len(passages)), key=lambda i: remote[i], reverse=True)[:10])
+    for scorer, func in LOCAL_SCORERS.items():
+        local = func(query, passages)
+        top_local = set(sorted(range(len(passages)), key=lambda i: local[i], reverse=True)[:10])
+        print(f"  {scorer} top-10 overlap with remote: {len(top_remote & top_local)}/10")
+
+    texts = [f"特許 {rng.randrange(args.texts // 2)}" for _ in range(args.texts)]
+    report(f"embeddings one by one ({args.texts})",
+           time_runs(lambda: [fake.embed(t) for t in texts], 1), args.texts)
+
+    embedder = BatchedEmbedder(fake.embed, "fake-embedding", max_workers=args.workers)
+    report("embeddings batched, cold cache", time_runs(lambda: embedder.embed(texts), 1), args.texts)
+    report("embeddings batched, warm cache", time_runs(lambda: embedder.embed(texts), args.repeat), args.texts)
+    print(f"  cache hits {embedder.cache.hits}, misses {embedder.cache.misses}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
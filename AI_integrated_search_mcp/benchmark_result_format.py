@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Payload size and serialization time of the query result formats (db/result_format.py).
+
+Builds a synthetic result of patent rows and serializes it as the /execute
+endpoint did before (row objects, json.dumps as flask-restful does) and in each
+format through encode_json (orjson when installed, gzip/br when negotiated).
+
+Usage:
+    python benchmark_result_format.py
+    python benchmark_result_format.py --rows 100000 --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "db"))
+
+import result_format
+from result_format import RESULT_FORMATS, encode_json, format_rows
+
+COLUMNS = ["publication_number", "application_number", "filing_date", "publication_date",
+           "title", "assignee_original", "ipc_code", "country_code", "family_id", "citation_count"]
+APPLICANTS = ["トヨタ自動車株式会社", "ソニーグループ株式会社", "株式会社日立製作所", "キヤノン株式会社", "富士通株式会社"]
+TITLES = ["電池制御装置", "画像処理方法", "車両用センサ", "通信システム", "半導体装置の製造方法"]
+
+
+def make_rows(count: int, seed: int = 42) -> List[Tuple]:
+    rng = random.Random(seed)
+    return [(f"JP{i:010d}A", f"2{i:09d}", f"20{rng.randint(0, 23):02d}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+             "2024-01-01", rng.choice(TITLES), rng.choice(APPLICANTS),
+             rng.choice(["H01M 10/052", "G06T 7/00", "H04W 72/04"]), "JP", rng.randrange(10 ** 8), rng.randrange(50))
+            for i in range(count)]
+
+
+def timed(func: Callable[[], bytes], repeat: int) -> Tuple[float, int]:
+    timings, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query result formats")
+    parser.add_argument("--rows", type=int, default=100000, help="Result rows (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant (default: 3)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"{args.rows} rows x {len(COLUMNS)} columns; orjson: {'yes' if result_format.orjson else 'no'}, "
+          f"brotli: {'yes' if result_format.brotli else 'no'}\n")
+    print(f"{'variant':<36}{'ms':>10}{'bytes':>14}")
+    print("-" * 60)
+
+    def legacy():
+        objects = [dict(zip(COLUMNS, row)) for row in rows]
+        return json.dumps({"columns": COLUMNS, "rows": objects}).encode("utf-8")
+    ms, size = timed(legacy, args.repeat)
+    print(f"{'objects, json (previous)':<36}{ms:>10.1f}{size:>14,}")
+
+    encodings = [("identity", None), ("gzip", "gzip")] + ([("br", "br")] if result_format.brotli else [])
+    for fmt in RESULT_FORMATS:
+        for label, accept in encodings:
+            def run():
+                body, _ = encode_json({"columns": COLUMNS, "format": fmt,
+                                       "rows": format_rows(COLUMNS, rows, fmt)}, accept)
+                return body
+            ms, size = timed(run, args.repeat)
+            print(f"{fmt + ', ' + label:<36}{ms:>10.1f}{size:>14,}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
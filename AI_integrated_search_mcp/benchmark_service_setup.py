@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the per-request setup removed by the process-wide service containers.
+
+Flask-RESTful instantiates a Resource per request. The nl-query and langchain-query
+resources used to build their clients in __init__, so every request paid for:
+
+  nl-query:        BedrockClient (boto3 client), DatabaseClient, NLQueryProcessor
+                   and the schema request to the database API
+  langchain-query: BedrockLLM (BedrockChat), LangChainQueryProcessor, SQLDatabase
+                   reflection and the SQL query chain
+
+This script times that setup ("per-request") against the same work through the
+service's SERVICES container ("shared"). No LLM calls are made.
+
+Usage (with the service's requirements installed and AWS_REGION set):
+    python benchmark_service_setup.py nl-query
+    python benchmark_service_setup.py langchain-query --db input --repeat 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import statistics
+from typing import Callable, List
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+
+
+def load_service(name: str, path: str = None):
+    """Import a service's app.py as a module"""
+    path = path or os.path.join(APP_DIR, name, "app.py")
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_runs(func: Callable[[], None], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request vs. shared service setup")
+    parser.add_argument("service", choices=["nl-query", "langchain-query"])
+    parser.add_argument("--app", help="Path of the service's app.py (default: app/<service>/app.py)")
+    parser.add_argument("--db", default="bigquery", help="Database name (default: bigquery)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per variant (default: 20)")
+    parser.add_argument("--no-db", action="store_true",
+                        help="Skip the schema request / reflection (client setup only)")
+    args = parser.parse_args()
+
+    service = load_service(args.service, args.app)
+
+    if args.service == "nl-query":
+        def per_request():
+            processor = service.NLQueryProcessor(service.BedrockClient(),
+                                                 service.DatabaseClient(service.DATABASE_API_URL))
+            if not args.no_db:
+                processor.db_client.get_schema(args.db)
+
+        def shared():
+            processor = service.SERVICES.nl_processor
+            if not args.no_db:
+                processor.db_client.get_schema(args.db)
+    else:
+        def per_request():
+            processor = service.LangChainQueryProcessor(service.BedrockLLM().llm)
+            if not args.no_db:
+                processor.get_db_connection(args.db)
+
+        def shared():
+            processor = service.SERVICES.lc_processor
+            if not args.no_db:
+                processor.get_db_connection(args.db)
+
+    # The first shared call builds the container (as warm_up() does at startup)
+    started = time.perf_counter()
+    shared()
+    print(f"{args.service}: container warm-up {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print(f"\n{'variant':<14}{'min ms':>10}{'median ms':>12}{'max ms':>10}")
+    print("-" * 46)
+    for variant, func in (("per-request", per_request), ("shared", shared)):
+        timings = time_runs(func, args.repeat)
+        print(f"{variant:<14}{min(timings):>10.2f}{statistics.median(timings):>12.2f}{max(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
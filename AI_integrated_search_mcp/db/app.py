@@ -12,15 +12,21 @@ import json
 import sqlite3
 import time
 from pathlib import Path
-import subprocess
 import threading
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response
 from flask_cors import CORS
 from flask_restful import Api, Resource
 import boto3
 from dotenv import load_dotenv
 
+from query_governor import QueryTooExpensive, normalize_max_rows, normalize_params
+from result_format import check_format, encode_json, format_rows
+from s3_downloader import ParallelS3Downloader
+from slow_query_log import execute_logged, index_advisor
+from snapshot_manager import SnapshotManager, SnapshotCache, check_admin_token, handle_snapshot_admin
+from trend_columns import ensure_trend_columns_at
+
 # Configure logging
 logging.basicConfig(
     level=os.environ.get("LOG_LEVEL", "INFO"),
@@ -38,6 +44,14 @@ BIGQUERY_DB_PATH = DATA_DIR / "google_patents_gcp.db"
 INPUT_DB_S3_PATH = os.environ.get("INPUT_DB_S3_PATH")
 BIGQUERY_DB_S3_PATH = os.environ.get("BIGQUERY_DB_S3_PATH")
 
+# Snapshot managers by database name: the downloaded files are the base snapshots
+SNAPSHOT_MANAGERS = {
+    "input": SnapshotManager("input", INPUT_DB_PATH),
+    "bigquery": SnapshotManager("bigquery", BIGQUERY_DB_PATH)
+}
+# Schema per snapshot (cleared when the database's snapshot changes)
+SCHEMA_CACHES = {db_name: SnapshotCache(manager) for db_name, manager in SNAPSHOT_MANAGERS.items()}
+
 app = Flask(__name__)
 CORS(app)
 api = Api(app)
@@ -46,25 +60,21 @@ api = Api(app)
 DATA_DIR.mkdir(exist_ok=True, parents=True)
 
 def download_db_from_s3(s3_path, local_path):
-    """Download a database file from S3"""
+    """Download a database file from S3 (parallel ranged GETs, resumable, checksum-verified)"""
     logger.info(f"Downloading database from {s3_path} to {local_path}")
     try:
-        cmd = ["aws", "s3", "cp", s3_path, str(local_path)]
-        logger.debug(f"Running command: {' '.join(cmd)}")
+        if not s3_path.startswith("s3://"):
+            raise ValueError(f"Not an S3 URL: {s3_path}")
+        bucket, _, key = s3_path[len("s3://"):].partition("/")
         
         # AWS credentials should be available as environment variables via source
-        process = subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        result = ParallelS3Downloader(boto3.client('s3')).download(bucket, key, str(local_path))
         
-        logger.info(f"Download completed: {process.stdout}")
+        logger.info(f"Download completed: {result['size']} bytes in {result['elapsed_seconds']}s, "
+                    f"verified: {', '.join(result['verified']) or 'no checksum available'}")
         return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to download database from S3: {e.stderr}")
+    except Exception as e:
+        logger.error(f"Failed to download database from S3: {e}")
         return False
 
 def get_db_schema(db_path):
@@ -237,13 +247,16 @@ class Schema(Resource):
         if db_name not in ["input", "bigquery"]:
             return {"error": "Invalid database name"}, 400
             
-        db_path = INPUT_DB_PATH if db_name == "input" else BIGQUERY_DB_PATH
+        manager = SNAPSHOT_MANAGERS[db_name]
         
-        if not db_path.exists():
+        if not os.path.exists(manager.active_path):
             return {"error": f"Database {db_name} does not exist"}, 404
             
-        schema = get_db_schema(db_path)
-        return {"database": db_name, "schema": schema}
+        schema = SCHEMA_CACHES[db_name].get_or_compute("schema", lambda: get_db_schema(manager.active_path))
+        if not schema:
+            # Do not keep an empty result (e.g. while the database is still being downloaded)
+            SCHEMA_CACHES[db_name].clear()
+        return {"database": db_name, "schema": schema, "snapshot_id": manager.active_id}
 
 class ExecuteQuery(Resource):
     def post(self, db_name):
@@ -257,9 +270,9 @@ class ExecuteQuery(Resource):
         if db_name not in ["input", "bigquery"]:
             return {"error": "Invalid database name"}, 400
             
-        db_path = INPUT_DB_PATH if db_name == "input" else BIGQUERY_DB_PATH
+        manager = SNAPSHOT_MANAGERS[db_name]
         
-        if not db_path.exists():
+        if not os.path.exists(manager.active_path):
             return {"error": f"Database {db_name} does not exist"}, 404
             
         data = request.get_json()
@@ -267,17 +280,49 @@ class ExecuteQuery(Resource):
             return {"error": "Missing query parameter"}, 400
             
         query = data["query"]
-        logger.info(f"Executing query on {db_name} database: {query}")
+        try:
+            # Optional bound parameters: a list for "?" or an object for ":name" placeholders
+            params = normalize_params(data.get("params"))
+            # Optional row cap (bounded by the governor ceiling)
+            max_rows = normalize_max_rows(data.get("max_rows"))
+            # Optional result format: "objects" (default), "rows" (arrays) or "columns" (column-major)
+            result_format = check_format(data.get("format"), "objects")
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        logger.info(f"Executing query on {db_name} database: {query}" + (f" with params {params}" if params else ""))
         
         try:
-            conn = sqlite3.connect(db_path)
+            if query.strip().upper().startswith(("SELECT", "WITH")):
+                # Read queries run on a pooled connection to the active snapshot and go
+                # through the cost governor (plan check, time budget, row cap)
+                try:
+                    with manager.connection() as (conn, snapshot_id):
+                        result = execute_logged(conn, db_name, query, params, max_rows=max_rows)
+                except QueryTooExpensive as e:
+                    logger.warning(f"Query rejected on {db_name}: {e.message}")
+                    return {**e.to_dict(), "database": db_name, "query": query}, 422
+                
+                body, headers = encode_json({
+                    "database": db_name,
+                    "query": query,
+                    "columns": result["columns"],
+                    "format": result_format,
+                    "rows": format_rows(result["columns"], result["rows"], result_format),
+                    "row_count": result["row_count"],
+                    "truncated": result["truncated"],
+                    "execution_time_ms": result["execution_time_ms"],
+                    "snapshot_id": snapshot_id
+                }, request.headers.get("Accept-Encoding"))
+                return Response(body, headers=headers)
+            
+            conn = sqlite3.connect(manager.active_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
             start_time = time.time()
-            cursor.execute(query)
+            cursor.execute(query, params or ())
             
-            if query.strip().upper().startswith(("SELECT", "PRAGMA", "EXPLAIN")):
+            if query.strip().upper().startswith(("PRAGMA", "EXPLAIN")):
                 rows = cursor.fetchall()
                 columns = [column[0] for column in cursor.description]
                 
@@ -315,6 +360,45 @@ class ExecuteQuery(Resource):
             logger.error(f"SQL error: {error_msg}")
             return {"error": f"SQL error: {error_msg}", "query": query}, 400
 
+class QueryAdvisor(Resource):
+    def get(self, db_name):
+        """Aggregate slow queries by fingerprint and recommend indexes (requires X-Admin-Token)"""
+        logger.debug(f"Query advisor requested for database: {db_name}")
+        if not check_admin_token(request.headers.get("X-Admin-Token")):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        
+        # Map "inpit" to "input" for backward compatibility
+        if db_name == "inpit":
+            db_name = "input"
+            
+        if db_name not in ["input", "bigquery"]:
+            return {"error": "Invalid database name"}, 400
+            
+        manager = SNAPSHOT_MANAGERS[db_name]
+        
+        if not os.path.exists(manager.active_path):
+            return {"error": f"Database {db_name} does not exist"}, 404
+        
+        try:
+            with manager.connection() as (conn, _):
+                return index_advisor.advise(conn, db_name, int(request.args.get("limit", 10)))
+        except sqlite3.Error as e:
+            logger.error(f"Query advisor error: {e}")
+            return {"error": f"SQL error: {e}"}, 500
+
+class SnapshotAdmin(Resource):
+    def get(self):
+        """Active snapshot, in-flight queries and snapshot files of every database"""
+        return {db_name: manager.status() for db_name, manager in SNAPSHOT_MANAGERS.items()}
+    
+    def post(self):
+        """Flip, register or clean up snapshots (JSON body with db_type, action, snapshot_id/path)"""
+        if not check_admin_token(request.headers.get("X-Admin-Token")):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        data = request.get_json() or {}
+        logger.info(f"Snapshot admin request: action={data.get('action')} db_type={data.get('db_type')}")
+        return handle_snapshot_admin(SNAPSHOT_MANAGERS, data)
+
 class SampleQueries(Resource):
     def get(self, db_name):
         """Get sample queries for a database"""
@@ -459,7 +543,17 @@ class OpenAPISpec(Resource):
                                     "schema": {
                                         "type": "object",
                                         "properties": {
-                                            "query": {"type": "string"}
+                                            "query": {"type": "string"},
+                                            "params": {
+                                                "description": "Bound parameters: an array for ? placeholders or an object for :name placeholders",
+                                                "oneOf": [{"type": "array"}, {"type": "object"}]
+                                            },
+                                            "max_rows": {"type": "integer"},
+                                            "format": {
+                                                "description": "Rows as objects (default), as arrays (rows) or one array per column (columns)",
+                                                "type": "string",
+                                                "enum": ["objects", "rows", "columns"]
+                                            }
                                         },
                                         "required": ["query"]
                                     }
@@ -473,6 +567,39 @@ class OpenAPISpec(Resource):
                         }
                     }
                 },
+                "/query_advisor/{db_name}": {
+                    "get": {
+                        "summary": "Slow-query fingerprints and index recommendations",
+                        "parameters": [
+                            {
+                                "name": "db_name",
+                                "in": "path",
+                                "required": True,
+                                "schema": {"type": "string", "enum": ["input", "inpit", "bigquery"]}
+                            },
+                            {
+                                "name": "limit",
+                                "in": "query",
+                                "required": False,
+                                "schema": {"type": "integer", "default": 10}
+                            },
+                            {
+                                "name": "X-Admin-Token",
+                                "in": "header",
+                                "required": True,
+                                "schema": {"type": "string"}
+                            }
+                        ],
+                        "responses": {
+                            "200": {
+                                "description": "Aggregated slow queries and recommended indexes"
+                            },
+                            "403": {
+                                "description": "Missing or invalid admin token"
+                            }
+                        }
+                    }
+                },
                 "/sample_queries/{db_name}": {
                     "get": {
                         "summary": "Get sample queries for a database",
@@ -536,6 +663,8 @@ api.add_resource(Health, '/health')
 api.add_resource(Databases, '/databases')
 api.add_resource(Schema, '/schema/<string:db_name>')
 api.add_resource(ExecuteQuery, '/execute/<string:db_name>')
+api.add_resource(QueryAdvisor, '/query_advisor/<string:db_name>')
+api.add_resource(SnapshotAdmin, '/admin/snapshots')
 api.add_resource(SampleQueries, '/sample_queries/<string:db_name>')
 api.add_resource(OpenAPISpec, '/openapi')
 
@@ -565,6 +694,11 @@ def check_and_fix_db_files():
         download_databases()
     else:
         logger.info("Both database files already exist")
+    
+    # Generated filing_year / ipc_section columns used by the trend queries
+    # (added once to databases built before they existed)
+    if BIGQUERY_DB_PATH.exists():
+        ensure_trend_columns_at(str(BIGQUERY_DB_PATH))
         
     # Log database status
     input_status = "Present" if INPUT_DB_PATH.exists() else "Missing"
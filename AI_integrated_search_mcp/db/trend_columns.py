@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Generated trend columns and covering indexes for the publications table.
+
+Trend analyses group and filter publications by filing year and IPC section. As
+expressions (substr(filing_date, 1, 4), substr(ipc_code, 1, 1)) no index can serve
+them, so the table gets two virtual generated columns:
+
+  filing_year  INTEGER  year of filing_date (NULL when filing_date is empty)
+  ipc_section  TEXT     first character of the first IPC code (A-H)
+
+and two covering indexes for the two access paths:
+
+  (assignee_original, filing_year, ipc_section)  trends of one applicant
+  (ipc_section, filing_year, assignee_original)   applicants of one IPC section
+
+The columns are VIRTUAL so they can be added with ALTER TABLE to databases that
+were built (or downloaded) without them; only the indexes store their values.
+
+This module is shared by the SQLite API services (patentDWH/db, container/inpit-sqlite,
+AI_integrated_search_mcp/db); keep the copies identical.
+"""
+
+import sqlite3
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+TREND_TABLE = "publications"
+
+# Generated columns: name -> definition
+TREND_COLUMNS = {
+    "filing_year": "INTEGER GENERATED ALWAYS AS (CAST(NULLIF(substr(filing_date, 1, 4), '') AS INTEGER)) VIRTUAL",
+    "ipc_section": "TEXT GENERATED ALWAYS AS (substr(ipc_code, 1, 1)) VIRTUAL",
+}
+
+# Covering indexes: name -> columns
+TREND_INDEXES = {
+    "idx_pub_assignee_year_section": ("assignee_original", "filing_year", "ipc_section"),
+    "idx_pub_section_year_assignee": ("ipc_section", "filing_year", "assignee_original"),
+}
+
+
+def missing_trend_columns(conn: sqlite3.Connection) -> List[str]:
+    """
+    Names of the trend columns and indexes the publications table lacks
+
+    Empty when they all exist or the database has no publications table.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({TREND_TABLE})")}
+    if not columns:
+        return []
+    indexes = {row[1] for row in conn.execute(f"PRAGMA index_list({TREND_TABLE})")}
+    return ([name for name in TREND_COLUMNS if name not in columns]
+            + [name for name in TREND_INDEXES if name not in indexes])
+
+
+def ensure_trend_columns(conn: sqlite3.Connection) -> List[str]:
+    """
+    Add the generated trend columns and their indexes to the publications table
+
+    Idempotent; does nothing when the database has no publications table.
+
+    Args:
+        conn: Writable connection to the database
+
+    Returns:
+        Names of the columns and indexes that were created
+    """
+    # table_xinfo (unlike table_info) also lists generated columns
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({TREND_TABLE})")}
+    if not columns:
+        return []
+
+    created = []
+    for name, definition in TREND_COLUMNS.items():
+        if name not in columns:
+            conn.execute(f"ALTER TABLE {TREND_TABLE} ADD COLUMN {name} {definition}")
+            created.append(name)
+
+    existing_indexes = {row[1] for row in conn.execute(f"PRAGMA index_list({TREND_TABLE})")}
+    for name, index_columns in TREND_INDEXES.items():
+        if name not in existing_indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TREND_TABLE} ({', '.join(index_columns)})")
+            created.append(name)
+
+    if created:
+        conn.execute(f"ANALYZE {TREND_TABLE}")
+        conn.commit()
+        logger.info(f"Added trend columns/indexes to {TREND_TABLE}: {', '.join(created)}")
+    return created
+
+
+def ensure_trend_columns_at(db_path: str) -> List[str]:
+    """
+    ensure_trend_columns for a database file
+
+    Failures (e.g. a read-only mount) are logged and reported as no changes.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return ensure_trend_columns(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not add trend columns to {db_path}: {e}")
+        return []
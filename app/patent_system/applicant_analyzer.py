@@ -7,11 +7,7 @@ Specialized patent applicant analyzer for patent examiners
 
 from datetime import datetime, timedelta
 import random
-import matplotlib.pyplot as plt
-import io
-import base64
-import pandas as pd
-import numpy as np
+from .chart_renderer import render_chart_base64, render_charts_base64
 from .mock_analyzer import MockPatentAnalyzer
 
 class ApplicantAnalyzer:
@@ -96,13 +92,14 @@ class ApplicantAnalyzer:
         # Get applicant summary data
         summary = self.get_applicant_summary(applicant_name)
         
-        # Generate visualizations
-        visualizations = {
-            "assessment_chart": self._create_assessment_ratio_chart(summary["assessment_statistics"]),
-            "application_trend": self._create_application_trend_chart(summary["application_history"]),
-            "tech_distribution": self._create_tech_distribution_chart(summary["technical_distribution"]),
-            "industry_comparison": self._create_industry_comparison_chart(summary["industry_comparison"])
+        # Generate visualizations (rendered in one batch by the shared renderer's worker pool)
+        chart_jobs = {
+            "assessment_chart": self._assessment_ratio_chart_job(summary["assessment_statistics"]),
+            "application_trend": self._application_trend_chart_job(summary["application_history"]),
+            "tech_distribution": self._tech_distribution_chart_job(summary["technical_distribution"]),
+            "industry_comparison": self._industry_comparison_chart_job(summary["industry_comparison"])
         }
+        visualizations = dict(zip(chart_jobs, render_charts_base64(list(chart_jobs.values()))))
         
         # Format markdown report
         markdown_report = self._format_markdown_report(summary, visualizations)
@@ -130,7 +127,7 @@ class ApplicantAnalyzer:
         stats = self._generate_assessment_statistics(applicant)
         
         # Create visualization
-        visualization = self._create_assessment_ratio_chart(stats)
+        visualization = render_chart_base64(*self._assessment_ratio_chart_job(stats))
         
         return {
             "applicant_name": applicant_name,
@@ -156,7 +153,7 @@ class ApplicantAnalyzer:
         tech_dist = self._generate_technical_distribution(applicant)
         
         # Create visualization
-        visualization = self._create_tech_distribution_chart(tech_dist)
+        visualization = render_chart_base64(*self._tech_distribution_chart_job(tech_dist))
         
         # Add domain analysis
         domain_analysis = self._analyze_technical_domains(tech_dist)
@@ -202,9 +199,11 @@ class ApplicantAnalyzer:
                 "tech_distribution": tech_dist
             })
         
-        # Generate comparative visualizations
-        assessment_comparison = self._create_comparative_assessment_chart(applicant, competitors_data)
-        field_comparison = self._create_comparative_field_chart(applicant, competitors_data)
+        # Generate comparative visualizations in one batch
+        assessment_comparison, field_comparison = render_charts_base64([
+            self._comparative_assessment_chart_job(applicant, competitors_data),
+            self._comparative_field_chart_job(applicant, competitors_data)
+        ])
         
         return {
             "applicant": {
@@ -602,359 +601,221 @@ class ApplicantAnalyzer:
             "unmapped_codes": unmapped_codes
         }
 
-    def _create_assessment_ratio_chart(self, stats):
+    def _assessment_ratio_chart_job(self, stats):
         """
-        Create an assessment ratio chart as base64 encoded image
+        Build the assessment ratio chart (spec and data)
         
         Args:
             stats (dict): Assessment statistics
             
         Returns:
-            str: Base64 encoded image
+            tuple: (spec, data) for the chart renderer
         """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Extract data
         status_dist = stats["status_distribution"]
-        labels = list(status_dist.keys())
-        sizes = list(status_dist.values())
-        
-        # Generate colors
-        colors = ['#4CAF50', '#F44336', '#2196F3', '#FFC107', '#9C27B0']
-        
-        # Create pie chart - filter out any zero or negative values
-        positive_sizes = []
-        positive_labels = []
-        positive_colors = []
-        for i, size in enumerate(sizes):
-            if size > 0:
-                positive_sizes.append(size)
-                positive_labels.append(labels[i])
-                positive_colors.append(colors[i])
-        
-        wedges, texts, autotexts = ax.pie(
-            positive_sizes, 
-            labels=None, 
-            autopct='%1.1f%%',
-            startangle=90,
-            colors=positive_colors
-        )
-        
-        # Equal aspect ratio ensures that pie is drawn as a circle
-        ax.axis('equal')
-        
-        # Add title
-        ax.set_title('出願審査結果の分布', fontsize=14)
         
-        # Add legend - only use labels from positive values
-        ax.legend(
-            wedges, 
-            [f"{label} ({size}件)" for label, size in zip(positive_labels, positive_sizes)],
-            loc="center left",
-            bbox_to_anchor=(1, 0, 0.5, 1)
+        return (
+            {
+                "type": "pie",
+                "title": "出願審査結果の分布",
+                "figsize": [10, 6],
+                "colors": ['#4CAF50', '#F44336', '#2196F3', '#FFC107', '#9C27B0'],
+                "legend_label_format": "{label} ({value}件)",
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": list(status_dist.keys()),
+                "series": [{"name": "件数", "values": list(status_dist.values())}]
+            }
         )
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
 
-    def _create_application_trend_chart(self, history):
+    def _application_trend_chart_job(self, history):
         """
-        Create an application trend chart as base64 encoded image
+        Build the application trend chart (spec and data)
         
         Args:
             history (dict): Application history
             
         Returns:
-            str: Base64 encoded image
-        """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # Extract yearly data
-        years = [data["year"] for data in history["yearly_data"]]
-        counts = [data["count"] for data in history["yearly_data"]]
-        
-        # Create bar chart
-        ax.bar(years, counts, color='#2196F3')
-        
-        # Add labels and title
-        ax.set_xlabel('年', fontsize=12)
-        ax.set_ylabel('出願数', fontsize=12)
-        ax.set_title('年別出願数推移', fontsize=14)
-        
-        # Add grid
-        ax.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+            tuple: (spec, data) for the chart renderer
+        """
+        return (
+            {
+                "type": "bar",
+                "title": "年別出願数推移",
+                "xlabel": "年",
+                "ylabel": "出願数",
+                "figsize": [12, 6],
+                "colors": "#2196F3",
+                "grid": {"axis": "y", "linestyle": "--", "alpha": 0.7},
+                "tight_layout": False,
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": [data["year"] for data in history["yearly_data"]],
+                "series": [{"name": "出願数", "values": [data["count"] for data in history["yearly_data"]]}]
+            }
+        )
 
-    def _create_tech_distribution_chart(self, tech_dist):
+    def _tech_distribution_chart_job(self, tech_dist):
         """
-        Create a technical distribution chart as base64 encoded image
+        Build the technical distribution chart (spec and data)
         
         Args:
             tech_dist (list): Technical field distribution
             
         Returns:
-            str: Base64 encoded image
-        """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(12, 8))
-        
-        # Extract data
-        codes = [f"{item['ipc_code']}" for item in tech_dist]
-        counts = [item["count"] for item in tech_dist]
-        
-        # Sort by count
-        sorted_indices = np.argsort(counts)
-        codes = [codes[i] for i in sorted_indices]
-        counts = [counts[i] for i in sorted_indices]
-        
-        # Create horizontal bar chart
-        y_pos = np.arange(len(codes))
-        ax.barh(y_pos, counts, color='#4CAF50')
-        
-        # Add labels
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(codes)
-        ax.set_xlabel('特許数', fontsize=12)
-        ax.set_title('技術分野別出願分布', fontsize=14)
-        
-        # Add count values at the end of each bar
-        for i, count in enumerate(counts):
-            ax.text(count + 0.5, i, str(count), va='center')
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+            tuple: (spec, data) for the chart renderer
+        """
+        return (
+            {
+                "type": "barh",
+                "title": "技術分野別出願分布",
+                "xlabel": "特許数",
+                "figsize": [12, 8],
+                "colors": "#4CAF50",
+                "sort": "ascending",
+                "value_labels": {"format": "{:.0f}"},
+                "tight_layout": False,
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": [f"{item['ipc_code']}" for item in tech_dist],
+                "series": [{"name": "特許数", "values": [item["count"] for item in tech_dist]}]
+            }
+        )
 
-    def _create_industry_comparison_chart(self, comparison):
+    def _industry_comparison_chart_job(self, comparison):
         """
-        Create an industry comparison chart as base64 encoded image
+        Build the industry comparison chart (spec and data)
         
         Args:
             comparison (dict): Industry comparison data
             
         Returns:
-            str: Base64 encoded image
-        """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Extract data
-        metrics = ['特許査定率', '平均オフィスアクション数', '平均処理時間 (月)']
-        
-        industry_values = [
-            comparison["industry_averages"]["grant_rate"] * 100,
-            comparison["industry_averages"]["avg_office_actions"],
-            comparison["industry_averages"]["avg_processing_time_days"] / 30  # Convert days to months
-        ]
-        
-        applicant_values = [
-            comparison["applicant_values"]["grant_rate"] * 100,
-            comparison["applicant_values"]["avg_office_actions"],
-            comparison["applicant_values"]["avg_processing_time_days"] / 30  # Convert days to months
-        ]
-        
-        # Set up bar chart
-        x = np.arange(len(metrics))
-        width = 0.35
-        
-        # Create bars
-        ax.bar(x - width/2, industry_values, width, label='業界平均', color='#2196F3')
-        ax.bar(x + width/2, applicant_values, width, label='対象出願人', color='#FF9800')
-        
-        # Add labels and title
-        ax.set_ylabel('値', fontsize=12)
-        ax.set_title('業界平均との比較', fontsize=14)
-        ax.set_xticks(x)
-        ax.set_xticklabels(metrics)
-        ax.legend()
-        
-        # Add value labels on top of bars
-        def add_labels(rects):
-            for rect in rects:
-                height = rect.get_height()
-                ax.annotate(
-                    f'{height:.1f}',
-                    xy=(rect.get_x() + rect.get_width() / 2, height),
-                    xytext=(0, 3),
-                    textcoords="offset points",
-                    ha='center', va='bottom'
-                )
-        
-        add_labels(ax.patches[:len(metrics)])
-        add_labels(ax.patches[len(metrics):])
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+            tuple: (spec, data) for the chart renderer
+        """
+        industry = comparison["industry_averages"]
+        applicant = comparison["applicant_values"]
+        
+        return (
+            {
+                "type": "bar",
+                "title": "業界平均との比較",
+                "ylabel": "値",
+                "figsize": [10, 6],
+                "bar_width": 0.35,
+                "legend": {},
+                "value_labels": {"format": "{:.1f}"},
+                "tight_layout": False,
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": ['特許査定率', '平均オフィスアクション数', '平均処理時間 (月)'],
+                "series": [
+                    {
+                        "name": "業界平均",
+                        "color": "#2196F3",
+                        "values": [
+                            industry["grant_rate"] * 100,
+                            industry["avg_office_actions"],
+                            industry["avg_processing_time_days"] / 30  # Convert days to months
+                        ]
+                    },
+                    {
+                        "name": "対象出願人",
+                        "color": "#FF9800",
+                        "values": [
+                            applicant["grant_rate"] * 100,
+                            applicant["avg_office_actions"],
+                            applicant["avg_processing_time_days"] / 30  # Convert days to months
+                        ]
+                    }
+                ]
+            }
+        )
 
-    def _create_comparative_assessment_chart(self, applicant, competitors):
+    def _comparative_assessment_chart_job(self, applicant, competitors):
         """
-        Create a comparative assessment chart as base64 encoded image
+        Build the comparative assessment chart (spec and data)
         
         Args:
             applicant (dict): Applicant data
             competitors (list): Competitor data
             
         Returns:
-            str: Base64 encoded image
+            tuple: (spec, data) for the chart renderer
         """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # Extract data
         names = [applicant["name"]] + [comp["name"] for comp in competitors]
         grant_rates = [self._generate_assessment_statistics(applicant)["grant_rate"] * 100]
+        grant_rates += [comp["assessment_stats"]["grant_rate"] * 100 for comp in competitors]
+        
+        return (
+            {
+                "type": "bar",
+                "title": "査定率の比較",
+                "xlabel": "出願人",
+                "ylabel": "特許査定率 (%)",
+                "figsize": [12, 6],
+                "colors": ['#4CAF50'] + ['#2196F3'] * len(competitors),
+                "xtick_rotation": 45,
+                "xtick_ha": "right",
+                "value_labels": {"format": "{:.1f}%"},
+                "grid": {"axis": "y", "linestyle": "--", "alpha": 0.7},
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": names,
+                "series": [{"name": "特許査定率", "values": grant_rates}]
+            }
+        )
         
-        for comp in competitors:
-            grant_rates.append(comp["assessment_stats"]["grant_rate"] * 100)
-        
-        # Create bar chart
-        colors = ['#4CAF50'] + ['#2196F3'] * len(competitors)
-        x = np.arange(len(names))
-        ax.bar(x, grant_rates, color=colors)
-        
-        # Add labels and title
-        ax.set_xlabel('出願人', fontsize=12)
-        ax.set_ylabel('特許査定率 (%)', fontsize=12)
-        ax.set_title('査定率の比較', fontsize=14)
-        ax.set_xticks(x)
-        ax.set_xticklabels(names, rotation=45, ha='right')
-        
-        # Add value labels on top of bars
-        for i, v in enumerate(grant_rates):
-            ax.text(i, v + 1, f'{v:.1f}%', ha='center')
-        
-        # Add grid
-        ax.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
-        
-    def _create_comparative_field_chart(self, applicant, competitors):
+    def _comparative_field_chart_job(self, applicant, competitors):
         """
-        Create a comparative field distribution chart as base64 encoded image
+        Build the comparative field distribution chart (spec and data)
         
         Args:
             applicant (dict): Applicant data
             competitors (list): Competitor data
             
         Returns:
-            str: Base64 encoded image
+            tuple: (spec, data) for the chart renderer
         """
-        # Create a figure and axis
-        fig, ax = plt.subplots(figsize=(14, 8))
-        
         # Generate technical distribution for the applicant
         applicant_tech = self._generate_technical_distribution(applicant)
         
         # Get top 5 tech fields from applicant
-        top_fields = [item["ipc_code"] for item in applicant_tech[:5]]
-        
-        # Extract data for chart
-        field_labels = top_fields
+        field_labels = [item["ipc_code"] for item in applicant_tech[:5]]
         company_names = [applicant["name"]] + [comp["name"] for comp in competitors]
         
-        # Create data structure for grouped bar chart
-        data = {}
-        for field in field_labels:
-            data[field] = []
-            
-            # Add applicant data
-            found = False
-            for item in applicant_tech:
-                if item["ipc_code"] == field:
-                    data[field].append(item["percentage"])
-                    found = True
-                    break
-            if not found:
-                data[field].append(0)
-            
-            # Add competitors data
-            for comp in competitors:
-                found = False
-                for item in comp["tech_distribution"]:
-                    if item["ipc_code"] == field:
-                        data[field].append(item["percentage"])
-                        found = True
-                        break
-                if not found:
-                    data[field].append(0)
-        
-        # Set up grouped bar chart
-        x = np.arange(len(company_names))
-        width = 0.15
-        num_fields = len(field_labels)
-        offsets = np.linspace(-(width * (num_fields-1))/2, (width * (num_fields-1))/2, num_fields)
-        
-        # Create bars for each field
-        for i, field in enumerate(field_labels):
-            ax.bar(x + offsets[i], data[field], width, label=field)
-        
-        # Add labels and title
-        ax.set_xlabel('企業', fontsize=12)
-        ax.set_ylabel('技術分野の割合 (%)', fontsize=12)
-        ax.set_title('主要技術分野の企業間比較', fontsize=14)
-        ax.set_xticks(x)
-        ax.set_xticklabels(company_names, rotation=45, ha='right')
-        ax.legend(title="技術分野 (IPC)")
-        
-        # Add grid
-        ax.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        
-        # Save to an in-memory bytes buffer
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Encode the image to base64
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+        # Field share per company, 0 when the company has no patents in the field
+        distributions = [applicant_tech] + [comp["tech_distribution"] for comp in competitors]
+        percentages = [
+            {item["ipc_code"]: item["percentage"] for item in reversed(distribution)}
+            for distribution in distributions
+        ]
+        
+        return (
+            {
+                "type": "bar",
+                "title": "主要技術分野の企業間比較",
+                "xlabel": "企業",
+                "ylabel": "技術分野の割合 (%)",
+                "figsize": [14, 8],
+                "bar_width": 0.15,
+                "xtick_rotation": 45,
+                "xtick_ha": "right",
+                "legend": {"title": "技術分野 (IPC)"},
+                "grid": {"axis": "y", "linestyle": "--", "alpha": 0.7},
+                "bbox_inches": "tight"
+            },
+            {
+                "labels": company_names,
+                "series": [
+                    {"name": field, "values": [shares.get(field, 0) for shares in percentages]}
+                    for field in field_labels
+                ]
+            }
+        )
         
     def _format_markdown_report(self, summary, visualizations):
         """
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Microbenchmarks for the patent system data access layer.
+
+Times PatentDBManager.search_patents, get_top_applicants and get_patents_by_year
+against a SQLite database, once with sessions from the shared pooled engine
+(data_access) and once with an unpooled engine that opens a new connection per
+session (how the modules worked before the data access layer).
+
+Usage:
+    python -m app.patent_system.benchmark_data_access
+    python -m app.patent_system.benchmark_data_access --patents 20000 --repeat 50
+    python -m app.patent_system.benchmark_data_access --db /path/to/patents.db
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the patent system data access layer")
+    parser.add_argument("--db", help="Existing SQLite database to benchmark (default: synthetic data)")
+    parser.add_argument("--patents", type=int, default=5000, help="Synthetic patents to generate (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed runs per benchmark (default: 30)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    # models.py binds its engine at import time, so point it at the benchmark database first
+    BENCH_DB_PATH = ARGS.db or os.path.join(tempfile.mkdtemp(prefix="patent_bench_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DB_PATH}"
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.patent_system import data_access
+from app.patent_system.db_manager import PatentDBManager
+from app.patent_system.models import Base, Patent, Applicant, Inventor, IPCClassification, SessionLocal
+
+APPLICANTS = [
+    "トヨタ自動車株式会社", "ソニーグループ株式会社", "パナソニックホールディングス株式会社",
+    "株式会社日立製作所", "キヤノン株式会社", "富士通株式会社", "日本電気株式会社",
+    "三菱電機株式会社", "株式会社デンソー", "本田技研工業株式会社",
+]
+TITLE_WORDS = ["電池", "制御装置", "画像処理", "通信方法", "半導体", "車両", "センサ", "学習モデル", "表示装置", "燃料電池"]
+IPC_CODES = ["H01M 10/052", "G06T 7/00", "H04W 72/04", "B60L 58/12", "G06N 20/00", "H01L 21/02", "G01S 17/89"]
+
+
+def generate_data(url: str, count: int, seed: int):
+    """Fill the benchmark database with synthetic patents through the writer connection"""
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=data_access.get_engine(url, writer=True))
+    start_date = datetime(2000, 1, 1)
+
+    with data_access.session_scope(url, writer=True) as session:
+        patents, applicants, inventors, classifications = [], [], [], []
+        for i in range(1, count + 1):
+            title = f"{rng.choice(TITLE_WORDS)}及び{rng.choice(TITLE_WORDS)}"
+            patents.append({
+                "id": i,
+                "application_number": f"2{i:09d}",
+                "application_date": start_date + timedelta(days=rng.randrange(9000)),
+                "publication_number": f"JP{i:010d}A",
+                "title": title,
+                "abstract": f"{title}に関する技術。" * 5,
+            })
+            for name in rng.sample(APPLICANTS, rng.randint(1, 2)):
+                applicants.append({"patent_id": i, "name": name})
+            inventors.append({"patent_id": i, "name": f"発明者{rng.randrange(count // 3 + 1)}"})
+            classifications.append({"patent_id": i, "code": rng.choice(IPC_CODES)})
+        session.execute(insert(Patent), patents)
+        session.execute(insert(Applicant), applicants)
+        session.execute(insert(Inventor), inventors)
+        session.execute(insert(IPCClassification), classifications)
+
+
+BENCHMARKS: Dict[str, Callable[[PatentDBManager], Any]] = {
+    "search_patents(title)": lambda db: db.search_patents({"title": "電池"}, limit=20),
+    "search_patents(applicant, ipc)": lambda db: db.search_patents(
+        {"applicant": "トヨタ", "ipc_code": "H01M"}, limit=20),
+    "get_top_applicants": lambda db: db.get_top_applicants(limit=10),
+    "get_patents_by_year": lambda db: db.get_patents_by_year(),
+}
+
+
+def run_benchmark(session_factory, func, repeat: int) -> List[float]:
+    """Time func with a fresh session per run (as request handlers do), in milliseconds"""
+    timings = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        session = session_factory()
+        try:
+            func(PatentDBManager(db_session=session))
+        finally:
+            session.close()
+        timings.append((time.perf_counter() - started) * 1000)
+    # The first run warms caches and is not counted
+    return timings[1:]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def main():
+    url = os.environ["DATABASE_URL"]
+    if not ARGS.db:
+        print(f"Generating {ARGS.patents} synthetic patents in {BENCH_DB_PATH} ...")
+        generate_data(url, ARGS.patents, ARGS.seed)
+
+    unpooled = sessionmaker(autocommit=False, autoflush=False,
+                            bind=create_engine(url, poolclass=NullPool))
+    variants = {"pooled": SessionLocal, "unpooled": unpooled}
+
+    print(f"\n{'benchmark':<34}{'variant':<10}{'min ms':>10}{'median ms':>12}{'p95 ms':>10}")
+    print("-" * 76)
+    for name, func in BENCHMARKS.items():
+        for variant, factory in variants.items():
+            stats = summarize(run_benchmark(factory, func, ARGS.repeat))
+            print(f"{name:<34}{variant:<10}{stats['min']:>10.2f}{stats['median']:>12.2f}{stats['p95']:>10.2f}")
+
+    print("\nSlowest statements on the pooled engine (data_access.statement_stats):")
+    for entry in data_access.statement_stats(limit=5):
+        print(f"  {entry['count']:>5}x avg {entry['avg_ms']:>8.3f} ms  max {entry['max_ms']:>8.3f} ms  {entry['sql'][:90]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Page latency benchmark for the SQL web interface.
+
+Times GET / and POST /query through Flask's test client against a synthetic
+patent database, for the current implementation (cached schema, compiled
+template, paged cursor reads) and for the previous one (schema rebuilt with one
+PRAGMA per table, template parsed per request, results loaded through a pandas
+DataFrame with LIMIT 1000 appended), which is registered under /previous.
+
+Usage:
+    python -m app.patent_system.benchmark_sql_web_interface
+    python -m app.patent_system.benchmark_sql_web_interface --patents 20000 --repeat 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from typing import Callable, Dict, List
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL web interface pages")
+    parser.add_argument("--patents", type=int, default=5000, help="Synthetic patents to generate (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed requests per benchmark (default: 20)")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    # data_access and models read the database location at import time
+    BENCH_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="sql_web_bench_"), "bench.db")
+    os.environ["DATABASE_PATH"] = BENCH_DB_PATH
+    os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DB_PATH}"
+
+import pandas as pd
+from flask import render_template_string, request
+
+from app.patent_system import sql_web_interface as web
+from app.patent_system.benchmark_data_access import generate_data
+from app.patent_system.data_access import execute_sql
+
+
+def previous_get_db_schemas():
+    """get_db_schemas before the schema cache: one PRAGMA table_info per table"""
+    _, tables = execute_sql("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+    schemas = {}
+    for table in tables:
+        _, columns = execute_sql(f"PRAGMA table_info({table[0]})")
+        schemas[table[0]] = f"CREATE TABLE {table[0]} (\n" + ",\n".join(
+            f"    {col[1]} {col[2]} {'NOT NULL' if col[3] else ''} {'PRIMARY KEY' if col[5] else ''}"
+            for col in columns) + "\n);"
+    return schemas
+
+
+def previous_render(**context):
+    values = dict(query="", results=None, error=None, execution_time=0, columns=[], row_count=0,
+                  page=1, first_row=1, has_more=False, next_page=None, row_limit_reached=False,
+                  max_rows=web.SQL_WEB_MAX_ROWS, schemas=previous_get_db_schemas())
+    values.update(context)
+    return render_template_string(web.HTML_TEMPLATE, **values)
+
+
+@web.app.route('/previous')
+def previous_index():
+    return previous_render()
+
+
+@web.app.route('/previous/query', methods=['POST'])
+def previous_query():
+    query_text = request.form.get('query', '')
+    if "LIMIT" not in query_text.upper():
+        query_text = f"{query_text} LIMIT 1000"
+    columns, rows = execute_sql(query_text)
+    df = pd.DataFrame(rows, columns=columns)
+    results = df.values.tolist()
+    return previous_render(query=query_text, results=results, columns=df.columns.tolist(),
+                           row_count=len(results))
+
+
+QUERIES: Dict[str, str] = {
+    "all patents": "SELECT * FROM patents",
+    "applicant counts": "SELECT name, COUNT(*) AS n FROM applicants GROUP BY name ORDER BY n DESC",
+}
+
+
+def time_requests(func: Callable[[], object], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        response = func()
+        assert response.status_code == 200, response.status_code
+        timings.append((time.perf_counter() - started) * 1000)
+    # The first request warms caches and is not counted
+    return timings[1:]
+
+
+def main():
+    print(f"Generating {ARGS.patents} synthetic patents in {BENCH_DB_PATH} ...")
+    generate_data(os.environ["DATABASE_URL"], ARGS.patents, 42)
+    client = web.app.test_client()
+
+    benchmarks = {"GET /": ("/", None)}
+    for name, sql in QUERIES.items():
+        benchmarks[f"POST /query {name}"] = ("/query", {"query": sql})
+    benchmarks["POST /query all patents, page 5"] = ("/query", {"query": QUERIES["all patents"], "page": "5"})
+
+    print(f"\n{'page':<38}{'variant':<10}{'median ms':>12}{'p95 ms':>10}{'KiB':>8}")
+    print("-" * 78)
+    for name, (path, form) in benchmarks.items():
+        variants = {"current": path}
+        if "page 5" not in name:
+            variants["previous"] = "/previous" + ("" if path == "/" else path)
+        for variant, url in variants.items():
+            call = (lambda: client.get(url)) if form is None else (lambda: client.post(url, data=form))
+            timings = sorted(time_requests(call, ARGS.repeat))
+            size = len(call().data) / 1024
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<38}{variant:<10}{statistics.median(timings):>12.2f}{p95:>10.2f}{size:>8.0f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from app.patent_system.models import SessionLocal, Patent
+from app.patent_system.models import SessionLocal, Patent, patent_load_options
 
 def check_patent_data():
     """Check if patent data was successfully loaded in the database"""
@@ -11,8 +11,8 @@ def check_patent_data():
         patent_count = db.query(Patent).count()
         print(f"データベース内の特許数: {patent_count}")
         
-        # Get all patents
-        patents = db.query(Patent).all()
+        # Get all patents with their related data in one query per relationship
+        patents = db.query(Patent).options(*patent_load_options("full")).all()
         
         # Display information about each patent
         print("\n--- 特許データの詳細 ---")
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared data access layer for the patent system databases.
+
+All modules get their engines, sessions and raw connections from here instead of
+creating them ad hoc:
+
+- one pooled engine per database URL (thread-safe QueuePool);
+- SQLite connections are opened in WAL mode with a busy timeout and a per-connection
+  prepared statement cache, so readers are not blocked by the ingest writer;
+- a dedicated single-connection writer engine per SQLite database for ingest,
+  which serializes writers instead of letting them fail with "database is locked";
+- PRAGMA optimize is run when a pooled SQLite connection is closed;
+- every statement is timed; listeners registered with add_statement_listener
+  receive (sql, duration_ms, database) and aggregated latencies are available
+  from statement_stats().
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Default SQLite database of the patent system
+DATABASE_PATH = os.environ.get(
+    "DATABASE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "patents.db")
+)
+SQLITE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# Pooled connections per engine (plus overflow) and the prepared statement cache per connection
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get("DB_POOL_MAX_OVERFLOW", "10"))
+SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+# Statements slower than this are logged at WARNING level
+SLOW_STATEMENT_MS = float(os.environ.get("SLOW_STATEMENT_MS", "500"))
+# Distinct statements kept in the latency statistics
+STATEMENT_STATS_MAX_ENTRIES = 1000
+
+_engines: Dict[Tuple[str, bool], Engine] = {}
+_sessionmakers: Dict[Tuple[str, bool], sessionmaker] = {}
+_engines_lock = threading.Lock()
+
+_statement_listeners: List[Callable[[str, float, str], None]] = []
+_statement_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _sqlite_file(url: str) -> Optional[str]:
+    """Database file of a sqlite URL (None for in-memory databases)"""
+    path = url.split("///", 1)[1] if "///" in url else ""
+    return path if path and path != ":memory:" else None
+
+
+# -- instrumentation ---------------------------------------------------------
+
+def add_statement_listener(listener: Callable[[str, float, str], None]):
+    """
+    Register a callback invoked after every statement
+
+    Args:
+        listener: Callable receiving (sql, duration_ms, database_url)
+    """
+    _statement_listeners.append(listener)
+
+
+def remove_statement_listener(listener: Callable[[str, float, str], None]):
+    """Unregister a callback added with add_statement_listener"""
+    if listener in _statement_listeners:
+        _statement_listeners.remove(listener)
+
+
+def statement_stats(limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Aggregated statement latencies, slowest total time first
+
+    Args:
+        limit: Maximum number of statements to return
+
+    Returns:
+        List of dicts with sql, count, total_ms, avg_ms and max_ms
+    """
+    with _stats_lock:
+        stats = [
+            {**entry, "sql": sql, "avg_ms": round(entry["total_ms"] / entry["count"], 3)}
+            for sql, entry in _statement_stats.items()
+        ]
+    stats.sort(key=lambda entry: entry["total_ms"], reverse=True)
+    return stats[:limit]
+
+
+def reset_statement_stats():
+    """Clear the aggregated statement latencies"""
+    with _stats_lock:
+        _statement_stats.clear()
+
+
+def _record_statement(sql: str, duration_ms: float, database: str):
+    key = " ".join(sql.split())
+    with _stats_lock:
+        entry = _statement_stats.get(key)
+        if entry is None:
+            if len(_statement_stats) >= STATEMENT_STATS_MAX_ENTRIES:
+                return
+            entry = _statement_stats[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+
+    if duration_ms >= SLOW_STATEMENT_MS:
+        logger.warning(f"Slow statement ({duration_ms:.1f} ms) on {database}: {key[:200]}")
+    for listener in list(_statement_listeners):
+        try:
+            listener(sql, duration_ms, database)
+        except Exception as e:
+            logger.warning(f"Statement listener failed: {e}")
+
+
+def _instrument(engine: Engine):
+    """Time every cursor execution of the engine"""
+    database = engine.url.render_as_string(hide_password=True)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["statement_start"].pop()
+        _record_statement(statement, (time.perf_counter() - started) * 1000, database)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("statement_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# -- engines -----------------------------------------------------------------
+
+def _configure_sqlite(engine: Engine, writer: bool):
+    """Connection-level SQLite settings (WAL, busy timeout, optimize on close)"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy issue BEGIN itself so the writer can use BEGIN IMMEDIATE
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        # The writer takes the write lock up front instead of upgrading mid-transaction
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if writer else "BEGIN")
+
+    @event.listens_for(engine.pool, "close")
+    def _on_close(dbapi_connection, connection_record):
+        try:
+            dbapi_connection.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.debug(f"PRAGMA optimize failed: {e}")
+
+
+def get_engine(url: Optional[str] = None, writer: bool = False) -> Engine:
+    """
+    Get the shared pooled engine for a database URL
+
+    Args:
+        url: SQLAlchemy database URL (default: the patent system SQLite database)
+        writer: Return the dedicated single-connection writer engine (SQLite only)
+
+    Returns:
+        Engine shared by all callers in this process
+    """
+    url = url or SQLITE_URL
+    writer = writer and _is_sqlite(url)
+    key = (url, writer)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+
+        if _is_sqlite(url):
+            db_file = _sqlite_file(url)
+            if db_file and os.path.dirname(db_file):
+                os.makedirs(os.path.dirname(db_file), exist_ok=True)
+            engine = create_engine(
+                url,
+                poolclass=QueuePool,
+                pool_size=1 if writer else DB_POOL_SIZE,
+                max_overflow=0 if writer else DB_POOL_MAX_OVERFLOW,
+                pool_timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                connect_args={
+                    "check_same_thread": False,
+                    "cached_statements": SQLITE_STATEMENT_CACHE_SIZE,
+                    "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+                },
+            )
+            _configure_sqlite(engine, writer)
+        else:
+            engine = create_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_POOL_MAX_OVERFLOW,
+                pool_pre_ping=True,
+            )
+        _instrument(engine)
+        _engines[key] = engine
+        logger.info(f"Created {'writer' if writer else 'pooled'} engine for "
+                    f"{engine.url.render_as_string(hide_password=True)}")
+        return engine
+
+
+def get_sessionmaker(url: Optional[str] = None, writer: bool = False) -> sessionmaker:
+    """Get the shared session factory bound to get_engine(url, writer)"""
+    url = url or SQLITE_URL
+    key = (url, writer and _is_sqlite(url))
+    factory = _sessionmakers.get(key)
+    if factory is None:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine(url, writer))
+        _sessionmakers[key] = factory
+    return factory
+
+
+@contextmanager
+def session_scope(url: Optional[str] = None, writer: bool = False) -> Iterator[Session]:
+    """
+    Session that is committed on success and rolled back on error
+
+    Args:
+        url: SQLAlchemy database URL (default: the patent system SQLite database)
+        writer: Use the dedicated writer connection (for ingest)
+    """
+    session = get_sessionmaker(url, writer)()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def execute_sql(sql: str, params: Optional[Sequence[Any]] = None, url: Optional[str] = None,
+                max_rows: Optional[int] = None, offset: int = 0) -> Tuple[List[str], List[tuple]]:
+    """
+    Execute raw SQL on a pooled connection
+
+    The SQL is passed to the driver as-is (no bind parameter parsing), so
+    user-entered queries behave exactly as in the sqlite3 shell.
+
+    Args:
+        sql: SQL statement
+        params: Positional parameters for "?" placeholders
+        url: SQLAlchemy database URL (default: the patent system SQLite database)
+        max_rows: Fetch at most this many rows
+        offset: Skip this many rows on the cursor first (the SQL is not rewritten)
+
+    Returns:
+        Tuple of column names and rows
+    """
+    with get_engine(url).connect() as conn:
+        result = conn.exec_driver_sql(sql, tuple(params) if params else ())
+        if not result.returns_rows:
+            conn.commit()
+            return [], []
+        columns = list(result.keys())
+        while offset > 0:
+            skipped = result.fetchmany(min(offset, 1000))
+            if not skipped:
+                break
+            offset -= len(skipped)
+        rows = result.fetchmany(max_rows) if max_rows else result.fetchall()
+        rows = [tuple(row) for row in rows]
+        result.close()
+        return columns, rows
+
+
+def dispose_engines():
+    """Close all pooled connections (runs PRAGMA optimize on SQLite connections)"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _sessionmakers.clear()
+
+
+atexit.register(dispose_engines)
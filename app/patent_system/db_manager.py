@@ -10,7 +10,7 @@ from sqlalchemy.sql import text
 
 from app.patent_system.models import (
     Patent, Applicant, Inventor, IPCClassification,
-    Claim, Description, EmbeddingCache, get_db
+    Claim, Description, EmbeddingCache, get_db, patent_load_options
 )
 
 # Configure logging
@@ -292,7 +292,8 @@ class PatentDBManager:
         
         return None
     
-    def search_patents(self, query: Dict[str, Any], limit: int = 20, offset: int = 0) -> List[Patent]:
+    def search_patents(self, query: Dict[str, Any], limit: int = 20, offset: int = 0,
+                       profile: str = "summary") -> List[Patent]:
         """
         Search patents by various criteria
         
@@ -300,11 +301,13 @@ class PatentDBManager:
             query: Dictionary of search parameters
             limit: Maximum number of results
             offset: Pagination offset
+            profile: Relationship loading profile (see models.PATENT_LOAD_PROFILES);
+                use "full" when the results are serialized with to_dict()
             
         Returns:
             List of patent objects
         """
-        q = self.db.query(Patent)
+        q = self.db.query(Patent).options(*patent_load_options(profile))
         
         # Apply filters based on query parameters
         if "application_number" in query:
@@ -351,9 +354,11 @@ class PatentDBManager:
         
         return q.all()
     
-    def get_patent_by_application_number(self, application_number: str) -> Optional[Patent]:
-        """Get patent by application number"""
-        return self.db.query(Patent).filter_by(application_number=application_number).first()
+    def get_patent_by_application_number(self, application_number: str, profile: str = "full") -> Optional[Patent]:
+        """Get patent by application number with its related data eager-loaded"""
+        return self.db.query(Patent).options(*patent_load_options(profile)).filter_by(
+            application_number=application_number
+        ).first()
     
     def get_patents_count(self) -> int:
         """Get total count of patents in database"""
@@ -4,10 +4,11 @@ from typing import Dict, List, Any, Optional, Union
 from datetime import datetime
 from sqlalchemy.orm import Session
 import sqlalchemy.exc
+from sqlalchemy import text
 
 from app.patent_system.models_sqlite import (
-    Base, engine, SessionLocal, Patent, Applicant, Inventor, 
-    IPCClassification, Claim, Description, ensure_db_exists
+    Base, engine, SessionLocal, WriterSessionLocal, Patent, Applicant, Inventor, 
+    IPCClassification, Claim, Description, ensure_db_exists, patent_load_options
 )
 
 # Configure logging
@@ -21,14 +22,20 @@ logger = logging.getLogger(__name__)
 class SQLiteDBManager:
     """Manager for SQLite database operations"""
     
-    def __init__(self):
-        """Initialize the database manager"""
+    def __init__(self, writer: bool = False):
+        """
+        Initialize the database manager
+        
+        Args:
+            writer: Use the dedicated writer connection (for ingest via store_patent(s_batch))
+        """
         self.db_path = ensure_db_exists()
+        self.writer = writer
         self.db = None
     
     def __enter__(self):
         """Context manager entry"""
-        self.db = SessionLocal()
+        self.db = WriterSessionLocal() if self.writer else SessionLocal()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -237,37 +244,40 @@ class SQLiteDBManager:
         logger.info(f"Successfully stored {success_count}/{len(patents_data)} patents")
         return success_count
     
-    def get_patent_by_application_number(self, application_number: str) -> Optional[Patent]:
+    def get_patent_by_application_number(self, application_number: str, profile: str = "full") -> Optional[Patent]:
         """
         Get a patent by application number
         
         Args:
             application_number: Patent application number
+            profile: Relationship loading profile (see models_sqlite.PATENT_LOAD_PROFILES)
             
         Returns:
             Patent object if found, None otherwise
         """
         try:
-            return self.db.query(Patent).filter(
+            return self.db.query(Patent).options(*patent_load_options(profile)).filter(
                 Patent.application_number == application_number
             ).first()
         except Exception as e:
             logger.error(f"Error getting patent by application number: {str(e)}")
             return None
     
-    def get_patents_by_applicant(self, applicant_name: str, limit: int = 100) -> List[Patent]:
+    def get_patents_by_applicant(self, applicant_name: str, limit: int = 100,
+                                 profile: str = "summary") -> List[Patent]:
         """
         Get patents by applicant name
         
         Args:
             applicant_name: Name of the applicant
             limit: Maximum number of patents to retrieve
+            profile: Relationship loading profile (see models_sqlite.PATENT_LOAD_PROFILES)
             
         Returns:
             List of Patent objects
         """
         try:
-            return self.db.query(Patent).join(
+            return self.db.query(Patent).options(*patent_load_options(profile)).join(
                 Applicant
             ).filter(
                 Applicant.name.like(f"%{applicant_name}%")
@@ -276,26 +286,27 @@ class SQLiteDBManager:
             logger.error(f"Error getting patents by applicant: {str(e)}")
             return []
     
-    def search_patents(self, query: str, limit: int = 100) -> List[Patent]:
+    def search_patents(self, query: str, limit: int = 100, profile: str = "summary") -> List[Patent]:
         """
         Search patents by title, abstract, or applicant name
         
         Args:
             query: Search query string
             limit: Maximum number of patents to retrieve
+            profile: Relationship loading profile (see models_sqlite.PATENT_LOAD_PROFILES)
             
         Returns:
             List of Patent objects
         """
         try:
             # Search in title, abstract, applicant name
-            results = self.db.query(Patent).filter(
+            results = self.db.query(Patent).options(*patent_load_options(profile)).filter(
                 Patent.title.like(f"%{query}%") | 
                 Patent.abstract.like(f"%{query}%")
             ).limit(limit).all()
             
             # Also search in applicant names
-            applicant_results = self.db.query(Patent).join(
+            applicant_results = self.db.query(Patent).options(*patent_load_options(profile)).join(
                 Applicant
             ).filter(
                 Applicant.name.like(f"%{query}%")
@@ -311,22 +322,55 @@ class SQLiteDBManager:
             logger.error(f"Error searching patents: {str(e)}")
             return []
     
-    def get_all_patents(self, limit: int = 1000) -> List[Patent]:
+    def get_all_patents(self, limit: int = 1000, profile: str = "summary") -> List[Patent]:
         """
         Get all patents in the database
         
         Args:
             limit: Maximum number of patents to retrieve
+            profile: Relationship loading profile (see models_sqlite.PATENT_LOAD_PROFILES)
             
         Returns:
             List of Patent objects
         """
         try:
-            return self.db.query(Patent).limit(limit).all()
+            return self.db.query(Patent).options(*patent_load_options(profile)).limit(limit).all()
         except Exception as e:
             logger.error(f"Error getting all patents: {str(e)}")
             return []
     
+    def get_ipc_trends_by_applicant(self, applicant_name: str) -> List[Dict[str, Any]]:
+        """
+        Count IPC main classes (first 3 characters) per application year for an applicant
+        
+        The aggregation runs in SQLite, so it is a single query regardless of the
+        number of patents instead of loading every patent and its classifications.
+        
+        Args:
+            applicant_name: Name (or part of the name) of the applicant
+            
+        Returns:
+            List of dicts with year, ipc_class and count, ordered by year and class
+        """
+        try:
+            result = self.db.execute(text('''
+            SELECT strftime('%Y', p.application_date) AS year,
+                   substr(c.code, 1, 3) AS ipc_class,
+                   COUNT(*) AS count
+            FROM patents p
+            JOIN ipc_classifications c ON c.patent_id = p.id
+            WHERE p.application_date IS NOT NULL
+              AND p.id IN (SELECT patent_id FROM applicants WHERE name LIKE :pattern)
+            GROUP BY year, ipc_class
+            ORDER BY year, ipc_class
+            '''), {"pattern": f"%{applicant_name}%"})
+            trends = [dict(row) for row in result.mappings()]
+            logger.info(f"IPC trend aggregation for {applicant_name}: {len(trends)} year/class rows")
+            return trends
+        except Exception as e:
+            logger.error(f"Error aggregating IPC trends by applicant: {str(e)}")
+            return []
+    
     def count_patents(self) -> int:
         """
         Count the number of patents in the database
@@ -351,7 +395,7 @@ if __name__ == "__main__":
     # Test database operations
     init_sqlite_db()
     
-    with SQLiteDBManager() as db:
+    with SQLiteDBManager(writer=True) as db:
         # Check if database is empty
         count = db.count_patents()
         print(f"Current patent count: {count}")
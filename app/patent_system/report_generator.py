@@ -15,15 +15,12 @@ import os
 import io
 import base64
 from datetime import datetime
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from matplotlib.backends.backend_pdf import PdfPages
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
 
+from .chart_renderer import render_chart_base64, render_charts_base64
 from .mock_analyzer import MockPatentAnalyzer
 
 class PatentReportGenerator:
@@ -57,52 +54,40 @@ class PatentReportGenerator:
         Returns:
             str: Base64でエンコードされたグラフ画像
         """
+        return render_chart_base64(*self._classification_trend_chart_job(years, top_n))
+    
+    def _classification_trend_chart_job(self, years, top_n):
+        """特許分類別トレンドグラフの (spec, data)"""
         # 技術トレンドデータを取得
         trend_data = self.analyzer.analyze_technology_trends(years=years, top_n=top_n)
         
-        # データフレーム作成のための辞書
-        data_dict = {'年': [item['year'] for item in trend_data['yearly_trends']]}
-        
-        # 各技術分野のデータを追加
-        for tech in trend_data['top_technologies'][:top_n]:
-            data_dict[tech] = [item.get(tech, 0) for item in trend_data['yearly_trends']]
-        
-        # データフレーム作成
-        df = pd.DataFrame(data_dict)
-        
-        # グラフ作成
-        fig, ax = plt.subplots(figsize=(12, 8))
-        
-        # 棒グラフの幅を計算
-        width = 0.8 / top_n
-        
-        # 各分類ごとに棒グラフを描画
-        for i, tech in enumerate(trend_data['top_technologies'][:top_n]):
-            x = np.arange(len(df))
-            offset = (i - top_n/2 + 0.5) * width
-            ax.bar(x + offset, df[tech], width, label=f"{tech}: {trend_data['technology_descriptions'].get(tech, '')}")
-        
-        # グラフの装飾設定
-        ax.set_xlabel('年', fontsize=12)
-        ax.set_ylabel('出願数', fontsize=12)
-        ax.set_title('特許分類別の年次出願数推移', fontsize=14)
-        ax.set_xticks(np.arange(len(df)))
-        ax.set_xticklabels(df['年'])
-        ax.legend(loc='upper left', bbox_to_anchor=(0, -0.15), ncol=2)
-        ax.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        plt.tight_layout()
-        
-        # グラフを画像としてメモリに保存
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Base64エンコード
-        img_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+        technologies = trend_data['top_technologies'][:top_n]
+        yearly_trends = trend_data['yearly_trends']
+        
+        # 共有レンダラー用のグラフ定義（同一データの再描画はキャッシュから返す）
+        return (
+            {
+                "type": "bar",
+                "title": '特許分類別の年次出願数推移',
+                "xlabel": '年',
+                "ylabel": '出願数',
+                "figsize": [12, 8],
+                "bar_width": 0.8 / top_n,
+                "legend": {"loc": 'upper left', "bbox_to_anchor": [0, -0.15], "ncol": 2},
+                "grid": {"axis": 'y', "linestyle": '--', "alpha": 0.7},
+                "bbox_inches": 'tight'
+            },
+            {
+                "labels": [item['year'] for item in yearly_trends],
+                "series": [
+                    {
+                        "name": f"{tech}: {trend_data['technology_descriptions'].get(tech, '')}",
+                        "values": [item.get(tech, 0) for item in yearly_trends]
+                    }
+                    for tech in technologies
+                ]
+            }
+        )
     
     def generate_assessment_ratio_chart(self, applicant_name=None):
         """
@@ -114,6 +99,10 @@ class PatentReportGenerator:
         Returns:
             str: Base64でエンコードされたグラフ画像
         """
+        return render_chart_base64(*self._assessment_ratio_chart_job(applicant_name))
+    
+    def _assessment_ratio_chart_job(self, applicant_name=None):
+        """査定状況円グラフの (spec, data)"""
         # 審査結果データを取得
         if applicant_name:
             from .applicant_analyzer import ApplicantAnalyzer
@@ -138,72 +127,34 @@ class PatentReportGenerator:
             }
         
         # 円グラフの作成
-        fig, ax = plt.subplots(figsize=(10, 8))
-        
-        # データ抽出
         status_dist = stats["status_distribution"]
-        labels = ["特許査定", "拒絶査定", "審査中", "取下げ", "審判請求中"]
-        sizes = [
-            status_dist["granted"],
-            status_dist["rejected"],
-            status_dist["pending"],
-            status_dist["withdrawn"],
-            status_dist["appealed"]
-        ]
-        colors = ['#4CAF50', '#F44336', '#2196F3', '#FFC107', '#9C27B0']
-        explode = (0.05, 0.05, 0, 0, 0)  # 特許査定と拒絶査定を少し強調
-        
-        # 0のエントリーを除外
-        non_zero_sizes = []
-        non_zero_labels = []
-        non_zero_colors = []
-        non_zero_explode = []
-        
-        for i, size in enumerate(sizes):
-            if size > 0:
-                non_zero_sizes.append(size)
-                non_zero_labels.append(labels[i])
-                non_zero_colors.append(colors[i])
-                non_zero_explode.append(explode[i])
-        
-        # 円グラフ作成
-        wedges, texts, autotexts = ax.pie(
-            non_zero_sizes,
-            explode=non_zero_explode,
-            labels=None,
-            autopct='%1.1f%%',
-            startangle=90,
-            colors=non_zero_colors,
-            shadow=True
-        )
-        
-        # 凡例の追加
-        ax.legend(
-            wedges,
-            [f"{label} ({size}件)" for label, size in zip(non_zero_labels, non_zero_sizes)],
-            loc="center left",
-            bbox_to_anchor=(1, 0, 0.5, 1)
-        )
-        
-        # タイトル設定
         title = f"{applicant_name} - " if applicant_name else ""
-        ax.set_title(f'{title}特許査定状況の分布', fontsize=14)
         
-        # アスペクト比を等しく設定
-        ax.axis('equal')
-        
-        plt.tight_layout()
-        
-        # グラフを画像としてメモリに保存
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        
-        # Base64エンコード
-        img_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-        plt.close(fig)
-        
-        return img_base64
+        return (
+            {
+                "type": "pie",
+                "title": f'{title}特許査定状況の分布',
+                "figsize": [10, 8],
+                "colors": ['#4CAF50', '#F44336', '#2196F3', '#FFC107', '#9C27B0'],
+                "explode": [0.05, 0.05, 0, 0, 0],  # 特許査定と拒絶査定を少し強調
+                "shadow": True,
+                "legend_label_format": "{label} ({value}件)",
+                "bbox_inches": 'tight'
+            },
+            {
+                "labels": ["特許査定", "拒絶査定", "審査中", "取下げ", "審判請求中"],
+                "series": [{
+                    "name": "件数",
+                    "values": [
+                        status_dist["granted"],
+                        status_dist["rejected"],
+                        status_dist["pending"],
+                        status_dist["withdrawn"],
+                        status_dist["appealed"]
+                    ]
+                }]
+            }
+        )
     
     def generate_pdf_report(self, output_path, applicant_name=None, years=10, top_n=5):
         """
@@ -219,9 +170,11 @@ class PatentReportGenerator:
             bool: 生成に成功したかどうか
         """
         try:
-            # グラフ生成
-            trend_chart = self.generate_classification_trend_chart(years, top_n)
-            assessment_chart = self.generate_assessment_ratio_chart(applicant_name)
+            # グラフ生成（共有レンダラーのワーカープールでまとめて描画）
+            trend_chart, assessment_chart = render_charts_base64([
+                self._classification_trend_chart_job(years, top_n),
+                self._assessment_ratio_chart_job(applicant_name)
+            ])
             
             # レポート作成
             doc = SimpleDocTemplate(
@@ -380,13 +333,14 @@ class PatentReportGenerator:
             content.append(Paragraph(f"生成日: {datetime.now().strftime('%Y年%m月%d日')}", jp_normal_style))
             content.append(Spacer(1, 20))
             
-            # 各出願人の査定状況グラフを生成
-            for applicant in applicants:
+            # 各出願人の査定状況グラフを生成（まとめて描画）
+            assessment_charts = render_charts_base64([
+                self._assessment_ratio_chart_job(applicant) for applicant in applicants
+            ])
+            for applicant, assessment_chart in zip(applicants, assessment_charts):
                 content.append(Paragraph(f"{applicant}の特許査定状況", jp_heading2_style))
                 content.append(Spacer(1, 10))
                 
-                assessment_chart = self.generate_assessment_ratio_chart(applicant)
-                
                 assessment_img_data = base64.b64decode(assessment_chart)
                 assessment_img = Image(io.BytesIO(assessment_img_data))
                 assessment_img.drawHeight = 250
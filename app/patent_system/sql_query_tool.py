@@ -13,12 +13,13 @@ import pandas as pd
 import sys
 from datetime import datetime
 from tabulate import tabulate
+from sqlalchemy.exc import DBAPIError
 
-# Get database path from environment variables or use default
-DATABASE_PATH = os.environ.get(
-    "DATABASE_PATH",
-    os.path.join(os.path.dirname(os.path.abspath(__file__)), "patents.db")
-)
+# Also runnable as a script from this directory (python sql_query_tool.py)
+try:
+    from app.patent_system.data_access import DATABASE_PATH, execute_sql
+except ImportError:
+    from data_access import DATABASE_PATH, execute_sql
 
 def execute_query(query, format_output="table", output_file=None, limit=None):
     """
@@ -42,14 +43,9 @@ def execute_query(query, format_output="table", output_file=None, limit=None):
         query = f"{query} LIMIT {limit}"
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        
-        # Enable foreign keys
-        conn.execute("PRAGMA foreign_keys = ON")
-        
-        # Use pandas to execute query and get results
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        # Pooled connection from the shared data access layer (foreign keys enabled)
+        columns, rows = execute_sql(query)
+        df = pd.DataFrame(rows, columns=columns)
         
         # Return empty result for queries that don't return data (like INSERT, UPDATE)
         if df.empty and not query.upper().startswith("SELECT"):
@@ -95,8 +91,8 @@ def execute_query(query, format_output="table", output_file=None, limit=None):
                 return {"message": f"Results saved to {output_file}"}
             return tabulate(df, headers='keys', tablefmt='psql')
             
-    except sqlite3.Error as e:
-        return {"error": f"SQLite error: {str(e)}"}
+    except (sqlite3.Error, DBAPIError) as e:
+        return {"error": f"SQLite error: {str(getattr(e, 'orig', e))}"}
     except Exception as e:
         return {"error": f"Error: {str(e)}"}
 
@@ -6,19 +6,23 @@ This script provides a web interface for executing SQL queries against the paten
 """
 
 import os
-import sqlite3
-import pandas as pd
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+import threading
+from flask import Flask, request, jsonify, send_from_directory
 from datetime import datetime
 
-# Get database path from environment variables or use default
-DATABASE_PATH = os.environ.get(
-    "DATABASE_PATH",
-    os.path.join(os.path.dirname(os.path.abspath(__file__)), "patents.db")
-)
+# Also runnable as a script from this directory (python sql_web_interface.py)
+try:
+    from app.patent_system.data_access import DATABASE_PATH, execute_sql
+except ImportError:
+    from data_access import DATABASE_PATH, execute_sql
 
 app = Flask(__name__)
 
+# Rows per result page
+SQL_WEB_PAGE_SIZE = int(os.environ.get("SQL_WEB_PAGE_SIZE", "100"))
+# Rows of a result reachable through the pages
+SQL_WEB_MAX_ROWS = int(os.environ.get("SQL_WEB_MAX_ROWS", "10000"))
+
 # HTML template for the web interface
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -99,6 +103,15 @@ HTML_TEMPLATE = """
         tr:nth-child(even) {
             background-color: #f9f9f9;
         }
+        .pagination {
+            margin-top: 10px;
+        }
+        .pagination form {
+            display: inline;
+        }
+        .pagination span {
+            margin: 0 10px;
+        }
         .error {
             color: #ff0000;
             background-color: #ffe6e6;
@@ -207,7 +220,7 @@ HTML_TEMPLATE = """
             <div class="results">
                 <h2>Query Results</h2>
                 <p><strong>Execution time:</strong> {{ execution_time }} seconds</p>
-                <p><strong>Rows returned:</strong> {{ row_count }}</p>
+                <p><strong>Rows returned:</strong> {% if row_count > 0 %}{{ first_row }}-{{ first_row + row_count - 1 }}{% else %}0{% endif %}{% if has_more %} (more rows available){% endif %}</p>
                 {% if row_count > 0 %}
                 <table>
                     <tr>
@@ -224,6 +237,28 @@ HTML_TEMPLATE = """
                     {% endfor %}
                 </table>
                 {% endif %}
+                {% if page > 1 or next_page %}
+                <div class="pagination">
+                    {% if page > 1 %}
+                    <form method="post" action="/query">
+                        <input type="hidden" name="query" value="{{ query }}">
+                        <input type="hidden" name="page" value="{{ page - 1 }}">
+                        <button type="submit">&laquo; Previous</button>
+                    </form>
+                    {% endif %}
+                    <span>Page {{ page }}</span>
+                    {% if next_page %}
+                    <form method="post" action="/query">
+                        <input type="hidden" name="query" value="{{ query }}">
+                        <input type="hidden" name="page" value="{{ next_page }}">
+                        <button type="submit">Next &raquo;</button>
+                    </form>
+                    {% endif %}
+                </div>
+                {% endif %}
+                {% if row_limit_reached %}
+                <p>Only the first {{ max_rows }} rows can be browsed; narrow the query with WHERE or LIMIT.</p>
+                {% endif %}
             </div>
             {% endif %}
         </div>
@@ -400,130 +435,142 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once; render_template_string would parse the template on every request
+PAGE_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
+# Schema texts with the (file, PRAGMA schema_version) they were built for
+_schema_cache = {"version": None, "schemas": None}
+_schema_lock = threading.Lock()
+
+
 def get_db_schemas():
-    """Get schema for all tables in the database"""
+    """Get schema for all tables in the database (rebuilt only when the schema changes)"""
     if not os.path.exists(DATABASE_PATH):
         return {"Error": "Database not found"}
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        # schema_version changes with every schema change; the inode catches a replaced file
+        _, rows = execute_sql("PRAGMA schema_version")
+        version = (os.stat(DATABASE_PATH).st_ino, rows[0][0])
+        with _schema_lock:
+            if _schema_cache["version"] == version:
+                return _schema_cache["schemas"]
         
-        # Get all table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-        tables = cursor.fetchall()
+        # All columns of all tables in one query
+        _, columns = execute_sql(
+            "SELECT m.name, p.name, p.type, p.\"notnull\", p.pk "
+            "FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+            "WHERE m.type = 'table' ORDER BY m.name, p.cid"
+        )
         
-        schemas = {}
-        for table in tables:
-            table_name = table[0]
-            # Get schema for this table
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            
-            schema_text = f"CREATE TABLE {table_name} (\n"
-            for i, col in enumerate(columns):
-                # Format: cid, name, type, notnull, default_value, pk
-                col_name = col[1]
-                col_type = col[2]
-                not_null = "NOT NULL" if col[3] else ""
-                pk = "PRIMARY KEY" if col[5] else ""
-                
-                schema_text += f"    {col_name} {col_type} {not_null} {pk}"
-                if i < len(columns) - 1:
-                    schema_text += ",\n"
-                else:
-                    schema_text += "\n"
-            
-            schema_text += ");"
-            schemas[table_name] = schema_text
+        table_columns = {}
+        for table_name, col_name, col_type, not_null, pk in columns:
+            not_null = "NOT NULL" if not_null else ""
+            pk = "PRIMARY KEY" if pk else ""
+            table_columns.setdefault(table_name, []).append(f"    {col_name} {col_type} {not_null} {pk}")
+        
+        schemas = {
+            table_name: f"CREATE TABLE {table_name} (\n" + ",\n".join(lines) + "\n);"
+            for table_name, lines in table_columns.items()
+        }
         
-        conn.close()
+        with _schema_lock:
+            _schema_cache["version"] = version
+            _schema_cache["schemas"] = schemas
         return schemas
     
     except Exception as e:
         return {"Error": str(e)}
 
-def execute_query(query, limit=None):
-    """Execute SQL query and return results"""
+def execute_query(query, page=1, page_size=SQL_WEB_PAGE_SIZE, max_rows=SQL_WEB_MAX_ROWS):
+    """
+    Execute SQL query and return one page of results
+
+    Rows are read from the cursor as they are needed: the rows of earlier pages are
+    skipped and at most page_size + 1 rows are fetched, so a query without LIMIT
+    does not load its whole result. Only the first max_rows rows are reachable.
+
+    Returns:
+        Tuple of (rows, error, execution time in seconds, columns, row count of the page,
+        whether more rows follow)
+    """
     if not os.path.exists(DATABASE_PATH):
-        return None, "Database not found at {}".format(DATABASE_PATH), 0, [], 0
+        return None, "Database not found at {}".format(DATABASE_PATH), 0, [], 0, False
     
-    # Add LIMIT clause if requested and not already in query
-    if limit is not None and "LIMIT" not in query.upper():
-        query = f"{query} LIMIT {limit}"
+    offset = min((max(page, 1) - 1) * page_size, max(max_rows - page_size, 0))
+    fetch = min(page_size, max_rows - offset)
     
     try:
         start_time = datetime.now()
         
-        conn = sqlite3.connect(DATABASE_PATH)
-        # Enable foreign keys
-        conn.execute("PRAGMA foreign_keys = ON")
-        
-        # Use pandas to execute query and get results
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        # Pooled connection from the shared data access layer (foreign keys enabled)
+        columns, rows = execute_sql(query, max_rows=fetch + 1, offset=offset)
         
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
         
-        # Convert DataFrame to list of lists for template rendering
-        results = df.values.tolist()
-        columns = df.columns.tolist()
-        row_count = len(results)
-        
-        return results, None, execution_time, columns, row_count
+        has_more = len(rows) > fetch
+        results = [list(row) for row in rows[:fetch]]
+        return results, None, execution_time, columns, len(results), has_more
     
     except Exception as e:
-        return None, str(e), 0, [], 0
+        return None, str(getattr(e, "orig", None) or e), 0, [], 0, False
+
+def render_page(**context):
+    """Render the page with defaults for the values a view does not set"""
+    values = {
+        "query": "",
+        "results": None,
+        "error": None,
+        "execution_time": 0,
+        "columns": [],
+        "row_count": 0,
+        "page": 1,
+        "first_row": 1,
+        "has_more": False,
+        "next_page": None,
+        "row_limit_reached": False,
+        "max_rows": SQL_WEB_MAX_ROWS,
+        "schemas": get_db_schemas(),
+    }
+    values.update(context)
+    return PAGE_TEMPLATE.render(**values)
 
 @app.route('/')
 def index():
     """Render the main page with query form"""
-    schemas = get_db_schemas()
-    return render_template_string(
-        HTML_TEMPLATE, 
-        query="",
-        results=None, 
-        error=None,
-        execution_time=0,
-        columns=[],
-        row_count=0,
-        schemas=schemas
-    )
+    return render_page()
 
 @app.route('/query', methods=['POST'])
 def query():
-    """Execute the SQL query and display results"""
+    """Execute the SQL query and display one page of results"""
     query_text = request.form.get('query', '')
     
     if not query_text.strip():
-        schemas = get_db_schemas()
-        return render_template_string(
-            HTML_TEMPLATE,
-            query="", 
-            results=None, 
-            error="Query cannot be empty",
-            execution_time=0,
-            columns=[],
-            row_count=0,
-            schemas=schemas
-        )
+        return render_page(error="Query cannot be empty")
     
-    # Execute query with a limit of 1000 rows for safety
-    results, error, execution_time, columns, row_count = execute_query(query_text, 1000)
+    try:
+        page = max(int(request.form.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    page = min(page, max(SQL_WEB_MAX_ROWS // SQL_WEB_PAGE_SIZE, 1))
     
-    # Get schema information for the Schema tab
-    schemas = get_db_schemas()
+    results, error, execution_time, columns, row_count, has_more = execute_query(query_text, page)
+    first_row = (page - 1) * SQL_WEB_PAGE_SIZE + 1
+    more_pages = has_more and first_row - 1 + row_count < SQL_WEB_MAX_ROWS
     
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         query=query_text,
         results=results,
         error=error,
         execution_time=round(execution_time, 4),
         columns=columns,
         row_count=row_count,
-        schemas=schemas
+        page=page,
+        first_row=first_row,
+        has_more=has_more,
+        next_page=page + 1 if more_pages else None,
+        row_limit_reached=has_more and not more_pages
     )
 
 if __name__ == '__main__':
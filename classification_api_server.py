@@ -23,6 +23,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Applicants kept per year in classification trends
+TOP_APPLICANTS_PER_YEAR = 5
+
 class ClassificationTrendRequest(BaseModel):
     classification_code: str
     start_year: Optional[int] = None
@@ -50,32 +53,43 @@ def get_ipc_class_description(class_code):
 
 def query_database(classification_code, start_year=None, end_year=None):
     """Query the database API for patent classification data"""
-    # Build the SQL query
-    where_clauses = [f"substr(ipc_code, 1, 1) = '{classification_code}'"]
+    # Build the SQL query (values are sent as bound parameters)
+    where_clauses = ["ipc_section = ?"]
+    params = [classification_code]
     
     if start_year:
-        where_clauses.append(f"substr(filing_date, 1, 4) >= '{start_year}'")
+        where_clauses.append("filing_year >= ?")
+        params.append(int(start_year))
     
     if end_year:
-        where_clauses.append(f"substr(filing_date, 1, 4) <= '{end_year}'")
+        where_clauses.append("filing_year <= ?")
+        params.append(int(end_year))
     
     where_clause = " AND ".join(where_clauses)
     
+    # Top applicants per year, ranked in SQL so the result stays small for broad sections
     query = f"""
-    SELECT 
-        substr(filing_date, 1, 4) as year,
-        assignee_original as applicant_name,
-        COUNT(*) as application_count
-    FROM 
-        publications
-    WHERE 
-        {where_clause}
-    GROUP BY 
-        substr(filing_date, 1, 4), 
-        assignee_original
+    SELECT year, applicant_name, application_count
+    FROM (
+        SELECT 
+            filing_year as year,
+            assignee_original as applicant_name,
+            COUNT(*) as application_count,
+            ROW_NUMBER() OVER (
+                PARTITION BY filing_year ORDER BY COUNT(*) DESC, assignee_original
+            ) as applicant_rank
+        FROM 
+            publications
+        WHERE 
+            {where_clause}
+        GROUP BY 
+            filing_year, 
+            assignee_original
+    )
+    WHERE applicant_rank <= {TOP_APPLICANTS_PER_YEAR}
     ORDER BY 
-        substr(filing_date, 1, 4), 
-        COUNT(*) DESC
+        year, 
+        application_count DESC
     """
     
     try:
@@ -83,13 +97,17 @@ def query_database(classification_code, start_year=None, end_year=None):
         db_url = "http://localhost:5003"
         response = requests.post(
             f"{db_url}/execute/bigquery",
-            json={"query": query}
+            json={"query": query, "params": params}
         )
         
         if response.status_code != 200:
             raise Exception(f"Database API error: {response.status_code}, {response.text}")
         
         result = response.json()
+        if result.get("truncated"):
+            raise Exception(
+                f"Result truncated at {result.get('row_count')} rows; narrow the year range"
+            )
         
         # Process results into the desired format
         yearly_applicant_counts = {}
@@ -100,12 +118,7 @@ def query_database(classification_code, start_year=None, end_year=None):
             applicant = row.get("applicant_name", "Unknown")
             application_count = row.get("application_count", 0)
             
-            if year not in yearly_applicant_counts:
-                yearly_applicant_counts[year] = {}
-            
-            # Only keep top 5 applicants per year to prevent cluttering
-            if len(yearly_applicant_counts[year]) < 5:
-                yearly_applicant_counts[year][applicant] = application_count
+            yearly_applicant_counts.setdefault(year, {})[applicant] = application_count
         
         return yearly_applicant_counts
     
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Graph statistics of the Neo4j RAG database in one round trip.
+
+Counting with `MATCH (n:Chunk) WHERE ... RETURN count(n)` or `MATCH ()-[r]-()`
+(undirected, so every relationship is counted twice) scans the graph. Here:
+
+  - node, label and relationship counts come from one query whose subqueries each
+    have the shape Neo4j answers from its count store in constant time
+    (`MATCH (n:Label) RETURN count(n)`, `MATCH ()-[r]->() RETURN count(r)`);
+  - the numbers the count store cannot answer (chunks with text, text lengths)
+    come from a (:RAGStats {name: 'chunks'}) counter node, which ingestion
+    updates with RECORD_CHUNKS_QUERY. The counters only ever grow and not every
+    writer updates them, so they are stale when missing, when they are
+    inconsistent (more valid chunks than Chunk nodes) or when the last rebuild
+    is older than GRAPH_STATS_REBUILD_SECONDS;
+  - stale counters are rebuilt by one scan in rebuild_chunk_counters(), which the
+    services run at warm-up or in the background, never on the request path;
+    GraphStatsCache.claim_rebuild() makes sure only one rebuild runs at a time.
+    ensure_stats_constraint() (run at warm-up and before every rebuild) removes
+    duplicate RAGStats nodes and creates the uniqueness constraint on
+    RAGStats.name, so concurrent MERGEs cannot create new ones;
+  - the RAGStats node itself is not counted in total_nodes;
+  - results are kept for GRAPH_STATS_TTL_SECONDS in a GraphStatsCache.
+
+The functions take a sync neo4j session; their a-prefixed variants an async one.
+
+This module is shared by the graphRAG app (app/graph_stats.py) and the MCP server
+(mcp_server/graph_stats.py); keep the copies identical.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+# Seconds graph statistics are reused before they are queried again
+GRAPH_STATS_TTL_SECONDS = float(os.environ.get("GRAPH_STATS_TTL_SECONDS", "30"))
+# Seconds after which the chunk counters are rebuilt by a scan (0 disables periodic rebuilds)
+GRAPH_STATS_REBUILD_SECONDS = float(os.environ.get("GRAPH_STATS_REBUILD_SECONDS", "3600"))
+
+# Count-store counts and the chunk counters in one round trip
+GRAPH_STATS_QUERY = """
+CALL { MATCH (n) RETURN count(n) AS total_nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS total_relationships }
+CALL { MATCH (n:Chunk) RETURN count(n) AS chunk_nodes }
+CALL { MATCH (n:GraphRAGChunk) RETURN count(n) AS graphrag_chunks }
+CALL { MATCH (n:entity) RETURN count(n) AS entity_nodes }
+CALL { MATCH (n:RAGStats) RETURN count(n) AS stats_nodes }
+OPTIONAL MATCH (s:RAGStats {name: 'chunks'})
+RETURN total_nodes, total_relationships, chunk_nodes, graphrag_chunks, entity_nodes, stats_nodes,
+       s.valid_chunks AS valid_chunks, s.text_chars AS text_chars, s.max_text_length AS max_text_length,
+       duration.inSeconds(s.rebuilt_at, datetime()).seconds AS rebuilt_seconds_ago
+"""
+
+# Keep one counter node per name (duplicates come from concurrent MERGEs before the constraint existed)
+DEDUPLICATE_STATS_QUERY = """
+MATCH (s:RAGStats)
+WITH s.name AS name, collect(s) AS nodes
+WHERE size(nodes) > 1
+UNWIND nodes[1..] AS duplicate
+DETACH DELETE duplicate
+RETURN count(duplicate) AS removed
+"""
+
+STATS_CONSTRAINT_QUERY = "CREATE CONSTRAINT rag_stats_name IF NOT EXISTS FOR (s:RAGStats) REQUIRE s.name IS UNIQUE"
+
+# Recount the chunk counters with one scan (graphs ingested before the counters existed)
+REBUILD_CHUNK_COUNTERS_QUERY = """
+OPTIONAL MATCH (n:Chunk) WHERE n.text IS NOT NULL AND n.text <> ''
+WITH count(n) AS valid, coalesce(sum(size(n.text)), 0) AS chars, coalesce(max(size(n.text)), 0) AS longest
+MERGE (s:RAGStats {name: 'chunks'})
+SET s.valid_chunks = valid, s.text_chars = chars, s.max_text_length = longest,
+    s.updated_at = datetime(), s.rebuilt_at = datetime()
+RETURN s.valid_chunks AS valid_chunks, s.text_chars AS text_chars, s.max_text_length AS max_text_length
+"""
+
+# Add ingested chunks to the counters (parameters from chunk_counter_params())
+RECORD_CHUNKS_QUERY = """
+MERGE (s:RAGStats {name: 'chunks'})
+SET s.valid_chunks = coalesce(s.valid_chunks, 0) + $count,
+    s.text_chars = coalesce(s.text_chars, 0) + $chars,
+    s.max_text_length = CASE WHEN coalesce(s.max_text_length, 0) > $longest
+                             THEN s.max_text_length ELSE $longest END,
+    s.updated_at = datetime()
+"""
+
+_COUNTERS = ("valid_chunks", "text_chars", "max_text_length")
+
+
+def chunk_counter_params(texts: Iterable[str]) -> Dict[str, int]:
+    """RECORD_CHUNKS_QUERY parameters for chunks with these texts (empty texts are not counted)"""
+    lengths = [len(text) for text in texts if text]
+    return {"count": len(lengths), "chars": sum(lengths), "longest": max(lengths, default=0)}
+
+
+def needs_rebuild(record: Dict[str, Any], rebuild_seconds: float = GRAPH_STATS_REBUILD_SECONDS) -> bool:
+    """True if the chunk counters of a GRAPH_STATS_QUERY record are missing, inconsistent or due a rebuild"""
+    if record["valid_chunks"] is None or record["valid_chunks"] > record["chunk_nodes"]:
+        return True
+    # Counters from before rebuilt_at existed have no age and are rebuilt once
+    age = record.get("rebuilt_seconds_ago")
+    return rebuild_seconds > 0 and (age is None or age >= rebuild_seconds)
+
+
+def summarize(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Statistics from a GRAPH_STATS_QUERY record with the chunk counters filled in"""
+    stats = {key: record[key] or 0 for key in (
+        "total_nodes", "total_relationships", "chunk_nodes", "graphrag_chunks", "entity_nodes", *_COUNTERS)}
+    # The counter node is bookkeeping, not part of the graph
+    stats["total_nodes"] = max(stats["total_nodes"] - (record.get("stats_nodes") or 0), 0)
+    stats["empty_chunks"] = max(stats["chunk_nodes"] - stats["valid_chunks"], 0)
+    stats["avg_text_length"] = stats["text_chars"] // stats["valid_chunks"] if stats["valid_chunks"] else 0
+    stats["chunk_fill_rate"] = (stats["valid_chunks"] / stats["chunk_nodes"] * 100) if stats["chunk_nodes"] else 0.0
+    # Tells the caller to schedule rebuild_chunk_counters()
+    stats["counters_stale"] = needs_rebuild(record)
+    return stats
+
+
+def fetch_graph_stats(session) -> Dict[str, Any]:
+    """Graph statistics through a sync session (counters as stored, see counters_stale)"""
+    return summarize(dict(session.run(GRAPH_STATS_QUERY).single()))
+
+
+async def afetch_graph_stats(session) -> Dict[str, Any]:
+    """Graph statistics through an async session (counters as stored, see counters_stale)"""
+    return summarize(dict(await (await session.run(GRAPH_STATS_QUERY)).single()))
+
+
+def ensure_stats_constraint(session) -> bool:
+    """Remove duplicate counter nodes and create the RAGStats.name constraint; True if duplicates were removed (recount)"""
+    removed = session.run(DEDUPLICATE_STATS_QUERY).single()["removed"]
+    session.run(STATS_CONSTRAINT_QUERY).consume()
+    return removed > 0
+
+
+async def aensure_stats_constraint(session) -> bool:
+    """ensure_stats_constraint through an async session"""
+    removed = (await (await session.run(DEDUPLICATE_STATS_QUERY)).single())["removed"]
+    await (await session.run(STATS_CONSTRAINT_QUERY)).consume()
+    return removed > 0
+
+
+def rebuild_chunk_counters(session):
+    """Recount the chunk counters with one scan (after ensure_stats_constraint)"""
+    ensure_stats_constraint(session)
+    session.run(REBUILD_CHUNK_COUNTERS_QUERY).consume()
+
+
+async def arebuild_chunk_counters(session):
+    """rebuild_chunk_counters through an async session"""
+    await aensure_stats_constraint(session)
+    await (await session.run(REBUILD_CHUNK_COUNTERS_QUERY)).consume()
+
+
+class GraphStatsCache:
+    """Graph statistics kept for a TTL, and the single-flight claim on counter rebuilds"""
+
+    def __init__(self, ttl: float = GRAPH_STATS_TTL_SECONDS):
+        self.ttl = ttl
+        self._stats: Optional[Dict[str, Any]] = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """Cached statistics, or None if missing or expired"""
+        with self._lock:
+            if self._stats is not None and time.monotonic() < self._expires:
+                return self._stats
+            return None
+
+    def put(self, stats: Dict[str, Any]):
+        with self._lock:
+            self._stats = stats
+            self._expires = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        with self._lock:
+            self._stats = None
+
+    def claim_rebuild(self) -> bool:
+        """True if the caller may start a counter rebuild (none is running); release with release_rebuild()"""
+        return self._rebuild_lock.acquire(blocking=False)
+
+    def release_rebuild(self):
+        """End a counter rebuild; the next statistics are read fresh"""
+        self.invalidate()
+        self._rebuild_lock.release()
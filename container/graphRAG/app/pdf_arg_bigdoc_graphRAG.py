@@ -12,6 +12,8 @@ from llama_index.core import PropertyGraphIndex
 from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
 from llama_index.core.schema import Document
 
+from graph_stats import RECORD_CHUNKS_QUERY, chunk_counter_params
+
 logging.basicConfig(level=logging.INFO)
 
 # boto3セッションの初期化
@@ -134,6 +136,9 @@ if __name__ == "__main__":
             chunk_document = Document(text=chunk, metadata=document.metadata)
             index.insert(chunk_document)
 
+        # 統計用のチャンクカウンタを更新（統計取得時の全件スキャンを避ける）
+        graph_store.structured_query(RECORD_CHUNKS_QUERY, param_map=chunk_counter_params(text_chunks))
+
     retriever = index.as_retriever(
         include_text=False,
     )
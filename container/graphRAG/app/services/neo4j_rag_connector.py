@@ -5,6 +5,7 @@ Connects to neo4jRAG container on port 7587 and provides basic query functionali
 
 import time
 import logging
+import threading
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
@@ -16,6 +17,7 @@ from langchain.prompts import PromptTemplate
 from langchain.schema import Document
 
 from ..config.neo4j_rag_config import neo4j_rag_config
+from ..graph_stats import GraphStatsCache, fetch_graph_stats, rebuild_chunk_counters
 
 
 logger = logging.getLogger(__name__)
@@ -39,6 +41,7 @@ class Neo4jRAGConnector:
         self._vector_store = None
         self._llm = None
         self._qa_chain = None
+        self._stats_cache = GraphStatsCache()
         
     def connect(self) -> bool:
         """Connect to Neo4j RAG database."""
@@ -190,35 +193,43 @@ class Neo4jRAGConnector:
             return []
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get database statistics."""
+        """Get database statistics (count store, one query, cached for a TTL)."""
         try:
-            if not self.connect():
-                return {"error": "Cannot connect to database"}
-            
-            with self._driver.session() as session:
-                # Count nodes
-                node_result = session.run("MATCH (n) RETURN count(n) as count")
-                node_count = node_result.single()["count"]
-                
-                # Count relationships
-                rel_result = session.run("MATCH ()-[r]-() RETURN count(r) as count")
-                rel_count = rel_result.single()["count"]
+            stats = self._stats_cache.get()
+            if stats is None:
+                if self._driver is None and not self.connect():
+                    return {"error": "Cannot connect to database"}
                 
-                # Count GraphRAG chunks
-                chunk_result = session.run("MATCH (n:GraphRAGChunk) RETURN count(n) as count")
-                chunk_count = chunk_result.single()["count"]
-                
-                return {
-                    "total_nodes": node_count,
-                    "total_relationships": rel_count,
-                    "graphrag_chunks": chunk_count,
-                    "database_uri": self.config.uri
-                }
+                with self._driver.session() as session:
+                    stats = fetch_graph_stats(session)
+                self._stats_cache.put(stats)
+                if stats["counters_stale"] and self._stats_cache.claim_rebuild():
+                    # Rebuilt in the background; this call returns the stored counters
+                    threading.Thread(target=self._rebuild_chunk_counters, name="rag-stats-rebuild",
+                                     daemon=True).start()
+            
+            return {
+                "total_nodes": stats["total_nodes"],
+                "total_relationships": stats["total_relationships"],
+                "graphrag_chunks": stats["graphrag_chunks"],
+                "database_uri": self.config.uri
+            }
                 
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
             return {"error": str(e)}
     
+    def _rebuild_chunk_counters(self):
+        """Recount the chunk counters (the caller holds the stats cache's rebuild claim)"""
+        try:
+            with self._driver.session() as session:
+                rebuild_chunk_counters(session)
+            logger.info("Rebuilt the chunk counters")
+        except Exception as e:
+            logger.warning(f"Chunk counter rebuild failed: {e}")
+        finally:
+            self._stats_cache.release_rebuild()
+    
     def health_check(self) -> Dict[str, Any]:
         """Check system health."""
         try:
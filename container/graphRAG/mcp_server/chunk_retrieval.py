@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Chunk retrieval for the Neo4j RAG MCP server.
+
+Splitting a Japanese question on whitespace yields the whole question as one
+"keyword", and `n.text CONTAINS $kw` scans every Chunk node. ChunkRetriever instead:
+
+  1. extracts keywords by script runs: katakana, kanji and latin/digit runs are
+     kept, hiragana runs (particles, endings) are dropped; long kanji runs are
+     also split into character bigrams so compounds match their parts;
+  2. searches a Neo4j full-text index on Chunk.text with the CJK analyzer
+     (created on first use), whose Lucene scoring is BM25;
+  3. falls back to a CONTAINS scan ranked by a local BM25 over the same keywords
+     when the full-text index is unavailable. Latin keywords are lowercased, so
+     the scan and the BM25 counts compare against the lowercased text, as the
+     full-text analyzer does.
+
+The queries run on an async Neo4j session. retrieve() returns the chunks together
+with the retrieval method, keywords and latency, so callers can report retrieval
+time separately from LLM time.
+"""
+
+import os
+import re
+import math
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Full-text index on Chunk.text
+CHUNK_FULLTEXT_INDEX = os.environ.get("RAG_CHUNK_FULLTEXT_INDEX", "chunk_text_fulltext")
+# Chunks passed to the LLM as context
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "4"))
+# Candidates read for the fallback ranking
+RAG_FALLBACK_CANDIDATES = int(os.environ.get("RAG_FALLBACK_CANDIDATES", "200"))
+# Keywords used per question
+RAG_MAX_KEYWORDS = 12
+
+# Script runs: katakana (with prolonged sound mark), kanji, latin letters/digits, hiragana
+_RUN_PATTERN = re.compile(
+    r"(?P<katakana>[゠-ヿｦ-ﾟ]+)"
+    r"|(?P<kanji>[一-鿿㐀-䶿々]+)"
+    r"|(?P<latin>[A-Za-z0-9０-９Ａ-Ｚａ-ｚ]+)"
+    r"|(?P<hiragana>[぀-ゟ]+)"
+)
+# Words that carry no content in questions
+STOP_WORDS = {
+    "何", "誰", "何処", "何故", "教えて", "説明", "について", "とは", "ですか",
+    "what", "who", "where", "when", "why", "how", "is", "are", "the", "of", "and", "about", "tell",
+}
+# Lucene query syntax characters
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+def extract_keywords(question: str, max_keywords: int = RAG_MAX_KEYWORDS) -> List[str]:
+    """
+    Content keywords of a question, most specific first
+
+    Katakana, kanji and latin runs are kept (hiragana runs are particles and verb
+    endings); kanji runs longer than two characters add their character bigrams.
+    """
+    keywords, bigrams = [], []
+    for match in _RUN_PATTERN.finditer(question):
+        kind, run = match.lastgroup, match.group()
+        if kind == "hiragana":
+            continue
+        if kind == "latin":
+            run = run.lower()
+        if len(run) < 2 or run in STOP_WORDS:
+            continue
+        keywords.append(run)
+        if kind == "kanji" and len(run) > 2:
+            bigrams.extend(run[i:i + 2] for i in range(len(run) - 1))
+
+    result = []
+    for keyword in keywords + bigrams:
+        if keyword not in result and keyword not in STOP_WORDS:
+            result.append(keyword)
+    return result[:max_keywords]
+
+
+def lucene_query(keywords: List[str]) -> str:
+    """OR query of quoted keywords (phrases, so CJK bigram tokens must be adjacent)"""
+    return " OR ".join('"' + _LUCENE_SPECIAL.sub(r"\\\1", keyword) + '"' for keyword in keywords)
+
+
+def bm25_rank(keywords: List[str], chunks: List[Dict[str, Any]], k1: float = 1.5,
+              b: float = 0.75) -> List[Dict[str, Any]]:
+    """
+    Chunks ranked by BM25 over keyword occurrences (substring counts, which suits CJK text)
+
+    Keywords are expected in lowercase (see extract_keywords); occurrences are
+    counted in the lowercased text. Adds a "score" to each chunk; chunks without
+    any keyword are dropped.
+    """
+    if not chunks or not keywords:
+        return []
+    texts = [chunk["text"].lower() for chunk in chunks]
+    lengths = [len(text) for text in texts]
+    avg_len = sum(lengths) / len(lengths) or 1.0
+    counts = [{kw: text.count(kw) for kw in keywords} for text in texts]
+    doc_freq = {kw: sum(1 for c in counts if c[kw]) for kw in keywords}
+
+    ranked = []
+    for chunk, length, tf in zip(chunks, lengths, counts):
+        score = 0.0
+        for kw in keywords:
+            if tf[kw]:
+                idf = math.log(1 + (len(chunks) - doc_freq[kw] + 0.5) / (doc_freq[kw] + 0.5))
+                score += idf * tf[kw] * (k1 + 1) / (tf[kw] + k1 * (1 - b + b * length / avg_len))
+        if score > 0:
+            ranked.append({**chunk, "score": score})
+    ranked.sort(key=lambda chunk: chunk["score"], reverse=True)
+    return ranked
+
+
+class ChunkRetriever:
+    """Keyword retrieval of Chunk nodes through a full-text index, with a BM25 scan fallback"""
+
+    def __init__(self, index_name: str = CHUNK_FULLTEXT_INDEX, top_k: int = RAG_TOP_K,
+                 fallback_candidates: int = RAG_FALLBACK_CANDIDATES):
+        self.index_name = index_name
+        self.top_k = top_k
+        self.fallback_candidates = fallback_candidates
+        self._index_ready: Optional[bool] = None
+
+    async def ensure_index(self, session) -> bool:
+        """Create the CJK full-text index on Chunk.text if missing (checked once per process)"""
+        if self._index_ready is None:
+            try:
+                result = await session.run(
+                    f"CREATE FULLTEXT INDEX {self.index_name} IF NOT EXISTS "
+                    "FOR (n:Chunk) ON EACH [n.text] "
+                    "OPTIONS {indexConfig: {`fulltext.analyzer`: 'cjk'}}"
+                )
+                await result.consume()
+                self._index_ready = True
+            except Exception as e:
+                logger.warning(f"Full-text index {self.index_name} unavailable, using scan fallback: {e}")
+                self._index_ready = False
+        return self._index_ready
+
+    async def _fulltext(self, session, keywords: List[str]) -> List[Dict[str, Any]]:
+        result = await session.run(
+            """
+            CALL db.index.fulltext.queryNodes($index_name, $query, {limit: $limit})
+            YIELD node, score
+            WHERE node.text IS NOT NULL AND node.text <> ''
+            RETURN node.id AS id, node.text AS text, score
+            """,
+            index_name=self.index_name, query=lucene_query(keywords), limit=self.top_k
+        )
+        return [{"id": r["id"], "text": r["text"], "score": r["score"]} async for r in result]
+
+    async def _scan(self, session, keywords: List[str]) -> List[Dict[str, Any]]:
+        result = await session.run(
+            """
+            MATCH (n:Chunk)
+            WHERE n.text IS NOT NULL AND n.text <> ''
+              AND any(kw IN $keywords WHERE toLower(n.text) CONTAINS kw)
+            RETURN n.id AS id, n.text AS text
+            LIMIT $limit
+            """,
+            keywords=keywords, limit=self.fallback_candidates
+        )
+        candidates = [{"id": r["id"], "text": r["text"]} async for r in result]
+        return bm25_rank(keywords, candidates)[:self.top_k]
+
+    async def retrieve(self, session, question: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Chunks relevant to the question
+
+        Returns:
+            (chunks with id, text and score; stats with method, keywords and retrieval_ms)
+        """
+        started = time.perf_counter()
+        keywords = extract_keywords(question)
+        chunks, method = [], "none"
+        if keywords:
+            if await self.ensure_index(session):
+                try:
+                    chunks, method = await self._fulltext(session, keywords), "fulltext"
+                except Exception as e:
+                    # A newly created index is still populating; check it again next time
+                    logger.warning(f"Full-text search failed, using scan fallback: {e}")
+                    self._index_ready = None
+            if method != "fulltext":
+                chunks, method = await self._scan(session, keywords), "scan_bm25"
+
+        stats = {
+            "method": method,
+            "keywords": keywords,
+            "retrieval_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info(f"Retrieved {len(chunks)} chunks: {stats}")
+        return chunks, stats
@@ -4,9 +4,12 @@ Neo4j RAG MCP Server for Claude Code
 Provides GraphRAG query capabilities through MCP protocol
 """
 
+import os
 import json
 import sys
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 import logging
 import time
@@ -20,9 +23,10 @@ try:
     from mcp.server.stdio import stdio_server
     from mcp import types
     
-    # GraphRAG imports
-    from neo4j import GraphDatabase
+    # GraphRAG imports (the sync GraphDatabase driver is only used by standalone_test)
+    from neo4j import AsyncGraphDatabase, GraphDatabase
     import boto3
+    from botocore.config import Config
     from langchain_aws import ChatBedrock
     
     MCP_AVAILABLE = True
@@ -30,10 +34,18 @@ except ImportError as e:
     MCP_AVAILABLE = False
     print(f"MCP or dependencies not available: {e}")
 
+from chunk_retrieval import ChunkRetriever
+from graph_stats import GraphStatsCache, aensure_stats_constraint, afetch_graph_stats, arebuild_chunk_counters
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connections kept in the Neo4j driver pool
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", "20"))
+# Concurrent LLM calls (threads running the blocking Bedrock client)
+RAG_LLM_WORKERS = int(os.environ.get("RAG_LLM_WORKERS", "4"))
+
 class Neo4jRAGMCPServer:
     """MCP Server for Neo4j RAG operations."""
     
@@ -44,6 +56,16 @@ class Neo4jRAGMCPServer:
         self.neo4j_password = "password"
         self.region = "us-east-1"
         self.inference_profile_arn = "arn:aws:bedrock:us-east-1:711387140677:inference-profile/us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+        self.retriever = ChunkRetriever()
+        self.stats_cache = GraphStatsCache()
+        self._rebuild_task = None
+        
+        # Process-lifetime resources, created on first use or by warm_up()
+        self.driver = None
+        self.bedrock_runtime = None
+        self.llm = None
+        self._llm_lock = threading.Lock()
+        self.llm_executor = ThreadPoolExecutor(max_workers=RAG_LLM_WORKERS, thread_name_prefix="rag-llm")
         
         if MCP_AVAILABLE:
             self.server = Server(self.app_name)
@@ -51,6 +73,99 @@ class Neo4jRAGMCPServer:
         else:
             logger.error("MCP not available, running in standalone mode")
     
+    def get_driver(self):
+        """Shared async Neo4j driver (one connection pool per process)"""
+        if self.driver is None:
+            self.driver = AsyncGraphDatabase.driver(
+                self.neo4j_uri,
+                auth=(self.neo4j_user, self.neo4j_password),
+                max_connection_pool_size=NEO4J_MAX_POOL_SIZE
+            )
+        return self.driver
+    
+    def get_llm(self):
+        """Shared Bedrock client and chat model (thread-safe, created on first use)"""
+        with self._llm_lock:
+            if self.llm is None:
+                self.bedrock_runtime = boto3.client(
+                    "bedrock-runtime",
+                    region_name=self.region,
+                    config=Config(max_pool_connections=RAG_LLM_WORKERS, retries={"max_attempts": 3, "mode": "adaptive"})
+                )
+                self.llm = ChatBedrock(
+                    client=self.bedrock_runtime,
+                    model_id=self.inference_profile_arn,
+                    provider="anthropic",
+                    region_name=self.region,
+                    model_kwargs={"temperature": 0.0, "max_tokens": 1500}
+                )
+            return self.llm
+    
+    async def invoke_llm(self, prompt: str):
+        """Run the blocking LLM call on the LLM thread pool so the event loop keeps serving other calls"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.llm_executor, lambda: self.get_llm().invoke(prompt))
+    
+    async def get_graph_stats(self) -> Dict[str, Any]:
+        """Graph statistics from the count store and chunk counters, cached for GRAPH_STATS_TTL_SECONDS"""
+        stats = self.stats_cache.get()
+        if stats is None:
+            async with self.get_driver().session() as session:
+                stats = await afetch_graph_stats(session)
+            self.stats_cache.put(stats)
+            if stats["counters_stale"]:
+                # Rebuilt in the background; this call returns the stored counters
+                self._schedule_counter_rebuild()
+        return stats
+    
+    def _schedule_counter_rebuild(self):
+        """Start a background chunk counter rebuild unless one is already running"""
+        if self.stats_cache.claim_rebuild():
+            self._rebuild_task = asyncio.create_task(self._rebuild_chunk_counters())
+    
+    async def _rebuild_chunk_counters(self):
+        """Recount the chunk counters (the caller holds the stats cache's rebuild claim)"""
+        try:
+            async with self.get_driver().session() as session:
+                await arebuild_chunk_counters(session)
+            logger.info("Rebuilt the chunk counters")
+        except Exception as e:
+            logger.warning(f"Chunk counter rebuild failed: {e}")
+        finally:
+            self.stats_cache.release_rebuild()
+    
+    async def warm_up(self):
+        """Connect to Neo4j, prepare the full-text index and statistics and create the Bedrock client before the first query"""
+        started = time.perf_counter()
+        try:
+            driver = self.get_driver()
+            await driver.verify_connectivity()
+            async with driver.session() as session:
+                await self.retriever.ensure_index(session)
+                duplicates_removed = await aensure_stats_constraint(session)
+            # Builds the chunk counters once if the graph predates them (or had duplicate counter nodes)
+            await self.get_graph_stats()
+            if duplicates_removed:
+                self._schedule_counter_rebuild()
+            if self._rebuild_task is not None:
+                await self._rebuild_task
+        except Exception as e:
+            logger.warning(f"Neo4j warm-up failed: {e}")
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.llm_executor, self.get_llm)
+        except Exception as e:
+            logger.warning(f"Bedrock warm-up failed: {e}")
+        logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    async def close(self):
+        """Release the Neo4j pool and the LLM threads"""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            self._rebuild_task.cancel()
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+        self.llm_executor.shutdown(wait=False)
+    
     def setup_handlers(self):
         """Setup MCP handlers."""
         
@@ -123,73 +238,22 @@ class Neo4jRAGMCPServer:
         try:
             logger.info(f"Processing RAG query: {question}")
             
-            # Connect to Neo4j and search for relevant chunks
-            driver = GraphDatabase.driver(
-                self.neo4j_uri,
-                auth=(self.neo4j_user, self.neo4j_password)
-            )
+            # Keyword search on the full-text index, ranked by BM25
+            async with self.get_driver().session() as session:
+                chunks, retrieval = await self.retriever.retrieve(session, question)
             
-            with driver.session() as session:
-                # Search for relevant chunks containing the question keywords
-                keywords = question.split()
-                search_conditions = []
-                params = {}
-                
-                # Build search query for better matching
-                for i, keyword in enumerate(keywords[:3]):  # Limit to first 3 keywords
-                    if len(keyword) > 1:  # Skip very short words
-                        search_conditions.append(f"n.text CONTAINS $keyword{i}")
-                        params[f"keyword{i}"] = keyword
-                
-                if not search_conditions:
-                    # Fallback search if no good keywords
-                    search_conditions = ["n.text IS NOT NULL AND n.text <> ''"]
-                
-                search_query = f"""
-                    MATCH (n:Chunk) 
-                    WHERE n.text IS NOT NULL AND n.text <> ''
-                    AND ({' OR '.join(search_conditions)})
-                    RETURN n.text as text, n.id as id
-                    ORDER BY size(n.text) DESC
-                    LIMIT 4
-                """
-                
-                result = session.run(search_query, params)
-                chunks = list(result)
-                
-                if not chunks:
-                    # Try broader search if no specific matches
-                    broader_result = session.run("""
-                        MATCH (n:Chunk) 
-                        WHERE n.text IS NOT NULL AND n.text <> ''
-                        RETURN n.text as text, n.id as id
-                        ORDER BY size(n.text) DESC
-                        LIMIT 3
-                    """)
-                    chunks = list(broader_result)
-                
-                if not chunks:
-                    return [types.TextContent(
-                        type="text",
-                        text="❌ データベースに関連する情報が見つかりませんでした。"
-                    )]
-                
-                # Collect context
-                context_texts = [record["text"] for record in chunks]
-                full_context = "\n\n".join(context_texts)
-                
-            driver.close()
+            if not chunks:
+                return [types.TextContent(
+                    type="text",
+                    text=f"❌ データベースに関連する情報が見つかりませんでした。"
+                         f"（キーワード: {', '.join(retrieval['keywords']) or 'なし'}）"
+                )]
             
-            # Generate answer using LLM
-            bedrock_runtime = boto3.client("bedrock-runtime", region_name=self.region)
-            llm = ChatBedrock(
-                client=bedrock_runtime,
-                model_id=self.inference_profile_arn,
-                provider="anthropic",
-                region_name=self.region,
-                model_kwargs={"temperature": 0.0, "max_tokens": 1500}
-            )
+            # Collect context
+            context_texts = [record["text"] for record in chunks]
+            full_context = "\n\n".join(context_texts)
             
+            # Generate answer using LLM
             prompt = f"""以下の文脈情報に基づいて、質問に正確で詳細に答えてください。
 文脈に含まれる情報のみを使用して回答してください。
 
@@ -201,7 +265,9 @@ class Neo4jRAGMCPServer:
 回答:"""
             
             logger.info("Generating LLM response...")
-            response = llm.invoke(prompt)
+            llm_started = time.perf_counter()
+            response = await self.invoke_llm(prompt)
+            llm_ms = (time.perf_counter() - llm_started) * 1000
             
             # Format response
             answer_text = f"""🔍 **質問**: {question}
@@ -209,10 +275,10 @@ class Neo4jRAGMCPServer:
 📝 **回答**:
 {response.content}
 
-📊 **データソース**: {len(chunks)}個のチャンクから情報を取得
-⏱️ **処理時間**: {time.strftime('%Y-%m-%d %H:%M:%S')}"""
+📊 **データソース**: {len(chunks)}個のチャンクから情報を取得（{retrieval['method']}, キーワード: {', '.join(retrieval['keywords'])}）
+⏱️ **処理時間**: 検索 {retrieval['retrieval_ms']:.1f} ms / LLM {llm_ms:.1f} ms（{time.strftime('%Y-%m-%d %H:%M:%S')}）"""
             
-            logger.info("RAG query completed successfully")
+            logger.info(f"RAG query completed (retrieval {retrieval['retrieval_ms']:.1f} ms, LLM {llm_ms:.1f} ms)")
             
             return [types.TextContent(
                 type="text", 
@@ -232,34 +298,17 @@ class Neo4jRAGMCPServer:
             logger.info("Performing health check...")
             
             # Test Neo4j connection
-            driver = GraphDatabase.driver(
-                self.neo4j_uri,
-                auth=(self.neo4j_user, self.neo4j_password)
-            )
-            
-            with driver.session() as session:
+            async with self.get_driver().session() as session:
                 # Basic connectivity test
-                result = session.run("RETURN 1 as test")
-                result.single()
-                
-                # Get chunk statistics
-                chunk_result = session.run("""
-                    MATCH (n:Chunk) 
-                    WHERE n.text IS NOT NULL AND n.text <> '' 
-                    RETURN count(n) as valid_chunks
-                """)
-                valid_chunks = chunk_result.single()["valid_chunks"]
-                
-                # Get total chunks
-                total_result = session.run("MATCH (n:Chunk) RETURN count(n) as total")
-                total_chunks = total_result.single()["total"]
+                result = await session.run("RETURN 1 as test")
+                await result.single()
             
-            driver.close()
+            # Get chunk statistics
+            stats = await self.get_graph_stats()
             
             # Test AWS Bedrock connection
             try:
-                bedrock_runtime = boto3.client("bedrock-runtime", region_name=self.region)
-                # Simple test call
+                await asyncio.get_running_loop().run_in_executor(self.llm_executor, self.get_llm)
                 aws_status = "✅ Available"
             except Exception as e:
                 aws_status = f"⚠️ Warning: {str(e)}"
@@ -269,8 +318,8 @@ class Neo4jRAGMCPServer:
 **データベース**: ✅ 接続正常
 **AWS Bedrock**: {aws_status}
 **データ統計**:
-  - 総チャンク数: {total_chunks}
-  - 有効チャンク数: {valid_chunks}
+  - 総チャンク数: {stats["chunk_nodes"]}
+  - 有効チャンク数: {stats["valid_chunks"]}
   - データベースURI: {self.neo4j_uri}
   - AWSリージョン: {self.region}
 
@@ -296,40 +345,8 @@ class Neo4jRAGMCPServer:
         try:
             logger.info("Gathering database statistics...")
             
-            driver = GraphDatabase.driver(
-                self.neo4j_uri,
-                auth=(self.neo4j_user, self.neo4j_password)
-            )
-            
-            with driver.session() as session:
-                # Get comprehensive statistics
-                queries = {
-                    "total_nodes": "MATCH (n) RETURN count(n) as count",
-                    "chunk_nodes": "MATCH (n:Chunk) RETURN count(n) as count", 
-                    "valid_chunks": "MATCH (n:Chunk) WHERE n.text IS NOT NULL AND n.text <> '' RETURN count(n) as count",
-                    "entity_nodes": "MATCH (n:entity) RETURN count(n) as count",
-                    "empty_chunks": "MATCH (n:Chunk) WHERE n.text IS NULL OR n.text = '' RETURN count(n) as count"
-                }
-                
-                stats = {}
-                for key, query in queries.items():
-                    result = session.run(query)
-                    stats[key] = result.single()["count"]
-                
-                # Get sample of text lengths
-                text_lengths = session.run("""
-                    MATCH (n:Chunk) 
-                    WHERE n.text IS NOT NULL AND n.text <> ''
-                    RETURN size(n.text) as length
-                    ORDER BY length DESC
-                    LIMIT 5
-                """)
-                lengths = [record["length"] for record in text_lengths]
-                
-            driver.close()
-            
-            # Calculate percentages
-            chunk_fill_rate = (stats["valid_chunks"] / stats["chunk_nodes"] * 100) if stats["chunk_nodes"] > 0 else 0
+            # Count store and chunk counters in one query
+            stats = await self.get_graph_stats()
             
             stats_info = f"""📊 **Neo4j RAG Database Statistics**
 
@@ -341,9 +358,9 @@ class Neo4jRAGMCPServer:
   - Entityノード: {stats["entity_nodes"]:,}
 
 **データ品質**:
-  - Chunk充填率: {chunk_fill_rate:.1f}%
-  - 最大テキスト長: {max(lengths) if lengths else 0:,} 文字
-  - 平均テキスト長: {sum(lengths)//len(lengths) if lengths else 0:,} 文字
+  - Chunk充填率: {stats["chunk_fill_rate"]:.1f}%
+  - 最大テキスト長: {stats["max_text_length"]:,} 文字
+  - 平均テキスト長: {stats["avg_text_length"]:,} 文字
 
 **接続情報**:
   - データベースURI: {self.neo4j_uri}
@@ -374,12 +391,18 @@ class Neo4jRAGMCPServer:
             
         logger.info(f"Starting {self.app_name} MCP Server...")
         
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                self.server.create_initialization_options()
-            )
+        # Warm up alongside the MCP handshake; tool calls run as separate tasks on the event loop
+        warm_up = asyncio.create_task(self.warm_up())
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    self.server.create_initialization_options()
+                )
+        finally:
+            warm_up.cancel()
+            await self.close()
 
 def standalone_test():
     """Standalone test mode when MCP is not available."""
@@ -5,9 +5,10 @@ Flask application for SQLite web interface with API endpoints.
 
 import os
 import sqlite3
+import time
 import json
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_admin import Admin, BaseView, expose
 from flask_admin.contrib.sqla import ModelView
@@ -17,6 +18,11 @@ from sqlalchemy.orm import sessionmaker
 from flask_restful import Api, Resource
 from flask_cors import CORS
 
+from query_governor import QueryTooExpensive, is_select_query, normalize_max_rows, normalize_params
+from result_format import check_format, encode_json, format_rows
+from slow_query_log import execute_logged, index_advisor, slow_query_log
+from snapshot_manager import SnapshotManager, SnapshotCache, check_admin_token, handle_snapshot_admin
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -26,6 +32,13 @@ INPIT_DB_PATH = "/app/data/inpit.db"
 GOOGLE_PATENTS_DB_PATH = "/app/data/google_patents.db"  # Legacy path for compatibility
 GOOGLE_PATENTS_GCP_DB_PATH = "/app/data/google_patents_gcp.db"
 GOOGLE_PATENTS_S3_DB_PATH = "/app/data/google_patents_s3.db"
+# Snapshot managers by db_type: the fixed paths above are the base snapshots
+SNAPSHOT_MANAGERS = {
+    'inpit': SnapshotManager('inpit', INPIT_DB_PATH),
+    'google_patents': SnapshotManager('google_patents', GOOGLE_PATENTS_DB_PATH),
+    'google_patents_gcp': SnapshotManager('google_patents_gcp', GOOGLE_PATENTS_GCP_DB_PATH),
+    'google_patents_s3': SnapshotManager('google_patents_s3', GOOGLE_PATENTS_S3_DB_PATH)
+}
 # Default database path
 DB_PATH = INPIT_DB_PATH
 DB_URI = f"sqlite:///{DB_PATH}"
@@ -163,7 +176,7 @@ class InpitSQLExamplesView(BaseView):
     def query(self):
         """Execute a SQL query on inpit database and return results."""
         sql_query = request.form.get('query', '')
-        db_path = INPIT_DB_PATH
+        db_path = SNAPSHOT_MANAGERS['inpit'].active_path
         
         try:
             conn = sqlite3.connect(db_path)
@@ -214,7 +227,7 @@ class GooglePatentsGCPExamplesView(BaseView):
     def query(self):
         """Execute a SQL query on Google Patents GCP database and return results."""
         sql_query = request.form.get('query', '')
-        db_path = GOOGLE_PATENTS_GCP_DB_PATH
+        db_path = SNAPSHOT_MANAGERS['google_patents_gcp'].active_path
         
         try:
             conn = sqlite3.connect(db_path)
@@ -265,7 +278,7 @@ class GooglePatentsS3ExamplesView(BaseView):
     def query(self):
         """Execute a SQL query on Google Patents S3 database and return results."""
         sql_query = request.form.get('query', '')
-        db_path = GOOGLE_PATENTS_S3_DB_PATH
+        db_path = SNAPSHOT_MANAGERS['google_patents_s3'].active_path
         
         try:
             conn = sqlite3.connect(db_path)
@@ -437,11 +450,8 @@ def tables():
     """
     Return the list of tables in the database.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, _):
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
     return jsonify({"tables": tables})
 
 @app.route('/query', methods=['POST'])
@@ -452,18 +462,13 @@ def query():
     sql_query = request.form.get('query', '')
     db_type = request.form.get('db_type', 'inpit')
     
-    # Select database based on type
-    db_path = INPIT_DB_PATH
-    if db_type == 'google_patents':
-        db_path = GOOGLE_PATENTS_DB_PATH
-    elif db_type == 'google_patents_gcp':
-        db_path = GOOGLE_PATENTS_GCP_DB_PATH
-    elif db_type == 'google_patents_s3':
-        db_path = GOOGLE_PATENTS_S3_DB_PATH
+    # Select the active snapshot of the database
+    db_path = SNAPSHOT_MANAGERS.get(db_type, SNAPSHOT_MANAGERS['inpit']).active_path
     
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
+        start_time = time.monotonic()
         cursor.execute(sql_query)
         
         # Check if query returns data
@@ -477,6 +482,7 @@ def query():
                 
             results = cursor.fetchall()
             conn.close()
+            slow_query_log.record(db_type, sql_query, (time.monotonic() - start_time) * 1000, len(results))
             return jsonify({
                 "success": True,
                 "columns": display_columns,
@@ -504,9 +510,9 @@ def health():
     Check if the database is accessible.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.close()
-        return jsonify({"status": "healthy", "message": "Database is accessible."})
+        with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+            conn.execute("SELECT 1")
+        return jsonify({"status": "healthy", "message": "Database is accessible.", "snapshot_id": snapshot_id})
     except Exception as e:
         return jsonify({"status": "unhealthy", "message": str(e)}), 500
 
@@ -514,11 +520,21 @@ def health():
 api = Api(app)
 CORS(app)
 
+# Schema information per snapshot (cleared when the inpit snapshot changes)
+schema_cache = SnapshotCache(SNAPSHOT_MANAGERS['inpit'])
+
 # Helper function to get schema information
 def get_schema_info():
     """Get database schema information for API documentation."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        return schema_cache.get_or_compute('schema_info', _read_schema_info)
+    except Exception as e:
+        logger.error(f"Error getting schema info: {e}")
+        return {}
+
+def _read_schema_info():
+    """Read column information of every table in the active inpit snapshot."""
+    with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, _):
         cursor = conn.cursor()
         
         # Get table names
@@ -533,20 +549,13 @@ def get_schema_info():
             columns = [{'name': row[1], 'type': row[2]} for row in cursor.fetchall()]
             schema_info[table] = columns
         
-        conn.close()
         return schema_info
-    except Exception as e:
-        logger.error(f"Error getting schema info: {e}")
-        return {}
 
 
 # API Resource for application number queries
 class ApplicationNumberAPI(Resource):
     def get(self, app_number):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
             # Try to find column containing application number
             app_number_col = None
             for col, original in column_mapping.items():
@@ -558,17 +567,17 @@ class ApplicationNumberAPI(Resource):
                 app_number_col = "application_number"  # Fallback
             
             query = f"SELECT * FROM inpit_data WHERE {app_number_col} LIKE ? LIMIT 100"
-            cursor.execute(query, (f'%{app_number}%',))
-            
-            columns = [description[0] for description in cursor.description]
-            results = cursor.fetchall()
-            conn.close()
+            with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+                cursor = conn.execute(query, (f'%{app_number}%',))
+                columns = [description[0] for description in cursor.description]
+                results = cursor.fetchall()
             
             return {
                 "success": True,
                 "columns": columns,
                 "results": results,
-                "record_count": len(results)
+                "record_count": len(results),
+                "snapshot_id": snapshot_id
             }
         except Exception as e:
             logger.error(f"Error in application number query: {e}")
@@ -578,9 +587,6 @@ class ApplicationNumberAPI(Resource):
 class ApplicantAPI(Resource):
     def get(self, applicant_name):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
             # Try to find column containing applicant
             applicant_col = None
             for col, original in column_mapping.items():
@@ -592,17 +598,17 @@ class ApplicantAPI(Resource):
                 applicant_col = "applicant_name"  # Fallback
             
             query = f"SELECT * FROM inpit_data WHERE {applicant_col} LIKE ? LIMIT 100"
-            cursor.execute(query, (f'%{applicant_name}%',))
-            
-            columns = [description[0] for description in cursor.description]
-            results = cursor.fetchall()
-            conn.close()
+            with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+                cursor = conn.execute(query, (f'%{applicant_name}%',))
+                columns = [description[0] for description in cursor.description]
+                results = cursor.fetchall()
             
             return {
                 "success": True,
                 "columns": columns,
                 "results": results,
-                "record_count": len(results)
+                "record_count": len(results),
+                "snapshot_id": snapshot_id
             }
         except Exception as e:
             logger.error(f"Error in applicant query: {e}")
@@ -617,46 +623,83 @@ class SQLQueryAPI(Resource):
                 return {"error": "Missing 'query' field in JSON body"}, 400
             
             sql_query = data['query']
-            logger.info(f"Direct SQL query: {sql_query}")
+            try:
+                # Optional bound parameters: a list for "?" or an object for ":name" placeholders
+                params = normalize_params(data.get('params'))
+                # Optional row cap (bounded by the governor ceiling)
+                max_rows = normalize_max_rows(data.get('max_rows'))
+                # Optional result format: "rows" (arrays, default), "objects" or "columns" (column-major)
+                result_format = check_format(data.get('format'), 'rows')
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            logger.info(f"Direct SQL query: {sql_query}" + (f" with params {params}" if params else ""))
             
-            # Basic security check - only allow SELECT queries
-            if not sql_query.strip().lower().startswith('select'):
+            # Basic security check - only allow SELECT queries (optionally with a WITH clause)
+            if not is_select_query(sql_query):
                 return {"error": "Only SELECT queries are allowed"}, 403
             
-            # Execute the query
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
+            # Execute the query on the active snapshot within the cost, time and row budget
+            with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+                result = execute_logged(conn, 'inpit', sql_query, params, max_rows=max_rows)
             
-            columns = [description[0] for description in cursor.description]
-            results = cursor.fetchall()
-            conn.close()
-            
-            return {
+            body, headers = encode_json({
                 "success": True,
-                "columns": columns,
-                "results": results,
-                "record_count": len(results)
-            }
+                "columns": result["columns"],
+                "format": result_format,
+                "results": format_rows(result["columns"], result["rows"], result_format),
+                "record_count": result["row_count"],
+                "truncated": result["truncated"],
+                "snapshot_id": snapshot_id
+            }, request.headers.get('Accept-Encoding'))
+            return Response(body, headers=headers)
+        except QueryTooExpensive as e:
+            logger.warning(f"Rejected expensive SQL query: {e}")
+            return e.to_dict(), 422
         except Exception as e:
             logger.error(f"Error in SQL query: {e}")
             return {"error": str(e)}, 500
 
+# API Resource for the slow-query log and index advisor
+class QueryAdvisorAPI(Resource):
+    def get(self):
+        """Aggregate slow queries by fingerprint and recommend indexes (X-Admin-Token header, optional 'limit')"""
+        if not check_admin_token(request.headers.get('X-Admin-Token')):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        try:
+            with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, _):
+                return index_advisor.advise(conn, 'inpit', int(request.args.get('limit', 10)))
+        except Exception as e:
+            logger.error(f"Error in query advisor: {e}")
+            return {"error": str(e)}, 500
+
+# API Resource for snapshot management
+class SnapshotAdminAPI(Resource):
+    def get(self):
+        """Active snapshot, in-flight queries and snapshot files of every database"""
+        return {db_type: manager.status() for db_type, manager in SNAPSHOT_MANAGERS.items()}
+    
+    def post(self):
+        """Flip, register or clean up snapshots (JSON body with 'db_type', 'action', 'snapshot_id'/'path')"""
+        if not check_admin_token(request.headers.get('X-Admin-Token')):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        data = request.get_json() or {}
+        logger.info(f"Snapshot admin request: action={data.get('action')} db_type={data.get('db_type')}")
+        return handle_snapshot_admin(SNAPSHOT_MANAGERS, data)
+
 # Register API resources
 api.add_resource(ApplicationNumberAPI, '/api/application/<string:app_number>')
 api.add_resource(ApplicantAPI, '/api/applicant/<string:applicant_name>')
 api.add_resource(SQLQueryAPI, '/api/sql-query')
+api.add_resource(QueryAdvisorAPI, '/api/query-advisor')
+api.add_resource(SnapshotAdminAPI, '/api/admin/snapshots')
 
 # API status and documentation endpoint
 @app.route('/api/status')
 def api_status():
     """Return API status and documentation."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM inpit_data")
-        count = cursor.fetchone()[0]
-        conn.close()
+        with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+            count = conn.execute("SELECT COUNT(*) FROM inpit_data").fetchone()[0]
         
         # Get schema info for documentation
         schema = get_schema_info()
@@ -665,10 +708,14 @@ def api_status():
             "status": "active",
             "database": "connected",
             "record_count": count,
+            "snapshot_id": snapshot_id,
             "endpoints": {
                 "GET /api/application/{app_number}": "Query by application number",
                 "GET /api/applicant/{applicant_name}": "Query by applicant name",
-                "POST /api/sql-query": "Direct SQL query (JSON body with 'query' field)",
+                "POST /api/sql-query": "Direct SQL query (JSON body with 'query' field and optional 'params' array/object and 'format' rows/objects/columns)",
+                "GET /api/query-advisor": "Slow-query fingerprints and index recommendations (X-Admin-Token header, optional 'limit')",
+                "GET /api/admin/snapshots": "Active database snapshots",
+                "POST /api/admin/snapshots": "Activate, register or clean up snapshots (JSON body with 'db_type', 'action', 'snapshot_id'/'path')",
                 "GET /api/status": "This API status endpoint"
             },
             "schema": schema
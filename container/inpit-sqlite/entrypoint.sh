@@ -94,6 +94,13 @@ if [ -f "$DB_PATH" ]; then
     chmod 666 "$DB_PATH" 2>/dev/null || echo "Cannot set permissions on DB file - continuing anyway"
 fi
 
+# Keep the Google Patents GCP database current with incremental imports
+# (opt-in: set PATENTS_INCREMENTAL_INTERVAL_MINUTES to enable the schedule)
+if [ "${SKIP_DATA_DOWNLOAD}" != "true" ] && [ "${PATENTS_INCREMENTAL_INTERVAL_MINUTES:-0}" != "0" ]; then
+    echo "Starting scheduled incremental Google Patents import..."
+    python /app/download_data.py --incremental --schedule &
+fi
+
 # Start SQLite Web UI
 echo "Starting SQLite Web UI on port 5001..."
 cd /app && python app.py
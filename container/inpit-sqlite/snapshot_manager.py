@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Hot-swappable read-only database snapshots.
+
+New database builds land in versioned files under
+<data dir>/snapshots/<db name>/<snapshot id>.db. An ACTIVE pointer file in the same
+directory names the snapshot that serves queries; flipping it is an atomic rename,
+so other processes (e.g. a rebuild job) can flip it as well. Until a snapshot is
+activated, the original fixed database path is served as the "base" snapshot.
+
+Read queries borrow pooled read-only connections from the manager. Connections
+that are in use when the active snapshot changes keep reading the old file until
+the query finishes and are closed on return; idle connections of the old snapshot
+are closed immediately. Old snapshot files are only deleted when no query uses
+them. SnapshotCache values are keyed by snapshot id and cleared on every flip.
+
+Registering a build adds the generated trend columns (trend_columns.py) to it, and
+snapshots whose publications table lacks them are rejected on activation.
+
+This module is shared by the SQLite API services (patentDWH/db, container/inpit-sqlite,
+AI_integrated_search_mcp/db); keep the copies identical.
+"""
+
+import os
+import hmac
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from trend_columns import ensure_trend_columns_at, missing_trend_columns
+
+logger = logging.getLogger(__name__)
+
+# Idle read-only connections kept per database
+SNAPSHOT_POOL_SIZE = int(os.environ.get('SNAPSHOT_POOL_SIZE', '4'))
+# Compiled statements cached per pooled connection (keyed by SQL text, so
+# parameterized queries reuse the plan of their template)
+SNAPSHOT_STATEMENT_CACHE_SIZE = int(os.environ.get('SNAPSHOT_STATEMENT_CACHE_SIZE', '256'))
+# Inactive snapshot files kept per database (older ones are deleted when unused)
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', '2'))
+# Token required by the admin endpoints (X-Admin-Token header); unset disables them
+SNAPSHOT_ADMIN_TOKEN = os.environ.get('SNAPSHOT_ADMIN_TOKEN')
+
+# Seconds between checks of the ACTIVE pointer file for flips by other processes
+POINTER_CHECK_INTERVAL = 1.0
+ACTIVE_POINTER_FILE = "ACTIVE"
+# Directory under the data directory from which finished builds may be registered
+BUILD_DIR_NAME = "builds"
+BASE_SNAPSHOT_ID = "base"
+SNAPSHOT_SUFFIX = ".db"
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """True if an admin token is configured and the given token matches (fails closed)"""
+    if not SNAPSHOT_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), SNAPSHOT_ADMIN_TOKEN.encode("utf-8"))
+
+
+class SnapshotManager:
+    """Tracks the active snapshot of one database and pools connections to it"""
+
+    def __init__(self, name: str, base_path: str, snapshot_dir: Optional[str] = None,
+                 pool_size: int = SNAPSHOT_POOL_SIZE, keep: int = SNAPSHOT_KEEP):
+        """
+        Args:
+            name: Database name (used for the snapshot directory)
+            base_path: Fixed database path served while no snapshot is active
+            snapshot_dir: Directory of versioned files (default: <base dir>/snapshots/<name>)
+            pool_size: Idle read-only connections kept
+            keep: Inactive snapshot files kept
+        """
+        self.name = name
+        self.base_path = str(base_path)
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(self.base_path), "snapshots", name)
+        self.build_dir = os.path.join(os.path.dirname(self.base_path), BUILD_DIR_NAME)
+        self.pool_size = pool_size
+        self.keep = keep
+        self._lock = threading.RLock()
+        self._idle: Dict[str, List[sqlite3.Connection]] = {}
+        self._in_use: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._pointer_mtime: Optional[float] = None
+        self._pointer_checked = 0.0
+        self._active_id = self._read_pointer() or BASE_SNAPSHOT_ID
+
+    # -- paths and pointer -------------------------------------------------
+
+    def snapshot_path(self, snapshot_id: str) -> str:
+        """File path of a snapshot id"""
+        if snapshot_id == BASE_SNAPSHOT_ID:
+            return self.base_path
+        if os.sep in snapshot_id or snapshot_id.startswith("."):
+            raise ValueError(f"Invalid snapshot id: {snapshot_id}")
+        return os.path.join(self.snapshot_dir, snapshot_id + SNAPSHOT_SUFFIX)
+
+    def sidecar_path(self, snapshot_id: str, filename: str) -> str:
+        """
+        Path of a file belonging to a snapshot (e.g. its column mapping)
+
+        The base snapshot's files live in the data directory, those of versioned
+        snapshots next to the snapshot file as <snapshot id>.<filename>.
+        """
+        if snapshot_id == BASE_SNAPSHOT_ID:
+            return os.path.join(os.path.dirname(self.base_path), filename)
+        return self.snapshot_path(snapshot_id)[:-len(SNAPSHOT_SUFFIX)] + "." + filename
+
+    def new_snapshot_id(self) -> str:
+        """Unused timestamp-based snapshot id"""
+        base_id = time.strftime("%Y%m%dT%H%M%S")
+        snapshot_id, suffix = base_id, 1
+        while os.path.exists(self.snapshot_path(snapshot_id)):
+            snapshot_id = f"{base_id}_{suffix}"
+            suffix += 1
+        return snapshot_id
+
+    def new_snapshot_path(self) -> Tuple[str, str]:
+        """(snapshot id, path) for a build written directly into the snapshot directory"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        snapshot_id = self.new_snapshot_id()
+        return snapshot_id, self.snapshot_path(snapshot_id)
+
+    def _pointer_path(self) -> str:
+        return os.path.join(self.snapshot_dir, ACTIVE_POINTER_FILE)
+
+    def _read_pointer(self) -> Optional[str]:
+        """Snapshot id named by the ACTIVE file, if it exists and points to a file"""
+        try:
+            stat = os.stat(self._pointer_path())
+            with open(self._pointer_path(), "r", encoding="utf-8") as f:
+                snapshot_id = f.read().strip()
+        except OSError:
+            self._pointer_mtime = None
+            return None
+        self._pointer_mtime = stat.st_mtime
+        if snapshot_id and os.path.exists(self.snapshot_path(snapshot_id)):
+            return snapshot_id
+        logger.warning(f"Active snapshot '{snapshot_id}' of {self.name} not found, using base database")
+        return None
+
+    def _write_pointer(self, snapshot_id: str):
+        """Atomically replace the ACTIVE file"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{self._pointer_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(snapshot_id)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._pointer_path())
+        self._pointer_mtime = os.stat(self._pointer_path()).st_mtime
+
+    def _check_pointer(self):
+        """Pick up flips made by other processes (throttled)"""
+        now = time.monotonic()
+        if now - self._pointer_checked < POINTER_CHECK_INTERVAL:
+            return
+        self._pointer_checked = now
+        try:
+            mtime = os.stat(self._pointer_path()).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._pointer_mtime:
+            snapshot_id = self._read_pointer() or BASE_SNAPSHOT_ID
+            if snapshot_id != self._active_id:
+                self._switch(snapshot_id)
+
+    # -- activation --------------------------------------------------------
+
+    @property
+    def active_id(self) -> str:
+        with self._lock:
+            self._check_pointer()
+            return self._active_id
+
+    @property
+    def active_path(self) -> str:
+        return self.snapshot_path(self.active_id)
+
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """Register callback(old_id, new_id) called after every flip"""
+        self._listeners.append(callback)
+
+    @staticmethod
+    def validate(path: str):
+        """
+        Raise ValueError unless path is a readable, intact SQLite database with tables
+
+        A publications table must also have the generated trend columns and indexes.
+        """
+        if not os.path.isfile(path):
+            raise ValueError(f"Snapshot file not found: {path}")
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise ValueError(f"Snapshot failed integrity check: {result}")
+            tables = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+            if not tables:
+                raise ValueError("Snapshot contains no tables")
+            missing = missing_trend_columns(conn)
+            if missing:
+                raise ValueError(f"Snapshot lacks trend columns/indexes: {', '.join(missing)}")
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"Snapshot is not a valid SQLite database: {e}") from e
+        finally:
+            conn.close()
+
+    def register(self, source_path: str, snapshot_id: Optional[str] = None) -> str:
+        """
+        Move a finished database build from the build directory into the snapshot directory
+
+        Returns:
+            The snapshot id
+
+        The trend columns are added to the build before it is validated.
+
+        Raises:
+            ValueError: If the source is the base database, lies outside the build
+                directory or is not a valid database
+        """
+        source_path = os.path.realpath(source_path)
+        build_dir = os.path.realpath(self.build_dir)
+        if source_path == os.path.realpath(self.base_path):
+            raise ValueError("Cannot register the base database as a snapshot")
+        if not source_path.startswith(build_dir + os.sep):
+            raise ValueError(f"Snapshot source must be inside the build directory {self.build_dir}")
+        if os.path.isfile(source_path):
+            ensure_trend_columns_at(source_path)
+        self.validate(source_path)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        snapshot_id = snapshot_id or self.new_snapshot_id()
+        target_path = self.snapshot_path(snapshot_id)
+        if os.path.exists(target_path):
+            raise ValueError(f"Snapshot already exists: {snapshot_id}")
+        shutil.move(source_path, target_path)
+        logger.info(f"Registered snapshot {snapshot_id} of {self.name}")
+        return snapshot_id
+
+    def activate(self, snapshot_id: str) -> Dict[str, Any]:
+        """
+        Atomically make snapshot_id the active snapshot
+
+        Queries already running finish on the previous file. Returns the status.
+        """
+        self.validate(self.snapshot_path(snapshot_id))
+        with self._lock:
+            self._write_pointer(snapshot_id)
+            self._switch(snapshot_id)
+        self.cleanup()
+        return self.status()
+
+    def _switch(self, snapshot_id: str):
+        """Swap the in-memory pointer, drain idle connections and notify listeners"""
+        with self._lock:
+            old_id = self._active_id
+            self._active_id = snapshot_id
+            idle = self._idle.pop(old_id, [])
+        for conn in idle:
+            conn.close()
+        logger.info(f"Active snapshot of {self.name} changed from {old_id} to {snapshot_id}")
+        for callback in self._listeners:
+            try:
+                callback(old_id, snapshot_id)
+            except Exception as e:
+                logger.warning(f"Snapshot listener failed: {e}")
+
+    # -- connections -------------------------------------------------------
+
+    @contextmanager
+    def connection(self) -> Iterator[Tuple[sqlite3.Connection, str]]:
+        """
+        Borrow a read-only connection to the active snapshot
+
+        Yields:
+            (connection, snapshot id)
+        """
+        with self._lock:
+            self._check_pointer()
+            snapshot_id = self._active_id
+            idle = self._idle.get(snapshot_id)
+            conn = idle.pop() if idle else None
+            self._in_use[snapshot_id] = self._in_use.get(snapshot_id, 0) + 1
+        try:
+            if conn is None:
+                path = self.snapshot_path(snapshot_id)
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Database not found: {path}")
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False,
+                                       cached_statements=SNAPSHOT_STATEMENT_CACHE_SIZE)
+            yield conn, snapshot_id
+        finally:
+            with self._lock:
+                self._in_use[snapshot_id] -= 1
+                idle = self._idle.setdefault(snapshot_id, []) if snapshot_id == self._active_id else None
+                if conn is not None and idle is not None and len(idle) < self.pool_size:
+                    idle.append(conn)
+                    conn = None
+            if conn is not None:
+                # Drain: connections of a replaced snapshot (or beyond the pool size) are closed
+                conn.close()
+
+    # -- housekeeping ------------------------------------------------------
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshot files, newest first"""
+        snapshots = []
+        if os.path.isdir(self.snapshot_dir):
+            for filename in os.listdir(self.snapshot_dir):
+                if not filename.endswith(SNAPSHOT_SUFFIX):
+                    continue
+                path = os.path.join(self.snapshot_dir, filename)
+                stat = os.stat(path)
+                snapshots.append({
+                    "snapshot_id": filename[:-len(SNAPSHOT_SUFFIX)],
+                    "path": path,
+                    "size_bytes": stat.st_size,
+                    "modified": stat.st_mtime
+                })
+        snapshots.sort(key=lambda s: s["modified"], reverse=True)
+        return snapshots
+
+    def cleanup(self) -> List[str]:
+        """Delete unused inactive snapshot files beyond the newest `keep`"""
+        removed = []
+        with self._lock:
+            inactive = [s for s in self.list_snapshots() if s["snapshot_id"] != self._active_id]
+            for snapshot in inactive[self.keep:]:
+                if self._in_use.get(snapshot["snapshot_id"]):
+                    continue
+                for conn in self._idle.pop(snapshot["snapshot_id"], []):
+                    conn.close()
+                os.remove(snapshot["path"])
+                prefix = snapshot["snapshot_id"] + "."
+                for filename in os.listdir(self.snapshot_dir):
+                    if filename.startswith(prefix):
+                        os.remove(os.path.join(self.snapshot_dir, filename))
+                removed.append(snapshot["snapshot_id"])
+        if removed:
+            logger.info(f"Removed old snapshots of {self.name}: {', '.join(removed)}")
+        return removed
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._check_pointer()
+            return {
+                "database": self.name,
+                "active_snapshot": self._active_id,
+                "active_path": self.snapshot_path(self._active_id),
+                "in_flight": {k: v for k, v in self._in_use.items() if v},
+                "idle_connections": sum(len(conns) for conns in self._idle.values()),
+                "snapshots": self.list_snapshots()
+            }
+
+
+class SnapshotCache:
+    """Cache whose entries belong to one snapshot and are dropped when it is replaced"""
+
+    def __init__(self, manager: SnapshotManager):
+        self.manager = manager
+        self._values: Dict[Tuple[str, Any], Any] = {}
+        self._lock = threading.Lock()
+        manager.add_listener(lambda old_id, new_id: self.clear())
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """Cached value of key for the active snapshot, computed on a miss"""
+        cache_key = (self.manager.active_id, key)
+        with self._lock:
+            if cache_key in self._values:
+                return self._values[cache_key]
+        value = compute()
+        with self._lock:
+            self._values[cache_key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def handle_snapshot_admin(managers: Dict[str, SnapshotManager], data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Shared handler for the snapshot admin endpoints
+
+    JSON body:
+        db_type: Database name (key of managers)
+        action: "activate" (snapshot_id), "register" (path of a build inside the build
+                directory <data dir>/builds, optional snapshot_id and activate) or "cleanup"
+
+    Returns:
+        (response dict, HTTP status)
+    """
+    manager = managers.get(data.get("db_type"))
+    if manager is None:
+        return {"error": f"Unknown db_type: {data.get('db_type')}"}, 400
+
+    action = data.get("action", "activate")
+    try:
+        if action == "activate":
+            if not data.get("snapshot_id"):
+                return {"error": "Missing 'snapshot_id'"}, 400
+            return manager.activate(data["snapshot_id"]), 200
+        if action == "register":
+            if not data.get("path"):
+                return {"error": "Missing 'path'"}, 400
+            snapshot_id = manager.register(data["path"], data.get("snapshot_id"))
+            if data.get("activate"):
+                return manager.activate(snapshot_id), 200
+            return {"registered": snapshot_id, **manager.status()}, 200
+        if action == "cleanup":
+            return {"removed": manager.cleanup(), **manager.status()}, 200
+        return {"error": f"Unknown action: {action}"}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
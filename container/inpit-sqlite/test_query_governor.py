@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the query governor's cost estimate on an inpit_data table of realistic size
+
+The competitor ranking and similarity queries of inpit-sqlite-mcp
+(competitor_discovery.py) are planned here and must pass check().
+
+Run with: python -m pytest test_query_governor.py (or python test_query_governor.py)
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import unittest
+
+from query_governor import (
+    QUERY_MAX_ESTIMATED_ROWS, QueryGovernor, QueryTooExpensive, normalize_max_rows,
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "inpit-sqlite-mcp", "app"))
+from competitor_discovery import CompetitorDiscovery  # noqa: E402
+
+ROWS = 100000
+IPC_CODES = ["G06F 16/00", "G06N 3/08", "H04L 9/32", "A61B 5/00", "B60W 30/00", "G06F 3/01"]
+
+
+def _inpit_data(indexed: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE inpit_data (開放特許情報番号 TEXT, 出願人 TEXT, 出願日 TEXT, 国際特許分類_IPC_ TEXT)")
+    rng = random.Random(26)
+    conn.executemany("INSERT INTO inpit_data VALUES (?, ?, ?, ?)", [
+        (str(i), f"applicant{rng.randrange(5000)}", f"{rng.randrange(2000, 2024)}-04-01", rng.choice(IPC_CODES))
+        for i in range(ROWS)
+    ])
+    if indexed:
+        conn.execute("CREATE INDEX idx_applicant ON inpit_data (出願人)")
+        conn.execute("CREATE INDEX idx_ipc ON inpit_data (国際特許分類_IPC_)")
+    return conn
+
+
+class QueryGovernorEstimateTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.connections = {"indexed": _inpit_data(True), "unindexed": _inpit_data(False)}
+        cls.discovery = CompetitorDiscovery(query_executor=lambda request: {"success": False})
+
+    def setUp(self):
+        self.governor = QueryGovernor()
+
+    def test_competitor_queries_pass_the_budget(self):
+        ranking = self.discovery.build_ranking_query(
+            "applicant1", [("G06F", 0.5), ("H04L", 0.3), ("G06N", 0.2)], 10)
+        similar = self.discovery.build_aggregate_query([("applicant2", 0.9), ("applicant3", 0.8)])
+        for layout, conn in self.connections.items():
+            for name, (query, params) in (("ranking", ranking), ("similar", similar)):
+                with self.subTest(layout=layout, query=name):
+                    estimated_rows, _ = self.governor.check(conn, query, params)
+                    # Each visits inpit_data a few times, not a thousand
+                    self.assertLess(estimated_rows, 10 * ROWS)
+                    self.assertLess(estimated_rows, QUERY_MAX_ESTIMATED_ROWS)
+
+    def test_values_cte_is_charged_by_its_row_count(self):
+        conn = self.connections["unindexed"]
+        estimated_rows, _ = self.governor.estimate(conn, """
+            WITH target(prefix) AS (VALUES ('G06F'), ('H04L'), ('G06N'))
+            SELECT t.prefix, COUNT(*) FROM inpit_data d
+            JOIN target t ON d.国際特許分類_IPC_ LIKE t.prefix || '%'
+            GROUP BY t.prefix
+        """)
+        self.assertLessEqual(estimated_rows, 3 * ROWS + 10)
+
+    def test_limit_caps_streamed_rows_only(self):
+        conn = self.connections["unindexed"]
+        streamed, _ = self.governor.estimate(conn, "SELECT * FROM inpit_data WHERE 出願日 > '2010' LIMIT 50")
+        counted, _ = self.governor.estimate(conn, "SELECT COUNT(*) FROM inpit_data LIMIT 1")
+        sorted_rows, _ = self.governor.estimate(conn, "SELECT * FROM inpit_data ORDER BY 出願日 LIMIT 50")
+        self.assertEqual(streamed, 50)
+        self.assertEqual(counted, ROWS)
+        self.assertEqual(sorted_rows, ROWS)
+
+    def test_cartesian_join_is_rejected(self):
+        conn = self.connections["unindexed"]
+        with self.assertRaises(QueryTooExpensive) as raised:
+            self.governor.check(conn, "SELECT * FROM inpit_data a, inpit_data b")
+        self.assertEqual(raised.exception.reason, "estimated_cost")
+
+
+class NormalizeMaxRowsTest(unittest.TestCase):
+    def test_accepts_positive_integers(self):
+        self.assertIsNone(normalize_max_rows(None))
+        self.assertEqual(normalize_max_rows(50), 50)
+        self.assertEqual(normalize_max_rows("50"), 50)
+
+    def test_rejects_bad_values(self):
+        for value in ("abc", 0, -5, 2.5, True, [10]):
+            with self.assertRaises(ValueError):
+                normalize_max_rows(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
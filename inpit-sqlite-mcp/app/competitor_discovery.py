@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Competitor Discovery Module
+
+This module ranks competitors of a patent applicant for the Inpit SQLite MCP Server.
+Competitors sharing IPC prefixes with the applicant are scored and ranked in a single
+SQL statement (CTE + ROW_NUMBER()), and their aggregates (total patents, top IPC codes,
+recent yearly counts) are returned in the same round trip. Applicant names,
+IPC prefixes and scores are bound as ? parameters of the SQL API.
+
+It also provides a cosine-similarity search over per-applicant IPC subclass count
+vectors. The vectors are loaded once from the database into a NumPy datamart and
+cached, so top-k lookups only cost a sparse dot product.
+
+A query that fails in the SQL API (for example rejected by the query governor)
+raises CompetitorQueryError with the API's structured error, so it is not
+mistaken for "no competitors".
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the IPC vector datamart is reloaded from the database
+DATAMART_TTL = int(os.environ.get('COMPETITOR_DATAMART_TTL', '3600'))
+
+# Number of IPC codes / years returned per competitor
+TOP_IPC_PER_COMPETITOR = 3
+RECENT_YEARS_PER_COMPETITOR = 5
+
+# Row cap requested when loading the datamart (one row per applicant and IPC subclass)
+DATAMART_MAX_ROWS = int(os.environ.get('COMPETITOR_DATAMART_MAX_ROWS', '1000000'))
+
+# First whitespace-separated IPC code and the year part of the filing date
+_FIRST_IPC_EXPR = (
+    "CASE WHEN instr(trim(d.国際特許分類_IPC_), ' ') > 0 "
+    "THEN substr(trim(d.国際特許分類_IPC_), 1, instr(trim(d.国際特許分類_IPC_), ' ') - 1) "
+    "ELSE trim(d.国際特許分類_IPC_) END"
+)
+_YEAR_EXPR = (
+    "CASE WHEN instr(d.出願日, '-') > 0 "
+    "THEN substr(d.出願日, 1, instr(d.出願日, '-') - 1) "
+    "ELSE d.出願日 END"
+)
+
+# Aggregates for the competitors listed in the `top_competitors` CTE.
+# Rows come back tagged by `kind` so one statement carries all of them.
+_AGGREGATE_SQL = f"""
+competitor_rows AS (
+    SELECT d.出願人 AS name, {_FIRST_IPC_EXPR} AS ipc, {_YEAR_EXPR} AS year
+    FROM inpit_data d
+    JOIN top_competitors c ON d.出願人 = c.name
+),
+ipc_counts AS (
+    SELECT name, ipc, COUNT(*) AS cnt,
+           ROW_NUMBER() OVER (PARTITION BY name ORDER BY COUNT(*) DESC, ipc) AS rn
+    FROM competitor_rows
+    WHERE ipc IS NOT NULL AND ipc != ''
+    GROUP BY name, ipc
+),
+year_counts AS (
+    SELECT name, year, COUNT(*) AS cnt,
+           ROW_NUMBER() OVER (PARTITION BY name ORDER BY year DESC) AS rn
+    FROM competitor_rows
+    WHERE year IS NOT NULL AND year != ''
+    GROUP BY name, year
+)
+SELECT 'summary' AS kind, c.name AS name, c.rank AS rank, c.score AS score,
+       c.shared_areas AS shared_areas,
+       (SELECT COUNT(*) FROM competitor_rows r WHERE r.name = c.name) AS value,
+       NULL AS label
+FROM top_competitors c
+UNION ALL
+SELECT 'ipc', name, rn, NULL, NULL, cnt, ipc FROM ipc_counts WHERE rn <= {TOP_IPC_PER_COMPETITOR}
+UNION ALL
+SELECT 'year', name, rn, NULL, NULL, cnt, year FROM year_counts WHERE rn <= {RECENT_YEARS_PER_COMPETITOR}
+"""
+
+
+class CompetitorQueryError(Exception):
+    """A competitor query failed in the SQL API; result is the structured error it returned"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("error") or result.get("message") or "Competitor query failed")
+        self.result = result
+
+
+class IPCVectorDatamart:
+    """Per-applicant IPC subclass count vectors stored in coordinate form"""
+
+    def __init__(self, names: List[str], subclasses: List[str],
+                 rows: np.ndarray, cols: np.ndarray, counts: np.ndarray):
+        self.names = names
+        self.subclasses = subclasses
+        self.subclass_index = {code: i for i, code in enumerate(subclasses)}
+        self.rows = rows
+        self.cols = cols
+        self.counts = counts
+        self.norms = np.sqrt(np.bincount(rows, weights=counts * counts, minlength=len(names)))
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "IPCVectorDatamart":
+        """Build the datamart from (出願人, subclass, count) rows"""
+        name_index: Dict[str, int] = {}
+        subclass_index: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+
+        for record in records:
+            name = record.get("出願人")
+            subclass = record.get("subclass")
+            count = record.get("count")
+            if not name or not subclass or not count:
+                continue
+            rows.append(name_index.setdefault(name, len(name_index)))
+            cols.append(subclass_index.setdefault(subclass, len(subclass_index)))
+            counts.append(count)
+
+        return cls(
+            names=list(name_index),
+            subclasses=list(subclass_index),
+            rows=np.asarray(rows, dtype=np.int64),
+            cols=np.asarray(cols, dtype=np.int64),
+            counts=np.asarray(counts, dtype=np.float64)
+        )
+
+    def vector_for(self, applicant_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build the query vector for an applicant
+
+        Rows whose name contains applicant_name are summed, matching the partial-match
+        semantics of the applicant lookup API.
+
+        Returns:
+            Tuple of (dense subclass vector, boolean mask of the applicant's own rows)
+        """
+        own = np.fromiter((applicant_name in name for name in self.names),
+                          dtype=bool, count=len(self.names))
+        selected = own[self.rows]
+        vector = np.bincount(self.cols[selected], weights=self.counts[selected],
+                             minlength=len(self.subclasses))
+        return vector, own
+
+    def top_k(self, applicant_name: str, k: int) -> List[Tuple[str, float]]:
+        """Return the k applicants with the highest cosine similarity to applicant_name"""
+        vector, own = self.vector_for(applicant_name)
+        vector_norm = np.linalg.norm(vector)
+        if vector_norm == 0:
+            return []
+
+        dots = np.bincount(self.rows, weights=self.counts * vector[self.cols],
+                           minlength=len(self.names))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(self.norms > 0, dots / (self.norms * vector_norm), 0.0)
+        scores[own] = -1.0
+
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.names[i], float(scores[i])) for i in candidates]
+
+
+class CompetitorDiscovery:
+    """Single-query competitor ranking and IPC-vector similarity search"""
+
+    def __init__(self, query_executor: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 datamart_ttl: int = DATAMART_TTL):
+        """
+        Initialize the discovery engine
+
+        Args:
+            query_executor: Callable taking {"query": sql, "params": [...]} and
+                returning the InpitSQLiteMCPServer._execute_sql_query result format
+            datamart_ttl: Seconds before the similarity datamart is reloaded
+        """
+        self.query_executor = query_executor
+        self.datamart_ttl = datamart_ttl
+        self._datamart: Optional[IPCVectorDatamart] = None
+        self._datamart_lock = threading.Lock()
+
+    def build_ranking_query(self, applicant_name: str, ipc_weights: List[Tuple[str, float]],
+                            num_competitors: int) -> Tuple[str, List[Any]]:
+        """
+        Build the SQL that ranks competitors over shared IPC prefixes
+
+        Each competitor scores the sum of the weights of the applicant's IPC prefixes
+        it also files in; ties are broken by the number of shared patents.
+
+        Returns:
+            Tuple of (SQL with ? placeholders, parameters)
+        """
+        target_values = ", ".join("(?, ?)" for _ in ipc_weights)
+        params: List[Any] = [value for prefix, weight in ipc_weights for value in (prefix, float(weight))]
+        params += [applicant_name, int(num_competitors)]
+        query = f"""
+            SELECT * FROM (
+            WITH target_ipc(prefix, weight) AS (VALUES {target_values}),
+            candidates AS (
+                SELECT d.出願人 AS name, t.prefix AS prefix, t.weight AS weight,
+                       COUNT(*) AS shared_count
+                FROM inpit_data d
+                JOIN target_ipc t ON d.国際特許分類_IPC_ LIKE t.prefix || '%'
+                WHERE d.出願人 IS NOT NULL AND d.出願人 != ''
+                AND d.出願人 != ?
+                GROUP BY d.出願人, t.prefix
+            ),
+            ranked AS (
+                SELECT name, SUM(weight) AS score, COUNT(*) AS shared_areas,
+                       ROW_NUMBER() OVER (
+                           ORDER BY SUM(weight) DESC, SUM(shared_count) DESC, name
+                       ) AS rank
+                FROM candidates
+                GROUP BY name
+            ),
+            top_competitors AS (
+                SELECT name, rank, score, shared_areas FROM ranked
+                WHERE rank <= ?
+            ),
+            {_AGGREGATE_SQL}
+            )
+        """
+        return query, params
+
+    def build_aggregate_query(self, scored_names: List[Tuple[str, float]]) -> Tuple[str, List[Any]]:
+        """
+        Build the SQL returning aggregates for an already ranked list of competitors
+
+        Returns:
+            Tuple of (SQL with ? placeholders, parameters)
+        """
+        values = ", ".join("(?, ?, ?, NULL)" for _ in scored_names)
+        params = [
+            value
+            for rank, (name, score) in enumerate(scored_names, start=1)
+            for value in (name, rank, float(score))
+        ]
+        query = f"""
+            SELECT * FROM (
+            WITH top_competitors(name, rank, score, shared_areas) AS (VALUES {values}),
+            {_AGGREGATE_SQL}
+            )
+        """
+        return query, params
+
+    def discover(self, applicant_name: str, top_technologies: List[Dict[str, Any]],
+                 num_competitors: int) -> List[Dict[str, Any]]:
+        """
+        Rank competitors by weighted IPC overlap in one round trip
+
+        Args:
+            applicant_name: Name of the main applicant
+            top_technologies: The applicant's [{"ipc", "count"}] technology list
+            num_competitors: Number of competitors to return
+
+        Returns:
+            Competitor details ordered by rank
+
+        Raises:
+            CompetitorQueryError: the ranking query failed in the SQL API
+        """
+        total = sum(tech.get("count", 0) for tech in top_technologies) or 1
+        ipc_weights = [
+            (tech["ipc"], tech.get("count", 0) / total)
+            for tech in top_technologies if tech.get("ipc")
+        ]
+        if not ipc_weights:
+            return []
+
+        query, params = self.build_ranking_query(applicant_name, ipc_weights, num_competitors)
+        return self._run_aggregate_query(query, params, score_key="relevance")
+
+    def find_similar(self, applicant_name: str, num_competitors: int) -> List[Dict[str, Any]]:
+        """
+        Rank competitors by cosine similarity of IPC subclass count vectors
+
+        Args:
+            applicant_name: Name of the main applicant
+            num_competitors: Number of competitors to return
+
+        Returns:
+            Competitor details ordered by similarity
+
+        Raises:
+            CompetitorQueryError: the datamart or aggregate query failed in the SQL API
+        """
+        datamart = self.get_datamart()
+
+        start_time = time.perf_counter()
+        scored_names = datamart.top_k(applicant_name, num_competitors)
+        logger.info(f"Cosine top-{num_competitors} for {applicant_name} computed in "
+                    f"{(time.perf_counter() - start_time) * 1000:.2f} ms")
+        if not scored_names:
+            return []
+
+        query, params = self.build_aggregate_query(scored_names)
+        return self._run_aggregate_query(query, params, score_key="similarity")
+
+    def get_datamart(self, force_reload: bool = False) -> IPCVectorDatamart:
+        """
+        Return the cached IPC vector datamart, loading it if missing or expired
+
+        A failed reload keeps serving the expired datamart.
+
+        Raises:
+            CompetitorQueryError: the datamart could not be loaded and none is cached
+        """
+        with self._datamart_lock:
+            expired = (
+                self._datamart is None
+                or time.time() - self._datamart.loaded_at > self.datamart_ttl
+            )
+            if force_reload or expired:
+                try:
+                    self._datamart = self._load_datamart()
+                except CompetitorQueryError as e:
+                    if self._datamart is None:
+                        raise
+                    logger.warning(f"Could not reload IPC vector datamart, keeping the loaded one: {e}")
+            return self._datamart
+
+    def _load_datamart(self) -> IPCVectorDatamart:
+        """Load per-applicant IPC subclass counts from the database"""
+        query = """
+            SELECT 出願人, substr(trim(国際特許分類_IPC_), 1, 4) AS subclass, COUNT(*) AS count
+            FROM inpit_data
+            WHERE 出願人 IS NOT NULL AND 出願人 != ''
+            AND trim(国際特許分類_IPC_) GLOB '[A-H][0-9][0-9][A-Z]*'
+            GROUP BY 出願人, subclass
+        """
+        start_time = time.perf_counter()
+        records = self._query({"query": query, "max_rows": DATAMART_MAX_ROWS})
+        datamart = IPCVectorDatamart.from_records(records)
+        logger.info(f"Loaded IPC vector datamart: {len(datamart.names)} applicants, "
+                    f"{len(datamart.subclasses)} subclasses in "
+                    f"{(time.perf_counter() - start_time) * 1000:.0f} ms")
+        return datamart
+
+    def _query(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Rows of a query through the query executor
+
+        Raises:
+            CompetitorQueryError: the API returned an error (a query without
+                matching rows is not an error and returns [])
+        """
+        result = self.query_executor(request)
+        if result.get("success"):
+            return result.get("results", [])
+        if "error" in result:
+            raise CompetitorQueryError(result)
+        return []
+
+    def _run_aggregate_query(self, query: str, params: List[Any],
+                             score_key: str) -> List[Dict[str, Any]]:
+        """Execute an aggregate query and assemble one detail dict per competitor"""
+        competitors: Dict[str, Dict[str, Any]] = {}
+        top_ipc = []
+        years = []
+        for row in self._query({"query": query, "params": params}):
+            kind = row.get("kind")
+            if kind == "summary":
+                competitors[row["name"]] = {
+                    "name": row["name"],
+                    "rank": row.get("rank"),
+                    score_key: round(row.get("score") or 0.0, 4),
+                    "shared_areas": row.get("shared_areas"),
+                    "total_patents": row.get("value"),
+                    "top_technologies": [],
+                    "yearly_stats": []
+                }
+            elif kind == "ipc":
+                top_ipc.append(row)
+            elif kind == "year":
+                years.append(row)
+
+        for row in sorted(top_ipc, key=lambda r: r.get("rank") or 0):
+            if row["name"] in competitors:
+                competitors[row["name"]]["top_technologies"].append(
+                    {"ipc": row.get("label"), "count": row.get("value")})
+        for row in sorted(years, key=lambda r: r.get("label") or ""):
+            if row["name"] in competitors:
+                competitors[row["name"]]["yearly_stats"].append(
+                    {"year": row.get("label"), "count": row.get("value")})
+
+        details = sorted(competitors.values(), key=lambda c: c.get("rank") or 0)
+        for detail in details:
+            if detail.get("shared_areas") is None:
+                del detail["shared_areas"]
+        return details
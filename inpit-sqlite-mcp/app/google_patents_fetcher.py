@@ -9,7 +9,9 @@ and stores it in a SQLite database along with family relationship information.
 """
 
 import os
+import sys
 import json
+import fcntl
 import sqlite3
 import logging
 import pandas as pd
@@ -17,6 +19,7 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 import time
 import tempfile
+import threading
 import boto3
 import shutil
 from typing import Dict, List, Any, Optional, Tuple
@@ -29,6 +32,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Interval of the scheduled incremental import (opt-in: 0, the default, disables the schedule)
+PATENTS_INCREMENTAL_INTERVAL_MINUTES = float(os.environ.get('PATENTS_INCREMENTAL_INTERVAL_MINUTES', '0'))
+# Maximum publications fetched per incremental run; the watermark advances by
+# what was fetched, so a backlog is caught up over consecutive runs
+PATENTS_INCREMENTAL_LIMIT = int(os.environ.get('PATENTS_INCREMENTAL_LIMIT', '10000'))
+# Lock file (next to the database) held while an incremental import runs
+INGESTION_LOCK_SUFFIX = ".ingest.lock"
+
+# Columns selected from patents-public-data.patents.publications, in the
+# order of the publications table (family_size and examined are derived)
+PUBLICATION_SELECT_COLUMNS = """
+            publication_number,
+            filing_date,
+            publication_date,
+            application_number,
+            (SELECT STRING_AGG(name, '; ') FROM UNNEST(assignee_harmonized)) as assignee_harmonized,
+            ARRAY_TO_STRING(assignee, '; ') as assignee_original,
+            (SELECT STRING_AGG(text, ' ') FROM UNNEST(title_localized) WHERE language = 'ja') as title_ja,
+            (SELECT STRING_AGG(text, ' ') FROM UNNEST(title_localized) WHERE language = 'en') as title_en,
+            (SELECT STRING_AGG(text, ' ') FROM UNNEST(abstract_localized) WHERE language = 'ja') as abstract_ja,
+            (SELECT STRING_AGG(text, ' ') FROM UNNEST(abstract_localized) WHERE language = 'en') as abstract_en,
+            (SELECT STRING_AGG(text, ' ') FROM UNNEST(claims_localized) WHERE language = 'ja') as claims,
+            (SELECT STRING_AGG(code, '; ') FROM UNNEST(ipc)) as ipc_code,
+            family_id,
+            country_code,
+            kind_code,
+            priority_date,
+            grant_date,
+            '' as priority_claim,
+            '' as legal_status,
+            '' as status"""
+
 class GooglePatentsFetcher:
     """Class to fetch and process Google Patents Public Data"""
     
@@ -148,8 +183,26 @@ class GooglePatentsFetcher:
             )
             ''')
             
+            # Metrics of full and incremental imports
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingestion_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mode TEXT,
+                started_at TEXT,
+                duration_seconds REAL,
+                watermark_before TEXT,
+                watermark_after TEXT,
+                rows_fetched INTEGER,
+                rows_added INTEGER,
+                families_updated INTEGER,
+                status TEXT,
+                error TEXT
+            )
+            ''')
+            
             # Create indexes for better query performance
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_family_id ON publications (family_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_publication_date ON publications (publication_date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_num ON publications (application_number)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_assignee_harmonized ON publications (assignee_harmonized)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_country_code ON publications (country_code)')
@@ -182,27 +235,7 @@ class GooglePatentsFetcher:
         # Use publication_date to get approximately the requested number
         # Note: Updated to use the latest BigQuery schema
         query = f"""
-        SELECT
-            publication_number,
-            filing_date,
-            publication_date,
-            application_number,
-            (SELECT STRING_AGG(name, '; ') FROM UNNEST(assignee_harmonized)) as assignee_harmonized,
-            ARRAY_TO_STRING(assignee, '; ') as assignee_original,
-            (SELECT STRING_AGG(text, ' ') FROM UNNEST(title_localized) WHERE language = 'ja') as title_ja,
-            (SELECT STRING_AGG(text, ' ') FROM UNNEST(title_localized) WHERE language = 'en') as title_en,
-            (SELECT STRING_AGG(text, ' ') FROM UNNEST(abstract_localized) WHERE language = 'ja') as abstract_ja,
-            (SELECT STRING_AGG(text, ' ') FROM UNNEST(abstract_localized) WHERE language = 'en') as abstract_en,
-            (SELECT STRING_AGG(text, ' ') FROM UNNEST(claims_localized) WHERE language = 'ja') as claims,
-            (SELECT STRING_AGG(code, '; ') FROM UNNEST(ipc)) as ipc_code,
-            family_id,
-            country_code,
-            kind_code,
-            priority_date,
-            grant_date,
-            '' as priority_claim,
-            '' as legal_status,
-            '' as status
+        SELECT{PUBLICATION_SELECT_COLUMNS}
         FROM
             `patents-public-data.patents.publications`
         WHERE
@@ -246,75 +279,215 @@ class GooglePatentsFetcher:
                         logger.error(f"Error executing BigQuery on retry {retry_count}: {e}")
                         
         # If we got here, either the query was successful or all retries failed
+        started_at = time.time()
+        try:
+            
+            processed_rows, _ = self._store_query_results(query_job)
+            logger.info(f"Total number of patents processed: {processed_rows}")
+            
+            # Build the patent family relationships
+            self._build_family_relationships()
+            
+            self._record_ingestion_run({
+                "mode": "full",
+                "started_at": started_at,
+                "watermark_after": self._get_watermark()[0],
+                "rows_fetched": processed_rows,
+                "status": "success"
+            })
+            return processed_rows
+        except Exception as e:
+            logger.error(f"Error fetching Japanese patents: {e}")
+            return 0
+    
+    def fetch_incremental_patents(self, limit: int = PATENTS_INCREMENTAL_LIMIT) -> Dict[str, Any]:
+        """
+        Fetch only the Japanese publications newer than the stored watermark
+        
+        The watermark is the newest (publication_date, publication_number) in the
+        publications table. Newer publications are fetched in ascending order,
+        upserted, and only the families they belong to are rebuilt. If more than
+        `limit` publications are pending, the next run continues where this one
+        stopped. An empty database, or a stored date that is not YYYYMMDD, falls
+        back to a full fetch.
+        
+        Only one run per database imports at a time: manual and scheduled runs,
+        in this or another process, take the lock file next to the database, and
+        a run that finds it taken returns with status "busy".
+        
+        Args:
+            limit: Maximum number of publications to fetch in this run
+            
+        Returns:
+            Metrics of the run (rows fetched/added, families updated, duration)
+        """
+        if not self.client:
+            logger.error("BigQuery client is not initialized")
+            return {"status": "error", "error": "BigQuery client is not initialized"}
+        
+        with open(self.db_path + INGESTION_LOCK_SUFFIX, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.warning("Another incremental patent import is running, skipping this run")
+                return {"mode": "incremental", "status": "busy", "error": "Another incremental import is running"}
+            return self._fetch_incremental_patents(limit)
+    
+    def _fetch_incremental_patents(self, limit: int) -> Dict[str, Any]:
+        """Incremental fetch of fetch_incremental_patents, run while holding the ingestion lock"""
+        self._create_database_schema()
+        watermark_date, watermark_number = self._get_watermark()
+        if watermark_date:
+            try:
+                watermark_day = int(watermark_date)
+            except ValueError:
+                logger.warning(f"Stored publication date {watermark_date!r} is not YYYYMMDD, running a full fetch")
+                watermark_date = None
+        if not watermark_date:
+            logger.info("No publications stored yet, running a full fetch instead of an incremental one")
+            count = self.fetch_japanese_patents(limit=limit)
+            return {"mode": "full", "status": "success" if count else "error", "rows_fetched": count or 0}
+        
+        run = {
+            "mode": "incremental",
+            "started_at": time.time(),
+            "watermark_before": f"{watermark_date}/{watermark_number}"
+        }
+        query = f"""
+        SELECT{PUBLICATION_SELECT_COLUMNS}
+        FROM
+            `patents-public-data.patents.publications`
+        WHERE
+            country_code = 'JP'
+            AND (publication_date > @watermark_date
+                 OR (publication_date = @watermark_date AND publication_number > @watermark_number))
+        ORDER BY
+            publication_date ASC, publication_number ASC
+        LIMIT
+            {int(limit)}
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("watermark_date", "INT64", watermark_day),
+            bigquery.ScalarQueryParameter("watermark_number", "STRING", watermark_number),
+        ])
+        
         try:
+            logger.info(f"Fetching Japanese patents published after {run['watermark_before']} (limit {limit})")
+            query_job = self.client.query(query, job_config=job_config)
             
-            # Process results in batches and insert into SQLite
             conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            rows_before = conn.execute("SELECT COUNT(*) FROM publications").fetchone()[0]
+            conn.close()
             
-            # Counter for processed rows
-            processed_rows = 0
-            batch_size = 100
-            current_batch = []
+            rows_fetched, family_ids = self._store_query_results(query_job)
+            families_updated = self._update_family_relationships(family_ids)
             
-            logger.info("Processing query results...")
-            for row in query_job:
-                # Convert row to dictionary
-                patent_data = dict(row.items())
-                
-                # Process the data - handle NoneType values
-                for key, value in patent_data.items():
-                    if value is None:
-                        patent_data[key] = ""
-                
-                # Calculate family size using a separate query
-                family_size = self._get_family_size(patent_data.get('family_id', ''))
-                patent_data['family_size'] = family_size
-                
-                # Prepare insertion tuple
-                insertion_tuple = (
-                    patent_data.get('publication_number', ''),
-                    patent_data.get('filing_date', ''),
-                    patent_data.get('publication_date', ''),
-                    patent_data.get('application_number', ''),
-                    patent_data.get('assignee_harmonized', ''),
-                    patent_data.get('assignee_original', ''),
-                    patent_data.get('title_ja', ''),
-                    patent_data.get('title_en', ''),
-                    patent_data.get('abstract_ja', ''),
-                    patent_data.get('abstract_en', ''),
-                    patent_data.get('claims', ''),
-                    patent_data.get('ipc_code', ''),
-                    patent_data.get('family_id', ''),
-                    patent_data.get('country_code', ''),
-                    patent_data.get('kind_code', ''),
-                    patent_data.get('priority_date', ''),
-                    patent_data.get('grant_date', ''),
-                    patent_data.get('priority_claim', ''),
-                    patent_data.get('status', ''),
-                    patent_data.get('legal_status', ''),
-                    'true' if patent_data.get('examined') else 'false',
-                    patent_data.get('family_size', 0)
-                )
-                
-                current_batch.append(insertion_tuple)
-                
-                # Insert in batches for better performance
-                if len(current_batch) >= batch_size:
-                    cursor.executemany(
-                        '''
-                        INSERT OR REPLACE INTO publications
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''',
-                        current_batch
-                    )
-                    conn.commit()
-                    processed_rows += len(current_batch)
-                    logger.info(f"Processed {processed_rows} patents")
-                    current_batch = []
+            conn = sqlite3.connect(self.db_path)
+            rows_after = conn.execute("SELECT COUNT(*) FROM publications").fetchone()[0]
+            conn.close()
             
-            # Insert remaining rows
-            if current_batch:
+            new_date, new_number = self._get_watermark()
+            run.update({
+                "watermark_after": f"{new_date}/{new_number}",
+                "rows_fetched": rows_fetched,
+                "rows_added": rows_after - rows_before,
+                "families_updated": families_updated,
+                "status": "success"
+            })
+        except Exception as e:
+            logger.error(f"Error during incremental patent fetch: {e}")
+            run.update({"status": "error", "error": str(e)})
+        
+        return self._record_ingestion_run(run)
+    
+    def _get_watermark(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Get the newest stored (publication_date, publication_number)
+        
+        Returns:
+            Tuple of publication date (YYYYMMDD) and publication number, or (None, None)
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('''
+            SELECT publication_date, MAX(publication_number)
+            FROM publications
+            WHERE publication_date = (
+                SELECT MAX(publication_date) FROM publications WHERE publication_date != ''
+            )
+            ''').fetchone()
+        finally:
+            conn.close()
+        if not row or not row[0]:
+            return None, None
+        return str(row[0]), row[1] or ''
+    
+    def _store_query_results(self, query_job) -> Tuple[int, set]:
+        """
+        Upsert BigQuery result rows into the publications table in batches
+        
+        Args:
+            query_job: BigQuery job (or any iterable of rows) selecting PUBLICATION_SELECT_COLUMNS
+            
+        Returns:
+            Tuple of the number of rows processed and the set of family IDs touched
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # Counter for processed rows
+        processed_rows = 0
+        batch_size = 100
+        current_batch = []
+        family_ids = set()
+        
+        logger.info("Processing query results...")
+        for row in query_job:
+            # Convert row to dictionary
+            patent_data = dict(row.items())
+            
+            # Process the data - handle NoneType values
+            for key, value in patent_data.items():
+                if value is None:
+                    patent_data[key] = ""
+            
+            if patent_data.get('family_id'):
+                family_ids.add(patent_data['family_id'])
+            
+            # Calculate family size using a separate query
+            family_size = self._get_family_size(patent_data.get('family_id', ''))
+            patent_data['family_size'] = family_size
+            
+            # Prepare insertion tuple
+            insertion_tuple = (
+                patent_data.get('publication_number', ''),
+                patent_data.get('filing_date', ''),
+                patent_data.get('publication_date', ''),
+                patent_data.get('application_number', ''),
+                patent_data.get('assignee_harmonized', ''),
+                patent_data.get('assignee_original', ''),
+                patent_data.get('title_ja', ''),
+                patent_data.get('title_en', ''),
+                patent_data.get('abstract_ja', ''),
+                patent_data.get('abstract_en', ''),
+                patent_data.get('claims', ''),
+                patent_data.get('ipc_code', ''),
+                patent_data.get('family_id', ''),
+                patent_data.get('country_code', ''),
+                patent_data.get('kind_code', ''),
+                patent_data.get('priority_date', ''),
+                patent_data.get('grant_date', ''),
+                patent_data.get('priority_claim', ''),
+                patent_data.get('status', ''),
+                patent_data.get('legal_status', ''),
+                'true' if patent_data.get('examined') else 'false',
+                patent_data.get('family_size', 0)
+            )
+            
+            current_batch.append(insertion_tuple)
+            
+            # Insert in batches for better performance
+            if len(current_batch) >= batch_size:
                 cursor.executemany(
                     '''
                     INSERT OR REPLACE INTO publications
@@ -324,17 +497,81 @@ class GooglePatentsFetcher:
                 )
                 conn.commit()
                 processed_rows += len(current_batch)
+                logger.info(f"Processed {processed_rows} patents")
+                current_batch = []
+        
+        # Insert remaining rows
+        if current_batch:
+            cursor.executemany(
+                '''
+                INSERT OR REPLACE INTO publications
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                current_batch
+            )
+            conn.commit()
+            processed_rows += len(current_batch)
+        
+        conn.close()
+        return processed_rows, family_ids
+    
+    def _record_ingestion_run(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store the metrics of an import run in the ingestion_runs table
+        
+        Args:
+            run: Run metrics; started_at is an epoch timestamp
             
-            logger.info(f"Total number of patents processed: {processed_rows}")
+        Returns:
+            The run metrics including duration_seconds
+        """
+        started_at = run.get("started_at", time.time())
+        run["duration_seconds"] = round(time.time() - started_at, 2)
+        run["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at))
+        logger.info(
+            f"Ingestion run ({run.get('mode')}) {run.get('status')}: "
+            f"{run.get('rows_fetched', 0)} fetched, {run.get('rows_added', 0)} added, "
+            f"{run.get('families_updated', 0)} families updated in {run['duration_seconds']}s"
+        )
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                '''
+                INSERT INTO ingestion_runs
+                (mode, started_at, duration_seconds, watermark_before, watermark_after,
+                 rows_fetched, rows_added, families_updated, status, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (run.get("mode"), run["started_at"], run["duration_seconds"], run.get("watermark_before"),
+                 run.get("watermark_after"), run.get("rows_fetched", 0), run.get("rows_added", 0),
+                 run.get("families_updated", 0), run.get("status"), run.get("error"))
+            )
+            conn.commit()
             conn.close()
-            
-            # Build the patent family relationships
-            self._build_family_relationships()
-            
-            return processed_rows
         except Exception as e:
-            logger.error(f"Error fetching Japanese patents: {e}")
-            return 0
+            logger.warning(f"Could not record ingestion run: {e}")
+        return run
+    
+    def get_ingestion_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the most recent import runs with their metrics
+        
+        Args:
+            limit: Maximum number of runs to return
+            
+        Returns:
+            List of runs, newest first
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM ingestion_runs ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
+        except sqlite3.OperationalError:
+            return []
     
     def _download_s3_db_files(self):
         """
@@ -506,6 +743,61 @@ class GooglePatentsFetcher:
             logger.error(f"Error building family relationships: {e}")
             raise
     
+    def _update_family_relationships(self, family_ids) -> int:
+        """
+        Rebuild the patent_families rows of the given families only
+        
+        Also refreshes family_size of the members, since new publications may
+        have joined an existing family.
+        
+        Args:
+            family_ids: Family IDs touched by an incremental import
+            
+        Returns:
+            Number of families updated
+        """
+        if not family_ids:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS affected_families (family_id TEXT PRIMARY KEY)")
+            cursor.execute("DELETE FROM affected_families")
+            cursor.executemany(
+                "INSERT OR IGNORE INTO affected_families VALUES (?)",
+                [(family_id,) for family_id in family_ids]
+            )
+            
+            cursor.execute(
+                "DELETE FROM patent_families WHERE family_id IN (SELECT family_id FROM affected_families)"
+            )
+            cursor.execute('''
+            INSERT OR IGNORE INTO patent_families
+            (family_id, application_number, publication_number, country_code)
+            SELECT family_id, application_number, publication_number, country_code
+            FROM publications
+            WHERE family_id IN (SELECT family_id FROM affected_families) AND application_number != ''
+            ''')
+            cursor.execute('''
+            UPDATE publications
+            SET family_size = MAX(
+                COALESCE(family_size, 0),
+                (SELECT COUNT(*) FROM publications AS member WHERE member.family_id = publications.family_id)
+            )
+            WHERE family_id IN (SELECT family_id FROM affected_families)
+            ''')
+            conn.commit()
+            
+            logger.info(f"Updated family relationships for {len(family_ids)} families")
+            return len(family_ids)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating family relationships: {e}")
+            raise
+        finally:
+            conn.close()
+    
     def get_family_members(self, application_number: str) -> List[Dict[str, Any]]:
         """
         Get all family members for a given application number
@@ -553,9 +845,54 @@ class GooglePatentsFetcher:
             return []
 
 
+class IncrementalIngestionScheduler:
+    """Runs GooglePatentsFetcher.fetch_incremental_patents periodically in a daemon thread"""
+    
+    def __init__(self, fetcher_factory, interval_minutes: float = PATENTS_INCREMENTAL_INTERVAL_MINUTES,
+                 limit: int = PATENTS_INCREMENTAL_LIMIT):
+        """
+        Initialize the scheduler
+        
+        Args:
+            fetcher_factory: Callable returning the GooglePatentsFetcher to use (called in the thread)
+            interval_minutes: Minutes between runs (0 disables the schedule)
+            limit: Maximum publications per run
+        """
+        self.fetcher_factory = fetcher_factory
+        self.interval_minutes = interval_minutes
+        self.limit = limit
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self) -> bool:
+        """Start the schedule; returns False if it is disabled or already running"""
+        if self.interval_minutes <= 0 or (self._thread and self._thread.is_alive()):
+            return False
+        self._thread = threading.Thread(target=self._run, name="patents-incremental-import", daemon=True)
+        self._thread.start()
+        logger.info(f"Incremental patent import scheduled every {self.interval_minutes} minutes")
+        return True
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_minutes * 60):
+            try:
+                self.last_run = self.fetcher_factory().fetch_incremental_patents(limit=self.limit)
+            except Exception as e:
+                logger.error(f"Scheduled incremental patent import failed: {e}")
+                self.last_run = {"mode": "incremental", "status": "error", "error": str(e)}
+
+
 if __name__ == "__main__":
     # Example usage
     credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
     fetcher = GooglePatentsFetcher(credentials_path=credentials_path)
-    num_patents = fetcher.fetch_japanese_patents(limit=10000)
-    print(f"Fetched {num_patents} Japanese patents")
+    if "--incremental" in sys.argv:
+        run = fetcher.fetch_incremental_patents()
+        print(f"Incremental import: {json.dumps(run, ensure_ascii=False)}")
+    else:
+        num_patents = fetcher.fetch_japanese_patents(limit=10000)
+        print(f"Fetched {num_patents} Japanese patents")
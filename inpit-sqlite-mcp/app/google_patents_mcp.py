@@ -13,10 +13,11 @@ import os
 import json
 import logging
 import sqlite3
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, Optional
 
-# Import Google Patents functionality
-from google_patents_fetcher import GooglePatentsFetcher
+# Import Google Patents functionality. GooglePatentsFetcher pulls in pandas, BigQuery
+# and boto3 (and downloads credentials from S3), so it is imported on first use.
 from nl_query_processor import PatentNLQueryProcessor
 
 # Configure logging
@@ -78,6 +79,7 @@ class GooglePatentsMCPExtension:
         """
         Initialize the Google Patents functionality
         """
+        self._patent_fetcher = None
         try:
             logger.info("Initializing Google Patents MCP Extension")
             logger.info(f"Checking for GCP database at: {GOOGLE_PATENTS_DB_PATH}")
@@ -132,9 +134,6 @@ class GooglePatentsMCPExtension:
                 logger.warning(f"No valid database found, defaulting to GCP database path: {GOOGLE_PATENTS_DB_PATH}")
                 logger.error("Both GCP and S3 databases are missing or invalid - this will cause problems!")
             
-            logger.info(f"Initializing patent fetcher with database path: {self.active_db_path}")
-            self.patent_fetcher = GooglePatentsFetcher(db_path=self.active_db_path)
-            
             logger.info(f"Initializing NL query processor with database path: {self.active_db_path}")
             self.nl_processor = PatentNLQueryProcessor(db_path=self.active_db_path)
             
@@ -144,6 +143,19 @@ class GooglePatentsMCPExtension:
             self.active_db_path = GOOGLE_PATENTS_DB_PATH  # Default to GCP path if initialization fails
             # We'll continue even if this fails
     
+    @property
+    def patent_fetcher(self):
+        """BigQuery patent fetcher, created on first use"""
+        if self._patent_fetcher is None:
+            from google_patents_fetcher import GooglePatentsFetcher
+            logger.info(f"Initializing patent fetcher with database path: {self.active_db_path}")
+            self._patent_fetcher = GooglePatentsFetcher(db_path=self.active_db_path)
+        return self._patent_fetcher
+
+    @patent_fetcher.setter
+    def patent_fetcher(self, fetcher):
+        self._patent_fetcher = fetcher
+
     def get_tools(self) -> List[Dict[str, Any]]:
         """Return list of available tools"""
         return [
@@ -245,6 +257,7 @@ class GooglePatentsMCPExtension:
             
             # Re-initialize the patent fetcher to use S3 credentials 
             # The GooglePatentsFetcher will automatically handle S3 credentials fetching
+            from google_patents_fetcher import GooglePatentsFetcher
             self.patent_fetcher = GooglePatentsFetcher(
                 credentials_path=credentials_path,  # This is now optional and used as a fallback
                 db_path=GOOGLE_PATENTS_DB_PATH  # Always import to the GCP database
@@ -542,22 +555,32 @@ class GooglePatentsMCPExtension:
                 "message": f"Error checking Google Patents database status: {str(e)}"
             }
 
-# Create singleton instance
-google_patents_extension = GooglePatentsMCPExtension()
+# Singleton instance, created on first use
+_google_patents_extension: Optional[GooglePatentsMCPExtension] = None
+_google_patents_extension_lock = threading.Lock()
+
+def get_extension() -> GooglePatentsMCPExtension:
+    """Return the singleton extension instance, creating it on first call"""
+    global _google_patents_extension
+    if _google_patents_extension is None:
+        with _google_patents_extension_lock:
+            if _google_patents_extension is None:
+                _google_patents_extension = GooglePatentsMCPExtension()
+    return _google_patents_extension
 
 # Functions to integrate with the main MCP server
 def get_extension_tools():
     """Return the Google Patents tools"""
-    return google_patents_extension.get_tools()
+    return get_extension().get_tools()
 
 def get_extension_resources():
     """Return the Google Patents resources"""
-    return google_patents_extension.get_resources()
+    return get_extension().get_resources()
 
 def execute_extension_tool(tool_name, arguments):
     """Execute a Google Patents tool"""
-    return google_patents_extension.execute_tool(tool_name, arguments)
+    return get_extension().execute_tool(tool_name, arguments)
 
 def access_extension_resource(uri):
     """Access a Google Patents resource"""
-    return google_patents_extension.access_resource(uri)
+    return get_extension().access_resource(uri)
@@ -16,11 +16,11 @@ import requests
 import logging
 import re
 import base64
-import io
+import importlib
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from urllib.parse import quote, unquote
-from collections import Counter, defaultdict
 
 # Import Google Patents extension
 from google_patents_mcp import (
@@ -30,15 +30,10 @@ from google_patents_mcp import (
     access_extension_resource
 )
 
-# Import new libraries for visualization and PDF generation
-import numpy as np
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend for server environments
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-from fpdf import FPDF
-from PIL import Image
+# Visualization (chart_renderer -> matplotlib), PDF (fpdf), portfolio analytics
+# (patent_analytics -> pandas) and competitor similarity (competitor_discovery -> numpy)
+# stacks are imported on first use inside the tools that need them, so that tool
+# listing and simple lookups start with the stdlib only.
 
 # Configure logging
 logging.basicConfig(
@@ -79,6 +74,10 @@ SCHEMAS = {
             "query": {
                 "type": "string",
                 "description": "実行するSQLクエリ（SELECT文のみ）"
+            },
+            "compact": {
+                "type": "boolean",
+                "description": "trueの場合、列名を一度だけ返し各行を配列で返します（大きな結果向け）"
             }
         },
         "required": ["query"]
@@ -136,6 +135,12 @@ SCHEMAS = {
                 "default": 3,
                 "minimum": 1,
                 "maximum": 10
+            },
+            "method": {
+                "type": "string",
+                "description": "競合他社の抽出方法（relevance: 共通IPC分類の重み付き関連度, cosine: IPC分布のコサイン類似度）",
+                "enum": ["relevance", "cosine"],
+                "default": "relevance"
             }
         },
         "required": ["applicant_name"]
@@ -163,7 +168,18 @@ class InpitSQLiteMCPServer:
             api_url: Base URL for the Inpit SQLite API service
         """
         self.api_url = api_url
+        # Keep-alive connections to the API service (responses are gzip/br compressed when large)
+        self.session = requests.Session()
+        self._competitor_discovery = None
         logger.info(f"Initialized Inpit SQLite MCP Server with API URL: {self.api_url}")
+
+    @property
+    def competitor_discovery(self):
+        """Competitor ranking helper, created on first use (imports numpy)"""
+        if self._competitor_discovery is None:
+            from competitor_discovery import CompetitorDiscovery
+            self._competitor_discovery = CompetitorDiscovery(self._execute_sql_query)
+        return self._competitor_discovery
     
     def get_tools(self) -> List[Dict[str, Any]]:
         """Return list of available tools"""
@@ -338,7 +354,7 @@ class InpitSQLiteMCPServer:
         logger.info(f"Getting patent by application number: {application_number}")
         logger.info(f"Request URL (encoded): {url}")
         
-        response = requests.get(url)
+        response = self.session.get(url)
         if response.status_code == 200:
             data = response.json()
             
@@ -394,7 +410,7 @@ class InpitSQLiteMCPServer:
         logger.info(f"Getting patents by applicant: {applicant_name}")
         logger.info(f"Request URL (encoded): {url}")
         
-        response = requests.get(url)
+        response = self.session.get(url)
         if response.status_code == 200:
             data = response.json()
             
@@ -434,7 +450,7 @@ class InpitSQLiteMCPServer:
         Execute SQL query against the patent database
         
         Args:
-            arguments: Arguments containing query
+            arguments: Arguments containing query (and optional params for its ? placeholders)
             
         Returns:
             Query results
@@ -462,7 +478,7 @@ class InpitSQLiteMCPServer:
                 col_query = "SELECT name FROM pragma_table_info('inpit_data')"
                 col_payload = {"query": col_query}
                 col_url = f"{self.api_url}/api/sql-query"
-                col_response = requests.post(col_url, json=col_payload)
+                col_response = self.session.post(col_url, json=col_payload)
                 
                 if col_response.status_code == 200:
                     col_data = col_response.json()
@@ -481,13 +497,18 @@ class InpitSQLiteMCPServer:
             logger.warning("Column '審査状況' was requested but doesn't exist in the schema")
         
         url = f"{self.api_url}/api/sql-query"
-        payload = {"query": query}
+        # Rows come back as arrays with the column names once
+        payload = {"query": query, "format": "rows"}
+        if arguments.get("params"):
+            payload["params"] = arguments["params"]
+        if arguments.get("max_rows"):
+            payload["max_rows"] = arguments["max_rows"]
         
         logger.info(f"Executing SQL query: {query}")
         logger.info(f"Request URL: {url}")
         
         try:
-            response = requests.post(url, json=payload)
+            response = self.session.post(url, json=payload)
             if response.status_code == 200:
                 data = response.json()
                 
@@ -496,13 +517,11 @@ class InpitSQLiteMCPServer:
                     results = data.get("results", [])
                     columns = data.get("columns", [])
                 
-                    processed_results = []
-                    for result in results:
-                        row_data = {}
-                        for i, col in enumerate(columns):
-                            if i < len(result):
-                                row_data[col] = result[i]
-                        processed_results.append(row_data)
+                    if arguments.get("compact"):
+                        # Pass the arrays through; the column names are listed once in "columns"
+                        processed_results = results
+                    else:
+                        processed_results = [dict(zip(columns, result)) for result in results]
                     
                     response_data = {
                         "success": True,
@@ -511,6 +530,10 @@ class InpitSQLiteMCPServer:
                         "results": processed_results,
                         "count": len(processed_results)
                     }
+                    if arguments.get("compact"):
+                        response_data["format"] = "rows"
+                    if data.get("truncated"):
+                        response_data["truncated"] = True
                     
                     # If we substituted columns, add a note
                     if query != original_query:
@@ -523,6 +546,9 @@ class InpitSQLiteMCPServer:
                         "message": "Query executed but returned no results",
                         "query": query
                     }
+            elif response.status_code == 422 and response.json().get("error_type") == "query_too_expensive":
+                # Rejected by the query governor; pass the structured error (with hint) through
+                return {**response.json(), "query": query}
             else:
                 error_text = response.text
                 # Check for specific SQLite errors related to column names
@@ -537,7 +563,7 @@ class InpitSQLiteMCPServer:
                         try:
                             col_query = "SELECT name FROM pragma_table_info('inpit_data')"
                             col_payload = {"query": col_query}
-                            col_response = requests.post(url, json=col_payload)
+                            col_response = self.session.post(url, json=col_payload)
                             
                             if col_response.status_code == 200:
                                 col_data = col_response.json()
@@ -582,7 +608,7 @@ class InpitSQLiteMCPServer:
         logger.info(f"Getting API status from: {url}")
         
         try:
-            response = requests.get(url)
+            response = self.session.get(url)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -596,6 +622,12 @@ class InpitSQLiteMCPServer:
                 "service_url": self.api_url
             }
 
+    @staticmethod
+    def _load_portfolio(patents: List[Dict[str, Any]]):
+        """Load an applicant's patent rows into the columnar analytics core (imports pandas)"""
+        from patent_analytics import PortfolioAnalytics
+        return PortfolioAnalytics.from_records(patents)
+    
     def _get_applicant_summary(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """
         Get comprehensive summary for a specific patent applicant
@@ -626,55 +658,15 @@ class InpitSQLiteMCPServer:
             patents = applicant_patents.get("patents", [])
             patent_count = applicant_patents.get("count", 0)
             
-            # 1. Patent count per year
-            patents_by_year = defaultdict(int)
-            for patent in patents:
-                if "出願日" in patent and patent["出願日"]:
-                    try:
-                        year = patent["出願日"].split('-')[0]
-                        patents_by_year[year] += 1
-                    except (IndexError, ValueError):
-                        continue
-            
-            yearly_stats = [{"year": year, "count": count} for year, count in patents_by_year.items()]
-            yearly_stats.sort(key=lambda x: x["year"])
-            
-            # 2. Technology fields (IPC classifications)
-            ipc_counts = Counter()
-            for patent in patents:
-                if "国際特許分類_IPC_" in patent and patent["国際特許分類_IPC_"]:
-                    ipc = patent["国際特許分類_IPC_"].split()[0] if patent["国際特許分類_IPC_"].split() else patent["国際特許分類_IPC_"]
-                    ipc_counts[ipc] += 1
-            
-            top_technologies = [{"ipc": ipc, "count": count} for ipc, count in ipc_counts.most_common(5)]
-            
-            # 3. Assessment status
-            assessment_status = Counter()
-            for patent in patents:
-                if "審査状況" in patent and patent["審査状況"]:
-                    assessment_status[patent["審査状況"]] += 1
-            
-            status_counts = [{"status": status, "count": count} for status, count in assessment_status.most_common()]
-            
-            # 4. Recent patents
-            try:
-                recent_patents = sorted(
-                    [p for p in patents if "出願日" in p and p["出願日"]],
-                    key=lambda x: x["出願日"],
-                    reverse=True
-                )[:5]
-            except Exception:
-                recent_patents = patents[:5]
+            # Yearly counts, top IPC codes, assessment status and recent patents
+            summary = self._load_portfolio(patents).applicant_summary()
             
             # Combine the results
             return {
                 "success": True,
                 "applicant_name": applicant_name,
                 "total_patents": patent_count,
-                "yearly_stats": yearly_stats,
-                "top_technologies": top_technologies,
-                "assessment_status": status_counts,
-                "recent_patents": recent_patents
+                **summary
             }
         
         except Exception as e:
@@ -692,6 +684,8 @@ class InpitSQLiteMCPServer:
         Returns:
             Visual report data with base64-encoded chart images
         """
+        from chart_renderer import render_charts_base64
+
         applicant_name = arguments.get("applicant_name")
         if not applicant_name:
             return {"error": "applicant_name is required"}
@@ -709,84 +703,71 @@ class InpitSQLiteMCPServer:
                     "message": f"Could not generate visual report for applicant: {applicant_name}"
                 }
             
-            # Generate actual charts using matplotlib
-            chart_images = {}
+            # Chart specs and data, rendered in one batch below
+            chart_jobs = {}
             
             # 1. Patent trend over time (line chart)
-            if summary.get("yearly_stats"):
-                yearly_stats = summary.get("yearly_stats", [])
-                if yearly_stats:
-                    years = [stat["year"] for stat in yearly_stats]
-                    counts = [stat["count"] for stat in yearly_stats]
-                    
-                    plt.figure(figsize=(10, 6))
-                    plt.plot(years, counts, marker='o', linewidth=2)
-                    plt.title(f"{applicant_name}の年間特許出願数", fontsize=16)
-                    plt.xlabel("年", fontsize=14)
-                    plt.ylabel("特許出願数", fontsize=14)
-                    plt.grid(True, linestyle='--', alpha=0.7)
-                    plt.tight_layout()
-                    
-                    # Convert plot to base64 image
-                    buffer = io.BytesIO()
-                    plt.savefig(buffer, format='png', dpi=100)
-                    buffer.seek(0)
-                    yearly_trend_img = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                    chart_images["yearly_trend"] = yearly_trend_img
-                    plt.close()
+            yearly_stats = summary.get("yearly_stats", [])
+            if yearly_stats:
+                chart_jobs["yearly_trend"] = (
+                    {
+                        "type": "line",
+                        "title": f"{applicant_name}の年間特許出願数",
+                        "title_fontsize": 16,
+                        "xlabel": "年",
+                        "ylabel": "特許出願数",
+                        "label_fontsize": 14,
+                        "figsize": [10, 6],
+                        "grid": {"linestyle": "--", "alpha": 0.7}
+                    },
+                    {
+                        "labels": [stat["year"] for stat in yearly_stats],
+                        "series": [{"name": "特許出願数", "values": [stat["count"] for stat in yearly_stats]}]
+                    }
+                )
             
             # 2. Technology distribution (pie chart)
-            if summary.get("top_technologies"):
-                tech_data = summary.get("top_technologies", [])
-                if tech_data:
-                    labels = [item["ipc"] for item in tech_data]
-                    sizes = [item["count"] for item in tech_data]
-                    
-                    plt.figure(figsize=(10, 8))
-                    plt.pie(sizes, labels=labels, autopct='%1.1f%%', 
-                            shadow=True, startangle=140)
-                    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-                    plt.title(f"{applicant_name}の技術分野分布", fontsize=16)
-                    plt.tight_layout()
-                    
-                    # Convert plot to base64 image
-                    buffer = io.BytesIO()
-                    plt.savefig(buffer, format='png', dpi=100)
-                    buffer.seek(0)
-                    tech_dist_img = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                    chart_images["tech_distribution"] = tech_dist_img
-                    plt.close()
+            tech_data = summary.get("top_technologies", [])
+            if tech_data:
+                chart_jobs["tech_distribution"] = (
+                    {
+                        "type": "pie",
+                        "title": f"{applicant_name}の技術分野分布",
+                        "title_fontsize": 16,
+                        "figsize": [10, 8],
+                        "shadow": True,
+                        "startangle": 140
+                    },
+                    {
+                        "labels": [item["ipc"] for item in tech_data],
+                        "series": [{"name": "特許数", "values": [item["count"] for item in tech_data]}]
+                    }
+                )
             
             # 3. Assessment status distribution (bar chart)
-            if summary.get("assessment_status"):
-                status_data = summary.get("assessment_status", [])
-                if status_data:
-                    statuses = [item["status"] for item in status_data]
-                    counts = [item["count"] for item in status_data]
-                    
-                    plt.figure(figsize=(12, 6))
-                    bars = plt.bar(statuses, counts, color='skyblue')
-                    plt.title(f"{applicant_name}の特許審査状況", fontsize=16)
-                    plt.xlabel("審査状況", fontsize=14)
-                    plt.ylabel("特許数", fontsize=14)
-                    plt.grid(True, linestyle='--', alpha=0.3, axis='y')
-                    
-                    # Add count labels on top of each bar
-                    for bar in bars:
-                        height = bar.get_height()
-                        plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                                f'{int(height)}',
-                                ha='center', va='bottom')
-                    
-                    plt.tight_layout()
-                    
-                    # Convert plot to base64 image
-                    buffer = io.BytesIO()
-                    plt.savefig(buffer, format='png', dpi=100)
-                    buffer.seek(0)
-                    assessment_img = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                    chart_images["assessment_distribution"] = assessment_img
-                    plt.close()
+            status_data = summary.get("assessment_status", [])
+            if status_data:
+                chart_jobs["assessment_distribution"] = (
+                    {
+                        "type": "bar",
+                        "title": f"{applicant_name}の特許審査状況",
+                        "title_fontsize": 16,
+                        "xlabel": "審査状況",
+                        "ylabel": "特許数",
+                        "label_fontsize": 14,
+                        "figsize": [12, 6],
+                        "colors": "skyblue",
+                        "grid": {"axis": "y", "linestyle": "--", "alpha": 0.3},
+                        "value_labels": {"format": "{:.0f}"}
+                    },
+                    {
+                        "labels": [item["status"] for item in status_data],
+                        "series": [{"name": "特許数", "values": [item["count"] for item in status_data]}]
+                    }
+                )
+            
+            # Uncached charts render in parallel in the shared renderer's worker pool
+            chart_images = dict(zip(chart_jobs, render_charts_base64(list(chart_jobs.values()))))
             
             # Prepare the report data
             yearly_trend = {
@@ -861,89 +842,16 @@ class InpitSQLiteMCPServer:
             
             patents = applicant_patents.get("patents", [])
             
-            # Calculate assessment ratios
-            assessment_counts = Counter()
-            total_analyzed = 0
-            
-            # 特許成立, 拒絶, 審査中 などのステータスをカウント
-            for patent in patents:
-                if "審査状況" in patent and patent["審査状況"]:
-                    assessment_counts[patent["審査状況"]] += 1
-                    total_analyzed += 1
-            
-            # Calculate approval ratio and other metrics
-            # Get assessment status counts
-            approval_count = assessment_counts.get("特許成立", 0)
-            rejection_count = assessment_counts.get("拒絶", 0)
-            pending_count = assessment_counts.get("審査中", 0)
-            
-            # Calculate ratios
-            approval_ratio = (approval_count / total_analyzed * 100) if total_analyzed > 0 else 0
-            rejection_ratio = (rejection_count / total_analyzed * 100) if total_analyzed > 0 else 0
-            pending_ratio = (pending_count / total_analyzed * 100) if total_analyzed > 0 else 0
-            
-            # Calculate industry average (mock data for demonstration)
-            # In a real implementation, you would query this from a database
-            industry_approval_ratio = 65  # Mock data
-            
-            # Calculate time-to-approval metrics
-            approval_times = []
-            for patent in patents:
-                if "審査状況" in patent and patent["審査状況"] == "特許成立":
-                    if "出願日" in patent and "特許登録日" in patent:
-                        try:
-                            application_date = datetime.strptime(patent["出願日"], "%Y-%m-%d")
-                            approval_date = datetime.strptime(patent["特許登録日"], "%Y-%m-%d")
-                            days_to_approval = (approval_date - application_date).days
-                            approval_times.append(days_to_approval)
-                        except (ValueError, TypeError):
-                            continue
-            
-            avg_approval_time = sum(approval_times) / len(approval_times) if approval_times else None
-            
-            # Get assessment status by technology field
-            assessment_by_tech = defaultdict(lambda: defaultdict(int))
-            for patent in patents:
-                if "審査状況" in patent and "国際特許分類_IPC_" in patent:
-                    status = patent["審査状況"]
-                    ipc = patent["国際特許分類_IPC_"].split()[0] if patent["国際特許分類_IPC_"].split() else ""
-                    if ipc:
-                        assessment_by_tech[ipc][status] += 1
-            
-            # Convert to list format for output
-            tech_assessment = []
-            for ipc, statuses in assessment_by_tech.items():
-                tech_assessment.append({
-                    "ipc": ipc,
-                    "statuses": [{"status": s, "count": c} for s, c in statuses.items()]
-                })
-            
-            # Sort by total count
-            tech_assessment.sort(key=lambda x: sum(item["count"] for item in x["statuses"]), reverse=True)
+            # Status ratios, time to approval and the top 5 tech fields by status.
+            # Industry average is mock data for demonstration; in a real implementation
+            # it would be queried from a database
+            ratios = self._load_portfolio(patents).assessment_ratios(industry_approval_ratio=65)
             
             return {
                 "success": True,
                 "applicant_name": applicant_name,
                 "total_patents": applicant_patents.get("count", 0),
-                "total_analyzed": total_analyzed,
-                "approval_stats": {
-                    "approved": approval_count,
-                    "rejected": rejection_count,
-                    "pending": pending_count,
-                    "approval_ratio": round(approval_ratio, 2),
-                    "rejection_ratio": round(rejection_ratio, 2),
-                    "pending_ratio": round(pending_ratio, 2),
-                },
-                "industry_comparison": {
-                    "applicant_approval_ratio": round(approval_ratio, 2),
-                    "industry_avg_approval_ratio": industry_approval_ratio,
-                    "difference": round(approval_ratio - industry_approval_ratio, 2)
-                },
-                "approval_time": {
-                    "average_days": avg_approval_time,
-                    "sample_size": len(approval_times)
-                },
-                "assessment_by_technology": tech_assessment[:5]  # Top 5 tech fields
+                **ratios
             }
         
         except Exception as e:
@@ -980,104 +888,14 @@ class InpitSQLiteMCPServer:
             
             patents = applicant_patents.get("patents", [])
             
-            # Analyze IPC codes
-            ipc_sections = Counter()  # e.g., A, B, C...
-            ipc_classes = Counter()   # e.g., A01, B60...
-            ipc_subclasses = Counter()  # e.g., A01B, B60R...
-            
-            for patent in patents:
-                if "国際特許分類_IPC_" in patent and patent["国際特許分類_IPC_"]:
-                    ipc_code = patent["国際特許分類_IPC_"]
-                    
-                    # Parse IPC code
-                    pattern = re.compile(r'^([A-H])(\d{2})([A-Z])')
-                    match = pattern.match(ipc_code)
-                    
-                    if match:
-                        section = match.group(1)  # e.g., "G"
-                        class_num = match.group(2)  # e.g., "06"
-                        subclass = match.group(3)  # e.g., "F"
-                        
-                        ipc_sections[section] += 1
-                        ipc_classes[f"{section}{class_num}"] += 1
-                        ipc_subclasses[f"{section}{class_num}{subclass}"] += 1
-            
-            # Get IPC section descriptions
-            ipc_descriptions = {
-                "A": "人間の必需品",
-                "B": "処理操作、運輸",
-                "C": "化学、冶金",
-                "D": "繊維、紙",
-                "E": "固定構造物",
-                "F": "機械工学、照明、加熱、武器、爆破",
-                "G": "物理学",
-                "H": "電気"
-            }
-            
-            # Prepare results for different hierarchy levels
-            section_results = [
-                {"section": section, "count": count, "description": ipc_descriptions.get(section, "不明")}
-                for section, count in ipc_sections.most_common()
-            ]
-            
-            class_results = [
-                {"class": class_code, "count": count}
-                for class_code, count in ipc_classes.most_common(10)
-            ]
-            
-            subclass_results = [
-                {"subclass": subclass_code, "count": count}
-                for subclass_code, count in ipc_subclasses.most_common(10)
-            ]
-            
-            # Calculate distribution percentages
-            total_patents = sum(ipc_sections.values())
-            
-            if total_patents > 0:
-                for item in section_results:
-                    item["percentage"] = round((item["count"] / total_patents) * 100, 2)
-            
-            # Get top technical fields over time
-            tech_trends = defaultdict(lambda: defaultdict(int))
-            
-            for patent in patents:
-                if "出願日" in patent and "国際特許分類_IPC_" in patent and patent["出願日"] and patent["国際特許分類_IPC_"]:
-                    try:
-                        year = patent["出願日"].split('-')[0]
-                        ipc_code = patent["国際特許分類_IPC_"]
-                        
-                        match = pattern.match(ipc_code)
-                        if match:
-                            section = match.group(1)
-                            tech_trends[year][section] += 1
-                    except (IndexError, ValueError):
-                        continue
-            
-            # Format trend data
-            trend_data = []
-            for year, techs in sorted(tech_trends.items()):
-                year_data = {"year": year}
-                for section in "ABCDEFGH":
-                    year_data[section] = techs.get(section, 0)
-                trend_data.append(year_data)
+            # IPC section / class / subclass distribution and section trend per year
+            fields = self._load_portfolio(patents).technical_fields()
             
             return {
                 "success": True,
                 "applicant_name": applicant_name,
                 "total_patents": applicant_patents.get("count", 0),
-                "sections": {
-                    "total": total_patents,
-                    "data": section_results
-                },
-                "classes": {
-                    "total": sum(ipc_classes.values()),
-                    "data": class_results
-                },
-                "subclasses": {
-                    "total": sum(ipc_subclasses.values()),
-                    "data": subclass_results
-                },
-                "trend_data": trend_data
+                **fields
             }
         
         except Exception as e:
@@ -1127,99 +945,45 @@ class InpitSQLiteMCPServer:
                     "message": f"No technology data available for {applicant_name}"
                 }
             
-            # Get top IPC codes for this applicant
-            ipc_codes = [tech["ipc"] for tech in top_technologies[:3]]
-            
-            # Find other applicants in the same technology areas
-            competitors = []
-            
-            for ipc_code in ipc_codes:
-                # SQL query to find other applicants in this technology area
-                query = f"""
-                    SELECT 出願人, COUNT(*) as count
-                    FROM inpit_data
-                    WHERE 国際特許分類_IPC_ LIKE '{ipc_code}%'
-                    AND 出願人 != '{applicant_name}'
-                    GROUP BY 出願人
-                    ORDER BY count DESC
-                    LIMIT 10
-                """
-                
-                result = self._execute_sql_query({"query": query})
-                
-                if result.get("success") and result.get("results"):
-                    for row in result.get("results", []):
-                        competitor_name = row.get("出願人")
-                        patent_count = row.get("count")
-                        
-                        if competitor_name and patent_count:
-                            # Check if already in our list
-                            existing = next((c for c in competitors if c["name"] == competitor_name), None)
-                            
-                            if existing:
-                                # Update existing competitor's data
-                                existing["relevance"] += 1  # Increment relevance for each shared tech area
-                            else:
-                                # Add new competitor
-                                competitors.append({
-                                    "name": competitor_name,
-                                    "patent_count": patent_count,
-                                    "relevance": 1  # Initial relevance score
-                                })
-            
-            # Sort by relevance and take top N
-            competitors.sort(key=lambda x: (x["relevance"], x["patent_count"]), reverse=True)
-            competitors = competitors[:num_competitors]
-            
-            # Get detailed data for each competitor
-            competitor_details = []
-            
-            for competitor in competitors:
-                try:
-                    competitor_summary = self._get_applicant_summary({"applicant_name": competitor["name"]})
-                    
-                    if competitor_summary.get("success"):
-                        competitor_details.append({
-                            "name": competitor["name"],
-                            "total_patents": competitor_summary.get("total_patents"),
-                            "top_technologies": competitor_summary.get("top_technologies", [])[:3],
-                            "yearly_stats": competitor_summary.get("yearly_stats", [])[-5:] if competitor_summary.get("yearly_stats") else []
-                        })
-                except Exception as e:
-                    logger.error(f"Error getting data for competitor {competitor['name']}: {str(e)}")
-                    continue
+            # Rank competitors and fetch their aggregates in a single query
+            from competitor_discovery import CompetitorQueryError
+            method = arguments.get("method", "relevance")
+            try:
+                if method == "cosine":
+                    competitor_details = self.competitor_discovery.find_similar(applicant_name, num_competitors)
+                else:
+                    competitor_details = self.competitor_discovery.discover(
+                        applicant_name, top_technologies[:3], num_competitors
+                    )
+            except CompetitorQueryError as e:
+                # Report the API error (e.g. the governor's 422 with its hint), not "no competitors"
+                logger.warning(f"Competitor query failed: {e}")
+                return {**e.result, "success": False, "error": f"Competitor query failed: {e}"}
             
             # Prepare comparison data
             # 1. Patent counts over time
-            all_years = set()
-            
-            # Add main applicant's years
-            for stat in main_applicant_data.get("yearly_stats", []):
-                if "year" in stat:
-                    all_years.add(stat["year"])
+            main_yearly = {
+                stat["year"]: stat.get("count", 0)
+                for stat in main_applicant_data.get("yearly_stats", []) if "year" in stat
+            }
+            competitor_yearly = {
+                competitor["name"]: {
+                    stat["year"]: stat.get("count", 0)
+                    for stat in competitor.get("yearly_stats", []) if "year" in stat
+                }
+                for competitor in competitor_details
+            }
             
-            # Add competitors' years
-            for competitor in competitor_details:
-                for stat in competitor.get("yearly_stats", []):
-                    if "year" in stat:
-                        all_years.add(stat["year"])
+            all_years = set(main_yearly)
+            for yearly in competitor_yearly.values():
+                all_years.update(yearly)
             
             # Create yearly comparison data
-            years_list = sorted(all_years)
             yearly_comparison = []
-            
-            for year in years_list:
-                year_data = {"year": year}
-                
-                # Add main applicant
-                main_year_stat = next((s for s in main_applicant_data.get("yearly_stats", []) if s.get("year") == year), None)
-                year_data[applicant_name] = main_year_stat.get("count", 0) if main_year_stat else 0
-                
-                # Add competitors
+            for year in sorted(all_years):
+                year_data = {"year": year, applicant_name: main_yearly.get(year, 0)}
                 for competitor in competitor_details:
-                    comp_year_stat = next((s for s in competitor.get("yearly_stats", []) if s.get("year") == year), None)
-                    year_data[competitor["name"]] = comp_year_stat.get("count", 0) if comp_year_stat else 0
-                
+                    year_data[competitor["name"]] = competitor_yearly[competitor["name"]].get(year, 0)
                 yearly_comparison.append(year_data)
             
             # 2. Technology overlap
@@ -1253,6 +1017,7 @@ class InpitSQLiteMCPServer:
                     "total_patents": main_applicant_data.get("total_patents"),
                     "top_technologies": main_applicant_data.get("top_technologies", [])[:3]
                 },
+                "competitor_method": method,
                 "competitors": competitor_details,
                 "comparisons": {
                     "yearly_patent_counts": yearly_comparison,
@@ -1275,6 +1040,8 @@ class InpitSQLiteMCPServer:
         Returns:
             PDF report data in base64 format
         """
+        from fpdf import FPDF
+
         applicant_name = arguments.get("applicant_name")
         if not applicant_name:
             return {"error": "applicant_name is required"}
@@ -1584,23 +1351,46 @@ class InpitSQLiteMCPServer:
             ]
         }
 
-# Create singleton instance
-inpit_sqlite_server = InpitSQLiteMCPServer()
+def preload_heavy_modules():
+    """
+    Import the visualization, PDF and similarity stacks ahead of their first use.
+
+    The server calls this from a background thread after startup (unless fast-start
+    mode is enabled) so the first visual/PDF report does not pay the import cost.
+    """
+    for module_name in ("chart_renderer", "fpdf", "competitor_discovery", "patent_analytics"):
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"Could not preload {module_name}: {e}")
+
+# Singleton instance, created on first use
+_inpit_sqlite_server: Optional[InpitSQLiteMCPServer] = None
+_inpit_sqlite_server_lock = threading.Lock()
+
+def get_server() -> InpitSQLiteMCPServer:
+    """Return the singleton server instance, creating it on first call"""
+    global _inpit_sqlite_server
+    if _inpit_sqlite_server is None:
+        with _inpit_sqlite_server_lock:
+            if _inpit_sqlite_server is None:
+                _inpit_sqlite_server = InpitSQLiteMCPServer()
+    return _inpit_sqlite_server
 
 # MCP server functions that will be called by the MCP framework
 def get_tools():
     """Return the tools provided by this server"""
-    return inpit_sqlite_server.get_tools()
+    return get_server().get_tools()
 
 def get_resources():
     """Return the resources provided by this server"""
-    return inpit_sqlite_server.get_resources()
+    return get_server().get_resources()
 
 def execute_tool(tool_name, arguments):
     """Execute a tool with the given arguments"""
     arguments_dict = json.loads(arguments) if isinstance(arguments, str) else arguments
-    return inpit_sqlite_server.execute_tool(tool_name, arguments_dict)
+    return get_server().execute_tool(tool_name, arguments_dict)
 
 def access_resource(uri):
     """Access a resource by URI"""
-    return inpit_sqlite_server.access_resource(uri)
+    return get_server().access_resource(uri)
@@ -11,9 +11,9 @@ processing natural language queries against the patent database.
 import os
 from typing import Dict, List, Any, Optional
 from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-from google_patents_fetcher import GooglePatentsFetcher
 from nl_query_processor import PatentNLQueryProcessor
 
 router = APIRouter(prefix="/patents", tags=["Patents"])
@@ -21,9 +21,35 @@ router = APIRouter(prefix="/patents", tags=["Patents"])
 # Path to Google Patents database
 DB_PATH = "/app/data/google_patents.db"
 
-# Initialize processors
-patent_fetcher = GooglePatentsFetcher(db_path=DB_PATH)
-nl_processor = PatentNLQueryProcessor(db_path=DB_PATH)
+# Processors are created on first request; GooglePatentsFetcher imports pandas,
+# BigQuery and boto3 and fetches credentials from S3, which would delay startup
+_patent_fetcher = None
+_nl_processor = None
+_ingestion_scheduler = None
+
+def get_patent_fetcher():
+    """Return the shared GooglePatentsFetcher, creating it on first use"""
+    global _patent_fetcher
+    if _patent_fetcher is None:
+        from google_patents_fetcher import GooglePatentsFetcher
+        _patent_fetcher = GooglePatentsFetcher(db_path=DB_PATH)
+    return _patent_fetcher
+
+def start_incremental_import_schedule():
+    """Start the scheduled incremental import (opt-in with PATENTS_INCREMENTAL_INTERVAL_MINUTES > 0)"""
+    global _ingestion_scheduler
+    if _ingestion_scheduler is None:
+        from google_patents_fetcher import IncrementalIngestionScheduler
+        _ingestion_scheduler = IncrementalIngestionScheduler(get_patent_fetcher)
+        _ingestion_scheduler.start()
+    return _ingestion_scheduler
+
+def get_nl_processor():
+    """Return the shared PatentNLQueryProcessor, creating it on first use"""
+    global _nl_processor
+    if _nl_processor is None:
+        _nl_processor = PatentNLQueryProcessor(db_path=DB_PATH)
+    return _nl_processor
 
 # Define models for request/response
 class NLQueryRequest(BaseModel):
@@ -41,6 +67,9 @@ class NLQueryResponse(BaseModel):
     results: List[Dict[str, Any]] = []
     error: Optional[str] = None
 
+class IncrementalImportRequest(BaseModel):
+    limit: int = 10000
+
 class ImportResponse(BaseModel):
     success: bool
     count: int = 0
@@ -60,7 +89,7 @@ async def query_patents(request: NLQueryRequest):
     Process a natural language query against the patents database.
     """
     try:
-        result = nl_processor.process_and_execute(request.query)
+        result = get_nl_processor().process_and_execute(request.query)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
@@ -71,7 +100,7 @@ async def get_query_patents(query_text: str):
     Process a natural language query against the patents database (GET method).
     """
     try:
-        result = nl_processor.process_and_execute(query_text)
+        result = get_nl_processor().process_and_execute(query_text)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
@@ -87,7 +116,7 @@ async def import_patents(request: ImportRequest):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = request.credentials_path
         
         # Import patents
-        count = patent_fetcher.fetch_japanese_patents(limit=request.limit)
+        count = get_patent_fetcher().fetch_japanese_patents(limit=request.limit)
         
         if count > 0:
             return {
@@ -110,13 +139,42 @@ async def import_patents(request: ImportRequest):
             "error": str(e)
         }
 
+@router.post("/import/incremental")
+async def import_patents_incremental(request: IncrementalImportRequest):
+    """
+    Import only the Japanese patents published after the newest stored publication.
+    
+    The BigQuery fetch and SQLite import run in the threadpool, off the event loop.
+    Returns status "busy" while another (e.g. scheduled) incremental import runs.
+    """
+    try:
+        fetcher = await run_in_threadpool(get_patent_fetcher)
+        run = await run_in_threadpool(fetcher.fetch_incremental_patents, limit=request.limit)
+        return {"success": run.get("status") == "success", **run}
+    except Exception as e:
+        return {"success": False, "status": "error", "error": str(e)}
+
+@router.get("/import/runs")
+async def get_import_runs(limit: int = Query(20, ge=1, le=500)):
+    """
+    Get metrics (rows added, duration, watermark) of recent full and incremental imports.
+    """
+    try:
+        return {
+            "success": True,
+            "schedule_interval_minutes": _ingestion_scheduler.interval_minutes if _ingestion_scheduler else None,
+            "runs": get_patent_fetcher().get_ingestion_runs(limit=limit)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching import runs: {str(e)}")
+
 @router.get("/family/{application_number}", response_model=FamilyResponse)
 async def get_family_members(application_number: str):
     """
     Get all family members for a given application number.
     """
     try:
-        family_members = patent_fetcher.get_family_members(application_number)
+        family_members = get_patent_fetcher().get_family_members(application_number)
         
         return {
             "success": True,
@@ -18,12 +18,17 @@ from urllib.parse import unquote
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import ssl
+import threading
+
+# Fast-start mode: skip the background preload of the visualization/PDF stacks.
+# Heavy modules are then imported only when a tool first needs them.
+FAST_START = os.environ.get("MCP_FAST_START", "false").lower() in ("1", "true", "yes")
 
 # Import our custom middleware for URL encoding
 from encoding_middleware import URLEncodingMiddleware
 
 # Import the patents API router
-from patents_api import router as patents_router
+from patents_api import router as patents_router, start_incremental_import_schedule
 
 # Import the MCP modules
 try:
@@ -31,7 +36,8 @@ try:
         get_tools as get_inpit_tools,
         get_resources as get_inpit_resources,
         execute_tool as execute_inpit_tool,
-        access_resource as access_inpit_resource
+        access_resource as access_inpit_resource,
+        preload_heavy_modules
     )
     print("Successfully imported Inpit SQLite MCP module")
 except ImportError as e:
@@ -155,6 +161,16 @@ app.add_middleware(URLEncodingMiddleware)
 # Include the patents API router
 app.include_router(patents_router)
 
+@app.on_event("startup")
+async def preload_modules():
+    """Warm up heavy modules in the background so startup is not blocked"""
+    # The fetcher module imports pandas and BigQuery, so the import schedule is set up off the event loop
+    threading.Thread(target=start_incremental_import_schedule, name="patents-import-schedule", daemon=True).start()
+    if FAST_START:
+        print("Fast-start mode: heavy modules will be loaded on first use")
+        return
+    threading.Thread(target=preload_heavy_modules, name="module-preload", daemon=True).start()
+
 class ToolRequest(BaseModel):
     tool_name: str
     arguments: Dict[str, Any]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for competitor_discovery against a small inpit_data fixture
+
+The queries run on an in-memory SQLite database through a query executor that
+returns the InpitSQLiteMCPServer._execute_sql_query result format.
+
+Run with: python -m pytest test_competitor_discovery.py (or python test_competitor_discovery.py)
+"""
+
+import sqlite3
+import unittest
+
+from competitor_discovery import CompetitorDiscovery, CompetitorQueryError
+
+# (applicant, IPC, filing date, number of patents)
+FIXTURE = [
+    ("Acme", "G06F16/00", "2020-04-01", 5),
+    ("Acme", "H04L9/32", "2021-04-01", 3),
+    ("Beta", "G06F16/00", "2019-04-01", 4),
+    ("Beta", "H04L9/32", "2021-04-01", 2),
+    ("Gamma", "G06F3/01", "2022-04-01", 6),
+    ("Delta", "A61B5/00", "2020-04-01", 7),
+]
+ACME_TECHNOLOGIES = [{"ipc": "G06F", "count": 5}, {"ipc": "H04L", "count": 3}]
+
+
+class CompetitorDiscoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE inpit_data (出願人 TEXT, 国際特許分類_IPC_ TEXT, 出願日 TEXT)")
+        for applicant, ipc, filed, count in FIXTURE:
+            self.conn.executemany("INSERT INTO inpit_data VALUES (?, ?, ?)", [(applicant, ipc, filed)] * count)
+        self.requests = []
+        self.discovery = CompetitorDiscovery(self.execute)
+
+    def execute(self, request):
+        self.requests.append(request)
+        cursor = self.conn.execute(request["query"], request.get("params") or ())
+        columns = [description[0] for description in cursor.description]
+        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if not results:
+            return {"success": False, "message": "Query executed but returned no results"}
+        return {"success": True, "columns": columns, "results": results, "count": len(results)}
+
+    def test_ranking_orders_by_weighted_overlap(self):
+        competitors = self.discovery.discover("Acme", ACME_TECHNOLOGIES, 5)
+
+        self.assertEqual([c["name"] for c in competitors], ["Beta", "Gamma"])
+        self.assertEqual([c["rank"] for c in competitors], [1, 2])
+        beta, gamma = competitors
+        self.assertAlmostEqual(beta["relevance"], 1.0)
+        self.assertAlmostEqual(gamma["relevance"], 0.625)
+        self.assertEqual(beta["shared_areas"], 2)
+        self.assertEqual(beta["total_patents"], 6)
+        self.assertEqual(beta["top_technologies"], [{"ipc": "G06F16/00", "count": 4}, {"ipc": "H04L9/32", "count": 2}])
+        self.assertEqual(beta["yearly_stats"], [{"year": "2019", "count": 4}, {"year": "2021", "count": 2}])
+        self.assertEqual(len(self.requests), 1)
+
+    def test_ranking_respects_the_competitor_count(self):
+        competitors = self.discovery.discover("Acme", ACME_TECHNOLOGIES, 1)
+        self.assertEqual([c["name"] for c in competitors], ["Beta"])
+
+    def test_cosine_similarity(self):
+        competitors = self.discovery.find_similar("Acme", 5)
+
+        self.assertEqual([c["name"] for c in competitors], ["Beta", "Gamma"])
+        beta, gamma = competitors
+        # Acme (G06F 5, H04L 3) against Beta (4, 2) and Gamma (6, 0)
+        self.assertAlmostEqual(beta["similarity"], round(26 / (34 ** 0.5 * 20 ** 0.5), 4))
+        self.assertAlmostEqual(gamma["similarity"], round(30 / (34 ** 0.5 * 6), 4))
+        self.assertEqual(gamma["total_patents"], 6)
+        self.assertEqual(gamma["top_technologies"], [{"ipc": "G06F3/01", "count": 6}])
+        self.assertNotIn("shared_areas", gamma)
+
+    def test_api_error_is_raised_not_reported_as_no_competitors(self):
+        rejection = {"success": False, "error": "Query too expensive: estimated rows", "error_type": "query_too_expensive"}
+        discovery = CompetitorDiscovery(lambda request: rejection)
+
+        with self.assertRaises(CompetitorQueryError) as raised:
+            discovery.discover("Acme", ACME_TECHNOLOGIES, 3)
+        self.assertEqual(raised.exception.result["error_type"], "query_too_expensive")
+        with self.assertRaises(CompetitorQueryError):
+            discovery.find_similar("Acme", 3)
+
+    def test_values_are_bound_as_parameters(self):
+        self.conn.executemany("INSERT INTO inpit_data VALUES (?, ?, ?)", [("O'Brien Ltd", "G06F1/00", "2020-04-01")] * 2)
+
+        competitors = self.discovery.discover("Acme", ACME_TECHNOLOGIES, 5)
+
+        self.assertIn("O'Brien Ltd", [c["name"] for c in competitors])
+        request = self.requests[0]
+        self.assertNotIn("Acme", request["query"])
+        self.assertIn("Acme", request["params"])
+
+    def test_no_match_is_empty(self):
+        self.assertEqual(self.discovery.discover("Acme", [{"ipc": "C07D", "count": 1}], 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import-time budget test for the Inpit SQLite MCP module
+
+Runs `python -X importtime` in a fresh interpreter, imports inpit_sqlite_mcp and lists
+its tools, then checks that:
+  - no heavy module (numpy, pandas, matplotlib, fpdf, PIL, BigQuery, boto3) was loaded
+  - the total import time stays under the budget
+
+Usage:
+    python test_import_time.py [budget_ms]
+
+The budget defaults to IMPORT_TIME_BUDGET_MS (500 ms).
+"""
+
+import os
+import sys
+import subprocess
+
+# Default cold-start budget in milliseconds
+IMPORT_TIME_BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "500"))
+
+# Modules that must only be imported on first use of the tools that need them
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "fpdf", "PIL", "google.cloud", "boto3"]
+
+# Code executed in the child interpreter: import the module and list tools
+STARTUP_CODE = "import inpit_sqlite_mcp; inpit_sqlite_mcp.get_tools()"
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure_import_time():
+    """
+    Run the startup code under `-X importtime`
+
+    Returns:
+        (total_ms, imported_modules) where imported_modules maps module name to
+        its cumulative import time in microseconds
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{proc.stderr[-2000:]}")
+
+    imported_modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+            imported_modules[name] = int(cumulative_us)
+            total_us += int(self_us)
+        except ValueError:
+            continue
+
+    return total_us / 1000.0, imported_modules
+
+def test_no_heavy_imports():
+    """Tool listing must not import the visualization/PDF/cloud stacks"""
+    _, imported_modules = measure_import_time()
+    loaded = [
+        name for name in imported_modules
+        if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY_MODULES)
+    ]
+    assert not loaded, f"Heavy modules imported at startup: {sorted(loaded)}"
+
+def test_import_time_budget(budget_ms: int = IMPORT_TIME_BUDGET_MS):
+    """Total import time must stay under the budget"""
+    total_ms, imported_modules = measure_import_time()
+    slowest = sorted(imported_modules.items(), key=lambda item: item[1], reverse=True)[:10]
+    print(f"Total import time: {total_ms:.1f} ms (budget {budget_ms} ms)")
+    for name, cumulative_us in slowest:
+        print(f"  {cumulative_us / 1000.0:8.1f} ms  {name}")
+    assert total_ms <= budget_ms, f"Import time {total_ms:.1f} ms exceeds budget of {budget_ms} ms"
+
+if __name__ == "__main__":
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_TIME_BUDGET_MS
+
+    print("=== テスト: MCPモジュールの起動時間 ===")
+    failed = False
+    for test in (test_no_heavy_imports, lambda: test_import_time_budget(budget)):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"FAILED: {e}")
+            failed = True
+
+    print("FAILED" if failed else "PASSED")
+    sys.exit(1 if failed else 0)
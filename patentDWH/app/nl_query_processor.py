@@ -42,13 +42,15 @@ class NLQueryProcessor(BaseNLQueryProcessor):
         """Initialize the NL query processor."""
         super().__init__()  # Initialize parent class
         
-    async def _generate_fallback_sql(self, query: str, db_type: str) -> str:
+    async def _generate_fallback_sql(self, query: str, db_type: str, feedback: Optional[Dict] = None) -> str:
         """
         Generate SQL using direct Bedrock API call as a fallback method.
         
         Args:
             query: Natural language query
             db_type: Database type
+            feedback: Optional query_too_expensive error of a previous attempt,
+                      used to ask for a cheaper rewrite
             
         Returns:
             Generated SQL query
@@ -89,7 +91,7 @@ class NLQueryProcessor(BaseNLQueryProcessor):
 
 ### 質問:
 {query}
-
+{self._format_cost_feedback(feedback)}
 ### 応答:
 SQLクエリのみを出力してください。説明は不要です。バックティック(```)やSQL識別子も含めないでください。
 """
@@ -123,6 +125,29 @@ SQLクエリのみを出力してください。説明は不要です。バッ
             logger.error(f"Error generating fallback SQL: {e}")
             return ""
     
+    @staticmethod
+    def _format_cost_feedback(feedback: Optional[Dict]) -> str:
+        """Format a query governor rejection as an extra prompt section"""
+        if not feedback:
+            return ""
+        return f"""
+### 前回のSQL（実行コストが高すぎるため拒否されました）:
+{feedback.get("sql", "")}
+
+### 拒否理由:
+{feedback.get("error", "")}
+
+### 改善のヒント:
+{feedback.get("hint", "")}
+"""
+
+    def _execute_sql(self, sql_query: str, db_type: str) -> httpx.Response:
+        """Execute SQL on the patent DB API"""
+        return httpx.post(
+            f"{PATENT_DB_URL}/api/sql-query",
+            json={"query": sql_query, "db_type": db_type}
+        )
+
     async def process_query(self, query: str, db_type: str = "inpit") -> Dict:
         """
         Process a natural language query about patents with Bedrock fallback.
@@ -164,10 +189,17 @@ SQLクエリのみを出力してください。説明は不要です。バッ
                     }
             
             # Execute the SQL query against the database
-            response = httpx.post(
-                f"{PATENT_DB_URL}/api/sql-query",
-                json={"query": sql_query, "db_type": db_type}
-            )
+            response = self._execute_sql(sql_query, db_type)
+            
+            # The DB rejected the query as too expensive: ask once for a cheaper rewrite
+            if response.status_code == 422 and response.json().get("error_type") == "query_too_expensive":
+                feedback = {**response.json(), "sql": sql_query}
+                logger.info(f"Query rejected as too expensive ({feedback.get('reason')}), requesting rewrite")
+                rewritten_sql = await self._generate_fallback_sql(query, db_type, feedback=feedback)
+                if rewritten_sql and rewritten_sql.strip().upper().startswith(("SELECT", "WITH")):
+                    sql_query = rewritten_sql
+                    used_fallback = True
+                    response = self._execute_sql(sql_query, db_type)
             
             if response.status_code != 200:
                 return {
@@ -4,10 +4,9 @@ Flask application for Patent DWH web interface with API endpoints.
 """
 
 import os
-import sqlite3
 import json
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_admin import Admin, BaseView, expose
 from flask_admin.contrib.sqla import ModelView
@@ -17,6 +16,12 @@ from sqlalchemy.orm import sessionmaker
 from flask_restful import Api, Resource
 from flask_cors import CORS
 
+from federated_query import FederatedQueryExecutor, normalize_timeout
+from query_governor import QueryTooExpensive, is_select_query, normalize_max_rows, normalize_params
+from result_format import check_format, encode_json, format_rows
+from slow_query_log import execute_logged, index_advisor
+from snapshot_manager import SnapshotManager, SnapshotCache, BASE_SNAPSHOT_ID, check_admin_token, handle_snapshot_admin
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -25,6 +30,22 @@ logger = logging.getLogger(__name__)
 INPIT_DB_PATH = "/app/data/inpit.db"
 GOOGLE_PATENTS_GCP_DB_PATH = "/app/data/google_patents_gcp.db"
 GOOGLE_PATENTS_S3_DB_PATH = "/app/data/google_patents_s3.db"
+# Database paths by db_type
+DATABASE_PATHS = {
+    'inpit': INPIT_DB_PATH,
+    'google_patents_gcp': GOOGLE_PATENTS_GCP_DB_PATH,
+    'google_patents_s3': GOOGLE_PATENTS_S3_DB_PATH
+}
+# Main table of each database (used for record counts)
+DATABASE_TABLES = {
+    'inpit': 'inpit_data',
+    'google_patents_gcp': 'publications',
+    'google_patents_s3': 'publications'
+}
+# Snapshot managers by db_type: the fixed paths above are the base snapshots
+SNAPSHOT_MANAGERS = {
+    db_type: SnapshotManager(db_type, db_path) for db_type, db_path in DATABASE_PATHS.items()
+}
 # Default database path
 DB_PATH = INPIT_DB_PATH
 DB_URI = f"sqlite:///{DB_PATH}"
@@ -45,15 +66,27 @@ app.config['SECRET_KEY'] = os.urandom(24)
 # Initialize SQLAlchemy
 db = SQLAlchemy(app)
 
-# Load column mapping if exists
+# Column mapping of the active INPIT snapshot (reloaded when the snapshot changes)
 column_mapping = {}
-mapping_path = '/app/data/column_mapping.json'
-if os.path.exists(mapping_path):
-    try:
-        with open(mapping_path, 'r') as f:
-            column_mapping = json.load(f)
-    except Exception as e:
-        print(f"Error loading column mapping: {e}")
+
+def load_column_mapping(snapshot_id):
+    """Load the column mapping written next to a snapshot, falling back to the base mapping"""
+    manager = SNAPSHOT_MANAGERS['inpit']
+    mapping_path = manager.sidecar_path(snapshot_id, 'column_mapping.json')
+    if not os.path.exists(mapping_path):
+        mapping_path = manager.sidecar_path(BASE_SNAPSHOT_ID, 'column_mapping.json')
+    mapping = {}
+    if os.path.exists(mapping_path):
+        try:
+            with open(mapping_path, 'r') as f:
+                mapping = json.load(f)
+        except Exception as e:
+            print(f"Error loading column mapping: {e}")
+    column_mapping.clear()
+    column_mapping.update(mapping)
+
+load_column_mapping(SNAPSHOT_MANAGERS['inpit'].active_id)
+SNAPSHOT_MANAGERS['inpit'].add_listener(lambda old_id, new_id: load_column_mapping(new_id))
 
 # Create dynamic model from database
 Base = declarative_base()
@@ -151,6 +184,31 @@ class InpitDataView(ModelView):
         
         super(InpitDataView, self).__init__(model, session, **kwargs)
 
+def run_form_query(db_type, sql_query):
+    """
+    Run a read-only query from the admin query forms on the active snapshot of db_type.
+
+    The query borrows a pooled read-only connection, so a snapshot flip waits for
+    it, and runs within the query governor's budget like the JSON API.
+    """
+    if not is_select_query(sql_query):
+        return jsonify({"success": False, "error": "Only SELECT queries are allowed"})
+    manager = SNAPSHOT_MANAGERS.get(db_type, SNAPSHOT_MANAGERS['inpit'])
+    try:
+        with manager.connection() as (conn, _):
+            result = execute_logged(conn, db_type, sql_query)
+    except QueryTooExpensive as e:
+        return jsonify(e.to_dict())
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+    return jsonify({
+        "success": True,
+        # Map DB column names to original CSV headers if possible
+        "columns": [column_mapping.get(col, col) for col in result["columns"]],
+        "results": result["rows"],
+        "truncated": result["truncated"]
+    })
+
 # Custom view for free SQL queries
 class SQLQueryView(BaseView):
     @expose('/')
@@ -169,45 +227,7 @@ class InpitSQLExamplesView(BaseView):
     @expose('/query', methods=['POST'])
     def query(self):
         """Execute a SQL query on inpit database and return results."""
-        sql_query = request.form.get('query', '')
-        db_path = INPIT_DB_PATH
-        
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            
-            # Check if query returns data
-            if sql_query.strip().lower().startswith(('select', 'pragma', 'explain')):
-                columns = [description[0] for description in cursor.description]
-                
-                # Map DB column names to original CSV headers if possible
-                display_columns = []
-                for col in columns:
-                    display_columns.append(column_mapping.get(col, col))
-                    
-                results = cursor.fetchall()
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "columns": display_columns,
-                    "results": results
-                })
-            else:
-                # For non-SELECT queries
-                conn.commit()
-                affected_rows = cursor.rowcount
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "message": f"Query executed successfully. {affected_rows} rows affected."
-                })
-                
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "error": str(e)
-            })
+        return run_form_query('inpit', request.form.get('query', ''))
 
 class GooglePatentsGCPExamplesView(BaseView):
     @expose('/')
@@ -220,45 +240,7 @@ class GooglePatentsGCPExamplesView(BaseView):
     @expose('/query', methods=['POST'])
     def query(self):
         """Execute a SQL query on Google Patents GCP database and return results."""
-        sql_query = request.form.get('query', '')
-        db_path = GOOGLE_PATENTS_GCP_DB_PATH
-        
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            
-            # Check if query returns data
-            if sql_query.strip().lower().startswith(('select', 'pragma', 'explain')):
-                columns = [description[0] for description in cursor.description]
-                
-                # Map DB column names to original CSV headers if possible
-                display_columns = []
-                for col in columns:
-                    display_columns.append(column_mapping.get(col, col))
-                    
-                results = cursor.fetchall()
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "columns": display_columns,
-                    "results": results
-                })
-            else:
-                # For non-SELECT queries
-                conn.commit()
-                affected_rows = cursor.rowcount
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "message": f"Query executed successfully. {affected_rows} rows affected."
-                })
-                
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "error": str(e)
-            })
+        return run_form_query('google_patents_gcp', request.form.get('query', ''))
         
 class GooglePatentsS3ExamplesView(BaseView):
     @expose('/')
@@ -271,45 +253,7 @@ class GooglePatentsS3ExamplesView(BaseView):
     @expose('/query', methods=['POST'])
     def query(self):
         """Execute a SQL query on Google Patents S3 database and return results."""
-        sql_query = request.form.get('query', '')
-        db_path = GOOGLE_PATENTS_S3_DB_PATH
-        
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            
-            # Check if query returns data
-            if sql_query.strip().lower().startswith(('select', 'pragma', 'explain')):
-                columns = [description[0] for description in cursor.description]
-                
-                # Map DB column names to original CSV headers if possible
-                display_columns = []
-                for col in columns:
-                    display_columns.append(column_mapping.get(col, col))
-                    
-                results = cursor.fetchall()
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "columns": display_columns,
-                    "results": results
-                })
-            else:
-                # For non-SELECT queries
-                conn.commit()
-                affected_rows = cursor.rowcount
-                conn.close()
-                return jsonify({
-                    "success": True,
-                    "message": f"Query executed successfully. {affected_rows} rows affected."
-                })
-                
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "error": str(e)
-            })
+        return run_form_query('google_patents_s3', request.form.get('query', ''))
 
 # Setup Flask-Admin
 admin = Admin(app, name='patentDWH Database', template_mode='bootstrap3')
@@ -341,11 +285,8 @@ def tables():
     """
     Return the list of tables in the database.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, _):
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")]
     return jsonify({"tables": tables})
 
 @app.route('/query', methods=['POST'])
@@ -353,52 +294,7 @@ def query():
     """
     Execute a SQL query and return results.
     """
-    sql_query = request.form.get('query', '')
-    db_type = request.form.get('db_type', 'inpit')
-    
-    # Select database based on type
-    db_path = INPIT_DB_PATH
-    if db_type == 'google_patents_gcp':
-        db_path = GOOGLE_PATENTS_GCP_DB_PATH
-    elif db_type == 'google_patents_s3':
-        db_path = GOOGLE_PATENTS_S3_DB_PATH
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        
-        # Check if query returns data
-        if sql_query.strip().lower().startswith(('select', 'pragma', 'explain')):
-            columns = [description[0] for description in cursor.description]
-            
-            # Map DB column names to original CSV headers if possible
-            display_columns = []
-            for col in columns:
-                display_columns.append(column_mapping.get(col, col))
-                
-            results = cursor.fetchall()
-            conn.close()
-            return jsonify({
-                "success": True,
-                "columns": display_columns,
-                "results": results
-            })
-        else:
-            # For non-SELECT queries
-            conn.commit()
-            affected_rows = cursor.rowcount
-            conn.close()
-            return jsonify({
-                "success": True,
-                "message": f"Query executed successfully. {affected_rows} rows affected."
-            })
-            
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        })
+    return run_form_query(request.form.get('db_type', 'inpit'), request.form.get('query', ''))
 
 @app.route('/health')
 def health():
@@ -406,9 +302,9 @@ def health():
     Check if the database is accessible.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.close()
-        return jsonify({"status": "healthy", "message": "Database is accessible."})
+        with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, snapshot_id):
+            conn.execute("SELECT 1")
+        return jsonify({"status": "healthy", "message": "Database is accessible.", "snapshot_id": snapshot_id})
     except Exception as e:
         return jsonify({"status": "unhealthy", "message": str(e)}), 500
 
@@ -416,11 +312,21 @@ def health():
 api = Api(app)
 CORS(app)
 
+# Schema information per snapshot (cleared when the inpit snapshot changes)
+schema_cache = SnapshotCache(SNAPSHOT_MANAGERS['inpit'])
+
 # Helper function to get schema information
 def get_schema_info():
     """Get database schema information for API documentation."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        return schema_cache.get_or_compute('schema_info', _read_schema_info)
+    except Exception as e:
+        logger.error(f"Error getting schema info: {e}")
+        return {}
+
+def _read_schema_info():
+    """Read column information of every table in the active inpit snapshot."""
+    with SNAPSHOT_MANAGERS['inpit'].connection() as (conn, _):
         cursor = conn.cursor()
         
         # Get table names
@@ -435,11 +341,7 @@ def get_schema_info():
             columns = [{'name': row[1], 'type': row[2]} for row in cursor.fetchall()]
             schema_info[table] = columns
         
-        conn.close()
         return schema_info
-    except Exception as e:
-        logger.error(f"Error getting schema info: {e}")
-        return {}
 
 # API Resource for direct SQL queries
 class SQLQueryAPI(Resource):
@@ -451,87 +353,177 @@ class SQLQueryAPI(Resource):
             
             db_type = data.get('db_type', 'inpit')
             sql_query = data['query']
-            logger.info(f"Direct SQL query on {db_type}: {sql_query}")
+            try:
+                # Optional bound parameters: a list for "?" or an object for ":name" placeholders
+                params = normalize_params(data.get('params'))
+                # Optional row cap (bounded by the governor ceiling)
+                max_rows = normalize_max_rows(data.get('max_rows'))
+                # Optional result format: "rows" (arrays, default), "objects" or "columns" (column-major)
+                result_format = check_format(data.get('format'), 'rows')
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            logger.info(f"Direct SQL query on {db_type}: {sql_query}" + (f" with params {params}" if params else ""))
             
-            # Basic security check - only allow SELECT queries
-            if not sql_query.strip().lower().startswith('select'):
+            # Basic security check - only allow SELECT queries (optionally with a WITH clause)
+            if not is_select_query(sql_query):
                 return {"error": "Only SELECT queries are allowed"}, 403
             
-            # Select database based on type
-            db_path = INPIT_DB_PATH
-            if db_type == 'google_patents_gcp':
-                db_path = GOOGLE_PATENTS_GCP_DB_PATH
-            elif db_type == 'google_patents_s3':
-                db_path = GOOGLE_PATENTS_S3_DB_PATH
-            
-            # Execute the query
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            
-            columns = [description[0] for description in cursor.description]
-            results = cursor.fetchall()
-            conn.close()
+            # Execute the query on the active snapshot within the cost, time and row budget
+            manager = SNAPSHOT_MANAGERS.get(db_type, SNAPSHOT_MANAGERS['inpit'])
+            with manager.connection() as (conn, snapshot_id):
+                result = execute_logged(conn, db_type, sql_query, params, max_rows=max_rows)
             
-            return {
+            body, headers = encode_json({
                 "success": True,
-                "columns": columns,
-                "results": results,
-                "record_count": len(results)
-            }
+                "columns": result["columns"],
+                "format": result_format,
+                "results": format_rows(result["columns"], result["rows"], result_format),
+                "record_count": result["row_count"],
+                "truncated": result["truncated"],
+                "snapshot_id": snapshot_id
+            }, request.headers.get('Accept-Encoding'))
+            return Response(body, headers=headers)
+        except QueryTooExpensive as e:
+            logger.warning(f"Rejected expensive SQL query on {db_type}: {e}")
+            return e.to_dict(), 422
         except Exception as e:
             logger.error(f"Error in SQL query API: {e}")
             return {"error": str(e)}, 500
 
+# Shared executor for queries that span several databases (governed reads of the active snapshots)
+federated_executor = FederatedQueryExecutor(SNAPSHOT_MANAGERS)
+
+# API Resource for federated queries across several databases
+class FederatedQueryAPI(Resource):
+    def post(self):
+        """
+        Run a query on several databases concurrently and merge the results.
+
+        JSON body:
+            query: SQL query run on every database in db_types
+            db_types: Databases to query (default: all)
+            queries: Alternatively, a mapping of db_type to a per-database query
+            timeout: Global timeout in seconds (optional)
+            max_rows: Row cap per database (optional, bounded by the governor ceiling)
+        
+        Every per-database query runs through the query governor; a database whose
+        query is too expensive reports the governor error in its "sources" entry.
+        """
+        try:
+            data = request.get_json()
+            if not data or ('query' not in data and 'queries' not in data):
+                return {"error": "Missing 'query' or 'queries' field in JSON body"}, 400
+            
+            if 'queries' in data:
+                queries = data['queries']
+                if not isinstance(queries, dict) or not queries:
+                    return {"error": "'queries' must be a non-empty object of db_type to query"}, 400
+            else:
+                db_types = data.get('db_types') or list(DATABASE_PATHS.keys())
+                queries = {db_type: data['query'] for db_type in db_types}
+            
+            unknown = [db_type for db_type in queries if db_type not in DATABASE_PATHS]
+            if unknown:
+                return {"error": f"Unknown db_type: {', '.join(unknown)}"}, 400
+            
+            # Basic security check - only allow SELECT queries (optionally with a WITH clause)
+            for db_type, sql_query in queries.items():
+                if not is_select_query(sql_query):
+                    return {"error": f"Only SELECT queries are allowed ({db_type})"}, 403
+            
+            try:
+                timeout = normalize_timeout(data.get('timeout'))
+                max_rows = normalize_max_rows(data.get('max_rows'))
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            
+            logger.info(f"Federated SQL query on {', '.join(queries)}")
+            return federated_executor.execute_merged(queries, timeout, max_rows=max_rows)
+        except Exception as e:
+            logger.error(f"Error in federated query API: {e}")
+            return {"error": str(e)}, 500
+
+# API Resource for the slow-query log and index advisor
+class QueryAdvisorAPI(Resource):
+    def get(self):
+        """
+        Aggregate slow queries by fingerprint and recommend indexes.
+
+        Query parameters:
+            db_type: Database to analyze (default: inpit)
+            limit: Number of fingerprints to analyze (default: 10)
+
+        Requires the X-Admin-Token header (the advisor shows other clients' queries).
+        """
+        if not check_admin_token(request.headers.get('X-Admin-Token')):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        db_type = request.args.get('db_type', 'inpit')
+        if db_type not in DATABASE_PATHS:
+            return {"error": f"Unknown db_type: {db_type}"}, 400
+        
+        try:
+            with SNAPSHOT_MANAGERS[db_type].connection() as (conn, _):
+                return index_advisor.advise(conn, db_type, int(request.args.get('limit', 10)))
+        except FileNotFoundError:
+            return {"error": "Database not found"}, 404
+        except Exception as e:
+            logger.error(f"Error in query advisor API: {e}")
+            return {"error": str(e)}, 500
+
+# API Resource for snapshot management
+class SnapshotAdminAPI(Resource):
+    def get(self):
+        """Active snapshot, in-flight queries and snapshot files of every database."""
+        return {db_type: manager.status() for db_type, manager in SNAPSHOT_MANAGERS.items()}
+    
+    def post(self):
+        """
+        Flip, register or clean up snapshots.
+        
+        JSON body:
+            db_type: Database to manage
+            action: 'activate' (snapshot_id), 'register' (path, optional snapshot_id
+                    and activate) or 'cleanup'
+        """
+        if not check_admin_token(request.headers.get('X-Admin-Token')):
+            return {"error": "Invalid admin token (the admin endpoints are disabled unless SNAPSHOT_ADMIN_TOKEN is set)"}, 403
+        data = request.get_json() or {}
+        logger.info(f"Snapshot admin request: action={data.get('action')} db_type={data.get('db_type')}")
+        return handle_snapshot_admin(SNAPSHOT_MANAGERS, data)
+
 # Register API resources
 api.add_resource(SQLQueryAPI, '/api/sql-query')
+api.add_resource(FederatedQueryAPI, '/api/federated-query')
+api.add_resource(QueryAdvisorAPI, '/api/query-advisor')
+api.add_resource(SnapshotAdminAPI, '/api/admin/snapshots')
 
 # API status and documentation endpoint
 @app.route('/api/status')
 def api_status():
     """Return API status and documentation."""
     try:
-        # Get schema info for documentation from all databases
-        schemas = {}
+        # Count records in all databases concurrently (fixed internal queries, not governed)
+        counts = federated_executor.execute({
+            db_type: f"SELECT COUNT(*) FROM {table}"
+            for db_type, table in DATABASE_TABLES.items()
+        }, governed=False)
         
-        # Check INPIT database
-        if os.path.exists(INPIT_DB_PATH):
-            conn = sqlite3.connect(INPIT_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM inpit_data")
-            count = cursor.fetchone()[0]
-            conn.close()
-            schemas['inpit'] = {'record_count': count}
-        else:
-            schemas['inpit'] = {'error': 'Database not found'}
-            
-        # Check GCP database
-        if os.path.exists(GOOGLE_PATENTS_GCP_DB_PATH):
-            conn = sqlite3.connect(GOOGLE_PATENTS_GCP_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM publications")
-            count = cursor.fetchone()[0]
-            conn.close()
-            schemas['google_patents_gcp'] = {'record_count': count}
-        else:
-            schemas['google_patents_gcp'] = {'error': 'Database not found'}
-            
-        # Check S3 database
-        if os.path.exists(GOOGLE_PATENTS_S3_DB_PATH):
-            conn = sqlite3.connect(GOOGLE_PATENTS_S3_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM publications")
-            count = cursor.fetchone()[0]
-            conn.close()
-            schemas['google_patents_s3'] = {'record_count': count}
-        else:
-            schemas['google_patents_s3'] = {'error': 'Database not found'}
+        schemas = {}
+        for db_type, result in counts.items():
+            if result.get('success'):
+                schemas[db_type] = {'record_count': result['results'][0][0]}
+            else:
+                schemas[db_type] = {'error': result.get('error')}
         
         return jsonify({
             "status": "active",
             "databases": schemas,
             "endpoints": {
-                "POST /api/sql-query": "Direct SQL query (JSON body with 'query' field and optional 'db_type')",
+                "POST /api/sql-query": "Direct SQL query (JSON body with 'query' field, optional 'params' array/object, 'db_type' and 'format' rows/objects/columns)",
+                "POST /api/federated-query": "Parallel query on several databases (JSON body with 'query' and optional 'db_types', or 'queries' per db_type; optional 'timeout' and 'max_rows')",
+                "GET /api/query-advisor": "Slow-query fingerprints and index recommendations (X-Admin-Token header, optional 'db_type' and 'limit')",
+                "GET /api/admin/snapshots": "Active database snapshots",
+                "POST /api/admin/snapshots": "Activate, register or clean up snapshots (JSON body with 'db_type', 'action', 'snapshot_id'/'path')",
                 "GET /api/status": "This API status endpoint"
             }
         })
@@ -4,17 +4,23 @@ Download bulk data from S3 bucket and create SQLite databases.
 """
 
 import os
+import re
+import json
 import boto3
 import logging
 import csv
 import sqlite3
+import itertools
 import tempfile
 from datetime import datetime
 from google.cloud import bigquery
 from google.oauth2 import service_account
-import pandas as pd
 import sys
 
+from snapshot_manager import SnapshotManager, BASE_SNAPSHOT_ID
+from s3_downloader import ParallelS3Downloader
+from trend_columns import ensure_trend_columns, ensure_trend_columns_at
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -32,6 +38,27 @@ S3_KEY_PATENTS_S3 = "MIT/demo/GCP/google_patents_s3.db"
 GOOGLE_PATENTS_GCP_DB_PATH = "/app/data/google_patents_gcp.db"
 GOOGLE_PATENTS_S3_DB_PATH = "/app/data/google_patents_s3.db"
 
+# INPIT CSV to SQLite conversion settings
+INPIT_CSV_CHUNK_ROWS = int(os.environ.get("INPIT_CSV_CHUNK_ROWS", "20000"))
+INPIT_TYPE_SAMPLE_ROWS = int(os.environ.get("INPIT_TYPE_SAMPLE_ROWS", "5000"))
+INPIT_LOAD_CACHE_KB = 65536
+INTEGER_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]*)')
+REAL_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]*)?\.[0-9]+(?:[eE][-+]?[0-9]+)?')
+
+# Columns indexed after the INPIT load; each entry lists the English and the
+# cleaned Japanese column name, whichever exists is indexed. These identifier,
+# number, name and date columns are always TEXT: a sample of plain digits must
+# not give them INTEGER affinity, which would turn a later '0012' into 12.
+INPIT_INDEX_COLUMNS = [
+    ("open_patent_info_number", "開放特許情報番号"),
+    ("application_number", "出願番号"),
+    ("publication_number", "公開番号"),
+    ("registration_number", "登録番号"),
+    ("applicant", "出願人"),
+    ("application_date", "出願日"),
+    ("international_patent_classification_ipc", "国際特許分類_ipc_"),
+]
+
 def download_from_s3(bucket, key, local_path, description="file"):
     """
     Download a file from S3 bucket.
@@ -58,9 +85,6 @@ def download_from_s3(bucket, key, local_path, description="file"):
         data_dir = os.path.dirname(local_path)
         os.makedirs(data_dir, exist_ok=True)
         
-        # Use a temporary file first to avoid permission issues
-        tmp_file = f"{local_path}.download"
-        
         # Check if the S3 object exists
         try:
             s3_client.head_object(Bucket=bucket, Key=key)
@@ -78,18 +102,10 @@ def download_from_s3(bucket, key, local_path, description="file"):
                 logger.error(f"Error listing S3 objects: {list_err}")
             return False
         
-        # Download file to temporary location
-        s3_client.download_file(bucket, key, tmp_file)
-        
-        # Make the file readable and writable by everyone
-        try:
-            os.chmod(tmp_file, 0o666)
-        except Exception as e:
-            logger.warning(f"Could not set permissions on downloaded file: {e}")
-        
-        # Move to final location
-        import shutil
-        shutil.move(tmp_file, local_path)
+        # Parallel ranged download into a resumable part file; the file only
+        # appears at local_path after its checksum has been verified
+        result = ParallelS3Downloader(s3_client).download(bucket, key, local_path)
+        logger.info(f"Verified {description}: {', '.join(result['verified']) or 'no checksum available'}")
         
         # Final permission check
         try:
@@ -172,6 +188,9 @@ def create_empty_db(db_path, schema_type="patents"):
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_family_app_num ON patent_families (application_number)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_family_pub_num ON patent_families (publication_number)')
             
+            # Generated filing_year / ipc_section columns for the trend queries
+            ensure_trend_columns(conn)
+            
         elif schema_type == "inpit":
             # Create empty inpit data table
             cursor.execute('''
@@ -246,10 +265,97 @@ def create_empty_db(db_path, schema_type="patents"):
         logger.error(f"Error creating empty database: {e}")
         return False
 
-def process_inpit_csv_to_sqlite():
+def _clean_column_names(headers, jp_to_en_mapping):
+    """
+    Convert CSV headers to unique SQL-friendly column names.
+    
+    Args:
+        headers: Original (Japanese) CSV headers
+        jp_to_en_mapping: Optional Japanese to English header mapping
+        
+    Returns:
+        tuple: (cleaned column names, clean name to original header mapping,
+                original header to English/clean name mapping)
+    """
+    column_mapping = {}    # Clean column name to original Japanese name
+    jp_en_used_mapping = {}  # Original Japanese name to English name used
+    cleaned_columns = []
+    
+    for col in headers:
+        # Use English mapping if available
+        if col in jp_to_en_mapping:
+            en_col = jp_to_en_mapping[col]
+            jp_en_used_mapping[col] = en_col
+            # Still ensure it's SQL-friendly
+            clean_col = en_col.lower().replace(' ', '_').replace('-', '_').replace('/', '_').replace('(', '').replace(')', '')
+            clean_col = ''.join(c if c.isalnum() or c == '_' else '_' for c in clean_col)
+        else:
+            # If no mapping, just clean the Japanese column name
+            clean_col = col.lower().replace(' ', '_').replace('-', '_').replace('/', '_').replace('(', '').replace(')', '')
+            clean_col = ''.join(c if c.isalnum() or c == '_' else '_' for c in clean_col)
+            jp_en_used_mapping[col] = clean_col
+        
+        # Ensure the column name starts with a letter
+        if not clean_col or not clean_col[0].isalpha():
+            clean_col = f"col_{clean_col}"
+            
+        # Avoid duplicate column names
+        base_col = clean_col
+        i = 1
+        while clean_col in cleaned_columns:
+            clean_col = f"{base_col}_{i}"
+            i += 1
+            
+        cleaned_columns.append(clean_col)
+        column_mapping[clean_col] = col  # Store mapping of clean name to original Japanese
+    
+    return cleaned_columns, column_mapping, jp_en_used_mapping
+
+def _infer_column_affinity(values):
+    """
+    Infer the SQLite column affinity from sample values.
+    
+    Values with leading zeros stay TEXT so identifiers keep their formatting.
+    
+    Returns:
+        str: 'INTEGER', 'REAL' or 'TEXT'
+    """
+    affinity = None
+    for value in values:
+        if value == '':
+            continue
+        if INTEGER_PATTERN.fullmatch(value):
+            affinity = affinity or 'INTEGER'
+        elif REAL_PATTERN.fullmatch(value):
+            affinity = 'REAL'
+        else:
+            return 'TEXT'
+    return affinity or 'TEXT'
+
+def _normalize_row(row, column_count):
+    """Pad or truncate a CSV row to the header width and map empty fields to NULL"""
+    if len(row) < column_count:
+        row = row + [''] * (column_count - len(row))
+    elif len(row) > column_count:
+        row = row[:column_count]
+    return [value if value != '' else None for value in row]
+
+def process_inpit_csv_to_sqlite(db_path=INPIT_DB_PATH, snapshot_id=BASE_SNAPSHOT_ID):
     """
     Process downloaded INPIT CSV file and create SQLite database.
     Uses JP to EN mapping to convert Japanese column headers to English.
+    
+    Args:
+        db_path: Database file to create (the fixed path or a new snapshot file)
+        snapshot_id: Snapshot the file belongs to; the column mappings are written
+            next to it so building an inactive snapshot leaves the served mapping alone
+    
+    The CSV is streamed with the csv module: column affinity is inferred from the
+    first INPIT_TYPE_SAMPLE_ROWS rows (the INPIT_INDEX_COLUMNS are always TEXT), rows are inserted in chunks inside a single
+    transaction into a temporary database file, the curated indexes are built after
+    the load, and the finished file atomically replaces db_path. Memory use is
+    bounded by the chunk size rather than the CSV size.
+    
     Returns:
         bool: True if successful, False otherwise
     """
@@ -257,8 +363,10 @@ def process_inpit_csv_to_sqlite():
         logger.error(f"INPIT CSV file not found at {LOCAL_FILE_PATH_INPIT}")
         return False
 
+    tmp_db_path = f"{db_path}.tmp"
+    conn = None
     try:
-        logger.info(f"Processing INPIT CSV file to SQLite database: {INPIT_DB_PATH}")
+        logger.info(f"Processing INPIT CSV file to SQLite database: {db_path}")
         
         # Load Japanese to English mapping
         jp_to_en_mapping_path = "/app/data/jp_to_en_mapping.json"
@@ -267,7 +375,6 @@ def process_inpit_csv_to_sqlite():
             jp_to_en_mapping = {}
         else:
             try:
-                import json
                 with open(jp_to_en_mapping_path, 'r', encoding='utf-8') as f:
                     jp_to_en_mapping = json.load(f)
                 logger.info(f"Loaded {len(jp_to_en_mapping)} Japanese to English column mappings")
@@ -275,86 +382,119 @@ def process_inpit_csv_to_sqlite():
                 logger.error(f"Error loading JP to EN mapping: {e}")
                 jp_to_en_mapping = {}
         
-        # Read the CSV file using pandas with proper encoding
-        df = pd.read_csv(LOCAL_FILE_PATH_INPIT, encoding='utf-8')
+        # Long technical descriptions can exceed the default csv field size limit
+        csv.field_size_limit(2**31 - 1)
         
-        # Store both original Japanese and English mappings for reference
-        column_mapping = {}    # Clean column name to original Japanese name
-        jp_en_used_mapping = {}  # Original Japanese name to English name used
-        cleaned_columns = []
+        # Start from a clean temporary database next to the target file
+        if os.path.exists(tmp_db_path):
+            os.remove(tmp_db_path)
         
-        # Clean column names for SQLite and convert to English where possible
-        for col in df.columns:
-            # Use English mapping if available
-            if col in jp_to_en_mapping:
-                en_col = jp_to_en_mapping[col]
-                jp_en_used_mapping[col] = en_col
-                # Still ensure it's SQL-friendly
-                clean_col = en_col.lower().replace(' ', '_').replace('-', '_').replace('/', '_').replace('(', '').replace(')', '')
-                clean_col = ''.join(c if c.isalnum() or c == '_' else '_' for c in clean_col)
-            else:
-                # If no mapping, just clean the Japanese column name
-                clean_col = col.lower().replace(' ', '_').replace('-', '_').replace('/', '_').replace('(', '').replace(')', '')
-                clean_col = ''.join(c if c.isalnum() or c == '_' else '_' for c in clean_col)
-                jp_en_used_mapping[col] = clean_col
+        record_count = 0
+        # utf-8-sig strips a byte order mark from the first header
+        with open(LOCAL_FILE_PATH_INPIT, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            headers = next(reader)
+            cleaned_columns, column_mapping, jp_en_used_mapping = _clean_column_names(headers, jp_to_en_mapping)
+            column_count = len(cleaned_columns)
             
-            # Ensure the column name starts with a letter
-            if not clean_col[0].isalpha():
-                clean_col = f"col_{clean_col}"
-                
-            # Avoid duplicate column names
-            base_col = clean_col
-            i = 1
-            while clean_col in cleaned_columns:
-                clean_col = f"{base_col}_{i}"
-                i += 1
-                
-            cleaned_columns.append(clean_col)
-            column_mapping[clean_col] = col  # Store mapping of clean name to original Japanese
-        
-        # Rename the columns
-        df.columns = cleaned_columns
-        
-        # Create SQLite connection
-        conn = sqlite3.connect(INPIT_DB_PATH)
-        
-        # Write to SQLite
-        df.to_sql('inpit_data', conn, if_exists='replace', index=False)
-        
-        # Create indexes for better performance
-        cursor = conn.cursor()
+            # Infer column affinities from a bounded sample (the indexed columns stay TEXT)
+            text_columns = {name.lower() for candidates in INPIT_INDEX_COLUMNS for name in candidates}
+            sample_rows = list(itertools.islice(reader, INPIT_TYPE_SAMPLE_ROWS))
+            affinities = [
+                'TEXT' if cleaned_columns[i].lower() in text_columns
+                else _infer_column_affinity(row[i] if i < len(row) else '' for row in sample_rows)
+                for i in range(column_count)
+            ]
+            
+            conn = sqlite3.connect(tmp_db_path)
+            # The temporary file is discarded on failure, so durability is not needed during the load
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA cache_size=-{INPIT_LOAD_CACHE_KB}')
+            
+            column_defs = ', '.join(f'"{col}" {affinity}' for col, affinity in zip(cleaned_columns, affinities))
+            conn.execute(f'CREATE TABLE inpit_data ({column_defs})')
+            insert_sql = f"INSERT INTO inpit_data VALUES ({', '.join('?' * column_count)})"
+            
+            rows = (_normalize_row(row, column_count) for row in itertools.chain(sample_rows, reader) if row)
+            conn.execute('BEGIN')
+            while True:
+                chunk = list(itertools.islice(rows, INPIT_CSV_CHUNK_ROWS))
+                if not chunk:
+                    break
+                conn.executemany(insert_sql, chunk)
+                record_count += len(chunk)
+                logger.info(f"Inserted {record_count} INPIT records")
         
-        # Create indexes on likely query columns
-        for col in cleaned_columns:
-            if 'application' in col or 'number' in col or 'date' in col or 'name' in col or 'id' in col:
-                try:
-                    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{col} ON inpit_data ({col})')
-                except Exception as e:
-                    logger.warning(f"Could not create index on column {col}: {e}")
+        # Build the curated index set after the bulk load
+        lower_columns = {col.lower(): col for col in cleaned_columns}
+        for candidates in INPIT_INDEX_COLUMNS:
+            col = next((lower_columns[name.lower()] for name in candidates if name.lower() in lower_columns), None)
+            if not col:
+                continue
+            try:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{col}" ON inpit_data ("{col}")')
+                logger.info(f"Created index on {col}")
+            except sqlite3.Error as e:
+                logger.warning(f"Could not create index on column {col}: {e}")
         
         conn.commit()
+        conn.execute('ANALYZE')
         conn.close()
+        conn = None
         
-        # Save column mappings to JSON files for reference
-        import json
+        # Atomically replace the previous database
+        try:
+            os.chmod(tmp_db_path, 0o666)
+        except Exception as e:
+            logger.warning(f"Could not set permissions on database file: {e}")
+        os.replace(tmp_db_path, db_path)
         
         # Save clean column to original Japanese mapping
-        with open('/app/data/column_mapping.json', 'w', encoding='utf-8') as f:
+        manager = SnapshotManager('inpit', INPIT_DB_PATH)
+        with open(manager.sidecar_path(snapshot_id, 'column_mapping.json'), 'w', encoding='utf-8') as f:
             json.dump(column_mapping, f, ensure_ascii=False, indent=2)
         
         # Save Japanese to English mapping that was used
-        with open('/app/data/jp_en_used_mapping.json', 'w', encoding='utf-8') as f:
+        with open(manager.sidecar_path(snapshot_id, 'jp_en_used_mapping.json'), 'w', encoding='utf-8') as f:
             json.dump(jp_en_used_mapping, f, ensure_ascii=False, indent=2)
             
-        logger.info(f"Successfully created INPIT database with {len(df)} records")
+        logger.info(f"Successfully created INPIT database with {record_count} records")
         logger.info(f"Created {len(cleaned_columns)} columns with mapping saved to column_mapping.json")
         logger.info(f"Japanese to English mapping saved to jp_en_used_mapping.json")
         
         return True
     except Exception as e:
         logger.error(f"Error processing INPIT CSV to SQLite: {e}")
+        if conn is not None:
+            conn.close()
+        if os.path.exists(tmp_db_path):
+            os.remove(tmp_db_path)
         return False
 
+def build_inpit_snapshot(activate=False):
+    """
+    Build the INPIT database from the downloaded CSV as a new versioned snapshot.
+    
+    The running DB service keeps serving the current snapshot; it switches when the
+    snapshot is activated (here, or later via POST /api/admin/snapshots).
+    
+    Args:
+        activate: Make the new snapshot active when the build succeeds
+        
+    Returns:
+        str: Snapshot id, or None if the build failed
+    """
+    manager = SnapshotManager('inpit', INPIT_DB_PATH)
+    snapshot_id, snapshot_path = manager.new_snapshot_path()
+    if not process_inpit_csv_to_sqlite(snapshot_path, snapshot_id):
+        return None
+    logger.info(f"Built INPIT snapshot {snapshot_id} at {snapshot_path}")
+    if activate:
+        manager.activate(snapshot_id)
+        logger.info(f"Activated INPIT snapshot {snapshot_id}")
+    return snapshot_id
+
 def download_google_patents_databases():
     """
     Download the Google Patents databases from S3 bucket.
@@ -382,6 +522,9 @@ def download_google_patents_databases():
         # If download fails, create an empty database
         logger.warning("Creating fallback empty Google Patents GCP database")
         create_empty_db(GOOGLE_PATENTS_GCP_DB_PATH, "patents")
+    else:
+        # Databases built before the trend columns existed get them here
+        ensure_trend_columns_at(GOOGLE_PATENTS_GCP_DB_PATH)
     
     # Download S3 database
     if os.path.exists(GOOGLE_PATENTS_S3_DB_PATH):
@@ -399,10 +542,22 @@ def download_google_patents_databases():
         # If download fails, create an empty database
         logger.warning("Creating fallback empty Google Patents S3 database")
         create_empty_db(GOOGLE_PATENTS_S3_DB_PATH, "patents")
+    else:
+        ensure_trend_columns_at(GOOGLE_PATENTS_S3_DB_PATH)
     
     return success_gcp or success_s3
 
 if __name__ == "__main__":
+    # Rebuild mode: build a new INPIT snapshot next to the running database
+    if "--snapshot" in sys.argv:
+        if not download_from_s3(S3_BUCKET, S3_PATH_INPIT, LOCAL_FILE_PATH_INPIT, "INPIT CSV data"):
+            sys.exit(1)
+        snapshot_id = build_inpit_snapshot(activate="--activate" in sys.argv)
+        if not snapshot_id:
+            sys.exit(1)
+        print(snapshot_id)
+        sys.exit(0)
+    
     # Download INPIT data
     inpit_success = download_from_s3(S3_BUCKET, S3_PATH_INPIT, LOCAL_FILE_PATH_INPIT, "INPIT CSV data")
     
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Federated query execution across the patentDWH SQLite databases.
+
+Runs one query (or a per-database translated query) against several databases
+concurrently and merges the results into a single table tagged with the source
+database. Each reader borrows a connection to the active snapshot from the
+database's SnapshotManager (so snapshot flips drain it like any other query) and
+runs its query through the query governor and slow-query log, as /api/sql-query
+does. A global timeout interrupts readers still running at the deadline, so a slow
+database cannot hold up the response.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Optional
+
+from query_governor import QueryTooExpensive
+from slow_query_log import execute_logged
+from snapshot_manager import SnapshotManager
+
+logger = logging.getLogger(__name__)
+
+# Default global timeout for a federated query in seconds
+FEDERATED_QUERY_TIMEOUT = float(os.environ.get('FEDERATED_QUERY_TIMEOUT', '30'))
+# Maximum number of concurrent reader threads
+FEDERATED_MAX_WORKERS = int(os.environ.get('FEDERATED_MAX_WORKERS', '8'))
+# Column prepended to merged results to identify the source database
+SOURCE_COLUMN = "source"
+
+
+def normalize_timeout(timeout: Any) -> Optional[float]:
+    """
+    Validate a global timeout received in a JSON request body
+
+    Returns:
+        None (use the executor default) or the timeout in seconds
+
+    Raises:
+        ValueError: timeout is not a positive, finite number of seconds
+    """
+    if timeout is None:
+        return None
+    try:
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float, str)):
+            raise ValueError
+        seconds = float(timeout)
+    except ValueError:
+        seconds = 0.0
+    if not 0 < seconds < float('inf'):
+        raise ValueError("'timeout' must be a positive number of seconds")
+    return seconds
+
+
+class FederatedQueryExecutor:
+    """Executes queries against several snapshot-managed SQLite databases in parallel"""
+
+    def __init__(self, snapshot_managers: Dict[str, SnapshotManager], max_workers: int = FEDERATED_MAX_WORKERS,
+                 timeout: float = FEDERATED_QUERY_TIMEOUT):
+        """
+        Args:
+            snapshot_managers: Mapping of db_type to the SnapshotManager of that database
+            max_workers: Maximum number of concurrent reader threads
+            timeout: Default global timeout in seconds
+        """
+        self.snapshot_managers = dict(snapshot_managers)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="federated-query")
+
+    def _run_on_database(self, db_type: str, sql_query: str, deadline: float, running: Dict[str, Any],
+                         running_lock: threading.Lock, governed: bool, max_rows: Optional[int]) -> Dict[str, Any]:
+        """Run a query on the active snapshot of one database"""
+        started = time.monotonic()
+        try:
+            with self.snapshot_managers[db_type].connection() as (conn, snapshot_id):
+                with running_lock:
+                    running[db_type] = conn
+                try:
+                    if governed:
+                        result = execute_logged(conn, db_type, sql_query, max_rows=max_rows)
+                        columns, rows, truncated = result["columns"], result["rows"], result["truncated"]
+                    else:
+                        cursor = conn.execute(sql_query)
+                        columns = [description[0] for description in cursor.description] if cursor.description else []
+                        rows, truncated = cursor.fetchall(), False
+                finally:
+                    with running_lock:
+                        running.pop(db_type, None)
+            return {
+                "success": True,
+                "columns": columns,
+                "results": rows,
+                "record_count": len(rows),
+                "truncated": truncated,
+                "snapshot_id": snapshot_id,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+            }
+        except FileNotFoundError:
+            return {"success": False, "error": "Database not found"}
+        except QueryTooExpensive as e:
+            logger.warning(f"Rejected expensive federated subquery on {db_type}: {e}")
+            return e.to_dict()
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                return {"success": False, "error": "Query timed out", "timed_out": True}
+            return {"success": False, "error": str(e)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def execute(self, queries: Dict[str, str], timeout: Optional[float] = None, governed: bool = True,
+                max_rows: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run each query on its database concurrently
+
+        Args:
+            queries: Mapping of db_type to SQL query
+            timeout: Global timeout in seconds (defaults to the executor timeout)
+            governed: Run the queries through the query governor and slow-query log;
+                      only internal queries of known cost (e.g. status counts) skip it
+            max_rows: Optional row cap per database (bounded by the governor ceiling)
+
+        Returns:
+            Mapping of db_type to its result dict (success, columns, results, error, ...)
+        """
+        unknown = [db_type for db_type in queries if db_type not in self.snapshot_managers]
+        if unknown:
+            raise ValueError(f"Unknown db_type: {', '.join(unknown)}")
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        running: Dict[str, sqlite3.Connection] = {}
+        running_lock = threading.Lock()
+        futures = {
+            db_type: self._pool.submit(self._run_on_database, db_type, sql_query, deadline,
+                                       running, running_lock, governed, max_rows)
+            for db_type, sql_query in queries.items()
+        }
+
+        # Interrupt the readers still running at the deadline (the governor owns the
+        # progress handler), then give them a short grace period to report the timeout
+        _, pending = wait(futures.values(), timeout=timeout)
+        if pending:
+            with running_lock:
+                for conn in running.values():
+                    conn.interrupt()
+            wait(pending, timeout=1.0)
+
+        results = {}
+        for db_type, future in futures.items():
+            if future.done():
+                results[db_type] = future.result()
+            else:
+                future.cancel()
+                results[db_type] = {"success": False, "error": "Query timed out", "timed_out": True}
+        return results
+
+    def execute_merged(self, queries: Dict[str, str], timeout: Optional[float] = None,
+                       max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run the queries concurrently and union the results into one table
+
+        Rows are tagged with the source db_type in the first column. When the sources
+        return different columns, the merged columns are the union in order of first
+        appearance and missing values are None.
+
+        Returns:
+            Dict with success, columns, results, record_count, sources and elapsed_ms
+        """
+        started = time.monotonic()
+        source_results = self.execute(queries, timeout, max_rows=max_rows)
+
+        merged_columns: List[str] = []
+        for result in source_results.values():
+            for column in result.get("columns", []):
+                if column not in merged_columns:
+                    merged_columns.append(column)
+
+        merged_rows = []
+        for db_type, result in source_results.items():
+            if not result.get("success"):
+                continue
+            positions = [result["columns"].index(c) if c in result["columns"] else None for c in merged_columns]
+            for row in result["results"]:
+                merged_rows.append([db_type] + [row[p] if p is not None else None for p in positions])
+
+        sources = {
+            db_type: {k: v for k, v in result.items() if k not in ("columns", "results")}
+            for db_type, result in source_results.items()
+        }
+
+        return {
+            "success": any(result.get("success") for result in source_results.values()),
+            "columns": [SOURCE_COLUMN] + merged_columns,
+            "results": merged_rows,
+            "record_count": len(merged_rows),
+            "sources": sources,
+            "timed_out": [db_type for db_type, result in source_results.items() if result.get("timed_out")],
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Query cost governor for SQLite SELECT queries.
+
+SQL coming from LLM-based natural language processors can contain cartesian joins
+or unindexed scans that pin a worker for minutes. The governor:
+
+  1. runs EXPLAIN QUERY PLAN and estimates the number of rows the query will visit
+     (full scans use the table size, nested loops multiply, CTEs and subqueries are
+     sized from their own plan, a top-level LIMIT caps streamed rows) and rejects
+     queries over the budget before they run;
+  2. enforces a wall-clock and VM-step budget while the query runs through
+     sqlite3's progress handler, interrupting runaway queries;
+  3. caps the number of returned rows (callers may request a different cap up to a
+     hard ceiling).
+
+Rejections raise QueryTooExpensive, whose to_dict() is a structured error that NL
+processors can feed back to the LLM to ask for a cheaper rewrite.
+
+Queries may carry bound parameters (a list for "?" placeholders or an object for
+":name" placeholders); normalize_params() validates them as received from JSON,
+as normalize_max_rows() does for a requested row cap.
+Keeping values out of the SQL text lets every call of the same template reuse the
+compiled statement from the connection's statement cache.
+
+This module is shared by the SQLite API services (patentDWH/db, container/inpit-sqlite,
+AI_integrated_search_mcp/db); keep the copies identical.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock budget per query in seconds
+QUERY_TIME_LIMIT = float(os.environ.get('QUERY_TIME_LIMIT', '30'))
+# SQLite virtual machine step budget per query
+QUERY_STEP_LIMIT = int(os.environ.get('QUERY_STEP_LIMIT', '2000000000'))
+# Default maximum number of rows returned per query
+QUERY_MAX_ROWS = int(os.environ.get('QUERY_MAX_ROWS', '10000'))
+# Upper bound for callers that explicitly request more rows (internal bulk loads)
+QUERY_MAX_ROWS_CEILING = int(os.environ.get('QUERY_MAX_ROWS_CEILING', '1000000'))
+# Maximum estimated number of visited rows (from EXPLAIN QUERY PLAN)
+QUERY_MAX_ESTIMATED_ROWS = int(os.environ.get('QUERY_MAX_ESTIMATED_ROWS', '50000000'))
+
+# VM steps between progress handler calls
+PROGRESS_HANDLER_INTERVAL = 1000
+# Rows assumed per lookup for an index SEARCH step
+SEARCH_ROWS_ESTIMATE = 10
+# Fraction of a table an index range SEARCH (only <, >, BETWEEN constraints) visits,
+# SQLite's own assumption without statistics
+SEARCH_RANGE_FRACTION = 4
+# Rows assumed for a derived relation of unknown size (grouped CTEs/subqueries are
+# capped at this, recursive CTEs use it)
+DERIVED_ROWS_ESTIMATE = 1000
+# Seconds a cached table size is reused
+TABLE_SIZE_CACHE_TTL = 300
+
+_PLAN_LOOP_PATTERN = re.compile(r'^(SCAN|SEARCH)\s+(?:TABLE\s+)?("[^"]+"|\S+)', re.IGNORECASE)
+# VALUES lists: "SCAN 3 CONSTANT ROWS"
+# Index constraints of a SEARCH step: "(a=? AND b>?)"
+_SEARCH_CONSTRAINT_PATTERN = re.compile(r'\(([^()]*[<>=][^()]*)\)\s*$')
+_CONSTANT_ROWS_PATTERN = re.compile(r'^SCAN\s+(\d+)\s+CONSTANT\s+ROWS', re.IGNORECASE)
+# Subplans that define a derived relation: "MATERIALIZE cte", "CO-ROUTINE (subquery-2)"
+_SUBPLAN_PATTERN = re.compile(r'^(MATERIALIZE|CO-ROUTINE)\s+("[^"]+"|\S+)', re.IGNORECASE)
+# Plan steps after which a derived relation has one row per group
+_GROUPED_PATTERN = re.compile(r'^USE TEMP B-TREE FOR (GROUP BY|DISTINCT)', re.IGNORECASE)
+# A LIMIT [OFFSET] at the end of the top-level statement
+_LIMIT_PATTERN = re.compile(r'\bLIMIT\s+(\d+)(?:\s*(?:OFFSET|,)\s*(\d+))?\s*;?\s*$', re.IGNORECASE)
+# Top-level clauses that consume every row before the first one is returned
+_BLOCKING_PATTERN = re.compile(
+    r'\bGROUP\s+BY\b|\bOVER\b|\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(', re.IGNORECASE
+)
+_FROM_ALIAS_PATTERN = re.compile(
+    r'(?:\bFROM|\bJOIN|,)\s+("[^"]+"|[^\s,()]+)(?=(?:\s+(?:AS\s+)?("[^"]+"|[^\s,()]+))?)',
+    re.IGNORECASE
+)
+_NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "cross", "natural", "outer", "on", "using",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window", "as",
+    "from", "select", "and", "or", "not"
+}
+
+# Bound parameters: positional values for "?" or named values for ":name" placeholders
+QueryParams = Union[Sequence[Any], Dict[str, Any]]
+_SELECT_PATTERN = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+_PARAM_TYPES = (str, int, float, bool, type(None))
+
+QUERY_TOO_EXPENSIVE_HINT = (
+    "Rewrite the query to visit fewer rows: filter on indexed columns with equality or "
+    "prefix conditions, avoid LIKE patterns with a leading '%' on large tables where "
+    "possible, make sure every JOIN has an ON condition, aggregate before joining, and "
+    "add a LIMIT to queries that do not aggregate or sort the whole result."
+)
+
+
+class QueryTooExpensive(Exception):
+    """Raised when a query exceeds the cost, time or step budget"""
+
+    def __init__(self, reason: str, message: str, estimated_rows: Optional[int] = None,
+                 plan: Optional[List[str]] = None, limits: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.estimated_rows = estimated_rows
+        self.plan = plan or []
+        self.limits = limits or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Structured error for API responses and LLM feedback"""
+        return {
+            "success": False,
+            "error": f"Query too expensive: {self.message}",
+            "error_type": "query_too_expensive",
+            "reason": self.reason,
+            "estimated_rows": self.estimated_rows,
+            "plan": self.plan,
+            "limits": self.limits,
+            "hint": QUERY_TOO_EXPENSIVE_HINT
+        }
+
+
+def is_select_query(sql: Any) -> bool:
+    """
+    True for SELECT statements, including SELECTs with a WITH (CTE) clause
+
+    Only the leading keyword is checked: SQLite also accepts WITH in front of
+    INSERT/UPDATE/DELETE, which the read-only query connections reject.
+    """
+    return bool(_SELECT_PATTERN.match(str(sql)))
+
+
+def normalize_params(params: Any) -> Optional[QueryParams]:
+    """
+    Validate bound parameters received in a JSON request body
+
+    Args:
+        params: None, a list of positional values or an object of named values
+                (keys may be given with or without the leading ':')
+
+    Returns:
+        None, a tuple or a dict that can be passed to sqlite3
+
+    Raises:
+        ValueError: params is not a list or object, or contains non-scalar values
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        values = {str(name).lstrip(':@$'): value for name, value in params.items()}
+    elif isinstance(params, (list, tuple)):
+        values = tuple(params)
+    else:
+        raise ValueError("'params' must be an array of positional values or an object of named values")
+
+    for value in (values.values() if isinstance(values, dict) else values):
+        if not isinstance(value, _PARAM_TYPES):
+            raise ValueError(f"Unsupported parameter value {value!r}: use strings, numbers, booleans or null")
+    return values
+
+
+def normalize_max_rows(max_rows: Any) -> Optional[int]:
+    """
+    Validate a row cap received in a JSON request body
+
+    Args:
+        max_rows: None, or a positive integer (an integral number or numeric string)
+
+    Returns:
+        None or the row cap (execute() bounds it by the ceiling)
+
+    Raises:
+        ValueError: max_rows is not a positive integer
+    """
+    if max_rows is None:
+        return None
+    if isinstance(max_rows, bool) or not isinstance(max_rows, (int, float, str)):
+        raise ValueError("'max_rows' must be a positive integer")
+    try:
+        value = float(max_rows)
+    except ValueError:
+        raise ValueError("'max_rows' must be a positive integer") from None
+    if not value.is_integer() or value < 1:
+        raise ValueError("'max_rows' must be a positive integer")
+    return int(value)
+
+
+class QueryGovernor:
+    """Estimates, budgets and caps SQLite queries"""
+
+    def __init__(self, time_limit: float = QUERY_TIME_LIMIT, step_limit: int = QUERY_STEP_LIMIT,
+                 max_rows: int = QUERY_MAX_ROWS, max_rows_ceiling: int = QUERY_MAX_ROWS_CEILING,
+                 max_estimated_rows: int = QUERY_MAX_ESTIMATED_ROWS):
+        self.time_limit = time_limit
+        self.step_limit = step_limit
+        self.max_rows = max_rows
+        self.max_rows_ceiling = max_rows_ceiling
+        self.max_estimated_rows = max_estimated_rows
+        self._table_sizes: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limits(self) -> Dict[str, Any]:
+        return {
+            "time_limit_seconds": self.time_limit,
+            "step_limit": self.step_limit,
+            "max_rows": self.max_rows,
+            "max_rows_ceiling": self.max_rows_ceiling,
+            "max_estimated_rows": self.max_estimated_rows
+        }
+
+    def _table_size(self, conn: sqlite3.Connection, table: str) -> Optional[int]:
+        """Approximate row count of a table (cached), None if it is not a table"""
+        db_file = conn.execute("PRAGMA database_list").fetchone()[2] or ":memory:"
+        key = (db_file, table)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._table_sizes.get(key)
+        if cached and now - cached[0] < TABLE_SIZE_CACHE_TTL:
+            return cached[1]
+
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE", (table,)
+        ).fetchone()
+        if not exists:
+            return None
+        quoted = '"' + table.replace('"', '""') + '"'
+        try:
+            # max(rowid) is an O(log n) estimate for rowid tables
+            size = conn.execute(f"SELECT max(rowid) FROM {quoted}").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            size = conn.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0]
+        with self._lock:
+            self._table_sizes[key] = (now, size)
+        return size
+
+    @staticmethod
+    def _aliases(sql_query: str) -> Dict[str, str]:
+        """Map FROM/JOIN aliases to table names (EXPLAIN QUERY PLAN reports aliases)"""
+        aliases = {}
+        for table, alias in _FROM_ALIAS_PATTERN.findall(sql_query):
+            table = table.strip('"')
+            aliases.setdefault(table.lower(), table)
+            if alias and alias.lower() not in _NOT_ALIASES:
+                aliases[alias.strip('"').lower()] = table
+        return aliases
+
+    @staticmethod
+    def _streamed_limit(sql_query: str) -> Optional[int]:
+        """
+        Rows a top-level LIMIT (plus OFFSET) stops the statement at, or None
+
+        Only literal limits count, and only when the top level does not aggregate,
+        group or window, which would consume every row before returning the first.
+        """
+        # Keep only the top-level text: drop literals, comments and parenthesized parts
+        top_level, depth, i = [], 0, 0
+        while i < len(sql_query):
+            char = sql_query[i]
+            if char in "'\"`[":
+                close = "]" if char == "[" else char
+                end = sql_query.find(close, i + 1)
+                i = len(sql_query) if end < 0 else end + 1
+                top_level.append(" " if depth else "''")
+                continue
+            if sql_query.startswith("--", i) or sql_query.startswith("/*", i):
+                end = sql_query.find("\n" if char == "-" else "*/", i + 2)
+                i = len(sql_query) if end < 0 else end + (1 if char == "-" else 2)
+                top_level.append(" ")
+                continue
+            if char == "(":
+                if depth == 0:
+                    top_level.append("(")
+                depth += 1
+            elif char == ")":
+                depth = max(depth - 1, 0)
+                if depth == 0:
+                    top_level.append(")")
+            elif depth == 0:
+                top_level.append(char)
+            i += 1
+        text = "".join(top_level)
+        match = _LIMIT_PATTERN.search(text)
+        if not match or _BLOCKING_PATTERN.search(text[:match.start()]):
+            return None
+        return int(match.group(1)) + int(match.group(2) or 0)
+
+    def estimate(self, conn: sqlite3.Connection, sql_query: str, params: Optional[QueryParams] = None,
+                 table_size: Optional[Callable[[str], Optional[int]]] = None) -> Tuple[int, List[str]]:
+        """
+        Estimate the number of rows a query visits from EXPLAIN QUERY PLAN
+
+        Sibling SCAN/SEARCH steps under the same parent are nested loops, so their
+        sizes multiply. Subplans (materialized CTEs, subqueries, compound parts) add,
+        except correlated subqueries which run once per outer row. Automatic indexes
+        add one scan of their relation. A scan of a CTE or subquery visits the rows
+        its own plan produces: the VALUES count, the product of its loops, or at
+        most DERIVED_ROWS_ESTIMATE rows when it groups. A LIMIT on a top-level
+        query that streams its rows caps the outer loop.
+
+        Args:
+            table_size: Optional lookup of table row counts; defaults to the sizes in
+                        conn (the index advisor plans on an empty schema copy)
+
+        Returns:
+            (estimated_rows, plan detail lines)
+        """
+        plan_rows = conn.execute(f"EXPLAIN QUERY PLAN {sql_query}", params or ()).fetchall()
+        aliases = self._aliases(sql_query)
+        if table_size is None:
+            table_size = lambda table: self._table_size(conn, table)
+        children: Dict[int, List[Tuple[int, str]]] = {}
+        subplans: Dict[str, int] = {}
+        for node_id, parent_id, _, detail in plan_rows:
+            children.setdefault(parent_id, []).append((node_id, detail))
+            match = _SUBPLAN_PATTERN.match(detail)
+            if match:
+                subplans.setdefault(match.group(2).strip('"').lower(), node_id)
+        output_rows: Dict[int, int] = {}
+
+        def relation_rows(name: str) -> Optional[int]:
+            # CTEs and subqueries are sized from their subplan, tables from their row count
+            name = name.strip('"')
+            table = aliases.get(name.lower(), name)
+            for key in (name.lower(), table.lower()):
+                if key in subplans:
+                    return subplan_rows(subplans[key])
+            return table_size(table)
+
+        def subplan_rows(node_id: int) -> int:
+            # Rows a subplan produces: its loops multiplied, one per group if grouped,
+            # and the parts added for compound selects
+            if node_id not in output_rows:
+                output_rows[node_id] = DERIVED_ROWS_ESTIMATE  # recursive CTEs scan themselves
+                nodes = children.get(node_id, [])
+                if any(_PLAN_LOOP_PATTERN.match(detail) for _, detail in nodes):
+                    rows = 1
+                    for _, detail in nodes:
+                        rows *= loop_rows(detail)
+                    if any(_GROUPED_PATTERN.match(detail) for _, detail in nodes):
+                        rows = min(rows, DERIVED_ROWS_ESTIMATE)
+                else:
+                    parts = [child_id for child_id, detail in nodes if not _SUBPLAN_PATTERN.match(detail)]
+                    rows = sum(subplan_rows(child_id) for child_id in parts) if parts else DERIVED_ROWS_ESTIMATE
+                output_rows[node_id] = max(rows, 1)
+            return output_rows[node_id]
+
+        def loop_rows(detail: str) -> int:
+            match = _PLAN_LOOP_PATTERN.match(detail)
+            if not match:
+                return 1
+            if match.group(1).upper() == "SEARCH":
+                constraints = _SEARCH_CONSTRAINT_PATTERN.search(detail)
+                if constraints and "=" not in constraints.group(1):
+                    # A range without an equality prefix reads a share of the whole index
+                    size = relation_rows(match.group(2))
+                    return max((size or 0) // SEARCH_RANGE_FRACTION, SEARCH_ROWS_ESTIMATE)
+                return SEARCH_ROWS_ESTIMATE
+            constant = _CONSTANT_ROWS_PATTERN.match(detail)
+            if constant:
+                return max(int(constant.group(1)), 1)
+            if "CONSTANT ROW" in detail.upper():
+                return 1
+            size = relation_rows(match.group(2))
+            return DERIVED_ROWS_ESTIMATE if size is None else max(size, 1)
+
+        def build_rows(detail: str) -> int:
+            # An automatic index is built from a full scan of the relation before the loop runs
+            match = _PLAN_LOOP_PATTERN.match(detail)
+            if not match or "AUTOMATIC" not in detail.upper():
+                return 0
+            return relation_rows(match.group(2)) or DERIVED_ROWS_ESTIMATE
+
+        def subtree_cost(parent_id: int, limit: Optional[int] = None) -> Tuple[int, int]:
+            # (rows visited once per statement, rows visited each time the parent runs):
+            # materialized CTEs and automatic indexes are built once, also inside
+            # correlated subqueries, whose other steps repeat per outer row
+            nodes = children.get(parent_id, [])
+            loops, first_loop, once, per_run = 1, None, 0, 0
+            for node_id, detail in nodes:
+                once += build_rows(detail)
+                rows = loop_rows(detail)
+                loops *= rows
+                if first_loop is None and _PLAN_LOOP_PATTERN.match(detail):
+                    first_loop = rows
+                sub_once, sub_run = subtree_cost(node_id)
+                once += sub_once
+                if detail.upper().startswith("MATERIALIZE"):
+                    once += sub_run
+                elif "CORRELATED" in detail.upper():
+                    per_run += sub_run * loops
+                else:
+                    per_run += sub_run
+            if limit is not None and first_loop and not any(detail.upper().startswith("USE TEMP B-TREE")
+                                                            for _, detail in nodes):
+                # Streamed rows stop at the LIMIT: the outer loop runs at most that often
+                loops = min(loops, limit * (loops // first_loop))
+            return once, per_run + (loops if nodes else 0)
+
+        once, per_run = subtree_cost(0, self._streamed_limit(sql_query))
+        return once + per_run, [detail for _, _, _, detail in plan_rows]
+
+    def check(self, conn: sqlite3.Connection, sql_query: str,
+              params: Optional[QueryParams] = None) -> Tuple[int, List[str]]:
+        """Reject a query whose estimated cost exceeds the budget"""
+        estimated_rows, plan = self.estimate(conn, sql_query, params)
+        if estimated_rows > self.max_estimated_rows:
+            raise QueryTooExpensive(
+                "estimated_cost",
+                f"estimated {estimated_rows:,} rows visited exceeds the limit of {self.max_estimated_rows:,}",
+                estimated_rows, plan, self.limits
+            )
+        return estimated_rows, plan
+
+    def execute(self, conn: sqlite3.Connection, sql_query: str, params: Optional[QueryParams] = None,
+                max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Check, run and cap a query
+
+        Args:
+            conn: SQLite connection
+            sql_query: SELECT statement
+            params: Optional bound parameters
+            max_rows: Optional row cap for this call (bounded by the ceiling)
+
+        Returns:
+            Dict with columns, rows, row_count, truncated, estimated_rows, plan and execution_time_ms
+
+        Raises:
+            QueryTooExpensive: the plan, time or step budget was exceeded
+        """
+        max_rows = normalize_max_rows(max_rows)
+        row_cap = min(max_rows, self.max_rows_ceiling) if max_rows else self.max_rows
+        estimated_rows, plan = self.check(conn, sql_query, params)
+
+        start_time = time.monotonic()
+        deadline = start_time + self.time_limit
+        state = {"steps": 0, "reason": None}
+
+        def progress_handler():
+            state["steps"] += PROGRESS_HANDLER_INTERVAL
+            if time.monotonic() > deadline:
+                state["reason"] = "time_limit"
+                return 1
+            if state["steps"] > self.step_limit:
+                state["reason"] = "step_limit"
+                return 1
+            return 0
+
+        conn.set_progress_handler(progress_handler, PROGRESS_HANDLER_INTERVAL)
+        try:
+            cursor = conn.execute(sql_query, params or ())
+            columns = [description[0] for description in cursor.description] if cursor.description else []
+            rows = cursor.fetchmany(row_cap + 1)
+        except sqlite3.OperationalError as e:
+            if state["reason"] == "time_limit":
+                raise QueryTooExpensive("time_limit", f"query exceeded the time limit of {self.time_limit} seconds",
+                                        estimated_rows, plan, self.limits) from e
+            if state["reason"] == "step_limit":
+                raise QueryTooExpensive("step_limit", f"query exceeded the limit of {self.step_limit:,} VM steps",
+                                        estimated_rows, plan, self.limits) from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+        truncated = len(rows) > row_cap
+        if truncated:
+            rows = rows[:row_cap]
+            logger.info(f"Query result truncated to {row_cap} rows")
+
+        return {
+            "columns": columns,
+            "rows": rows,
+            "row_count": len(rows),
+            "truncated": truncated,
+            "estimated_rows": estimated_rows,
+            "plan": plan,
+            "execution_time_ms": round((time.monotonic() - start_time) * 1000, 2)
+        }
+
+
+# Shared governor configured from the environment
+query_governor = QueryGovernor()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Compact result formats and compressed JSON responses for query results.
+
+Returning every row as an object repeats all column names per row, which for wide
+tables and large results makes up most of the payload. Query endpoints accept a
+"format" field:
+
+  objects  rows as objects {column: value}
+  rows     column names once, rows as arrays
+  columns  column names once, values as one array per column (column-major)
+
+format_rows() builds the rows in the requested format and encode_json() serializes
+a response with orjson (when installed, falling back to json) and compresses it
+with br or gzip as negotiated by the request's Accept-Encoding header.
+
+This module is shared by the SQLite API services (patentDWH/db, container/inpit-sqlite,
+AI_integrated_search_mcp/db); keep the copies identical.
+"""
+
+import os
+import gzip
+import json
+import base64
+import logging
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMATS = ("objects", "rows", "columns")
+
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+# gzip level (1-9) and brotli quality (0-11); low levels keep compression cheaper than the transfer
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '1'))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '2'))
+
+
+def check_format(value: Optional[str], default: str) -> str:
+    """
+    Validate a requested result format
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if value is None:
+        return default
+    if value not in RESULT_FORMATS:
+        raise ValueError(f"Unknown format '{value}' (expected one of: {', '.join(RESULT_FORMATS)})")
+    return value
+
+
+def format_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]], result_format: str) -> Any:
+    """Rows of a query result in the given format"""
+    if result_format == "objects":
+        return [dict(zip(columns, row)) for row in rows]
+    if result_format == "columns":
+        return [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+    return [list(row) for row in rows]
+
+
+def _default(value: Any) -> Any:
+    """Serialize values JSON has no type for (BLOBs as base64)"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    """UTF-8 JSON bytes of a payload"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred available encoding accepted by the client ("br", "gzip" or None)"""
+    accepted, refused = set(), set()
+    for part in (accept_encoding or "").split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            refused.add(name)
+        else:
+            accepted.add(name)
+
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if encoding in accepted or ('*' in accepted and encoding not in refused):
+            return encoding
+    return None
+
+
+def encode_json(payload: Any, accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a response and compress it as negotiated
+
+    Args:
+        payload: JSON-serializable response
+        accept_encoding: The request's Accept-Encoding header
+
+    Returns:
+        (body, headers) with Content-Type and, when compressed, Content-Encoding
+    """
+    body = dumps(payload)
+    headers = {"Content-Type": "application/json; charset=utf-8", "Vary": "Accept-Encoding"}
+    if len(body) < RESPONSE_COMPRESS_MIN_BYTES:
+        return body, headers
+
+    encoding = _negotiate(accept_encoding)
+    if encoding == 'br':
+        body = brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return body, headers
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable S3 downloader for database artifacts.
+
+Large SQLite snapshots are fetched as byte ranges by a pool of worker threads and
+written into a part file at their offsets. Completed parts are recorded in a JSON
+manifest next to the part file, so an interrupted download resumes with the
+missing parts only (as long as the object's ETag has not changed; every ranged GET
+is pinned to the ETag with IfMatch).
+
+The calling thread consumes the parts in order while the workers keep downloading:
+it feeds the verification hashes and, for zstd-compressed artifacts (".zst" keys or
+Content-Encoding: zstd), decompresses the stream (all of its frames) into the
+target file on the fly.
+
+Verification:
+  - sha256: against the expected_sha256 argument or the object's "sha256" user
+    metadata, when available;
+  - ETag: the MD5 of the object for single-part uploads, or the multipart ETag
+    recomputed for common upload part sizes. Only for unencrypted and SSE-S3
+    objects: the ETag of SSE-KMS and SSE-C objects is not an MD5 of the content;
+  - size: the bytes read, when neither of the above applies (with a warning).
+
+The target file only appears (atomically) after verification succeeded.
+
+This module is shared by patentDWH/db, container/inpit-sqlite and
+AI_integrated_search_mcp/db; keep the copies identical.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Size of each ranged GET
+S3_DOWNLOAD_PART_SIZE = int(os.environ.get('S3_DOWNLOAD_PART_SIZE', str(32 * 1024 * 1024)))
+# Concurrent ranged GETs
+S3_DOWNLOAD_WORKERS = int(os.environ.get('S3_DOWNLOAD_WORKERS', '8'))
+# Attempts per part before the download fails (completed parts are kept for resume)
+S3_DOWNLOAD_RETRIES = int(os.environ.get('S3_DOWNLOAD_RETRIES', '4'))
+
+# Block size for streaming reads and hashing (multipart ETag candidates are multiples)
+READ_BLOCK_SIZE = 1024 * 1024
+# Upload part sizes tried when verifying a multipart ETag (MiB)
+MULTIPART_ETAG_CANDIDATE_MB = [5, 8, 16, 32, 50, 64, 100, 128, 256, 512, 1024]
+# Server-side encryption under which the ETag is (derived from) the MD5 of the content
+MD5_ETAG_ENCRYPTION = (None, "AES256")
+MANIFEST_SUFFIX = ".manifest.json"
+PART_FILE_SUFFIX = ".download"
+
+
+class DownloadVerificationError(Exception):
+    """Raised when the downloaded content does not match its ETag, sha256 or size"""
+
+
+class _MultipartEtag:
+    """Running computation of an S3 multipart ETag for one upload part size"""
+
+    def __init__(self, part_size: int):
+        self.part_size = part_size
+        self.part_digests: List[bytes] = []
+        self._current = hashlib.md5()
+        self._current_size = 0
+
+    def update(self, block: bytes):
+        # Blocks are aligned to READ_BLOCK_SIZE, and part sizes are multiples of it
+        self._current.update(block)
+        self._current_size += len(block)
+        if self._current_size >= self.part_size:
+            self.part_digests.append(self._current.digest())
+            self._current = hashlib.md5()
+            self._current_size = 0
+
+    def etag(self) -> str:
+        digests = list(self.part_digests)
+        if self._current_size:
+            digests.append(self._current.digest())
+        return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class _FrameDecompressor:
+    """
+    Streaming zstd decompression across frames
+
+    A zstd decompressobj stops at the end of the first frame; artifacts written
+    by multi-threaded or streaming compressors consist of several frames.
+    """
+
+    def __init__(self, dctx, out_file):
+        self.dctx = dctx
+        self.out_file = out_file
+        self._obj = dctx.decompressobj()
+        self._in_frame = False
+
+    def write(self, data: bytes):
+        while data:
+            self.out_file.write(self._obj.decompress(data))
+            self._in_frame = True
+            if not self._obj.eof:
+                return
+            # Frame finished: continue with the next one
+            data = self._obj.unused_data
+            self._obj = self.dctx.decompressobj()
+            self._in_frame = False
+
+    def finish(self):
+        """Raise if the stream ended inside a frame"""
+        if self._in_frame:
+            raise DownloadVerificationError("zstd stream is truncated (incomplete frame)")
+
+
+class ParallelS3Downloader:
+    """Downloads S3 objects with parallel ranged GETs, resume and verification"""
+
+    def __init__(self, s3_client=None, part_size: int = S3_DOWNLOAD_PART_SIZE,
+                 max_workers: int = S3_DOWNLOAD_WORKERS, max_retries: int = S3_DOWNLOAD_RETRIES):
+        """
+        Args:
+            s3_client: boto3 S3 client (created on first use if omitted)
+            part_size: Size of each ranged GET in bytes
+            max_workers: Concurrent ranged GETs
+            max_retries: Attempts per part
+        """
+        self._s3_client = s3_client
+        self.part_size = max(READ_BLOCK_SIZE, part_size - part_size % READ_BLOCK_SIZE)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    # -- manifest ----------------------------------------------------------
+
+    @staticmethod
+    def _load_manifest(manifest_path: str, identity: Dict[str, Any]) -> Set[int]:
+        """Completed part numbers of a previous attempt at the same object version"""
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if any(manifest.get(k) != v for k, v in identity.items()):
+            logger.info("Object changed since the previous attempt, restarting download")
+            return set()
+        return set(manifest.get("completed", []))
+
+    @staticmethod
+    def _save_manifest(manifest_path: str, identity: Dict[str, Any], completed: Set[int]):
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**identity, "completed": sorted(completed)}, f)
+        os.replace(tmp_path, manifest_path)
+
+    # -- download ----------------------------------------------------------
+
+    def _fetch_part(self, bucket: str, key: str, etag: str, fd: int, part: int, size: int,
+                    stop: threading.Event):
+        """Download one byte range into the part file, retrying with backoff"""
+        start = part * self.part_size
+        end = min(start + self.part_size, size) - 1
+        for attempt in range(1, self.max_retries + 1):
+            if stop.is_set():
+                raise RuntimeError("Download cancelled")
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag
+                )
+                offset = start
+                for chunk in response["Body"].iter_chunks(READ_BLOCK_SIZE):
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                if offset != end + 1:
+                    raise IOError(f"Short read for part {part}: {offset - start} of {end - start + 1} bytes")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(2 ** attempt, 30)
+                logger.warning(f"Part {part} of s3://{bucket}/{key} failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+
+    def download(self, bucket: str, key: str, local_path: str, expected_sha256: Optional[str] = None,
+                 decompress: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Download s3://bucket/key to local_path
+
+        Args:
+            bucket: S3 bucket
+            key: S3 object key
+            local_path: Target file (replaced atomically after verification)
+            expected_sha256: Optional hex sha256 of the object
+            decompress: Decompress zstd (default: detect from key suffix / Content-Encoding)
+
+        Returns:
+            Dict with size, etag, sha256, verified (list of checks) and elapsed seconds
+
+        Raises:
+            DownloadVerificationError: the content does not match (the partial download is discarded)
+        """
+        started = time.monotonic()
+        head = self.s3_client.head_object(Bucket=bucket, Key=key)
+        size = head["ContentLength"]
+        etag = head["ETag"].strip('"')
+        etag_is_md5 = (head.get("ServerSideEncryption") in MD5_ETAG_ENCRYPTION
+                       and not head.get("SSECustomerAlgorithm"))
+        expected_sha256 = expected_sha256 or head.get("Metadata", {}).get("sha256")
+        if decompress is None:
+            decompress = key.endswith(".zst") or head.get("ContentEncoding") == "zstd"
+
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        part_path = f"{local_path}{PART_FILE_SUFFIX}"
+        manifest_path = f"{part_path}{MANIFEST_SUFFIX}"
+        identity = {"bucket": bucket, "key": key, "etag": etag, "size": size, "part_size": self.part_size}
+        part_count = max(1, -(-size // self.part_size))
+
+        completed = self._load_manifest(manifest_path, identity) if os.path.exists(part_path) else set()
+        if completed:
+            logger.info(f"Resuming s3://{bucket}/{key}: {len(completed)} of {part_count} parts already downloaded")
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            result = self._download_parts(bucket, key, etag, etag_is_md5, size, part_count, fd, part_path,
+                                          manifest_path, identity, completed, decompress, local_path)
+        except DownloadVerificationError:
+            self._discard(part_path, manifest_path, f"{local_path}.tmp")
+            raise
+        finally:
+            os.close(fd)
+
+        # Verify before the target appears
+        verified = []
+        if expected_sha256:
+            if result["sha256"] != expected_sha256.lower():
+                self._discard(part_path, manifest_path, f"{local_path}.tmp")
+                raise DownloadVerificationError(
+                    f"sha256 mismatch for s3://{bucket}/{key}: expected {expected_sha256}, got {result['sha256']}"
+                )
+            verified.append("sha256")
+        if not etag_is_md5:
+            if not verified:
+                logger.warning(f"ETag of encrypted object s3://{bucket}/{key} is not an MD5 and no sha256 "
+                               f"is available, verifying the size only")
+        elif "-" not in etag:
+            if result["md5"] != etag:
+                self._discard(part_path, manifest_path, f"{local_path}.tmp")
+                raise DownloadVerificationError(f"ETag mismatch for s3://{bucket}/{key}: expected {etag}, got {result['md5']}")
+            verified.append("etag")
+        elif etag in result["multipart_etags"]:
+            verified.append("etag")
+        elif not verified:
+            logger.warning(f"Could not verify multipart ETag {etag} of s3://{bucket}/{key} (unknown upload part size)")
+        if not verified:
+            if result["bytes"] != size:
+                self._discard(part_path, manifest_path, f"{local_path}.tmp")
+                raise DownloadVerificationError(
+                    f"Size mismatch for s3://{bucket}/{key}: expected {size} bytes, got {result['bytes']}"
+                )
+            verified.append("size")
+
+        if decompress:
+            os.replace(f"{local_path}.tmp", local_path)
+            os.remove(part_path)
+        else:
+            os.replace(part_path, local_path)
+        os.remove(manifest_path)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Downloaded s3://{bucket}/{key} ({size} bytes) in {elapsed:.1f}s, verified: {verified or 'none'}")
+        return {
+            "size": size,
+            "etag": etag,
+            "sha256": result["sha256"],
+            "verified": verified,
+            "decompressed": decompress,
+            "elapsed_seconds": round(elapsed, 2)
+        }
+
+    def _download_parts(self, bucket, key, etag, etag_is_md5, size, part_count, fd, part_path,
+                        manifest_path, identity, completed, decompress, local_path) -> Dict[str, Any]:
+        """Run the part downloads and consume the parts in order (hashing, decompressing)"""
+        done = threading.Condition()
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def run_part(part: int):
+            try:
+                self._fetch_part(bucket, key, etag, fd, part, size, stop)
+            except BaseException as e:
+                with done:
+                    errors.append(e)
+                    done.notify_all()
+                return
+            with done:
+                completed.add(part)
+                self._save_manifest(manifest_path, identity, completed)
+                done.notify_all()
+
+        sha256 = hashlib.sha256()
+        # MD5s are only worth computing when the ETag is MD5-based
+        md5 = hashlib.md5() if etag_is_md5 else None
+        multipart = [
+            _MultipartEtag(mb * 1024 * 1024) for mb in MULTIPART_ETAG_CANDIDATE_MB
+            if -(-size // (mb * 1024 * 1024)) == int(etag.split("-")[1])
+        ] if etag_is_md5 and "-" in etag else []
+        bytes_read = 0
+
+        decompressor = out_file = None
+        if decompress:
+            try:
+                import zstandard
+            except ImportError as e:
+                raise RuntimeError("zstandard is required to download zstd-compressed artifacts") from e
+            out_file = open(f"{local_path}.tmp", "wb")
+            decompressor = _FrameDecompressor(zstandard.ZstdDecompressor(), out_file)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="s3-download")
+        try:
+            for part in range(part_count):
+                if part not in completed:
+                    pool.submit(run_part, part)
+
+            with open(part_path, "rb") as reader:
+                for part in range(part_count):
+                    with done:
+                        while part not in completed and not errors:
+                            done.wait()
+                        if errors:
+                            raise errors[0]
+                    start = part * self.part_size
+                    remaining = min(self.part_size, size - start)
+                    reader.seek(start)
+                    while remaining > 0:
+                        block = reader.read(min(READ_BLOCK_SIZE, remaining))
+                        remaining -= len(block)
+                        bytes_read += len(block)
+                        sha256.update(block)
+                        if md5 is not None:
+                            md5.update(block)
+                        for candidate in multipart:
+                            candidate.update(block)
+                        if decompressor is not None:
+                            decompressor.write(block)
+            if decompressor is not None:
+                decompressor.finish()
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            if out_file is not None:
+                out_file.close()
+
+        return {
+            "bytes": bytes_read,
+            "sha256": sha256.hexdigest(),
+            "md5": md5.hexdigest() if md5 is not None else None,
+            "multipart_etags": {candidate.etag() for candidate in multipart}
+        }
+
+    @staticmethod
+    def _discard(*paths: str):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def download_s3_object(bucket: str, key: str, local_path: str, s3_client=None, **kwargs) -> Dict[str, Any]:
+    """Convenience wrapper: download one object with the default settings"""
+    return ParallelS3Downloader(s3_client).download(bucket, key, local_path, **kwargs)
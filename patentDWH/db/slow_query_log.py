@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Slow-query log and index advisor for the patent SQLite services.
+
+Every governed SELECT is timed; queries slower than SLOW_QUERY_THRESHOLD_MS are
+written to a small SQLite log database together with a normalized fingerprint
+(literals replaced by '?'), the returned row count and the query plan.
+
+The IndexAdvisor aggregates the log by fingerprint, derives candidate indexes from
+the slow queries (equality/range predicates, join keys, GROUP BY / ORDER BY keys and
+expressions such as substr(filing_date, 1, 4)) and estimates the benefit of each
+candidate by replaying the logged workload through the query planner on an empty
+copy of the schema with the candidate index added.
+
+This module is shared by the SQLite API services (patentDWH/db, container/inpit-sqlite,
+AI_integrated_search_mcp/db); keep the copies identical.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from query_governor import query_governor, QueryGovernor, QueryParams, QueryTooExpensive
+
+logger = logging.getLogger(__name__)
+
+# Log database file (kept outside the patent databases, which may be read-only)
+SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH', '/app/data/slow_query_log.db')
+# Queries at or above this duration are logged
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '500'))
+# Number of log entries kept; older entries are pruned
+SLOW_QUERY_LOG_MAX_ENTRIES = int(os.environ.get('SLOW_QUERY_LOG_MAX_ENTRIES', '100000'))
+
+# Inserts between pruning passes
+PRUNE_INTERVAL = 1000
+# Distinct sample queries replayed per fingerprint
+ADVISOR_SAMPLES_PER_FINGERPRINT = 3
+# Widest covering index the advisor proposes
+MAX_COVERING_INDEX_COLUMNS = 6
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+_IDENT = r'(?:"[^"]+"|[^\W\d]\w*)'
+_QUALIFIED = rf'(?:({_IDENT})\s*\.\s*)?({_IDENT})'
+_EXPRESSION = r'((?:substr|substring|strftime|date|lower|upper|trim|ifnull|coalesce)\s*\([^()]*\))'
+_EQ_OPERATOR = r'\s*(?:==?|\bIN\b|\bIS\b(?!\s+NOT))'
+_RANGE_OPERATOR = r'\s*(?:<|>|\bBETWEEN\b)'
+
+_EQ_COLUMN_PATTERN = re.compile(rf'{_QUALIFIED}{_EQ_OPERATOR}', re.IGNORECASE)
+_JOIN_RHS_PATTERN = re.compile(rf'(?<![<>!=])=\s*{_QUALIFIED}', re.IGNORECASE)
+_RANGE_COLUMN_PATTERN = re.compile(rf'{_QUALIFIED}{_RANGE_OPERATOR}', re.IGNORECASE)
+_EQ_EXPRESSION_PATTERN = re.compile(rf'{_EXPRESSION}{_EQ_OPERATOR}', re.IGNORECASE)
+_RANGE_EXPRESSION_PATTERN = re.compile(rf'{_EXPRESSION}{_RANGE_OPERATOR}', re.IGNORECASE)
+_EXPRESSION_ALIAS_PATTERN = re.compile(rf'{_EXPRESSION}\s+AS\s+({_IDENT})', re.IGNORECASE)
+_COLUMN_PATTERN = re.compile(_QUALIFIED)
+_CLAUSE_START_PATTERN = re.compile(r'\b(?:GROUP|ORDER)\s+BY\b', re.IGNORECASE)
+_CLAUSE_END_PATTERN = re.compile(
+    r'\b(?:HAVING|ORDER\s+BY|LIMIT|UNION|EXCEPT|INTERSECT|WINDOW|ASC|DESC|COLLATE|NULLS)\b', re.IGNORECASE
+)
+# Full table scans, and lookups through an automatic index built by a full scan
+_FULL_SCAN_PATTERN = re.compile(
+    r'^(?:SCAN\s+(?:TABLE\s+)?("[^"]+"|\S+)(?!.*\bUSING\b.*\bINDEX\b)'
+    r'|SEARCH\s+(?:TABLE\s+)?("[^"]+"|\S+)\s+USING\s+AUTOMATIC\b)',
+    re.IGNORECASE
+)
+
+
+def normalize_query(sql_query: str) -> str:
+    """Normalize a query for fingerprinting: literals become '?', whitespace and case are folded"""
+    normalized = _STRING_LITERAL.sub("?", sql_query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(?)", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip().rstrip(";").strip()
+    return normalized.lower()
+
+
+def query_fingerprint(sql_query: str) -> str:
+    """Short stable hash of the normalized query"""
+    return hashlib.sha1(normalize_query(sql_query).encode("utf-8")).hexdigest()[:16]
+
+
+def _clause_items(masked: str) -> List[Tuple[int, int]]:
+    """Spans of the comma-separated GROUP BY / ORDER BY items (without ASC/DESC etc.)"""
+    spans = []
+    for clause in _CLAUSE_START_PATTERN.finditer(masked):
+        depth = 0
+        item_start = clause.end()
+        item_end = None
+        position = clause.end()
+        while position < len(masked):
+            char = masked[position]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and char in ",;":
+                spans.append((item_start, item_end if item_end is not None else position))
+                item_start, item_end = position + 1, None
+                if char == ";":
+                    break
+            elif depth == 0 and item_end is None and _CLAUSE_END_PATTERN.match(masked, position):
+                # The item ends here; keywords other than ordering modifiers also end the clause
+                item_end = position
+                if not re.match(r'(?:ASC|DESC|COLLATE|NULLS)\b', masked[position:], re.IGNORECASE):
+                    break
+            position += 1
+        if item_start < position:
+            spans.append((item_start, item_end if item_end is not None else position))
+    return [(start, end) for start, end in spans if masked[start:end].strip()]
+
+
+class SlowQueryLog:
+    """Persistent log of slow queries, stored in its own SQLite database"""
+
+    def __init__(self, path: str = SLOW_QUERY_LOG_PATH, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+                 max_entries: int = SLOW_QUERY_LOG_MAX_ENTRIES):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the log database on first use (caller holds the lock)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS slow_queries (
+                    id INTEGER PRIMARY KEY,
+                    logged_at REAL NOT NULL,
+                    db_name TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    normalized_query TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    params TEXT,
+                    duration_ms REAL NOT NULL,
+                    row_count INTEGER,
+                    estimated_rows INTEGER,
+                    plan TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_slow_queries_db_fingerprint "
+                "ON slow_queries(db_name, fingerprint, duration_ms)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, db_name: str, sql_query: str, duration_ms: float, row_count: Optional[int] = None,
+               estimated_rows: Optional[int] = None, plan: Optional[List[str]] = None,
+               params: Optional[QueryParams] = None, error: Optional[str] = None) -> bool:
+        """
+        Log a query if it is slower than the threshold
+
+        Logging never fails the request; errors are only reported in the service log.
+
+        Returns:
+            True if the query was logged
+        """
+        if duration_ms < self.threshold_ms:
+            return False
+
+        normalized = normalize_query(sql_query)
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT INTO slow_queries (logged_at, db_name, fingerprint, normalized_query, query, params, "
+                    "duration_ms, row_count, estimated_rows, plan, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        time.time(), db_name, query_fingerprint(sql_query), normalized, sql_query,
+                        json.dumps(params if isinstance(params, dict) else list(params), ensure_ascii=False) if params else None,
+                        round(duration_ms, 2), row_count, estimated_rows,
+                        json.dumps(plan, ensure_ascii=False) if plan else None, error
+                    )
+                )
+                self._inserts += 1
+                if self._inserts % PRUNE_INTERVAL == 0:
+                    conn.execute(
+                        "DELETE FROM slow_queries WHERE id <= (SELECT max(id) FROM slow_queries) - ?",
+                        (self.max_entries,)
+                    )
+                conn.commit()
+            logger.info(f"Slow query on {db_name} ({duration_ms:.0f} ms): {normalized[:200]}")
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write slow query log: {e}")
+            return False
+
+    def top_fingerprints(self, db_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Aggregate the log by fingerprint, ordered by total time"""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute("""
+                SELECT fingerprint, normalized_query, COUNT(*), SUM(duration_ms), AVG(duration_ms),
+                       MAX(duration_ms), AVG(row_count), MAX(logged_at)
+                FROM slow_queries
+                WHERE db_name = ?
+                GROUP BY fingerprint
+                ORDER BY SUM(duration_ms) DESC
+                LIMIT ?
+            """, (db_name, limit)).fetchall()
+
+            fingerprints = []
+            for fingerprint, normalized, count, total_ms, avg_ms, max_ms, avg_rows, last_seen in rows:
+                samples = conn.execute("""
+                    SELECT query, params, plan FROM slow_queries
+                    WHERE db_name = ? AND fingerprint = ?
+                    GROUP BY query, params
+                    ORDER BY MAX(duration_ms) DESC
+                    LIMIT ?
+                """, (db_name, fingerprint, ADVISOR_SAMPLES_PER_FINGERPRINT)).fetchall()
+                fingerprints.append({
+                    "fingerprint": fingerprint,
+                    "normalized_query": normalized,
+                    "count": count,
+                    "total_ms": round(total_ms, 2),
+                    "avg_ms": round(avg_ms, 2),
+                    "max_ms": round(max_ms, 2),
+                    "avg_rows": round(avg_rows, 1) if avg_rows is not None else None,
+                    "last_seen": last_seen,
+                    "plan": json.loads(samples[0][2]) if samples and samples[0][2] else [],
+                    "samples": [
+                        {"query": query, "params": json.loads(params) if params else None}
+                        for query, params, _ in samples
+                    ]
+                })
+        return fingerprints
+
+
+class IndexAdvisor:
+    """Proposes indexes for the slow-query workload and estimates their benefit"""
+
+    def __init__(self, query_log: SlowQueryLog, governor: QueryGovernor = query_governor):
+        self.query_log = query_log
+        self.governor = governor
+
+    @staticmethod
+    def _schema_copy(conn: sqlite3.Connection) -> sqlite3.Connection:
+        """Empty in-memory database with the schema (tables, indexes, views) of conn"""
+        schema = sqlite3.connect(":memory:")
+        statements = conn.execute("""
+            SELECT sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+        """).fetchall()
+        for (statement,) in statements:
+            try:
+                schema.execute(statement)
+            except sqlite3.Error:
+                # Shadow tables of virtual tables, unavailable modules, ...
+                continue
+        return schema
+
+    @staticmethod
+    def _table_columns(schema: sqlite3.Connection) -> Dict[str, Dict[str, str]]:
+        """Map lower-cased table name to {lower-cased column: column}"""
+        tables = {}
+        for (table,) in schema.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            quoted = '"' + table.replace('"', '""') + '"'
+            tables[table.lower()] = {
+                row[1].lower(): row[1] for row in schema.execute(f"PRAGMA table_xinfo({quoted})").fetchall()
+            }
+        return tables
+
+    def _candidates_for_query(self, sql_query: str, plan: List[str],
+                              tables: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Derive candidate indexes for the fully scanned tables of one query"""
+        # Blank out string literals, keeping offsets so expressions can be cut from the original text
+        masked = _STRING_LITERAL.sub(lambda m: "'" + " " * (len(m.group(0)) - 2) + "'", sql_query)
+        aliases = self.governor._aliases(sql_query)
+        query_tables = []
+        for table in aliases.values():
+            if table.lower() in tables and table.lower() not in [t.lower() for t in query_tables]:
+                query_tables.append(table)
+
+        def resolve_column(qualifier: Optional[str], name: str) -> Optional[Tuple[str, str]]:
+            name = name.strip('"')
+            if qualifier:
+                table = aliases.get(qualifier.strip('"').lower(), qualifier.strip('"'))
+                column = tables.get(table.lower(), {}).get(name.lower())
+                return (table, column) if column else None
+            for table in query_tables:
+                column = tables[table.lower()].get(name.lower())
+                if column:
+                    return table, column
+            return None
+
+        def resolve_expression(match: re.Match) -> Optional[Tuple[str, str]]:
+            start, end = match.span(1)
+            for qualifier, name in _COLUMN_PATTERN.findall(masked[start:end]):
+                resolved = resolve_column(qualifier, name)
+                if resolved:
+                    expression = re.sub(rf'{_IDENT}\s*\.\s*(?={_IDENT})', '', sql_query[start:end])
+                    return resolved[0], expression
+            return None
+
+        # Keys per table: (kind, key) with kind "eq", "range" or "order"; key is a column or expression
+        keys: Dict[str, List[Tuple[str, str]]] = {}
+        referenced: Dict[str, List[str]] = {}
+
+        def add_key(table: str, kind: str, key: str):
+            table_keys = keys.setdefault(table.lower(), [])
+            if all(key.lower() != existing.lower() for _, existing in table_keys):
+                table_keys.append((kind, key))
+
+        expression_aliases = {}
+        for match in _EXPRESSION_ALIAS_PATTERN.finditer(masked):
+            resolved = resolve_expression(match)
+            if resolved:
+                expression_aliases[match.group(2).strip('"').lower()] = resolved
+
+        for pattern, kind in ((_EQ_EXPRESSION_PATTERN, "eq"), (_RANGE_EXPRESSION_PATTERN, "range")):
+            for match in pattern.finditer(masked):
+                resolved = resolve_expression(match)
+                if resolved:
+                    add_key(resolved[0], kind, resolved[1])
+        for pattern, kind in ((_EQ_COLUMN_PATTERN, "eq"), (_JOIN_RHS_PATTERN, "eq"), (_RANGE_COLUMN_PATTERN, "range")):
+            for qualifier, name in pattern.findall(masked):
+                resolved = resolve_column(qualifier, name)
+                if resolved:
+                    add_key(resolved[0], kind, f'"{resolved[1]}"')
+
+        for start, end in _clause_items(masked):
+            start += len(masked[start:end]) - len(masked[start:end].lstrip())
+            text = masked[start:end].strip()
+            expression = re.compile(_EXPRESSION, re.IGNORECASE).fullmatch(masked, start, start + len(text))
+            if expression:
+                resolved = resolve_expression(expression)
+            elif text.strip('"').lower() in expression_aliases:
+                resolved = expression_aliases[text.strip('"').lower()]
+            else:
+                column = _COLUMN_PATTERN.fullmatch(text)
+                resolved = resolve_column(*column.groups()) if column else None
+                if resolved:
+                    resolved = (resolved[0], f'"{resolved[1]}"')
+            if resolved:
+                add_key(resolved[0], "order", resolved[1])
+
+        select_all = re.search(r'\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*', masked, re.IGNORECASE)
+        for qualifier, name in _COLUMN_PATTERN.findall(masked):
+            resolved = resolve_column(qualifier, name)
+            if resolved:
+                table_columns = referenced.setdefault(resolved[0].lower(), [])
+                if f'"{resolved[1]}"' not in table_columns:
+                    table_columns.append(f'"{resolved[1]}"')
+
+        candidates = []
+        for detail in plan:
+            scan = _FULL_SCAN_PATTERN.match(detail)
+            if not scan:
+                continue
+            name = (scan.group(1) or scan.group(2)).strip('"')
+            table = aliases.get(name.lower(), name)
+            if table.lower() not in tables:
+                continue
+            table_keys = keys.get(table.lower(), [])
+            eq_keys = [key for kind, key in table_keys if kind == "eq"]
+            range_keys = [key for kind, key in table_keys if kind == "range"]
+            order_keys = [key for kind, key in table_keys if kind == "order"]
+            # Equality keys first, then one range key or the grouping/ordering keys
+            index_keys = eq_keys + (range_keys[:1] or order_keys)
+            if not index_keys:
+                continue
+
+            covering_keys = None
+            if not select_all:
+                extra = [column for column in referenced.get(table.lower(), []) if column not in index_keys]
+                if extra and len(index_keys) + len(extra) <= MAX_COVERING_INDEX_COLUMNS:
+                    covering_keys = index_keys + extra
+            candidates.append({"table": table, "keys": index_keys, "covering_keys": covering_keys})
+        return candidates
+
+    @staticmethod
+    def _index_name(table: str, keys: List[str]) -> str:
+        digest = hashlib.sha1("|".join(keys).lower().encode("utf-8")).hexdigest()[:8]
+        return f'"idx_{table}_advisor_{digest}"'
+
+    def _index_ddl(self, table: str, keys: List[str]) -> str:
+        quoted_table = '"' + table.replace('"', '""') + '"'
+        return f'CREATE INDEX {self._index_name(table, keys)} ON {quoted_table} ({", ".join(keys)})'
+
+    def _workload_cost(self, schema: sqlite3.Connection, conn: sqlite3.Connection,
+                       workload: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Mean estimated rows visited per fingerprint when planned against schema"""
+        table_size = lambda table: self.governor._table_size(conn, table)
+        costs = {}
+        for entry in workload:
+            estimates = []
+            for sample in entry["samples"]:
+                try:
+                    estimates.append(self.governor.estimate(schema, sample["query"], sample["params"],
+                                                            table_size=table_size)[0])
+                except sqlite3.Error:
+                    continue
+            if estimates:
+                costs[entry["fingerprint"]] = sum(estimates) / len(estimates)
+        return costs
+
+    def advise(self, conn: sqlite3.Connection, db_name: str, limit: int = 10) -> Dict[str, Any]:
+        """
+        Aggregate the slow-query log of db_name and recommend indexes
+
+        Each candidate index is created on an empty copy of the schema and the logged
+        workload is re-planned. The estimated saving of a fingerprint is its total
+        logged time scaled by the reduction in estimated rows visited.
+
+        Returns:
+            Dict with the top fingerprints and recommendations ordered by estimated saving
+        """
+        workload = self.query_log.top_fingerprints(db_name, limit)
+        schema = self._schema_copy(conn)
+        try:
+            tables = self._table_columns(schema)
+            baseline = self._workload_cost(schema, conn, workload)
+
+            candidates: Dict[str, Dict[str, Any]] = {}
+            for entry in workload:
+                for sample in entry["samples"]:
+                    try:
+                        plan = [row[3] for row in schema.execute(
+                            f"EXPLAIN QUERY PLAN {sample['query']}", sample["params"] or ()
+                        ).fetchall()]
+                    except sqlite3.Error:
+                        continue
+                    for candidate in self._candidates_for_query(sample["query"], plan, tables):
+                        ddl = self._index_ddl(candidate["table"], candidate["keys"])
+                        candidates.setdefault(ddl, candidate)
+
+            recommendations = []
+            for ddl, candidate in candidates.items():
+                try:
+                    schema.execute(ddl)
+                except sqlite3.Error as e:
+                    logger.debug(f"Skipping candidate index {ddl}: {e}")
+                    continue
+                try:
+                    costs = self._workload_cost(schema, conn, workload)
+                finally:
+                    schema.execute(f'DROP INDEX {self._index_name(candidate["table"], candidate["keys"])}')
+
+                saving_ms = 0.0
+                improved = []
+                for entry in workload:
+                    before = baseline.get(entry["fingerprint"])
+                    after = costs.get(entry["fingerprint"])
+                    if before and after is not None and after < before:
+                        saving_ms += entry["total_ms"] * (1 - after / before)
+                        improved.append(entry["fingerprint"])
+                if not improved:
+                    continue
+                recommendations.append({
+                    "table": candidate["table"],
+                    "columns": candidate["keys"],
+                    "ddl": ddl,
+                    "covering_ddl": (self._index_ddl(candidate["table"], candidate["covering_keys"])
+                                     if candidate["covering_keys"] else None),
+                    "estimated_saving_ms": round(saving_ms, 2),
+                    "improved_fingerprints": improved
+                })
+        finally:
+            schema.close()
+
+        recommendations.sort(key=lambda r: r["estimated_saving_ms"], reverse=True)
+        total_ms = sum(entry["total_ms"] for entry in workload)
+        for recommendation in recommendations:
+            recommendation["estimated_saving_ratio"] = (
+                round(recommendation["estimated_saving_ms"] / total_ms, 3) if total_ms else 0.0
+            )
+        return {
+            "database": db_name,
+            "threshold_ms": self.query_log.threshold_ms,
+            "logged_time_ms": round(total_ms, 2),
+            "fingerprints": workload,
+            "recommendations": recommendations
+        }
+
+
+def execute_logged(conn: sqlite3.Connection, db_name: str, sql_query: str,
+                   params: Optional[QueryParams] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run a query through the query governor and log it if it was slow
+
+    Queries interrupted by the time or step budget are logged with the reason.
+    """
+    started = time.monotonic()
+    try:
+        result = query_governor.execute(conn, sql_query, params, max_rows=max_rows)
+    except QueryTooExpensive as e:
+        if e.reason != "estimated_cost":
+            slow_query_log.record(db_name, sql_query, (time.monotonic() - started) * 1000,
+                                  estimated_rows=e.estimated_rows, plan=e.plan, params=params, error=e.reason)
+        raise
+    slow_query_log.record(db_name, sql_query, result["execution_time_ms"], result["row_count"],
+                          result["estimated_rows"], result["plan"], params)
+    return result
+
+
+# Shared log and advisor configured from the environment
+slow_query_log = SlowQueryLog()
+index_advisor = IndexAdvisor(slow_query_log)
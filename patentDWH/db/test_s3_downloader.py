@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for s3_downloader against a moto-mocked S3 bucket
+
+Run with: python -m pytest test_s3_downloader.py (or python test_s3_downloader.py)
+"""
+
+import os
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+import boto3
+import zstandard
+from moto import mock_aws
+
+import s3_downloader
+from s3_downloader import DownloadVerificationError, ParallelS3Downloader
+
+BUCKET = "test-artifacts"
+MiB = 1024 * 1024
+
+
+def _payload(size: int) -> bytes:
+    """Deterministic, incompressible-enough test content"""
+    block = hashlib.sha256(str(size).encode()).digest() * (MiB // 32)
+    return (block * (size // len(block) + 1))[:size]
+
+
+class ParallelS3DownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.target = os.path.join(self.tmp.name, "data.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.mock.stop()
+
+    def downloader(self, **kwargs) -> ParallelS3Downloader:
+        kwargs.setdefault("part_size", MiB)
+        kwargs.setdefault("max_workers", 4)
+        return ParallelS3Downloader(self.s3, **kwargs)
+
+    def read_target(self) -> bytes:
+        with open(self.target, "rb") as f:
+            return f.read()
+
+    def assert_no_leftovers(self):
+        leftovers = [name for name in os.listdir(self.tmp.name) if name != "data.db"]
+        self.assertEqual(leftovers, [])
+
+    def test_single_part_verifies_etag_and_sha256(self):
+        data = _payload(3 * MiB + 123)
+        self.s3.put_object(Bucket=BUCKET, Key="single.db", Body=data,
+                           Metadata={"sha256": hashlib.sha256(data).hexdigest()})
+
+        result = self.downloader().download(BUCKET, "single.db", self.target)
+
+        self.assertEqual(self.read_target(), data)
+        self.assertEqual(sorted(result["verified"]), ["etag", "sha256"])
+        self.assert_no_leftovers()
+
+    def test_multipart_etag(self):
+        part_size = 5 * MiB
+        data = _payload(2 * part_size + 7)
+        upload = self.s3.create_multipart_upload(Bucket=BUCKET, Key="multi.db")
+        parts = []
+        for number, offset in enumerate(range(0, len(data), part_size), start=1):
+            response = self.s3.upload_part(Bucket=BUCKET, Key="multi.db", UploadId=upload["UploadId"],
+                                           PartNumber=number, Body=data[offset:offset + part_size])
+            parts.append({"PartNumber": number, "ETag": response["ETag"]})
+        self.s3.complete_multipart_upload(Bucket=BUCKET, Key="multi.db", UploadId=upload["UploadId"],
+                                          MultipartUpload={"Parts": parts})
+
+        result = self.downloader().download(BUCKET, "multi.db", self.target)
+
+        self.assertIn("-", result["etag"])
+        self.assertEqual(result["verified"], ["etag"])
+        self.assertEqual(self.read_target(), data)
+
+    def test_resume_downloads_missing_parts_only(self):
+        data = _payload(6 * MiB)
+        self.s3.put_object(Bucket=BUCKET, Key="resume.db", Body=data)
+        downloader = self.downloader(max_retries=1)
+        fetch_part = downloader._fetch_part
+
+        def failing_fetch(bucket, key, etag, fd, part, size, stop):
+            if part == 4:
+                raise IOError("connection reset")
+            return fetch_part(bucket, key, etag, fd, part, size, stop)
+
+        with mock.patch.object(downloader, "_fetch_part", side_effect=failing_fetch):
+            with self.assertRaises(IOError):
+                downloader.download(BUCKET, "resume.db", self.target)
+        self.assertFalse(os.path.exists(self.target))
+        self.assertTrue(os.path.exists(self.target + s3_downloader.PART_FILE_SUFFIX))
+
+        fetched = []
+
+        def counting_fetch(bucket, key, etag, fd, part, size, stop):
+            fetched.append(part)
+            return fetch_part(bucket, key, etag, fd, part, size, stop)
+
+        with mock.patch.object(downloader, "_fetch_part", side_effect=counting_fetch):
+            result = downloader.download(BUCKET, "resume.db", self.target)
+
+        self.assertIn(4, fetched)
+        self.assertLess(len(fetched), 6)
+        self.assertEqual(result["verified"], ["etag"])
+        self.assertEqual(self.read_target(), data)
+        self.assert_no_leftovers()
+
+    def test_sha256_mismatch_discards_download(self):
+        self.s3.put_object(Bucket=BUCKET, Key="bad.db", Body=_payload(2 * MiB))
+
+        with self.assertRaises(DownloadVerificationError):
+            self.downloader().download(BUCKET, "bad.db", self.target, expected_sha256="0" * 64)
+
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_kms_encrypted_object_is_not_checked_against_etag(self):
+        data = _payload(MiB + 1)
+        self.s3.put_object(Bucket=BUCKET, Key="kms.db", Body=data, ServerSideEncryption="aws:kms")
+        head = self.s3.head_object(Bucket=BUCKET, Key="kms.db")
+        # The ETag of an SSE-KMS object is not the MD5 of its content
+        head["ETag"] = '"%s"' % ("f" * 32)
+        head["ServerSideEncryption"] = "aws:kms"
+
+        with mock.patch.object(self.s3, "head_object", return_value=head), \
+                mock.patch.object(self.s3, "get_object",
+                                  side_effect=lambda **kw: boto3.client("s3", region_name="us-east-1").get_object(
+                                      **{k: v for k, v in kw.items() if k != "IfMatch"})):
+            result = self.downloader().download(BUCKET, "kms.db", self.target)
+
+        self.assertEqual(result["verified"], ["size"])
+        self.assertEqual(self.read_target(), data)
+
+    def test_zstd_multiple_frames(self):
+        frames = [_payload(MiB + 5), b"second frame " * 1000, _payload(2 * MiB)]
+        compressor = zstandard.ZstdCompressor()
+        body = b"".join(compressor.compress(frame) for frame in frames)
+        self.s3.put_object(Bucket=BUCKET, Key="frames.db.zst", Body=body)
+
+        result = self.downloader().download(BUCKET, "frames.db.zst", self.target)
+
+        self.assertTrue(result["decompressed"])
+        self.assertEqual(self.read_target(), b"".join(frames))
+        self.assert_no_leftovers()
+
+    def test_truncated_zstd_is_rejected(self):
+        body = zstandard.ZstdCompressor().compress(_payload(2 * MiB))
+        self.s3.put_object(Bucket=BUCKET, Key="cut.db.zst", Body=body[:-100])
+
+        with self.assertRaises(DownloadVerificationError):
+            self.downloader().download(BUCKET, "cut.db.zst", self.target)
+
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared chart rendering service
+
+Renders the line, bar, stacked bar, horizontal bar and pie charts used by the patent
+analysis services from a declarative chart spec.
+
+- matplotlib is imported once with the Agg backend and a Japanese font is resolved once
+- figures are reused per (figsize, dpi) template instead of being created per request
+- rendered PNG/SVG bytes are cached by a hash of the chart spec and input data
+- batches of charts can be rendered in a worker process pool
+
+A chart is described by a spec and its data:
+
+    spec = {"type": "bar", "title": "年別出願数推移", "xlabel": "年", "ylabel": "出願数",
+            "figsize": [12, 6], "grid": {"axis": "y", "linestyle": "--", "alpha": 0.7}}
+    data = {"labels": ["2020", "2021"], "series": [{"name": "出願数", "values": [10, 12]}]}
+    image_base64 = render_chart_base64(spec, data)
+
+Reports that draw several charts pass them to render_charts_base64() in one batch.
+
+This module is kept identical in every service that renders charts
+(inpit-sqlite-mcp, app/patent_system, patent_analysis_container, trend-analysis).
+Run it directly to benchmark charts/s.
+"""
+
+import os
+import io
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend for server environments
+from matplotlib import font_manager
+from matplotlib import style as mpl_style
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+logger = logging.getLogger(__name__)
+
+# Rendered chart cache size (number of images) and worker process count for batches
+CHART_CACHE_SIZE = int(os.environ.get('CHART_CACHE_SIZE', '256'))
+CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Japanese fonts in order of preference
+JAPANESE_FONT_CANDIDATES = [
+    'IPAexGothic', 'IPAGothic', 'IPAPGothic', 'Noto Sans CJK JP', 'Noto Sans JP',
+    'TakaoGothic', 'VL Gothic', 'Hiragino Sans', 'Yu Gothic', 'MS Gothic'
+]
+
+SUPPORTED_FORMATS = ('png', 'svg')
+
+
+def _configure_japanese_font() -> Optional[str]:
+    """Select an installed Japanese font once for all charts in this process"""
+    available = {font.name for font in font_manager.fontManager.ttflist}
+    for name in JAPANESE_FONT_CANDIDATES:
+        if name in available:
+            matplotlib.rcParams['font.family'] = 'sans-serif'
+            matplotlib.rcParams['font.sans-serif'] = [name] + list(matplotlib.rcParams['font.sans-serif'])
+            matplotlib.rcParams['axes.unicode_minus'] = False
+            return name
+
+    try:
+        import japanize_matplotlib  # noqa: F401 - registers IPAexGothic on import
+        return 'IPAexGothic'
+    except ImportError:
+        logger.warning("No Japanese font found; Japanese labels may not render correctly")
+        return None
+
+
+JAPANESE_FONT = _configure_japanese_font()
+
+
+def chart_cache_key(spec: Dict[str, Any], data: Dict[str, Any]) -> str:
+    """Return the cache key for a chart spec and its input data"""
+    payload = json.dumps({"spec": spec, "data": data}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _to_list(values: Any) -> List[Any]:
+    """Convert numpy/pandas sequences to plain lists"""
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def _annotate_bars(ax, bars, spec: Dict[str, Any], horizontal: bool = False):
+    """Write the value of each bar next to it"""
+    options = spec.get("value_labels")
+    if not options:
+        return
+    options = options if isinstance(options, dict) else {}
+    label_format = options.get("format", "{:.0f}")
+    offset = options.get("offset", 3)
+
+    for bar in bars:
+        if horizontal:
+            value = bar.get_width()
+            ax.annotate(label_format.format(value),
+                        xy=(value, bar.get_y() + bar.get_height() / 2),
+                        xytext=(offset, 0), textcoords="offset points",
+                        ha='left', va='center')
+        else:
+            value = bar.get_height()
+            ax.annotate(label_format.format(value),
+                        xy=(bar.get_x() + bar.get_width() / 2, value),
+                        xytext=(0, offset), textcoords="offset points",
+                        ha='center', va='bottom', fontweight=options.get("fontweight"))
+
+
+def _draw_line(ax, spec: Dict[str, Any], labels: List[Any], series: List[Dict[str, Any]]):
+    for item in series:
+        ax.plot(labels, item["values"], marker=spec.get("marker", 'o'),
+                linewidth=spec.get("linewidth", 2), label=item.get("name"), color=item.get("color"))
+
+
+def _draw_bar(ax, spec: Dict[str, Any], labels: List[Any], series: List[Dict[str, Any]]):
+    x = np.arange(len(labels))
+    colors = spec.get("colors")
+    if spec.get("cmap"):
+        colormap = matplotlib.colormaps[spec["cmap"]]
+        colors = [colormap(position) for position in np.linspace(0, 1, len(series))]
+
+    if len(series) == 1 and not spec.get("stacked"):
+        bars = ax.bar(x, series[0]["values"], spec.get("bar_width", 0.8),
+                      color=series[0].get("color") or colors, label=series[0].get("name"))
+        _annotate_bars(ax, bars, spec)
+    elif spec.get("stacked"):
+        bottom = np.zeros(len(labels))
+        for i, item in enumerate(series):
+            values = np.asarray(item["values"], dtype=float)
+            color = item.get("color") or (colors[i % len(colors)] if colors else None)
+            ax.bar(x, values, bottom=bottom, label=item.get("name"), color=color,
+                   width=spec.get("bar_width", 0.8))
+            bottom += values
+
+        totals = spec.get("total_labels")
+        if totals:
+            totals = totals if isinstance(totals, dict) else {}
+            for i, total in enumerate(bottom):
+                ax.text(i, total + totals.get("offset", 0), totals.get("format", "{:.0f}").format(total),
+                        ha='center', va='bottom', fontweight=totals.get("fontweight"))
+    else:
+        width = spec.get("bar_width", 0.8 / len(series))
+        offsets = (np.arange(len(series)) - (len(series) - 1) / 2) * width
+        for i, item in enumerate(series):
+            color = item.get("color") or (colors[i % len(colors)] if colors else None)
+            bars = ax.bar(x + offsets[i], item["values"], width, label=item.get("name"), color=color)
+            _annotate_bars(ax, bars, spec)
+
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, rotation=spec.get("xtick_rotation", 0), ha=spec.get("xtick_ha", 'center'))
+
+
+def _draw_barh(ax, spec: Dict[str, Any], labels: List[Any], series: List[Dict[str, Any]]):
+    values = series[0]["values"]
+    if spec.get("sort") == "ascending":
+        order = np.argsort(values, kind='stable')
+        labels = [labels[i] for i in order]
+        values = [values[i] for i in order]
+
+    y = np.arange(len(labels))
+    bars = ax.barh(y, values, color=series[0].get("color") or spec.get("colors"))
+    ax.set_yticks(y)
+    ax.set_yticklabels(labels)
+    _annotate_bars(ax, bars, spec, horizontal=True)
+
+
+def _draw_pie(ax, spec: Dict[str, Any], labels: List[Any], series: List[Dict[str, Any]]):
+    values = series[0]["values"]
+    colors = spec.get("colors")
+    explode = spec.get("explode")
+
+    if spec.get("drop_non_positive", True):
+        keep = [i for i, value in enumerate(values) if value > 0]
+        labels = [labels[i] for i in keep]
+        values = [values[i] for i in keep]
+        colors = [colors[i] for i in keep] if colors else None
+        explode = [explode[i] for i in keep] if explode else None
+
+    legend_format = spec.get("legend_label_format")
+    wedges, _texts, _autotexts = ax.pie(
+        values,
+        labels=None if legend_format else labels,
+        autopct=spec.get("autopct", '%1.1f%%'),
+        startangle=spec.get("startangle", 90),
+        shadow=spec.get("shadow", False),
+        colors=colors,
+        explode=explode
+    )
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+
+    if legend_format:
+        ax.legend(wedges, [legend_format.format(label=label, value=value) for label, value in zip(labels, values)],
+                  loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+
+
+_DRAWERS = {
+    "line": _draw_line,
+    "bar": _draw_bar,
+    "barh": _draw_barh,
+    "pie": _draw_pie,
+}
+
+
+class ChartRenderer:
+    """Renders chart specs to image bytes with figure reuse and a rendered-chart cache"""
+
+    def __init__(self, cache_size: int = CHART_CACHE_SIZE, max_workers: int = CHART_RENDER_WORKERS):
+        """
+        Initialize the renderer
+
+        Args:
+            cache_size: Maximum number of rendered images kept in memory
+            max_workers: Worker processes used by render_many (0 renders batches in-process)
+        """
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._templates = threading.local()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, spec: Dict[str, Any], data: Dict[str, Any]) -> bytes:
+        """
+        Render a chart, returning cached bytes when the same spec and data were rendered before
+
+        Args:
+            spec: Chart spec (type, titles, styling, "format": "png" or "svg")
+            data: {"labels": [...], "series": [{"name", "values", "color"}]}
+
+        Returns:
+            Image bytes in the requested format
+        """
+        key = chart_cache_key(spec, data)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        image = self._render_uncached(spec, data)
+        self._cache_put(key, image)
+        return image
+
+    def render_base64(self, spec: Dict[str, Any], data: Dict[str, Any]) -> str:
+        """Render a chart and return it base64-encoded"""
+        return base64.b64encode(self.render(spec, data)).decode('utf-8')
+
+    def save(self, spec: Dict[str, Any], data: Dict[str, Any], path: str) -> str:
+        """Render a chart and write it to path"""
+        with open(path, 'wb') as f:
+            f.write(self.render(spec, data))
+        return path
+
+    def render_many(self, jobs: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[bytes]:
+        """
+        Render several charts, sending uncached ones to the worker process pool
+
+        Args:
+            jobs: List of (spec, data) pairs
+
+        Returns:
+            Image bytes in the same order as jobs
+        """
+        keys = [chart_cache_key(spec, data) for spec, data in jobs]
+        results: List[Optional[bytes]] = [self._cache_get(key) for key in keys]
+        pending = [i for i, image in enumerate(results) if image is None]
+
+        if len(pending) > 1 and self.max_workers > 0:
+            pool = self._get_pool()
+            futures = [pool.submit(_render_in_worker, jobs[i][0], jobs[i][1]) for i in pending]
+            for i, future in zip(pending, futures):
+                results[i] = future.result()
+        else:
+            for i in pending:
+                results[i] = self._render_uncached(*jobs[i])
+
+        for i in pending:
+            self._cache_put(keys[i], results[i])
+        return results
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return cache statistics"""
+        with self._cache_lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._cache), "max_size": self.cache_size}
+
+    def clear_cache(self):
+        """Drop all cached images"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def close(self):
+        """Shut down the worker process pool"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        with self._cache_lock:
+            image = self._cache.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def _cache_put(self, key: str, image: bytes):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = image
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _get_figure(self, figsize: Tuple[float, float], dpi: int) -> Figure:
+        """Return this thread's reusable figure for the given size, cleared for drawing"""
+        templates = getattr(self._templates, "figures", None)
+        if templates is None:
+            templates = self._templates.figures = {}
+
+        fig = templates.get((figsize, dpi))
+        if fig is None:
+            fig = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(fig)
+            templates[(figsize, dpi)] = fig
+        else:
+            fig.clf()
+            fig.subplots_adjust(**{
+                name: matplotlib.rcParams[f'figure.subplot.{name}']
+                for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+            })
+        return fig
+
+    def _render_uncached(self, spec: Dict[str, Any], data: Dict[str, Any]) -> bytes:
+        chart_type = spec.get("type", "bar")
+        drawer = _DRAWERS.get(chart_type)
+        if drawer is None:
+            raise ValueError(f"Unsupported chart type: {chart_type}")
+
+        image_format = spec.get("format", "png")
+        if image_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        figsize = tuple(spec.get("figsize", (10, 6)))
+        dpi = spec.get("dpi", 100)
+        labels = _to_list(data.get("labels", []))
+        series = [dict(item, values=_to_list(item.get("values", []))) for item in data.get("series", [])]
+
+        style = spec.get("style")
+        style_context = mpl_style.context(style) if style in mpl_style.available else nullcontext()
+        with style_context:
+            fig = self._get_figure(figsize, dpi)
+            ax = fig.add_subplot(111)
+
+            if not series or not labels:
+                ax.text(0.5, 0.5, spec.get("empty_message", "No data available"),
+                        ha='center', va='center', transform=ax.transAxes)
+                ax.set_axis_off()
+            else:
+                drawer(ax, spec, labels, series)
+
+            self._decorate(ax, spec, chart_type)
+            if spec.get("tight_layout", True):
+                fig.tight_layout()
+
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=image_format, dpi=dpi, bbox_inches=spec.get("bbox_inches"))
+
+        fig.clf()
+        return buffer.getvalue()
+
+    @staticmethod
+    def _decorate(ax, spec: Dict[str, Any], chart_type: str):
+        """Apply titles, axis labels, grid and legend"""
+        if spec.get("title"):
+            ax.set_title(spec["title"], fontsize=spec.get("title_fontsize", 14))
+        if spec.get("xlabel"):
+            ax.set_xlabel(spec["xlabel"], fontsize=spec.get("label_fontsize", 12))
+        if spec.get("ylabel"):
+            ax.set_ylabel(spec["ylabel"], fontsize=spec.get("label_fontsize", 12))
+        if chart_type == "line" and spec.get("xtick_rotation"):
+            for label in ax.get_xticklabels():
+                label.set_rotation(spec["xtick_rotation"])
+
+        grid = spec.get("grid")
+        if grid:
+            grid = grid if isinstance(grid, dict) else {}
+            ax.grid(True, axis=grid.get("axis", "both"), linestyle=grid.get("linestyle", "--"),
+                    alpha=grid.get("alpha", 0.7))
+
+        legend = spec.get("legend")
+        if legend and chart_type != "pie":
+            legend = legend if isinstance(legend, dict) else {}
+            ax.legend(**{k: v for k, v in legend.items() if v is not None})
+
+
+_default_renderer: Optional[ChartRenderer] = None
+_default_renderer_lock = threading.Lock()
+
+
+def _render_in_worker(spec: Dict[str, Any], data: Dict[str, Any]) -> bytes:
+    """Render one chart inside a pool worker (fonts and matplotlib are set up at import)"""
+    return get_renderer()._render_uncached(spec, data)
+
+
+def get_renderer() -> ChartRenderer:
+    """Return the process-wide chart renderer"""
+    global _default_renderer
+    with _default_renderer_lock:
+        if _default_renderer is None:
+            _default_renderer = ChartRenderer()
+        return _default_renderer
+
+
+def render_chart(spec: Dict[str, Any], data: Dict[str, Any]) -> bytes:
+    """Render a chart with the process-wide renderer"""
+    return get_renderer().render(spec, data)
+
+
+def render_chart_base64(spec: Dict[str, Any], data: Dict[str, Any]) -> str:
+    """Render a chart with the process-wide renderer and return it base64-encoded"""
+    return get_renderer().render_base64(spec, data)
+
+
+def render_charts_base64(jobs: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[str]:
+    """Render several (spec, data) charts with the process-wide renderer's worker pool, base64-encoded in job order"""
+    return [base64.b64encode(image).decode('utf-8') for image in get_renderer().render_many(jobs)]
+
+
+def save_chart(spec: Dict[str, Any], data: Dict[str, Any], path: str) -> str:
+    """Render a chart with the process-wide renderer and write it to path"""
+    return get_renderer().save(spec, data, path)
+
+
+def benchmark_charts(num_charts: int = 50, workers: int = CHART_RENDER_WORKERS) -> Dict[str, float]:
+    """
+    Measure rendering throughput in charts/s
+
+    Compares the per-request pyplot pattern the services used before with the shared
+    renderer (figure reuse), the worker pool and the rendered-chart cache.
+    """
+    import matplotlib.pyplot as plt
+
+    years = [str(year) for year in range(2010, 2024)]
+    jobs = []
+    for i in range(num_charts):
+        rng = np.random.default_rng(i)
+        series = [{"name": f"G0{k}", "values": rng.integers(1, 100, len(years)).tolist()} for k in range(5)]
+        jobs.append(({"type": "bar", "stacked": True, "title": f"出願推移 {i}", "xlabel": "年",
+                      "ylabel": "出願数", "figsize": [12, 8], "legend": {"loc": "upper left"}},
+                     {"labels": years, "series": series}))
+
+    results = {}
+
+    start = time.perf_counter()
+    for _spec, data in jobs:
+        plt.figure(figsize=(12, 8))
+        bottom = np.zeros(len(years))
+        for item in data["series"]:
+            plt.bar(years, item["values"], bottom=bottom, label=item["name"])
+            bottom += item["values"]
+        plt.legend(loc="upper left")
+        plt.tight_layout()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png', dpi=100)
+        base64.b64encode(buffer.getvalue())
+        plt.close()
+    results["pyplot_per_request"] = num_charts / (time.perf_counter() - start)
+
+    renderer = ChartRenderer(cache_size=0, max_workers=0)
+    start = time.perf_counter()
+    for spec, data in jobs:
+        renderer.render_base64(spec, data)
+    results["renderer_figure_reuse"] = num_charts / (time.perf_counter() - start)
+
+    if workers > 0:
+        renderer = ChartRenderer(cache_size=0, max_workers=workers)
+        renderer.render_many(jobs[:workers * 2])  # warm up the worker processes
+        start = time.perf_counter()
+        renderer.render_many(jobs)
+        results[f"renderer_pool_{workers}_workers"] = num_charts / (time.perf_counter() - start)
+        renderer.close()
+
+    renderer = ChartRenderer(cache_size=num_charts, max_workers=0)
+    for spec, data in jobs:
+        renderer.render(spec, data)
+    start = time.perf_counter()
+    for spec, data in jobs:
+        renderer.render_base64(spec, data)
+    results["renderer_cached"] = num_charts / (time.perf_counter() - start)
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark chart rendering throughput")
+    parser.add_argument("--charts", type=int, default=50, help="Number of charts to render")
+    parser.add_argument("--workers", type=int, default=CHART_RENDER_WORKERS, help="Worker processes")
+    args = parser.parse_args()
+
+    print(f"Japanese font: {JAPANESE_FONT}")
+    for name, rate in benchmark_charts(args.charts, args.workers).items():
+        print(f"{name:32s} {rate:10.1f} charts/s")
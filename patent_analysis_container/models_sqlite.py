@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, selectinload, sessionmaker
 from datetime import datetime
 import os
 import sqlite3
@@ -161,6 +161,35 @@ class Description(Base):
         }
 
 
+# Relationship loading profiles for Patent queries. selectinload fetches each
+# listed collection for all returned patents in one extra IN query, instead of
+# one lazy-load query per patent when the collection is first accessed:
+#   summary - list views (applicants and IPC codes)
+#   trends  - year x IPC processing
+#   full    - everything Patent.to_dict() and detail views touch
+PATENT_LOAD_PROFILES = {
+    "none": (),
+    "summary": ("applicants", "ipc_classifications"),
+    "trends": ("ipc_classifications",),
+    "full": ("applicants", "inventors", "ipc_classifications", "claims", "descriptions"),
+}
+
+
+def patent_load_options(profile: str = "summary"):
+    """
+    Loader options for a Patent query, e.g. query(Patent).options(*patent_load_options("full"))
+    
+    Args:
+        profile: Key of PATENT_LOAD_PROFILES
+        
+    Returns:
+        List of loader options
+    """
+    if profile not in PATENT_LOAD_PROFILES:
+        raise ValueError(f"Unknown load profile '{profile}', expected one of: {', '.join(PATENT_LOAD_PROFILES)}")
+    return [selectinload(getattr(Patent, name)) for name in PATENT_LOAD_PROFILES[profile]]
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
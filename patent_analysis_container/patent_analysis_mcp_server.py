@@ -5,7 +5,6 @@ import zipfile
 import io
 import uvicorn
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
 from fastapi import FastAPI, HTTPException, Response, Depends
 from fastapi.responses import StreamingResponse
@@ -32,6 +31,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 # Import required modules 
 from app.patent_system.models_sqlite import ensure_db_exists, SessionLocal, get_db
 from app.patent_system.db_sqlite import SQLiteDBManager
+from chart_renderer import save_chart
 
 app = FastAPI(title="Patent Analysis MCP Server", 
               description="MCP server for patent application trend analysis",
@@ -64,11 +64,11 @@ def sanitize_string_for_filename(input_string):
         return "default_report"
     return safe_string
 
-def execute_sql_query(query, db_type="sqlite"):
-    """Execute SQL query using the patent_sql_query tool via MCP API or direct DB access"""
+def execute_sql_query(query, db_type="sqlite", params=None):
+    """Execute SQL query using the patent_sql_query tool via MCP API or direct DB access (params are bound by the API)"""
     try:
         # Log the SQL query being executed
-        logger.info(f"Executing SQL query: {query}")
+        logger.info(f"Executing SQL query: {query}" + (f" with params {params}" if params else ""))
         
         if db_type == "sqlite":
             # Use local SQLite connection
@@ -83,10 +83,8 @@ def execute_sql_query(query, db_type="sqlite"):
                         if match:
                             applicant_name = match.group(1)
                             logger.info(f"Extracted applicant name from SQL: {applicant_name}")
-                            # Get patents by applicant
-                            patents = db_manager.get_patents_by_applicant(applicant_name)
-                            # Process to get IPC classifications by year
-                            result = process_patents_for_trends(patents)
+                            # Aggregate IPC classifications by year in SQLite
+                            result = db_manager.get_ipc_trends_by_applicant(applicant_name)
                             logger.info(f"SQL query result: {len(result)} records returned")
                             return {
                                 "success": True,
@@ -99,6 +97,7 @@ def execute_sql_query(query, db_type="sqlite"):
                 logger.info(f"Using external API for query: {query}")
                 payload = {
                     "query": query,
+                    "params": params,
                     "db_type": db_type
                 }
                 response = requests.post(DB_URL, json=payload)
@@ -125,6 +124,7 @@ def execute_sql_query(query, db_type="sqlite"):
             logger.info(f"Using external API for {db_type} database query: {query}")
             payload = {
                 "query": query,
+                "params": params,
                 "db_type": db_type
             }
             response = requests.post(DB_URL, json=payload)
@@ -182,41 +182,6 @@ def execute_nl_query(query, db_type="sqlite"):
         logger.error(f"Exception executing query: {str(e)}")
         return None
 
-def process_patents_for_trends(patents):
-    """Process patent data to extract trends by year and IPC classification"""
-    # Create a list to store results
-    results = []
-    
-    # Process each patent
-    for patent in patents:
-        # Get the application year
-        if patent.application_date:
-            year = patent.application_date.strftime("%Y")
-            
-            # Process each IPC classification
-            for ipc in patent.ipc_classifications:
-                # Get the main class (first 3 or 4 characters)
-                ipc_class = ipc.code[:3] if len(ipc.code) >= 3 else ipc.code
-                
-                # Add to results
-                results.append({
-                    "year": year,
-                    "ipc_class": ipc_class,
-                    "count": 1  # Each patent counts as 1
-                })
-    
-    # Convert to DataFrame for aggregation
-    if not results:
-        return []
-        
-    df = pd.DataFrame(results)
-    
-    # Group by year and IPC class, counting occurrences
-    grouped = df.groupby(['year', 'ipc_class']).size().reset_index(name='count')
-    
-    # Convert back to list of dictionaries
-    return grouped.to_dict('records')
-
 def get_patent_trends_by_applicant(applicant_name, db_type="sqlite"):
     """Get patent application trends by classification for a specific applicant from SQLite DB"""
     logger.info(f"Analyzing patent trends for applicant: {applicant_name}")
@@ -224,12 +189,8 @@ def get_patent_trends_by_applicant(applicant_name, db_type="sqlite"):
     if db_type == "sqlite":
         # Use local SQLite connection
         with SQLiteDBManager() as db_manager:
-            # Get patents by applicant
-            patents = db_manager.get_patents_by_applicant(applicant_name)
-            logger.info(f"Found {len(patents)} patents for applicant {applicant_name}")
-            
-            # Process to get IPC classifications by year
-            results = process_patents_for_trends(patents)
+            # Aggregate IPC classifications by year in SQLite (one query for any number of patents)
+            results = db_manager.get_ipc_trends_by_applicant(applicant_name)
             
             # Convert to DataFrame
             if not results:
@@ -241,7 +202,7 @@ def get_patent_trends_by_applicant(applicant_name, db_type="sqlite"):
             return df
     else:
         # Use SQL query for other databases
-        query = f"""
+        query = """
         SELECT 
             SUBSTR(p.application_date, 1, 4) AS year,
             SUBSTR(ipc.code, 1, 3) AS ipc_class,
@@ -249,13 +210,13 @@ def get_patent_trends_by_applicant(applicant_name, db_type="sqlite"):
         FROM patents p
         JOIN applicants a ON p.id = a.patent_id
         JOIN ipc_classifications ipc ON p.id = ipc.patent_id
-        WHERE a.name LIKE '%{applicant_name}%'
+        WHERE a.name LIKE '%' || ? || '%'
         GROUP BY year, ipc_class
         ORDER BY year, count DESC
         """
         
         logger.info(f"Execute SQL query for applicant trends: {query}")
-        result = execute_sql_query(query, db_type)
+        result = execute_sql_query(query, db_type, [applicant_name])
         if result and "data" in result:
             df = pd.DataFrame(result["data"])
             logger.info(f"Retrieved {len(df)} trend records via SQL")
@@ -337,25 +298,26 @@ def generate_trend_chart(df, applicant_name):
     renamed_columns = [ipc_mapping.get(col, col) for col in pivot_df.columns]
     pivot_df.columns = renamed_columns
     
-    # Create the stacked bar chart
-    plt.figure(figsize=(14, 8))
-    ax = pivot_df.plot(kind='bar', stacked=True, figsize=(14, 8))
-    
-    # Set labels and title
+    # Render the stacked bar chart with the shared renderer
     safe_applicant_name = re.sub(r'[^\x00-\x7F]', '', applicant_name)
-    ax.set_xlabel('Year', fontsize=12)
-    ax.set_ylabel('Number of Applications', fontsize=12)
-    ax.set_title(f'Patent Applications by Classification: {safe_applicant_name}', fontsize=14)
-    
-    # Enhance legend
-    plt.legend(title='IPC Classification', bbox_to_anchor=(1.05, 1), loc='upper left')
-    
-    # Adjust layout
-    plt.tight_layout()
+    spec = {
+        "type": "bar",
+        "stacked": True,
+        "title": f'Patent Applications by Classification: {safe_applicant_name}',
+        "xlabel": 'Year',
+        "ylabel": 'Number of Applications',
+        "figsize": [14, 8],
+        "bar_width": 0.5,
+        "legend": {"title": 'IPC Classification', "bbox_to_anchor": [1.05, 1], "loc": 'upper left'}
+    }
+    data = {
+        "labels": [str(year) for year in pivot_df.index],
+        "series": [{"name": column, "values": pivot_df[column].tolist()} for column in pivot_df.columns]
+    }
     
     # Save the chart
     filename = os.path.join(OUTPUT_DIR, f"{sanitize_string_for_filename(applicant_name)}_classification_trend.png")
-    plt.savefig(filename)
+    save_chart(spec, data, filename)
     print(f"Chart saved as {filename}")
     
     return filename
@@ -462,9 +424,9 @@ async def mcp_endpoint(request: MCPToolRequest):
             
             # Direct SQL query attempt for debugging
             try:
-                test_sql = f"SELECT * FROM inpit_data WHERE applicant LIKE '%{applicant_name}%' ORDER BY application_date DESC LIMIT 20;"
+                test_sql = "SELECT * FROM inpit_data WHERE applicant LIKE '%' || ? || '%' ORDER BY application_date DESC LIMIT 20;"
                 logger.info(f"Attempting direct SQL query for debug: {test_sql}")
-                test_result = execute_sql_query(test_sql, db_type)
+                test_result = execute_sql_query(test_sql, db_type, [applicant_name])
                 if test_result:
                     logger.info("Direct SQL query successful")
                     # Include the raw SQL in the response for debugging
@@ -10,24 +10,18 @@ import os
 import json
 import requests
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
 import numpy as np
 from datetime import datetime
 import sys
 import markdown
-from japanize_matplotlib import japanize
 import re
 from typing import Dict, List, Any
+from chart_renderer import save_chart
 
 # Get service URLs from environment variables or use defaults
 MCP_URL = os.environ.get("MCP_URL", "http://patentdwh-mcp-enhanced:8080/api/v1/mcp")
 DB_URL = os.environ.get("DB_URL", "http://patentdwh-db:5002/api/sql-query")
 
-# Configure plot settings
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.style.use('ggplot')
-
 # Output directory for generated files
 OUTPUT_DIR = "/app/output"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -213,24 +207,27 @@ def generate_trend_chart(df, applicant_name):
     renamed_columns = [ipc_mapping.get(col, col) for col in pivot_df.columns]
     pivot_df.columns = renamed_columns
     
-    # Create the stacked bar chart
-    ax = pivot_df.plot(kind='bar', stacked=True, figsize=(14, 8))
-    
-    # Set labels and title
+    # Render the stacked bar chart with the shared renderer
     safe_applicant_name = re.sub(r'[^\x00-\x7F]', '', applicant_name)
-    ax.set_xlabel('Year', fontsize=12)
-    ax.set_ylabel('Number of Applications', fontsize=12)
-    ax.set_title(f'Patent Applications by Classification: {safe_applicant_name}', fontsize=14)
-    
-    # Enhance legend
-    plt.legend(title='IPC Classification', bbox_to_anchor=(1.05, 1), loc='upper left')
-    
-    # Adjust layout
-    plt.tight_layout()
+    spec = {
+        "type": "bar",
+        "stacked": True,
+        "title": f'Patent Applications by Classification: {safe_applicant_name}',
+        "xlabel": 'Year',
+        "ylabel": 'Number of Applications',
+        "figsize": [14, 8],
+        "bar_width": 0.5,
+        "style": 'ggplot',
+        "legend": {"title": 'IPC Classification', "bbox_to_anchor": [1.05, 1], "loc": 'upper left'}
+    }
+    data = {
+        "labels": [str(year) for year in pivot_df.index],
+        "series": [{"name": column, "values": pivot_df[column].tolist()} for column in pivot_df.columns]
+    }
     
     # Save the chart
     filename = os.path.join(OUTPUT_DIR, f"{sanitize_string_for_filename(applicant_name)}_classification_trend.png")
-    plt.savefig(filename)
+    save_chart(spec, data, filename)
     print(f"Chart saved as {filename}")
     
     return filename
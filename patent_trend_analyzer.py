@@ -10,24 +10,18 @@ import os
 import json
 import requests
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
 import numpy as np
 from datetime import datetime
 import sys
 import markdown
-from japanize_matplotlib import japanize
 import re
 from typing import Dict, List, Any
+from app.patent_system.chart_renderer import save_chart
 
 # MCP server endpoint
 MCP_URL = "http://localhost:8080/api/v1/mcp"
 DB_URL = "http://localhost:5002/api/sql-query"
 
-# Configure plot settings
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.style.use('ggplot')
-
 def sanitize_string_for_filename(input_string):
     """Convert Japanese characters to romaji for filenames"""
     # Replace Japanese characters with romaji (simplified approach)
@@ -59,11 +53,12 @@ def execute_sql_query(query, db_type="inpit"):
         print(f"Exception executing query: {str(e)}")
         return None
 
-def execute_direct_sql_query(query, db_type="inpit"):
-    """Execute SQL query directly using the database API"""
+def execute_direct_sql_query(query, db_type="inpit", params=None):
+    """Execute SQL query directly using the database API (params are bound server-side)"""
     try:
         payload = {
             "query": query,
+            "params": params,
             "db_type": db_type
         }
         response = requests.post(DB_URL, json=payload)
@@ -108,7 +103,7 @@ def get_applicant_patent_trends(applicant_name, db_type="inpit"):
     
     # SQL query to get patent applications by applicant with classification and date
     if db_type == "inpit":
-        query = f"""
+        query = """
         SELECT 
             substr(application_date, 1, 4) as year, 
             substr(ipc_code, 1, 4) as ipc_class, 
@@ -116,7 +111,7 @@ def get_applicant_patent_trends(applicant_name, db_type="inpit"):
         FROM 
             inpit_data 
         WHERE 
-            applicant_name LIKE '%{applicant_name}%'
+            applicant_name LIKE '%' || ? || '%'
             AND application_date IS NOT NULL
             AND ipc_code IS NOT NULL
         GROUP BY 
@@ -127,19 +122,19 @@ def get_applicant_patent_trends(applicant_name, db_type="inpit"):
             ipc_class
         """
     else:
-        query = f"""
+        query = """
         SELECT 
-            substr(filing_date, 1, 4) as year, 
+            filing_year as year, 
             substr(ipc_code, 1, 4) as ipc_class, 
             COUNT(*) as count
         FROM 
             publications 
         WHERE 
-            assignee_harmonized LIKE '%{applicant_name}%' 
-            AND filing_date IS NOT NULL
+            assignee_harmonized LIKE '%' || ? || '%' 
+            AND filing_year IS NOT NULL
             AND ipc_code IS NOT NULL
         GROUP BY 
-            substr(filing_date, 1, 4), 
+            filing_year, 
             substr(ipc_code, 1, 4) 
         ORDER BY 
             year, 
@@ -147,7 +142,7 @@ def get_applicant_patent_trends(applicant_name, db_type="inpit"):
         """
     
     # Execute the query
-    result = execute_direct_sql_query(query, db_type)
+    result = execute_direct_sql_query(query, db_type, [applicant_name])
     
     if not result or "results" not in result:
         print("No data found for the applicant or query failed")
@@ -234,24 +229,27 @@ def generate_trend_chart(df, applicant_name):
     renamed_columns = [ipc_mapping.get(col, col) for col in pivot_df.columns]
     pivot_df.columns = renamed_columns
     
-    # Create the stacked bar chart
-    ax = pivot_df.plot(kind='bar', stacked=True, figsize=(14, 8))
-    
-    # Set labels and title
+    # Render the stacked bar chart with the shared renderer
     safe_applicant_name = re.sub(r'[^\x00-\x7F]', '', applicant_name)
-    ax.set_xlabel('Year', fontsize=12)
-    ax.set_ylabel('Number of Applications', fontsize=12)
-    ax.set_title(f'Patent Applications by Classification: {safe_applicant_name}', fontsize=14)
-    
-    # Enhance legend
-    plt.legend(title='IPC Classification', bbox_to_anchor=(1.05, 1), loc='upper left')
-    
-    # Adjust layout
-    plt.tight_layout()
+    spec = {
+        "type": "bar",
+        "stacked": True,
+        "title": f'Patent Applications by Classification: {safe_applicant_name}',
+        "xlabel": 'Year',
+        "ylabel": 'Number of Applications',
+        "figsize": [14, 8],
+        "bar_width": 0.5,
+        "style": 'ggplot',
+        "legend": {"title": 'IPC Classification', "bbox_to_anchor": [1.05, 1], "loc": 'upper left'}
+    }
+    data = {
+        "labels": [str(year) for year in pivot_df.index],
+        "series": [{"name": column, "values": pivot_df[column].tolist()} for column in pivot_df.columns]
+    }
     
     # Save the chart
     filename = f"{sanitize_string_for_filename(applicant_name)}_classification_trend.png"
-    plt.savefig(filename)
+    save_chart(spec, data, filename)
     print(f"Chart saved as {filename}")
     
     return filename
@@ -6,24 +6,31 @@ import sys
 def query_database(classification_code="G", start_year=2010, end_year=2023):
     """Send a direct query to the database API for classification analysis"""
     
-    # Build the SQL query
-    query = f"""
-    SELECT 
-        substr(filing_date, 1, 4) as year,
-        assignee_original as applicant_name,
-        COUNT(*) as application_count
-    FROM 
-        publications
-    WHERE 
-        substr(ipc_code, 1, 1) = '{classification_code}'
-        AND substr(filing_date, 1, 4) >= '{start_year}'
-        AND substr(filing_date, 1, 4) <= '{end_year}'
-    GROUP BY 
-        substr(filing_date, 1, 4), 
-        assignee_original
+    # Build the SQL query (top 5 applicants per year, ranked in SQL)
+    query = """
+    SELECT year, applicant_name, application_count
+    FROM (
+        SELECT 
+            filing_year as year,
+            assignee_original as applicant_name,
+            COUNT(*) as application_count,
+            ROW_NUMBER() OVER (
+                PARTITION BY filing_year ORDER BY COUNT(*) DESC, assignee_original
+            ) as applicant_rank
+        FROM 
+            publications
+        WHERE 
+            ipc_section = :classification_code
+            AND filing_year >= :start_year
+            AND filing_year <= :end_year
+        GROUP BY 
+            filing_year, 
+            assignee_original
+    )
+    WHERE applicant_rank <= 5
     ORDER BY 
-        substr(filing_date, 1, 4), 
-        COUNT(*) DESC
+        year, 
+        application_count DESC
     """
     
     # Send query to database API
@@ -31,7 +38,14 @@ def query_database(classification_code="G", start_year=2010, end_year=2023):
         db_url = "http://localhost:5003"
         response = requests.post(
             f"{db_url}/execute/bigquery",
-            json={"query": query}
+            json={
+                "query": query,
+                "params": {
+                    "classification_code": classification_code,
+                    "start_year": int(start_year),
+                    "end_year": int(end_year)
+                }
+            }
         )
         
         # Save raw response to file
@@ -39,6 +53,8 @@ def query_database(classification_code="G", start_year=2010, end_year=2023):
             json.dump(response.json(), f, indent=2, ensure_ascii=False)
         
         print(f"Saved raw database response to db_query_response.json")
+        if response.json().get("truncated"):
+            print(f"WARNING: result truncated at {response.json().get('row_count')} rows")
         
         return response.json()
         